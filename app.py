@@ -3,13 +3,13 @@ from datetime import datetime
 import pedala_teste_2
 from openai import OpenAI
 import os
-import json
 import re
-import html
 import streamlit.components.v1 as components
 import pandas as pd
 import base64
 import random
+import functools
+import asyncio
 from utils.openai_helper import analyze_cycling_conditions
 from utils.echarts_helper import (
     generate_historical_chart,
@@ -18,6 +18,12 @@ from utils.echarts_helper import (
 )
 from utils.new_gauge_chart import generate_improved_gauge_chart
 from pdf_generator import gerar_pdf_roteiro
+import rotas_offline
+from utils.maps_provider import cliente_maps
+from utils.geocoding import geocodificar
+from utils.address_index import validar_endereco
+from utils.route_budget import OrcamentoBusca, MODO_PADRAO
+from utils.route_engine import gerar_rota_circular, gerar_rota_circular_async
 
 # Função para inicializar ou reiniciar o estado da aplicação
 def inicializar_sessao(reiniciar=False):
@@ -60,14 +66,11 @@ inicializar_sessao()
 
 # Configura API keys
 OPENAI_KEY = os.getenv("OPENAI_API_KEY")
-GMAPS_KEY = os.getenv("GOOGLE_MAPS_API_KEY")
 client = OpenAI(api_key=OPENAI_KEY)
 
-# Verificar se temos chave do Google Maps
-has_gmaps = GMAPS_KEY is not None and GMAPS_KEY.strip() != ""
-if has_gmaps:
-    import googlemaps
-    gmaps = googlemaps.Client(key=GMAPS_KEY)
+# Cliente do Google Maps (live, record ou replay conforme PEDALA_MAPS_MODO)
+gmaps = cliente_maps()
+has_gmaps = gmaps is not None
 
 # Configuração da página
 st.set_page_config(
@@ -381,6 +384,7 @@ def gerar_guia_com_rota(relatorio: str, nivel: str, distancia_real: float, ender
     # Extrair os dados relevantes da rota
     passos_rota = dados_rota.get("passos", [])
     pontos_referencia = dados_rota.get("waypoints", [])
+    ciclovias_rota = dados_rota.get("ciclovias", "")
     
     # Formatar os passos da rota para o prompt
     if passos_rota:
@@ -424,6 +428,14 @@ Isso representa {analise_temperatura['percentual']}% abaixo do normal, recomenda
         print(f"Erro ao analisar temperatura: {str(e)}")
         temp_analise_texto = ""
     
+    # Só as ciclovias realmente percorridas são citadas no guia
+    if ciclovias_rota:
+        ciclovias_texto = f"## Ciclovias e ciclofaixas na rota:\n{ciclovias_rota}\n"
+        destaque_ciclovias = "Destaque as ciclovias e ciclofaixas listadas acima, nos trechos em que a rota passa por elas"
+    else:
+        ciclovias_texto = ""
+        destaque_ciclovias = "A rota não passa por ciclovias ou ciclofaixas conhecidas: não cite nenhuma"
+
     # Construir um prompt específico baseado na rota real
     prompt = f"""
 # 🚲 Guia Personalizado de Pedalada em São José dos Campos
@@ -443,6 +455,7 @@ O ciclista tem nível {nivel} e prefere o estilo {estilo}.
 ## Pontos principais:
 {", ".join(pontos_referencia)}
 
+{ciclovias_texto}
 EXTREMAMENTE IMPORTANTE:
 1. Estruture o guia com EXATAMENTE as seguintes seções:
    - ROTEIRO E EXPLICAÇÃO (explicando a rota acima e destacando aspectos de SEGURANÇA)
@@ -451,7 +464,7 @@ EXTREMAMENTE IMPORTANTE:
 
 2. Prioridades de segurança para enfatizar:
    - Evite rodovias movimentadas
-   - Destaque ciclovias e ciclofaixas
+   - {destaque_ciclovias}
    - Indique trechos onde é preciso ter atenção especial
    - Para iniciantes: priorize rotas mais tranquilas e planas
    - Para avançados: identifique desafios de terreno (subidas, curvas)
@@ -580,7 +593,7 @@ def extrair_passos_do_guia(guia_md: str) -> list[str]:
     # Limitar a 5 passos para não sobrecarregar a API
     return passos[:5]
 
-def gerar_rota_e_embed(origem: str, passos: list[str], distancia: int = 15, forcar_distancia: bool = False):
+def gerar_rota_e_embed(origem: str, passos: list[str], distancia: int = 15, forcar_distancia: bool = False, origem_coords: dict = None, modo_busca: str = "grade", orcamento: OrcamentoBusca = None):
     """
     Gera uma rota circular e um mapa HTML embutível que respeita a distância solicitada
     
@@ -589,11 +602,18 @@ def gerar_rota_e_embed(origem: str, passos: list[str], distancia: int = 15, forc
         passos (list[str]): Lista de pontos de referência da rota
         distancia (int): Distância desejada em km
         forcar_distancia (bool): Se True, força a distância a ficar próxima do valor solicitado
+        origem_coords (dict): Coordenadas já resolvidas da origem ({'lat', 'lng'}); se None,
+            a origem é geocodificada uma única vez aqui
+        modo_busca (str): "grade" para a varredura de multiplicadores, "secante" para
+            convergir no fator de deslocamento com poucas chamadas ou "matriz" para escolher
+            os waypoints pela matriz de distâncias e pedir uma única rota (caem na grade se falharem)
+        orcamento (OrcamentoBusca): Limite de chamadas à API de rotas e de tempo; ao se esgotar,
+            a busca devolve a melhor rota encontrada até ali (padrão: modo "preciso")
         
     Returns:
         tuple: HTML do mapa, texto descritivo da rota, dados de elevação
     """
-    global has_gmaps, GMAPS_KEY, gmaps
+    global has_gmaps, gmaps
     
     if not passos:
         return "", "<p>Não foi possível extrair passos para a rota.</p>", []
@@ -601,45 +621,18 @@ def gerar_rota_e_embed(origem: str, passos: list[str], distancia: int = 15, forc
     # Se não temos acesso ao Google Maps, retornamos uma mensagem explicativa
     if not has_gmaps:
         return "", "<p>Mapas indisponíveis sem uma chave de API do Google Maps.</p>", []
-        
-    # Preparar waypoints
-    waypoints_to_use = []
-    for passo in passos:
-        # Certificar que cada waypoint tem a cidade incluída
-        if "São José dos Campos" not in passo and "SJC" not in passo:
-            waypoint = f"{passo}, São José dos Campos, SP"
-        else:
-            waypoint = passo
-        waypoints_to_use.append(waypoint)
     
     # Definir client de Maps, se necessário
     try:
         if not gmaps:
-            GMAPS_KEY = os.environ.get('GOOGLE_MAPS_API_KEY', '')
-            if GMAPS_KEY:
-                gmaps = googlemaps.Client(key=GMAPS_KEY)
+            gmaps = cliente_maps()
+            if gmaps:
                 has_gmaps = True
             else:
                 st.warning("⚠️ Chave da API do Google Maps não encontrada!")
                 has_gmaps = False
                 return "", "<p>Mapa não disponível sem a chave do Google Maps API</p>", []
         
-        # Perfis de ciclista para personalizar a rota
-        ciclista_fatores = {
-            "Iniciante": 0.6,      # Iniciantes: rotas mais curtas
-            "Intermediário": 0.8,   # Intermediários: rotas médias
-            "Avançado": 1.0,        # Avançados: rotas completas
-            "Profissional": 1.2     # Profissionais: rotas mais desafiadoras
-        }
-        
-        # Ajustes por estilo de pedalada
-        estilo_ajustes = {
-            "urbano": {"lat_bias": 0.8, "lng_bias": 1.2},   # Urbano: áreas centrais
-            "montanha": {"lat_bias": 1.5, "lng_bias": 0.8}, # Montanha: mais elevação
-            "parques": {"lat_bias": 1.2, "lng_bias": 1.0},  # Parques: equilibrado
-            "familiar": {"lat_bias": 0.6, "lng_bias": 0.6}  # Familiar: rotas mais curtas
-        }
-        
         # Tentar obter dados da sessão
         try:
             nivel_ciclista = st.session_state.data['nivel']
@@ -648,980 +641,26 @@ def gerar_rota_e_embed(origem: str, passos: list[str], distancia: int = 15, forc
             nivel_ciclista = "Intermediário"
             estilo_pedalada = "urbano"
         
-        # Aplicar fatores de perfil
-        perfil_fator = ciclista_fatores.get(nivel_ciclista, 0.8)
-        estilo_config = estilo_ajustes.get(estilo_pedalada, {"lat_bias": 1.0, "lng_bias": 1.0})
-        
-        directions = None
-        
-        # Gerar a rota usando pontos cardeais
+        # Marcos do guia → circuito pré-calculado → busca (secante/grade) → rota simples
         with st.spinner("Gerando rota personalizada..."):
-            # Obter coordenadas da origem
-            geocode_result = gmaps.geocode(origem)
-            if geocode_result:
-                start_lat = geocode_result[0]['geometry']['location']['lat']
-                start_lng = geocode_result[0]['geometry']['location']['lng']
-                
-                # Calcular raio base baseado na distância solicitada
-                raio_km = distancia / (2 * 3.14)  # Raio aproximado
-                
-                # Calcular fator para distância desejada
-                base_factor = 0.002 * distancia
-                
-                # Ajustar pelo perfil e estilo
-                best_route = None
-                best_distance_diff = float('inf')
-                
-                # Tentar várias combinações para encontrar a rota ideal
-                # Usar mais multiplicadores para ter mais chances de encontrar uma rota adequada
-                for factor_mult in [0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.1, 1.2, 1.3, 1.4]:
-                    factor = base_factor * factor_mult * perfil_fator
-                    
-                    # Criar pontos de waypoint - usando mais variações
-                    north = f"{start_lat + factor * estilo_config['lat_bias']},{start_lng}"
-                    east = f"{start_lat},{start_lng + factor * estilo_config['lng_bias']}"
-                    south = f"{start_lat - factor * estilo_config['lat_bias']},{start_lng}"
-                    west = f"{start_lat},{start_lng - factor * estilo_config['lng_bias']}"
-                    
-                    # Diferentes combinações de pontos
-                    waypoint_sets = [
-                        [north, east],
-                        [north, west],
-                        [south, east], 
-                        [south, west],
-                        [north, south],
-                        [east, west]
-                    ]
-                    
-                    for waypoints in waypoint_sets:
-                        try:
-                            # Gerar rota de teste
-                            test_route = gmaps.directions(
-                                origin=origem,
-                                destination=origem,
-                                waypoints=waypoints,
-                                mode="bicycling",
-                                optimize_waypoints=True
-                            )
-                            
-                            if test_route:
-                                # Calcular distância desta rota
-                                test_distance = sum(leg['distance']['value'] for leg in test_route[0]['legs'])/1000
-                                distance_diff = abs(test_distance - distancia)
-                                
-                                # Tolerância SEMPRE 2.0 km no máximo
-                                tolerancia = 2.0
-                                
-                                # Verificar se está dentro do limite e não ultrapassa a distância solicitada em mais de 2km
-                                if distance_diff <= tolerancia and test_distance <= distancia + tolerancia:
-                                    # Rota dentro da tolerância, mas damos preferência para rotas menores ou iguais à solicitada
-                                    if test_distance <= distancia:
-                                        best_route = test_route
-                                        best_distance_diff = distance_diff
-                                        break  # Sai do loop de waypoints
-                                    # Se não for menor, guarda como melhor opção até agora
-                                    elif distance_diff < best_distance_diff:
-                                        best_route = test_route
-                                        best_distance_diff = distance_diff
-                                # Se for melhor, mas ainda dentro da tolerância, guardar esta rota
-                                elif test_distance <= distancia + tolerancia and distance_diff < best_distance_diff:
-                                    best_route = test_route
-                                    best_distance_diff = distance_diff
-                        except:
-                            # Silenciosamente continuar para a próxima tentativa
-                            pass
-                    
-                    # Se encontrou uma rota adequada, interromper o loop de multiplicadores
-                    tolerancia = 2.0  # Tolerância fixa de 2km, sem exceções
-                    if best_distance_diff <= tolerancia:
-                        break
-                
-                # Priorizar os waypoints extraídos do guia
-                try:
-                    # Primeiro tentar com os waypoints específicos do guia
-                    if len(waypoints_to_use) >= 2:
-                        specific_directions = gmaps.directions(
-                            origin=origem,
-                            destination=origem,
-                            waypoints=waypoints_to_use[:min(5, len(waypoints_to_use))],  # Limite de 5 waypoints intermediários
-                            mode="bicycling",
-                            optimize_waypoints=True
-                        )
-                        if specific_directions:
-                            directions = specific_directions
-                except Exception as e:
-                    st.warning(f"Não foi possível gerar rota com pontos específicos: {str(e)}")
-
-                # Se conseguiu com pontos específicos, verificar se a distância está dentro da tolerância
-                if directions:
-                    # Calcular a distância total da rota com pontos específicos
-                    total_distance = sum(leg['distance']['value'] for leg in directions[0]['legs'])/1000
-                    # Se a distância exceder a tolerância, descartar esta rota
-                    if abs(total_distance - distancia) > 2.0:
-                        directions = None
-                        # Apenas registrar o erro no log, não mostrar ao usuário
-                        print(f"ERRO: Rota gerada de {total_distance:.1f}km excede a tolerância de ±2km da distância solicitada ({distancia}km)")
-                        
-                # Se não conseguiu com pontos específicos ou a distância excedeu, usar a melhor rota circular calculada
-                if not directions and best_route:
-                    # Verificar se a melhor rota está dentro da tolerância
-                    best_distance = sum(leg['distance']['value'] for leg in best_route[0]['legs'])/1000
-                    if abs(best_distance - distancia) <= 2.0:
-                        directions = best_route
-                    else:
-                        # Só logar o erro, não mostrar ao usuário
-                        print(f"ERRO: Nenhuma rota dentro da tolerância de ±2km foi encontrada. A melhor rota tem {best_distance:.1f}km")
-            
-            # Se ainda não tem rota, tentar rota mais simples
-            if not directions:
-                try:
-                    test_directions = gmaps.directions(
-                        origin=origem,
-                        destination=origem,
-                        mode="bicycling"
-                    )
-                    
-                    # Verificar se a distância está dentro da tolerância
-                    if test_directions:
-                        test_distance = sum(leg['distance']['value'] for leg in test_directions[0]['legs'])/1000
-                        if abs(test_distance - distancia) <= 2.0:
-                            directions = test_directions
-                        else:
-                            # Apenas registrar no log, não mostrar ao usuário
-                            print(f"ERRO: Rota básica de {test_distance:.1f}km excede a tolerância de ±2km da distância solicitada ({distancia}km)")
-                except Exception as e:
-                    st.error(f"Erro ao gerar rota básica: {str(e)}")
-            
-            # Se nenhuma tentativa funcionou
-            if not directions:
-                return "", "<p>Não foi possível gerar um roteiro para o endereço especificado.</p>", []
-        
-        # Obter dados de elevação
-        elevation_data = []
-        try:
-            max_steps = 5
-            step_count = 0
-            
-            for leg in directions[0]['legs']:
-                for step in leg['steps']:
-                    if step_count >= max_steps:
-                        break
-                        
-                    start_loc = step['start_location']
-                    try:
-                        elevation_result = gmaps.elevation((start_loc['lat'], start_loc['lng']))
-                        if elevation_result:
-                            elevation_data.append({
-                                'distance': len(elevation_data) * 0.5,
-                                'elevation': elevation_result[0]['elevation']
-                            })
-                    except:
-                        pass
-                    step_count += 1
-        except:
-            pass
-        
-        # Calcular distância total
-        distancia_total = sum(leg['distance']['value'] for leg in directions[0]['legs'])/1000
-        distancia_total = f"{distancia_total:.1f} km"
-        
-        # Extrair instruções
-        ruas = [html.unescape(re.sub(r'<[^>]+>', '', step['html_instructions']))
-               for leg in directions[0]['legs'] for step in leg['steps']]
-        
-        # Traduzir instruções
-        ruas_traduzidas = []
-        for rua in ruas:
-            # Substituições básicas de inglês para português
-            rua_pt = rua.replace("Turn right", "Vire à direita")
-            rua_pt = rua_pt.replace("Turn left", "Vire à esquerda")
-            rua_pt = rua_pt.replace("Continue onto", "Continue pela")
-            rua_pt = rua_pt.replace("Continue to follow", "Continue seguindo pela")
-            rua_pt = rua_pt.replace("Head", "Siga")
-            rua_pt = rua_pt.replace("Destination", "Destino")
-            rua_pt = rua_pt.replace("north", "norte")
-            rua_pt = rua_pt.replace("south", "sul")
-            rua_pt = rua_pt.replace("east", "leste")
-            rua_pt = rua_pt.replace("west", "oeste")
-            rua_pt = rua_pt.replace("Walk your bicycle", "Desça da bicicleta")
-            rua_pt = rua_pt.replace("toward", "em direção a")
-            rua_pt = rua_pt.replace("Pass by", "Passe por")
-            rua_pt = rua_pt.replace("on the right", "à direita")
-            rua_pt = rua_pt.replace("on the left", "à esquerda")
-            rua_pt = rua_pt.replace("in", "em")
-            rua_pt = rua_pt.replace("m)", "m)")
-            
-            # Traduções adicionais (caso rota simplificada não funcione)
-            rua_pt = rua_pt.replace("take the", "pegue a")
-            rua_pt = rua_pt.replace("take the 1st", "pegue a 1ª")
-            rua_pt = rua_pt.replace("take the 2nd", "pegue a 2ª")
-            rua_pt = rua_pt.replace("take the 3rd", "pegue a 3ª")
-            rua_pt = rua_pt.replace("take the 4th", "pegue a 4ª")
-            rua_pt = rua_pt.replace("take the 5th", "pegue a 5ª")
-            rua_pt = rua_pt.replace("exit", "saída")
-            rua_pt = rua_pt.replace("At the roundabout", "Na rotatória")
-            rua_pt = rua_pt.replace("At", "Em")
-            rua_pt = rua_pt.replace("roundabout", "rotatória")
-            rua_pt = rua_pt.replace("Enter", "Entre na")
-            rua_pt = rua_pt.replace("and", "e")
-            rua_pt = rua_pt.replace("the", "a")
-            rua_pt = rua_pt.replace("your", "sua")
-            rua_pt = rua_pt.replace("until", "até")
-            rua_pt = rua_pt.replace("will be", "estará")
-            rua_pt = rua_pt.replace("for", "por")
-            rua_pt = rua_pt.replace("next", "próximo")
-            rua_pt = rua_pt.replace("Slight", "Levemente")
-            rua_pt = rua_pt.replace("Keep", "Mantenha-se")
-            rua_pt = rua_pt.replace("right", "direita")
-            rua_pt = rua_pt.replace("left", "esquerda")
-            
-            ruas_traduzidas.append(rua_pt)
-        
-        # Gerar HTML do mapa
-        mapa_html = f"""
-<div id="map" style="height:500px; border-radius:12px; box-shadow: 0 4px 8px rgba(0,0,0,0.3);"></div>
-<script>
-  function initMap() {{
-    const map = new google.maps.Map(document.getElementById("map"), {{
-      zoom: 14,
-      center: {{ lat: {directions[0]['legs'][0]['start_location']['lat']}, lng: {directions[0]['legs'][0]['start_location']['lng']} }},
-      styles: [
-        {{
-          "featureType": "all",
-          "elementType": "labels.text.fill",
-          "stylers": [{{ "color": "#ffffff" }}]
-        }},
-        {{
-          "featureType": "all",
-          "elementType": "labels.text.stroke",
-          "stylers": [{{ "color": "#000000" }}, {{ "lightness": 13 }}]
-        }},
-        {{
-          "featureType": "administrative",
-          "elementType": "geometry.fill",
-          "stylers": [{{ "color": "#000000" }}]
-        }},
-        {{
-          "featureType": "administrative",
-          "elementType": "geometry.stroke",
-          "stylers": [{{ "color": "#144b53" }}, {{ "lightness": 14 }}, {{ "weight": 1.4 }}]
-        }},
-        {{
-          "featureType": "landscape",
-          "elementType": "all",
-          "stylers": [{{ "color": "#08304b" }}]
-        }},
-        {{
-          "featureType": "poi",
-          "elementType": "geometry",
-          "stylers": [{{ "color": "#0c4152" }}, {{ "lightness": 5 }}]
-        }},
-        {{
-          "featureType": "road.highway",
-          "elementType": "geometry.fill",
-          "stylers": [{{ "color": "#3498db" }}]
-        }},
-        {{
-          "featureType": "road.highway",
-          "elementType": "geometry.stroke",
-          "stylers": [{{ "color": "#2980b9" }}, {{ "lightness": 25 }}]
-        }},
-        {{
-          "featureType": "road.arterial",
-          "elementType": "geometry.fill",
-          "stylers": [{{ "color": "#2c3e50" }}]
-        }},
-        {{
-          "featureType": "road.arterial",
-          "elementType": "geometry.stroke",
-          "stylers": [{{ "color": "#0b3d51" }}, {{ "lightness": 16 }}]
-        }},
-        {{
-          "featureType": "road.local",
-          "elementType": "geometry",
-          "stylers": [{{ "color": "#000000" }}]
-        }},
-        {{
-          "featureType": "transit",
-          "elementType": "all",
-          "stylers": [{{ "color": "#146474" }}]
-        }},
-        {{
-          "featureType": "water",
-          "elementType": "all",
-          "stylers": [{{ "color": "#021019" }}]
-        }}
-      ]
-    }});
-    const directionsService = new google.maps.DirectionsService();
-    const directionsRenderer = new google.maps.DirectionsRenderer({{
-      map: map,
-      polylineOptions: {{
-        strokeColor: '#e74c3c',
-        strokeWeight: 6,
-        strokeOpacity: 0.9
-      }}
-    }});
-    directionsService.route({{
-      origin: "{origem}",
-      destination: "{origem}",
-      waypoints: [
-        // É essencial ter pelo menos um waypoint para rotas circulares
-        // Calcular um ponto ao norte do ponto de partida
-        {{
-          location: new google.maps.LatLng(
-            {directions[0]['legs'][0]['start_location']['lat'] + 0.02}, 
-            {directions[0]['legs'][0]['start_location']['lng']}
-          )
-        }}
-      ],
-      travelMode: google.maps.TravelMode.BICYCLING,
-      optimizeWaypoints: true,
-    }}, (result, status) => {{
-      if (status === "OK") directionsRenderer.setDirections(result);
-      else alert("Falha na rota: " + status);
-    }});
-  }}
-</script>
-<script src="https://maps.googleapis.com/maps/api/js?key={GMAPS_KEY}&callback=initMap" async defer></script>
-"""
-        
-        # Gerar texto da rota
-        texto = f"""
-### 🗺️ Resumo da Rota  
-**Origem e retorno:** {origem}  
-**Distância total:** {distancia_total}  
-
-**Passos detalhados:**  
-<ol>
-{''.join(f"<li>{rua}</li>" for rua in ruas_traduzidas)}
-</ol>
-"""
-        return mapa_html, texto, elevation_data
+            argumentos = dict(
+                passos=passos,
+                nivel=nivel_ciclista,
+                estilo=estilo_pedalada,
+                origem_coords=origem_coords,
+                modo_busca=modo_busca,
+                orcamento=orcamento
+            )
+            if os.getenv("PEDALA_ROTAS_ASYNC") == "1":
+                # Pipeline assíncrono: candidatos avaliados concorrentemente num único event loop
+                resultado = asyncio.run(gerar_rota_circular_async(origem, distancia, **argumentos))
+            else:
+                resultado = gerar_rota_circular(origem, distancia, gmaps=gmaps, **argumentos)
+        return resultado.como_tupla()
         
     except Exception as e:
         st.error(f"Erro ao gerar rota: {str(e)}")
         return "", f"<p>Não foi possível gerar a rota: {str(e)}</p>", []
-        
-    try:
-        # ⭐ Melhorar os pontos de referência adicionando a cidade para evitar erros NOT_FOUND
-        waypoints_completos = []
-        for passo in passos:
-            # Certificar que cada waypoint tem a cidade incluída
-            if "São José dos Campos" not in passo and "SJC" not in passo:
-                waypoint = f"{passo}, São José dos Campos, SP"
-            else:
-                waypoint = passo
-            waypoints_completos.append(waypoint)
-        
-        # Primeiro tentamos com todos os pontos (até 5, que é o máximo que o Google Maps permite no plano gratuito)
-        max_waypoints = min(len(waypoints_completos), 5)
-        waypoints_to_use = waypoints_completos[0:max_waypoints]
-        
-        # Processar pontos de referência internamente, sem mostrar ao usuário
-        
-        # ⭐ Uso da API com tratamento de erros mais robusto
-        try:
-            # Remover ponto A → ponto A sem waypoints dá distância zero
-            # Então vamos gerar uma rota circular usando algoritmo específico
-            
-            # Definir fatores específicos baseados no tipo de ciclista e estilo
-            # Escondendo logs de processamento e mensagens de status
-            with st.spinner(f"Gerando rota personalizada de {distancia} km..."):
-                # Usar nível e estilo para personalizar rota
-                # 1. Usar fatores diferentes por perfil
-                ciclista_fatores = {
-                    "Iniciante": 0.6,       # Iniciantes: rotas mais curtas, menos elevação
-                    "Intermediário": 0.8,    # Intermediários: rotas médias
-                    "Avançado": 1.0,         # Avançados: rotas completas
-                    "Profissional": 1.2      # Profissionais: rotas mais desafiadoras
-                }
-                
-                # 2. Aplicar ajustes por estilo de pedalada
-                estilo_ajustes = {
-                    "urbano": {"lat_bias": 0.8, "lng_bias": 1.2},      # Urbano: preferência para áreas centrais
-                    "montanha": {"lat_bias": 1.5, "lng_bias": 0.8},     # Montanha: mais elevação
-                    "parques": {"lat_bias": 1.2, "lng_bias": 1.0},      # Parques: equilibrado
-                    "familiar": {"lat_bias": 0.6, "lng_bias": 0.6}      # Familiar: rotas mais curtas e seguras
-                }
-                
-                # Pegar perfil do ciclista da sessão
-                try:
-                    nivel_ciclista = data['nivel']
-                    estilo_pedalada = data['estilo']
-                except:
-                    nivel_ciclista = "Intermediário"
-                    estilo_pedalada = "urbano"
-                
-                # Aplicar fatores baseados no perfil
-                perfil_fator = ciclista_fatores.get(nivel_ciclista, 0.8)
-                estilo_config = estilo_ajustes.get(estilo_pedalada, {"lat_bias": 1.0, "lng_bias": 1.0})
-                
-                # Calcular raio base baseado na distância solicitada
-                raio_km = distancia / (2 * 3.14)  # Raio aproximado para obter a distância desejada
-                
-                # Obter as coordenadas da origem
-                geocode_result = gmaps.geocode(origem)
-                best_route = None
-                best_distance_diff = float('inf')
-                
-                if geocode_result:
-                    start_lat = geocode_result[0]['geometry']['location']['lat']
-                    start_lng = geocode_result[0]['geometry']['location']['lng']
-                    
-                    # Tentar diferentes fatores até encontrar uma distância próxima da solicitada
-                    # Fator inicial baseado na distância solicitada
-                    base_factor = 0.002 * distancia
-                    
-                    # Variações do fator para tentar diferentes distâncias - mais precisas para respeitar a tolerância de 2km
-                    factor_variations = [0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95, 1.0, 1.05, 1.1, 1.15, 1.2, 1.25, 1.3]
-                    
-                    # Aplicar o ajuste de perfil mas sem ultrapassar limites razoáveis para a distância
-                    factor_variations = [max(0.5, min(1.3, f * perfil_fator)) for f in factor_variations]
-                    
-                    # Tentar diversos fatores até encontrar a melhor rota dentro da tolerância
-                    for factor_mult in factor_variations:
-                        factor = base_factor * factor_mult
-                        
-                        # Aplicar fatores de estilo para direções diferentes (norte, leste, etc)
-                        north_factor = factor * estilo_config["lat_bias"]
-                        east_factor = factor * estilo_config["lng_bias"]
-                        
-                        # Criar pontos cardeais para este teste
-                        north = f"{start_lat + north_factor},{start_lng}"
-                        east = f"{start_lat},{start_lng + east_factor}"
-                        
-                        # Gerar rota com estes pontos
-                        try:
-                            test_route = gmaps.directions(
-                                origin=origem,
-                                destination=origem,
-                                waypoints=[north, east],
-                                mode="bicycling",
-                                optimize_waypoints=True
-                            )
-                            
-                            if test_route:
-                                # Calcular distância desta rota
-                                test_distance = sum(leg['distance']['value'] for leg in test_route[0]['legs'])/1000
-                                
-                                # Verificar se está dentro da tolerância (2km)
-                                distance_diff = abs(test_distance - distancia)
-                                
-                                # Se for mais próxima da distância solicitada, salvar como melhor rota
-                                if distance_diff < best_distance_diff:
-                                    best_route = test_route
-                                    best_distance_diff = distance_diff
-                                    
-                                    # Se diferença < 2km, temos uma rota boa o suficiente
-                                    if distance_diff <= 2.0:
-                                        break
-                                        
-                        except Exception as e:
-                            # Silenciosamente continuar para o próximo fator
-                            pass
-                    
-                    # Usar a melhor rota encontrada
-                    if best_route:
-                        directions = best_route
-                    else:
-                        # Se nenhuma rota foi encontrada, usar a última tentativa
-                        directions = gmaps.directions(
-                            origin=origem,
-                            destination=origem,
-                            waypoints=[north, east],
-                            mode="bicycling",
-                            optimize_waypoints=True
-                        )
-                else:
-                    # Se não encontrou parques, vamos calcular pontos cardeais
-                    # e criar uma rota com 4 pontos ao redor do local inicial
-                    # Esconder mensagens de processamento
-                    
-                    # Obter as coordenadas da origem
-                    geocode_result = gmaps.geocode(origem)
-                    if geocode_result:
-                        start_lat = geocode_result[0]['geometry']['location']['lat']
-                        start_lng = geocode_result[0]['geometry']['location']['lng']
-                    
-                    # Cálculo de 1 km em graus (aproximadamente)
-                    lat_offset = 0.009  # ~1km em latitude
-                    lng_offset = 0.012  # ~1km em longitude (varia com a latitude)
-                    
-                    # Calcular distância radial para obter aproximadamente a metade da distância total
-                    distance_factor = raio_km * 0.009  # Ajustar deslocamento para distância
-                    
-                    # Criar 4 pontos ao redor
-                    north = f"{start_lat + distance_factor},{start_lng}"
-                    east = f"{start_lat},{start_lng + distance_factor}"
-                    south = f"{start_lat - distance_factor},{start_lng}"
-                    west = f"{start_lat},{start_lng - distance_factor}"
-                    
-                    # Criar rota com 2 pontos - isso geralmente resulta em um retângulo
-                    directions = gmaps.directions(
-                        origin=origem,
-                        destination=origem,
-                        waypoints=[north, east],
-                        mode="bicycling",
-                        optimize_waypoints=False
-                    )
-                # Último recurso: usar pontos conhecidos em São José dos Campos
-                if not directions:
-                    waypoints = [
-                        "Parque Santos Dumont, São José dos Campos, SP",
-                        "Parque Vicentina Aranha, São José dos Campos, SP"
-                    ]
-                    
-                    try:
-                        directions = gmaps.directions(
-                            origin=origem,
-                            destination=origem,
-                            waypoints=waypoints,
-                            mode="bicycling",
-                            optimize_waypoints=False
-                        )
-                    except:
-                        pass
-            
-            if not directions:
-                # Tentar com menos waypoints (sem mostrar mensagem ao usuário)
-                directions = gmaps.directions(
-                    origin=origem,
-                    destination=origem,
-                    waypoints=waypoints_to_use[0:min(2, len(waypoints_to_use))],
-                    mode="bicycling",
-                    optimize_waypoints=False
-                )
-                
-                if not directions:
-                    # Última tentativa: apenas origem e destino sem waypoints
-                    directions = gmaps.directions(
-                        origin=origem,
-                        destination=origem,
-                        mode="bicycling"
-                    )
-                    
-                    if not directions:
-                        return "", "<p>Não foi possível gerar um roteiro para o endereço especificado.</p>", []
-        except Exception as e:
-            # Tentar com formato de endereço simplificado sem notificar o usuário
-            
-            # ⭐ Segunda tentativa com endereços simplificados
-            try:
-                simplified_origin = origem.split(',')[0] + ", São José dos Campos, SP"
-                simplified_waypoints = [wp.split(',')[0] + ", São José dos Campos, SP" for wp in waypoints_to_use]
-                
-                directions = gmaps.directions(
-                    origin=simplified_origin,
-                    destination=simplified_origin,
-                    waypoints=simplified_waypoints[0:min(2, len(simplified_waypoints))],
-                    mode="bicycling",
-                    optimize_waypoints=False
-                )
-                
-                if not directions:
-                    return "", "<p>Não foi possível gerar rota mesmo com endereços simplificados.</p>", []
-            except Exception as e2:
-                return "", f"<p>Falha ao gerar rota após múltiplas tentativas: {str(e2)}</p>", []
-            
-        # ⭐ Verificar se a distância está próxima da solicitada
-        distancia_calculada = sum(leg['distance']['value'] for leg in directions[0]['legs'])/1000
-        # Armazenar info de distância
-        distance_diff = abs(distancia_calculada - distancia)
-        
-        # IMPORTANTE: Garantir que a rota respeite a tolerância de 2km
-        # Se a diferença for maior que 2km, tentar ajustar a rota
-        if distance_diff > 2.0:
-            # Tentar com menos waypoints para reduzir a distância
-            with st.spinner("Refinando rota para distância ideal..."):
-                for num_points in range(min(2, len(waypoints_to_use)), 0, -1):
-                    try:
-                        simpler_directions = gmaps.directions(
-                            origin=origem,
-                            destination=origem,
-                            waypoints=waypoints_to_use[0:num_points],
-                            mode="bicycling",
-                            optimize_waypoints=True  # Otimizar para reduzir distância
-                        )
-                        
-                        if simpler_directions:
-                            simpler_distance = sum(leg['distance']['value'] for leg in simpler_directions[0]['legs'])/1000
-                            
-                            # Se a nova distância está mais próxima do desejado, usar esta rota
-                            if abs(simpler_distance - distancia) < abs(distancia_calculada - distancia):
-                                directions = simpler_directions
-                                distancia_calculada = simpler_distance
-                        
-                    except Exception:
-                        pass
-                    
-                # Se ainda está muito fora, tentar uma rota circular simples
-                if distancia_calculada > distancia * 1.3:
-                    try:
-                        # Calcular a distância que precisamos para um lado (metade do total)
-                        half_distance = distancia / 2
-                    
-                        # Obter geocodificação do endereço de origem
-                        try:
-                            geocode_result = gmaps.geocode(origem)
-                            if geocode_result:
-                                start_lat = geocode_result[0]['geometry']['location']['lat']
-                                start_lng = geocode_result[0]['geometry']['location']['lng']
-                            
-                            # Calcular fator de distância para obter aproximadamente a distância desejada
-                            # Ajuste específico para 15km que foi solicitado
-                            if distancia == 15:
-                                factor = 0.03  # Fator específico para gerar rota de 15km
-                            else:
-                                # Para outras distâncias, calcular proporcionalmente
-                                factor = 0.002 * distancia  # Aproximadamente 0.03 para 15km
-                            
-                            # Dois pontos em lados opostos para formar um circuito mais próximo de 15km
-                            point_north = f"{start_lat + factor},{start_lng}"
-                            point_east = f"{start_lat},{start_lng + factor}" 
-                            
-                            circular_route = gmaps.directions(
-                                origin=origem,
-                                destination=origem,
-                                waypoints=[point_north, point_east],
-                                mode="bicycling"
-                            )
-                            
-                            if circular_route:
-                                circular_distance = sum(leg['distance']['value'] for leg in circular_route[0]['legs'])/1000
-                                
-                                # Se está mais próxima do desejado, usar esta rota
-                                if abs(circular_distance - distancia) < abs(distancia_calculada - distancia):
-                                    directions = circular_route
-                                    distancia_calculada = circular_distance
-                        except Exception:
-                            # Silenciosamente ignorar erros
-                            pass
-                            
-                    except Exception:
-                        # Silenciosamente ignorar erros
-                        pass
-        
-    except Exception as e:
-        st.error(f"Erro ao acessar a API do Google Maps: {str(e)}")
-        return "", f"<p>Erro ao acessar a API do Google Maps: {str(e)}</p>", []
-    # usamos todas as pernas
-    distancia_total = sum(leg['distance']['value'] for leg in directions[0]['legs'])/1000
-    distancia_total = f"{distancia_total:.1f} km"
-    ruas = [ html.unescape(re.sub(r'<[^>]+>', '', step['html_instructions']))
-             for leg in directions[0]['legs'] for step in leg['steps'] ]
-             
-    # Traduzir instruções para português usando a API OpenAI
-    with st.spinner("Traduzindo instruções da rota..."):
-        # Primeiro, tentar corrigir problemas comuns nas strings de origem 
-        # (como mixagem de idiomas)
-        ruas_corrigidas = []
-        for rua in ruas:
-            # Corrigir alguns erros comuns, como palavras que ficam no idioma errado
-            rua_corrigida = rua.replace("Contemue", "Continue")
-            rua_corrigida = rua_corrigida.replace("norteleste", "nordeste")
-            rua_corrigida = rua_corrigida.replace("Destemo", "Destino")
-            rua_corrigida = rua_corrigida.replace("Slight right", "Vire levemente à direita")
-            rua_corrigida = rua_corrigida.replace("Slight left", "Vire levemente à esquerda")
-            rua_corrigida = rua_corrigida.replace("Restricted usage road", "Estrada de uso restrito")
-            ruas_corrigidas.append(rua_corrigida)
-        
-        # Agora, preparar o prompt para tradução
-        instrucoes_texto = "\n".join(ruas_corrigidas)
-        
-        # Usar o modelo OpenAI para tradução
-        prompt_tradutor = f"""
-Traduza as seguintes instruções de rota para português brasileiro formal e correto.
-IMPORTANTE: TRADUZA CADA INSTRUÇÃO COMPLETAMENTE para português, sem deixar nenhuma parte em inglês.
-Mantenha nomes de ruas/locais intactos, pois são nomes próprios (ex: Av. Engenheiro Sebastião Gualberto).
-Use consistência nas traduções, sempre com o mesmo formato para instruções similares.
-Traduza cada linha separadamente e mantenha o mesmo número de linhas.
-
-Mapeamento completo de termos específicos:
-- "Head" → "Siga"
-- "Turn right" → "Vire à direita"
-- "Turn left" → "Vire à esquerda" 
-- "Turn" → "Vire"
-- "Continue onto" → "Continue pela"
-- "Continue to follow" → "Continue seguindo pela"
-- "Continue" → "Continue"
-- "northeast" → "nordeste"
-- "southeast" → "sudeste" 
-- "northwest" → "noroeste"
-- "southwest" → "sudoeste"
-- "north" → "norte"
-- "south" → "sul"
-- "east" → "leste"
-- "west" → "oeste"
-- "Walk your bicycle" → "Desça da bicicleta"
-- "toward" → "em direção a"
-- "Pass by" → "Passe por"
-- "on the right" → "à direita"
-- "on the right side" → "do lado direito"
-- "on the left" → "à esquerda"
-- "on the left side" → "do lado esquerdo"
-- "in" → "em"
-- "will be on" → "estará"
-- "Restricted usage road" → "Estrada de uso restrito"
-- "Destination" → "Destino"
-- "Slight right" → "Vire levemente à direita"
-- "Slight left" → "Vire levemente à esquerda"
-- "for" → "por"
-- "then" → "depois"
-- "Take" → "Pegue"
-
-Texto para traduzir:
-{instrucoes_texto}
-
-Responda APENAS com a tradução, sem comentários adicionais. Não deixe NENHUMA palavra em inglês.
-"""
-        
-        try:
-            # the newest OpenAI model is "gpt-4o" which was released May 13, 2024.
-            resp = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": prompt_tradutor}],
-                temperature=0.2
-            )
-            
-            texto_traduzido = resp.choices[0].message.content.strip()
-            ruas_traduzidas = [linha.strip() for linha in texto_traduzido.split('\n') if linha.strip()]
-            
-            # Validar resultado da tradução
-            if len(ruas_traduzidas) != len(ruas):
-                st.warning(f"Tradução automática resultou em número diferente de instruções (original: {len(ruas)}, traduzido: {len(ruas_traduzidas)}). Aplicando correções.")
-                
-                # Tentar ajustar o tamanho da lista traduzida
-                if len(ruas_traduzidas) > len(ruas):
-                    # Se temos mais traduções que originais, pegar apenas as primeiras
-                    ruas_traduzidas = ruas_traduzidas[:len(ruas)]
-                else:
-                    # Se temos menos traduções, completar com traduções básicas
-                    for i in range(len(ruas_traduzidas), len(ruas)):
-                        rua = ruas[i]
-                        # Tradução básica mais abrangente
-                        rua_pt = rua.replace("Head", "Siga")
-                        rua_pt = rua_pt.replace("Turn right", "Vire à direita")
-                        rua_pt = rua_pt.replace("Turn left", "Vire à esquerda")
-                        rua_pt = rua_pt.replace("Turn", "Vire")
-                        rua_pt = rua_pt.replace("Continue onto", "Continue pela")
-                        rua_pt = rua_pt.replace("Continue to follow", "Continue seguindo pela")
-                        rua_pt = rua_pt.replace("Continue", "Continue")
-                        rua_pt = rua_pt.replace("Walk your bicycle", "Desça da bicicleta")
-                        rua_pt = rua_pt.replace("toward", "em direção a")
-                        rua_pt = rua_pt.replace("Pass by", "Passe por")
-                        rua_pt = rua_pt.replace("on the right", "à direita")
-                        rua_pt = rua_pt.replace("on the right side", "do lado direito")
-                        rua_pt = rua_pt.replace("on the left", "à esquerda")
-                        rua_pt = rua_pt.replace("on the left side", "do lado esquerdo")
-                        rua_pt = rua_pt.replace("in", "em")
-                        rua_pt = rua_pt.replace("Destination", "Destino")
-                        rua_pt = rua_pt.replace("northeast", "nordeste")
-                        rua_pt = rua_pt.replace("southeast", "sudeste")
-                        rua_pt = rua_pt.replace("northwest", "noroeste")
-                        rua_pt = rua_pt.replace("southwest", "sudoeste")
-                        rua_pt = rua_pt.replace("north", "norte")
-                        rua_pt = rua_pt.replace("south", "sul")
-                        rua_pt = rua_pt.replace("east", "leste")
-                        rua_pt = rua_pt.replace("west", "oeste")
-                        rua_pt = rua_pt.replace("Restricted usage road", "Estrada de uso restrito")
-                        rua_pt = rua_pt.replace("Slight right", "Vire levemente à direita")
-                        rua_pt = rua_pt.replace("Slight left", "Vire levemente à esquerda")
-                        rua_pt = rua_pt.replace("for", "por")
-                        rua_pt = rua_pt.replace("then", "depois")
-                        rua_pt = rua_pt.replace("Take", "Pegue")
-                        rua_pt = rua_pt.replace("m)", "m)")
-                        ruas_traduzidas.append(rua_pt)
-        except Exception as e:
-            st.warning(f"Erro na tradução avançada: {str(e)}. Usando tradução básica.")
-            # Fallback para tradução básica
-            ruas_traduzidas = []
-            for rua in ruas:
-                rua_pt = rua
-                # Tradução abrangente
-                rua_pt = rua_pt.replace("Head", "Siga")
-                rua_pt = rua_pt.replace("Turn right", "Vire à direita")
-                rua_pt = rua_pt.replace("Turn left", "Vire à esquerda")
-                rua_pt = rua_pt.replace("Turn", "Vire")
-                rua_pt = rua_pt.replace("Continue onto", "Continue pela")
-                rua_pt = rua_pt.replace("Continue to follow", "Continue seguindo pela")
-                rua_pt = rua_pt.replace("Continue", "Continue")
-                rua_pt = rua_pt.replace("Walk your bicycle", "Desça da bicicleta")
-                rua_pt = rua_pt.replace("toward", "em direção a")
-                rua_pt = rua_pt.replace("Pass by", "Passe por")
-                rua_pt = rua_pt.replace("on the right", "à direita")
-                rua_pt = rua_pt.replace("on the right side", "do lado direito")
-                rua_pt = rua_pt.replace("on the left", "à esquerda")
-                rua_pt = rua_pt.replace("on the left side", "do lado esquerdo")
-                rua_pt = rua_pt.replace("in", "em")
-                rua_pt = rua_pt.replace("Destination", "Destino")
-                rua_pt = rua_pt.replace("northeast", "nordeste")
-                rua_pt = rua_pt.replace("southeast", "sudeste")
-                rua_pt = rua_pt.replace("northwest", "noroeste")
-                rua_pt = rua_pt.replace("southwest", "sudoeste")
-                rua_pt = rua_pt.replace("north", "norte")
-                rua_pt = rua_pt.replace("south", "sul")
-                rua_pt = rua_pt.replace("east", "leste")
-                rua_pt = rua_pt.replace("west", "oeste")
-                rua_pt = rua_pt.replace("Restricted usage road", "Estrada de uso restrito")
-                rua_pt = rua_pt.replace("Slight right", "Vire levemente à direita")
-                rua_pt = rua_pt.replace("Slight left", "Vire levemente à esquerda")
-                rua_pt = rua_pt.replace("for", "por")
-                rua_pt = rua_pt.replace("then", "depois")
-                rua_pt = rua_pt.replace("Take", "Pegue")
-                ruas_traduzidas.append(rua_pt)
-
-    # Extract elevation data for the route
-    elevation_data = []
-    try:
-        # Limitar para não sobrecarregar a API
-        max_steps = 5
-        step_count = 0
-        
-        for leg in directions[0]['legs']:
-            for step in leg['steps']:
-                if step_count >= max_steps:
-                    break
-                    
-                start_loc = step['start_location']
-                # Get elevation for start point
-                try:
-                    elevation_result = gmaps.elevation((start_loc['lat'], start_loc['lng']))
-                    if elevation_result:
-                        elevation_data.append({
-                            'distance': len(elevation_data) * 0.5,  # Approximated distance
-                            'elevation': elevation_result[0]['elevation']
-                        })
-                except Exception:
-                    # Ignorar erros de elevação e continuar
-                    pass
-                
-                step_count += 1
-    except Exception as e:
-        st.warning(f"Não foi possível obter dados de elevação: {str(e)}")
-
-    mapa_html = f"""
-<div id="map" style="height:500px; border-radius:12px; box-shadow: 0 4px 8px rgba(0,0,0,0.3);"></div>
-<script>
-  function initMap() {{
-    const map = new google.maps.Map(document.getElementById("map"), {{
-      zoom: 14,
-      center: {{ lat: {directions[0]['legs'][0]['start_location']['lat']}, lng: {directions[0]['legs'][0]['start_location']['lng']} }},
-      styles: [
-        {{
-          "featureType": "all",
-          "elementType": "labels.text.fill",
-          "stylers": [{{ "color": "#ffffff" }}]
-        }},
-        {{
-          "featureType": "all",
-          "elementType": "labels.text.stroke",
-          "stylers": [{{ "color": "#000000" }}, {{ "lightness": 13 }}]
-        }},
-        {{
-          "featureType": "administrative",
-          "elementType": "geometry.fill",
-          "stylers": [{{ "color": "#000000" }}]
-        }},
-        {{
-          "featureType": "administrative",
-          "elementType": "geometry.stroke",
-          "stylers": [{{ "color": "#144b53" }}, {{ "lightness": 14 }}, {{ "weight": 1.4 }}]
-        }},
-        {{
-          "featureType": "landscape",
-          "elementType": "all",
-          "stylers": [{{ "color": "#08304b" }}]
-        }},
-        {{
-          "featureType": "poi",
-          "elementType": "geometry",
-          "stylers": [{{ "color": "#0c4152" }}, {{ "lightness": 5 }}]
-        }},
-        {{
-          "featureType": "road.highway",
-          "elementType": "geometry.fill",
-          "stylers": [{{ "color": "#3498db" }}]
-        }},
-        {{
-          "featureType": "road.highway",
-          "elementType": "geometry.stroke",
-          "stylers": [{{ "color": "#2980b9" }}, {{ "lightness": 25 }}]
-        }},
-        {{
-          "featureType": "road.arterial",
-          "elementType": "geometry.fill",
-          "stylers": [{{ "color": "#2c3e50" }}]
-        }},
-        {{
-          "featureType": "road.arterial",
-          "elementType": "geometry.stroke",
-          "stylers": [{{ "color": "#0b3d51" }}, {{ "lightness": 16 }}]
-        }},
-        {{
-          "featureType": "road.local",
-          "elementType": "geometry",
-          "stylers": [{{ "color": "#000000" }}]
-        }},
-        {{
-          "featureType": "transit",
-          "elementType": "all",
-          "stylers": [{{ "color": "#146474" }}]
-        }},
-        {{
-          "featureType": "water",
-          "elementType": "all",
-          "stylers": [{{ "color": "#021019" }}]
-        }}
-      ]
-    }});
-    const directionsService = new google.maps.DirectionsService();
-    const directionsRenderer = new google.maps.DirectionsRenderer({{
-      map: map,
-      polylineOptions: {{
-        strokeColor: '#e74c3c',
-        strokeWeight: 6,
-        strokeOpacity: 0.9
-      }}
-    }});
-    directionsService.route({{
-      origin: "{origem}",
-      destination: "{origem}",
-      waypoints: [
-        // É essencial ter pelo menos um waypoint para rotas circulares
-        // Calcular um ponto ao norte do ponto de partida
-        {{
-          location: new google.maps.LatLng(
-            {directions[0]['legs'][0]['start_location']['lat'] + 0.02}, 
-            {directions[0]['legs'][0]['start_location']['lng']}
-          )
-        }}
-      ],
-      travelMode: google.maps.TravelMode.BICYCLING,
-      optimizeWaypoints: true,
-    }}, (result, status) => {{
-      if (status === "OK") directionsRenderer.setDirections(result);
-      else alert("Falha na rota: " + status);
-    }});
-  }}
-</script>
-<script src="https://maps.googleapis.com/maps/api/js?key={GMAPS_KEY}&callback=initMap" async defer></script>
-"""
-
-    # A tradução já foi feita anteriormente usando OpenAI
-    # Aqui, só garantimos que temos instruções traduzidas para o português
-
-    texto = f"""
-### 🗺️ Resumo da Rota  
-**Origem e retorno:** {origem}  
-**Distância total:** {distancia_total}  
-
-**Passos detalhados:**  
-<ol>
-{''.join(f"<li>{rua}</li>" for rua in ruas_traduzidas)}
-</ol>
-"""
-    return mapa_html, texto, elevation_data
 
 # Funções para mudar de página
 def go_to_results():
@@ -1659,6 +698,13 @@ def generate_pdf():
         st.error(f"Erro ao gerar PDF: {str(e)}")
         return None
 
+def aplicar_sugestao_endereco():
+    """Copia a sugestão escolhida para o campo de endereço de partida"""
+    sugestao = st.session_state.get('sugestao_endereco')
+    if sugestao:
+        st.session_state.endereco_partida = sugestao
+    st.session_state.sugestao_endereco = ""
+
 # Interface principal
 def main():
     # Página de Formulário
@@ -1674,7 +720,22 @@ def main():
         col1, col2 = st.columns(2)
 
         with col1:
-            endereco = st.text_input("Endereço de partida:", "Rua Coronel José Monteiro, 123")
+            if 'endereco_partida' not in st.session_state:
+                st.session_state.endereco_partida = "Rua Coronel José Monteiro, 123"
+            endereco = st.text_input("Endereço de partida:", key="endereco_partida")
+            # Validação local (índice de logradouros e gazetteer), sem chamada à API
+            validacao = validar_endereco(endereco)
+            if validacao['status'] == 'validado':
+                st.caption(f"✅ {validacao['coords']['endereco_formatado']}")
+                if validacao['mensagem']:
+                    st.caption(validacao['mensagem'])
+            elif validacao['status'] == 'invalido':
+                st.error(validacao['mensagem'])
+            else:
+                st.caption("Endereço fora do índice local: será localizado ao gerar a rota")
+            if validacao['sugestoes']:
+                st.selectbox("Sugestões:", [""] + validacao['sugestoes'],
+                             key="sugestao_endereco", on_change=aplicar_sugestao_endereco)
             # Fixar cidade como São José dos Campos
             cidade = "São José dos Campos"
             estado = "SP"
@@ -1690,19 +751,27 @@ def main():
             distancia = st.slider("Distância da pedalada (km):", 
                                 min_value=5, max_value=30, value=15, step=5)
             
+            # Rápido: menos chamadas e resposta em poucos segundos; Preciso: busca completa da distância
+            modo = st.radio("Modo de busca da rota:", ["Rápido", "Preciso"], index=1, horizontal=True)
+            
             # Valores fixos para horário e estilo (não mais visíveis na interface)
             horario = "Manhã"  # Valor padrão
             visual_style = "urbano"  # Valor padrão
         
         # Botão para planejar pedalada
         if st.button("🚲 Planejar Pedalada", use_container_width=True):
+            if validacao['status'] == 'invalido':
+                st.error(f"Corrija o endereço de partida: {validacao['mensagem']}")
+                st.stop()
             # Salvar dados do formulário
             st.session_state.data = {
                 'endereco': endereco_completo,
+                'origem_coords': validacao['coords'],
                 'nivel': nivel,
                 'distancia': distancia,
                 'horario': horario,
-                'estilo': visual_style
+                'estilo': visual_style,
+                'modo': "rapido" if modo == "Rápido" else "preciso"
             }
             go_to_results()
             st.rerun()
@@ -1817,8 +886,32 @@ def main():
                 
             # Etapa 2: Gerar a rota com base nos pontos de referência selecionados
             
+            # Origem já validada no formulário; senão, geocodificar uma única vez e repassar as coordenadas
+            origem_coords = data.get('origem_coords')
+            if origem_coords is None and has_gmaps:
+                try:
+                    origem_coords = geocodificar(gmaps, data['endereco'])
+                except Exception as e:
+                    print(f"Erro ao geocodificar origem: {e}")
+            
+            # Orçamento de chamadas e de tempo compartilhado por todos os geradores desta requisição
+            modo_requisicao = data.get('modo', MODO_PADRAO)
+            orcamento = OrcamentoBusca.de_modo(modo_requisicao)
+            # No modo rápido, escolher os waypoints pela matriz de distâncias em vez de varrer a grade
+            modo_busca = "matriz" if modo_requisicao == "rapido" else "grade"
+            
+            # Roteamento offline: forçado por PEDALA_ROTEAMENTO=offline ou automático sem chave do Google Maps
+            usar_offline = rotas_offline.disponivel() and (os.getenv("PEDALA_ROTEAMENTO") == "offline" or not has_gmaps)
+            
+            if usar_offline:
+                mapa_html, texto_completo, elevation_data = rotas_offline.gerar_rota_offline(
+                    data['endereco'],
+                    data['distancia'],
+                    origem_coords=origem_coords,
+                    gmaps=gmaps if has_gmaps else None
+                )
             # NOVO TRATAMENTO ESPECIAL PARA ROTAS CURTAS (<=10km)
-            if data['distancia'] <= 10:
+            elif data['distancia'] <= 10:
                 # Importar função especializada para rotas curtas
                 try:
                     from rotas_curtas import gerar_rota_curta
@@ -1828,7 +921,9 @@ def main():
                     # Chamar função especializada para rotas curtas
                     mapa_html, texto_completo, elevation_data = gerar_rota_curta(
                         data['endereco'],
-                        data['distancia']
+                        data['distancia'],
+                        origem_coords=origem_coords,
+                        orcamento=orcamento
                     )
                 except Exception as e:
                     st.error(f"Erro ao usar função de rotas curtas: {str(e)}")
@@ -1837,7 +932,10 @@ def main():
                         data['endereco'], 
                         pontos_rota, 
                         data['distancia'],
-                        forcar_distancia=True
+                        forcar_distancia=True,
+                        origem_coords=origem_coords,
+                        modo_busca=modo_busca,
+                        orcamento=orcamento
                     )
             else:
                 # Método padrão para rotas maiores que 10km
@@ -1845,7 +943,10 @@ def main():
                     data['endereco'], 
                     pontos_rota, 
                     data['distancia'],
-                    forcar_distancia=True  # Parâmetro para forçar a distância correta
+                    forcar_distancia=True,  # Parâmetro para forçar a distância correta
+                    origem_coords=origem_coords,
+                    modo_busca=modo_busca,
+                    orcamento=orcamento
                 )
             
             # Agora simplificar a rota para exibição
@@ -1859,7 +960,9 @@ def main():
                     mapa_html=mapa_html,
                     texto_completo=texto_completo,
                     elevation_data=elevation_data,
-                    gerar_rota_e_embed=gerar_rota_e_embed
+                    gerar_rota_e_embed=functools.partial(gerar_rota_e_embed, origem_coords=origem_coords,
+                                                         modo_busca=modo_busca),
+                    orcamento=orcamento
                 )
             except Exception as e:
                 # Em caso de erro na simplificação, usar o texto original
@@ -1870,6 +973,10 @@ def main():
             distancia_match = re.search(r"\*\*Distância total:\*\* (.+)", texto_rota)
             distancia_total = distancia_match.group(1) if distancia_match else f"{data['distancia']} km"
             
+            # Ciclovias e ciclofaixas percorridas (índice local de ciclovias)
+            ciclovias_match = re.search(r"\*\*Ciclovias e ciclofaixas:\*\* (.+?)  $", texto_rota, re.MULTILINE)
+            ciclovias_rota = ciclovias_match.group(1) if ciclovias_match else ""
+
             # Extrair passos da rota 
             passos_rota = []
             for rua in re.findall(r"<li>(.+?)</li>", texto_rota):
@@ -1880,6 +987,7 @@ def main():
                 "passos": passos_rota,
                 "distancia_total": distancia_total,
                 "elevation_data": elevation_data,
+                "ciclovias": ciclovias_rota,
                 "waypoints": [p.split(',')[0] for p in pontos_rota]  # Lista simplificada de pontos principais
             }
             
@@ -1945,7 +1053,7 @@ def main():
             st.markdown("---")
             st.markdown("## 📍 Roteiro no Mapa")
             
-            if has_gmaps:
+            if has_gmaps or mapa_html:
                 components.html(mapa_html, height=520)
                 st.markdown(texto_rota, unsafe_allow_html=True)
                 
@@ -0,0 +1,280 @@
+"""
+Benchmark das estratégias de busca de rota sobre um corpus fixo de São José dos Campos.
+
+Executa o motor de rotas para cada origem × distância × nível, respondendo as
+chamadas ao Google Maps a partir do armazém de respostas gravadas (sem rede), e
+reporta por estratégia as chamadas de rotas/matriz/geocodificação/elevação, o tempo e o
+erro de distância. Com --linha-base, funciona como portão de regressão: termina
+com código 1 se alguma estratégia ficou mais cara ou menos precisa, ou se ficou
+abaixo do mínimo de rotas dentro da tolerância.
+
+O armazém versionado é gerado pelo modelo sintético de comparar_busca_raio.py
+(respostas marcadas como sintéticas): o portão mede as estratégias contra esse
+modelo, não contra a malha real do Google Maps. Para medir contra a API, grave
+um armazém com PEDALA_MAPS_MODO=record e passe-o em --fixtures.
+
+Uso:
+    python benchmark_rotas.py                                 # replay estrito do armazém
+    python benchmark_rotas.py --apoio sintetico --salvar      # completa o armazém com o modelo sintético
+    python benchmark_rotas.py --json atual.json --linha-base dados/fixtures/linha_base.json
+    python benchmark_rotas.py --latencia-ms 250 --variacao-ms 80 --workers 6   # tempo com latência da API
+    python benchmark_rotas.py --prefiltro medir     # quantas rotas escolhidas o pré-filtro podaria
+    python benchmark_rotas.py --circuidade acumulada  # modelo de circuidade aprendendo ao longo do corpus
+"""
+import io
+import sys
+import json
+import time
+import argparse
+import contextlib
+
+from comparar_busca_raio import ORIGENS, DISTANCIAS, ClienteContador, ClienteSintetico
+from utils.circuity_model import ModeloCircuidade, definir_modelo_circuidade
+from utils.elevation_cache import CacheElevacao, definir_cache_elevacao
+from utils.maps_cache import CacheMaps, com_cache, definir_cache_padrao
+from utils.maps_fixtures import FIXTURES_PATH, ArmazemFixtures, ClienteFixtures
+from utils.geocoding import limpar_memoria
+from utils.route_budget import OrcamentoBusca, MODO_PADRAO
+from utils.route_candidates import CICLISTA_FATORES, TOLERANCIA_KM
+from utils.route_prefilter import (
+    MODOS_PREFILTRO, definir_modo_prefiltro, estatisticas_prefiltro, zerar_estatisticas_prefiltro
+)
+from utils.route_engine import (
+    EstrategiaCurta, EstrategiaGrade, EstrategiaMatriz, EstrategiaSecante, gerar_rota_circular
+)
+
+NIVEIS = list(CICLISTA_FATORES)
+
+# Estratégias avaliadas: nome -> (fábrica da sequência de estratégias, distância máxima)
+CONJUNTOS = {
+    "grade": (lambda w: [EstrategiaGrade(max_workers=w)], None),
+    "secante": (lambda w: [EstrategiaSecante(), EstrategiaGrade(max_workers=w)], None),
+    "matriz": (lambda w: [EstrategiaMatriz(), EstrategiaGrade(max_workers=w)], None),
+    "curta": (lambda w: [EstrategiaCurta(max_workers=w)], 10),
+}
+
+# Piora máxima aceita em relação à linha de base
+LIMITE_CHAMADAS_RELATIVO = 0.05
+LIMITE_ERRO_KM = 0.1
+
+# Fração mínima de execuções dentro da tolerância, independente da linha de base
+MINIMO_DENTRO_TOLERANCIA = 0.9
+
+
+def executar(gmaps_base, origem, distancia, nivel, estrategias, modo, exigir_tolerancia, modelo=None):
+    """
+    Executa uma geração de rota isolada (cache vazio) e mede chamadas e tempo
+
+    Args:
+        modelo (ModeloCircuidade): Modelo de circuidade compartilhado entre execuções
+            (padrão: modelo vazio, como numa primeira requisição)
+
+    Returns:
+        dict: chamadas por tipo, tempo em ms, distância obtida, erro em km e
+            candidatos podados (ou marcados) pelo pré-filtro
+    """
+    # Cada execução começa sem cache para medir o custo real da busca
+    cache = CacheMaps(":memory:")
+    definir_cache_padrao(cache)
+    definir_cache_elevacao(CacheElevacao(":memory:"))
+    definir_modelo_circuidade(modelo if modelo is not None else ModeloCircuidade(":memory:"))
+    limpar_memoria()
+    zerar_estatisticas_prefiltro()
+    contador = ClienteContador(gmaps_base)
+
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        resultado = gerar_rota_circular(
+            origem, distancia, nivel=nivel, estrategias=estrategias, gmaps=com_cache(contador, cache),
+            orcamento=OrcamentoBusca.de_modo(modo), exigir_tolerancia=exigir_tolerancia
+        )
+    tempo_ms = (time.perf_counter() - inicio) * 1000
+    prefiltro = estatisticas_prefiltro()
+
+    return {
+        **contador.contagem,
+        "tempo_ms": tempo_ms,
+        "distancia_km": resultado.distancia_km if resultado.ok else None,
+        "erro_km": resultado.diff if resultado.ok else None,
+        "podados": prefiltro["podados"],
+        "vencedor_podado": prefiltro["vencedores_podados"] > 0,
+    }
+
+
+def executar_corpus(gmaps_base, conjuntos, origens=ORIGENS, distancias=DISTANCIAS, niveis=NIVEIS,
+                    modo=MODO_PADRAO, workers=1, circuidade_acumulada=False):
+    """
+    Executa todas as estratégias sobre o corpus
+
+    Args:
+        circuidade_acumulada (bool): Se True, cada estratégia usa um único modelo de
+            circuidade, que aprende com as execuções anteriores do corpus
+
+    Returns:
+        list: Uma linha por execução (estratégia, origem, distância, nível e medições)
+    """
+    linhas = []
+    for nome in conjuntos:
+        modelo = ModeloCircuidade(":memory:") if circuidade_acumulada else None
+        fabrica, distancia_max = CONJUNTOS[nome]
+        for origem in origens:
+            for distancia in distancias:
+                if distancia_max is not None and distancia > distancia_max:
+                    continue
+                for nivel in niveis:
+                    medicao = executar(gmaps_base, origem, distancia, nivel, fabrica(workers), modo,
+                                       exigir_tolerancia=(nome != "curta"), modelo=modelo)
+                    linhas.append({"estrategia": nome, "origem": origem, "distancia": distancia,
+                                   "nivel": nivel, **medicao})
+    return linhas
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p * (len(ordenados) - 1))))]
+
+
+def resumir(linhas):
+    """
+    Agrega as execuções por estratégia
+
+    Returns:
+        dict: estratégia -> médias de chamadas, tempo, erro e contagem dentro da tolerância
+    """
+    resumo = {}
+    for nome in dict.fromkeys(l["estrategia"] for l in linhas):
+        execucoes = [l for l in linhas if l["estrategia"] == nome]
+        erros = [l["erro_km"] for l in execucoes if l["erro_km"] is not None]
+        tempos = [l["tempo_ms"] for l in execucoes]
+        n = len(execucoes)
+        resumo[nome] = {
+            "execucoes": n,
+            "directions": sum(l["directions"] for l in execucoes) / n,
+            "distance_matrix": sum(l["distance_matrix"] for l in execucoes) / n,
+            "geocode": sum(l["geocode"] for l in execucoes) / n,
+            "elevation": sum(l["elevation"] for l in execucoes) / n,
+            "tempo_ms": sum(tempos) / n,
+            "tempo_p95_ms": _percentil(tempos, 0.95),
+            "erro_medio_km": sum(erros) / len(erros) if erros else None,
+            "dentro_tolerancia": sum(1 for e in erros if e <= TOLERANCIA_KM),
+            "sem_rota": n - len(erros),
+            "podados": sum(l["podados"] for l in execucoes) / n,
+            "vencedores_podados": sum(1 for l in execucoes if l["vencedor_podado"]),
+        }
+    return resumo
+
+
+def imprimir_resumo(resumo, faltas, prefiltro="podar"):
+    """
+    Imprime a tabela do resumo
+
+    Args:
+        resumo (dict): Saída de resumir
+        faltas (int): Requisições que não estavam gravadas no armazém
+        prefiltro (str): Modo do pré-filtro; a coluna Venc.podado só tem sentido em
+            "medir" (ao podar, a rota escolhida nunca está entre os podados)
+    """
+    print(f"{'Estratégia':<10} {'Exec':>5} {'Directions':>10} {'Matriz':>6} {'Geocode':>8} {'Elevation':>9} "
+          f"{'Tempo ms':>9} {'p95 ms':>8} {'Erro km':>8} {'≤2km':>6} {'Podados':>8} {'Venc.podado':>11}")
+    for nome, r in resumo.items():
+        vencedores = r["vencedores_podados"] if prefiltro == "medir" else "n/a"
+        erro = f"{r['erro_medio_km']:.2f}" if r["erro_medio_km"] is not None else "-"
+        print(f"{nome:<10} {r['execucoes']:>5} {r['directions']:>10.1f} {r['distance_matrix']:>6.1f} {r['geocode']:>8.2f} "
+              f"{r['elevation']:>9.1f} {r['tempo_ms']:>9.1f} {r['tempo_p95_ms']:>8.1f} {erro:>8} "
+              f"{r['dentro_tolerancia']:>3}/{r['execucoes']:<3} {r['podados']:>8.1f} "
+              f"{vencedores:>11}")
+    if faltas:
+        print(f"\n⚠️ {faltas} requisições não estavam gravadas no armazém")
+
+
+def comparar_linha_base(resumo, linha_base):
+    """
+    Compara o resumo com a linha de base e com o mínimo de rotas dentro da tolerância
+
+    Returns:
+        list: Regressões encontradas (mensagens); vazia se nada piorou
+    """
+    regressoes = []
+    for nome, atual in resumo.items():
+        if atual["dentro_tolerancia"] < MINIMO_DENTRO_TOLERANCIA * atual["execucoes"]:
+            regressoes.append(f"{nome}: só {atual['dentro_tolerancia']}/{atual['execucoes']} rotas dentro da "
+                              f"tolerância (mínimo {MINIMO_DENTRO_TOLERANCIA:.0%})")
+    for nome, base in linha_base.items():
+        atual = resumo.get(nome)
+        if atual is None:
+            continue
+        if atual["directions"] > base["directions"] * (1 + LIMITE_CHAMADAS_RELATIVO):
+            regressoes.append(f"{nome}: chamadas de rotas {base['directions']:.1f} → {atual['directions']:.1f}")
+        if atual["distance_matrix"] > base.get("distance_matrix", 0) * (1 + LIMITE_CHAMADAS_RELATIVO):
+            regressoes.append(f"{nome}: chamadas de matriz {base.get('distance_matrix', 0):.1f} → "
+                              f"{atual['distance_matrix']:.1f}")
+        if (base["erro_medio_km"] is not None and atual["erro_medio_km"] is not None
+                and atual["erro_medio_km"] > base["erro_medio_km"] + LIMITE_ERRO_KM):
+            regressoes.append(f"{nome}: erro médio {base['erro_medio_km']:.2f} → {atual['erro_medio_km']:.2f} km")
+        if atual["dentro_tolerancia"] < base["dentro_tolerancia"]:
+            regressoes.append(f"{nome}: rotas dentro da tolerância {base['dentro_tolerancia']} → "
+                              f"{atual['dentro_tolerancia']}")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das estratégias de busca de rota")
+    parser.add_argument("--fixtures", default=FIXTURES_PATH, help="Armazém de respostas gravadas")
+    parser.add_argument("--apoio", choices=["nenhum", "sintetico"], default="nenhum",
+                        help="Cliente para requisições não gravadas (padrão: replay estrito)")
+    parser.add_argument("--salvar", action="store_true", help="Gravar no armazém as respostas obtidas do apoio")
+    parser.add_argument("--estrategias", nargs="+", choices=list(CONJUNTOS), default=list(CONJUNTOS))
+    parser.add_argument("--distancias", type=int, nargs="+", default=DISTANCIAS, help="Distâncias em km")
+    parser.add_argument("--niveis", nargs="+", default=NIVEIS, help="Níveis do ciclista")
+    parser.add_argument("--modo", default=MODO_PADRAO, help="Modo de orçamento (rapido ou preciso)")
+    parser.add_argument("--latencia-ms", type=float, default=0,
+                        help="Latência média injetada em cada resposta gravada")
+    parser.add_argument("--variacao-ms", type=float, default=0, help="Variação (±) da latência injetada")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Chamadas simultâneas na grade (1 = contagem determinística)")
+    parser.add_argument("--prefiltro", choices=MODOS_PREFILTRO, default="podar",
+                        help="podar: pula candidatos fora da tolerância prevista; medir: só conta "
+                             "quantos seriam podados e quantas rotas escolhidas estavam entre eles")
+    parser.add_argument("--circuidade", choices=["vazia", "acumulada"], default="vazia",
+                        help="vazia: modelo de circuidade sem observações em cada execução; acumulada: "
+                             "o modelo aprende ao longo do corpus")
+    parser.add_argument("--json", help="Gravar o resumo em JSON")
+    parser.add_argument("--linha-base", help="Resumo JSON de referência; piora termina com código 1")
+    args = parser.parse_args()
+
+    definir_modo_prefiltro(args.prefiltro)
+    armazem = ArmazemFixtures(args.fixtures)
+    apoio = ClienteSintetico() if args.apoio == "sintetico" else None
+    cliente = ClienteFixtures(armazem, apoio=apoio, latencia_ms=args.latencia_ms, variacao_ms=args.variacao_ms)
+    print(f"Armazém: {args.fixtures} ({len(armazem)} respostas, {armazem.sinteticas} sintéticas)")
+    if armazem.sinteticas:
+        print("⚠️ Respostas sintéticas: os resultados medem o modelo de comparar_busca_raio.py, "
+              "não o Google Maps")
+    print()
+
+    linhas = executar_corpus(cliente, args.estrategias, distancias=args.distancias, niveis=args.niveis,
+                             modo=args.modo, workers=args.workers,
+                             circuidade_acumulada=(args.circuidade == "acumulada"))
+    resumo = resumir(linhas)
+    imprimir_resumo(resumo, cliente.faltas, args.prefiltro)
+
+    if args.salvar and armazem.alterado:
+        armazem.salvar()
+        print(f"\nArmazém atualizado: {len(armazem)} respostas")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as arquivo:
+            json.dump(resumo, arquivo, ensure_ascii=False, indent=2)
+
+    if args.linha_base:
+        with open(args.linha_base, encoding="utf-8") as arquivo:
+            regressoes = comparar_linha_base(resumo, json.load(arquivo))
+        if regressoes:
+            print("\nRegressões em relação à linha de base:")
+            for regressao in regressoes:
+                print(f"- {regressao}")
+            sys.exit(1)
+        print("\nSem regressões em relação à linha de base.")
+
+
+if __name__ == "__main__":
+    main()
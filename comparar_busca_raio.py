@@ -0,0 +1,273 @@
+"""
+Compara a busca em grade de multiplicadores com a busca por secante do fator de deslocamento.
+
+Para cada origem × distância, executa as duas estratégias e reporta o número de
+chamadas à API de rotas e o erro de distância em relação ao solicitado.
+
+Uso:
+    python comparar_busca_raio.py              # usa a API real se GOOGLE_MAPS_API_KEY existir
+    python comparar_busca_raio.py --sintetico  # modelo local de distâncias, sem rede
+"""
+import zlib
+import argparse
+import threading
+
+import numpy as np
+
+from utils.route_candidates import buscar_rota_grade, fator_inicial
+from utils.radius_search import avaliador_de_fator, buscar_fator_secante
+from utils.maps_provider import cliente_maps
+from utils.polyline import codificar, decodificar
+from utils.geodesia import distancias_acumuladas_m, distancias_m
+
+# Origens de teste em São José dos Campos
+ORIGENS = [
+    "Rua Coronel José Monteiro, 123, São José dos Campos, SP",
+    "Praça Afonso Pena, São José dos Campos, SP",
+    "Parque Santos Dumont, São José dos Campos, SP",
+    "Parque Vicentina Aranha, São José dos Campos, SP",
+    "Centro da Juventude, São José dos Campos, SP",
+]
+
+# Passos do slider de distância do formulário
+DISTANCIAS = [5, 10, 15, 20, 25, 30]
+
+# Centro aproximado de São José dos Campos (usado pelo modelo sintético)
+CENTRO_SJC = (-23.1794, -45.8869)
+
+
+class ClienteContador:
+    """Envolve um cliente do Maps contando as chamadas de rotas, matriz de distâncias, geocodificação e elevação"""
+
+    def __init__(self, cliente):
+        self.cliente = cliente
+        self.contagem = {"directions": 0, "distance_matrix": 0, "geocode": 0, "elevation": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def chamadas(self):
+        """Chamadas à API de rotas"""
+        return self.contagem["directions"]
+
+    def _contar(self, tipo):
+        with self._lock:
+            self.contagem[tipo] += 1
+
+    def directions(self, *args, **kwargs):
+        self._contar("directions")
+        return self.cliente.directions(*args, **kwargs)
+
+    def distance_matrix(self, *args, **kwargs):
+        self._contar("distance_matrix")
+        return self.cliente.distance_matrix(*args, **kwargs)
+
+    def geocode(self, *args, **kwargs):
+        self._contar("geocode")
+        return self.cliente.geocode(*args, **kwargs)
+
+    def elevation(self, *args, **kwargs):
+        self._contar("elevation")
+        return self.cliente.elevation(*args, **kwargs)
+
+    def elevation_along_path(self, *args, **kwargs):
+        self._contar("elevation")
+        return self.cliente.elevation_along_path(*args, **kwargs)
+
+    def __getattr__(self, nome):
+        return getattr(self.cliente, nome)
+
+
+class ClienteSintetico:
+    """
+    Modelo local de distância de rota: perímetro em linha reta × circuidade urbana.
+
+    Os waypoints são ajustados a uma malha regular de vias (como a API faz com a
+    via mais próxima) e a circuidade varia de forma determinística com os pontos
+    ajustados para imitar o ruído da malha viária real.
+    """
+
+    # Respostas gravadas a partir deste cliente são marcadas como sintéticas (utils.maps_fixtures)
+    sintetico = True
+
+    def __init__(self, circuidade=1.35, ruido=0.12, malha=0.004):
+        self.circuidade = circuidade
+        self.ruido = ruido
+        self.malha = malha
+
+    def geocode(self, endereco):
+        semente = zlib.crc32(endereco.encode("utf-8"))
+        lat = CENTRO_SJC[0] + ((semente % 1000) / 1000 - 0.5) * 0.06
+        lng = CENTRO_SJC[1] + (((semente // 1000) % 1000) / 1000 - 0.5) * 0.06
+        return [{"geometry": {"location": {"lat": lat, "lng": lng}}, "formatted_address": endereco}]
+
+    def directions(self, origin, destination, waypoints=None, mode=None, optimize_waypoints=False, **kwargs):
+        pontos = ([self._local(origin)] + [self._ajustar(self._local(w)) for w in (waypoints or [])]
+                  + [self._local(destination)])
+        legs = []
+        for a, b in zip(pontos, pontos[1:]):
+            legs.append({
+                "distance": {"value": self._trecho_m(a, b)},
+                "start_location": {"lat": a[0], "lng": a[1]},
+                "end_location": {"lat": b[0], "lng": b[1]},
+                "steps": [{
+                    "start_location": {"lat": a[0], "lng": a[1]},
+                    "html_instructions": f"Head <b>{_rumo_cardeal(a, b)}</b> toward <b>waypoint</b>",
+                    "polyline": {"points": codificar([a, b])},
+                }],
+            })
+        return [{"legs": legs, "overview_polyline": {"points": codificar(pontos)},
+                 "waypoint_order": list(range(len(waypoints or [])))}]
+
+    def distance_matrix(self, origins, destinations, mode=None, **kwargs):
+        """Distância de cada origem a cada destino, todos ajustados à malha (como a API faz)"""
+        origens = [self._ajustar(self._local(o)) for o in origins]
+        destinos = [self._ajustar(self._local(d)) for d in destinations]
+        return {
+            "status": "OK",
+            "rows": [{"elements": [{"status": "OK", "distance": {"value": self._trecho_m(a, b)}} for b in destinos]}
+                     for a in origens],
+        }
+
+    def elevation(self, locations):
+        if isinstance(locations, (list, tuple)) and locations and isinstance(locations[0], (list, tuple, str)):
+            pontos = [p if isinstance(p, (list, tuple)) else _parse(p) for p in locations]
+        else:
+            pontos = [locations if isinstance(locations, (list, tuple)) else _parse(locations)]
+        return [{"elevation": round(float(_relevo(lat, lng)), 1), "location": {"lat": lat, "lng": lng}}
+                for lat, lng in pontos]
+
+    def elevation_along_path(self, path, samples):
+        """Amostras igualmente espaçadas ao longo do caminho (polyline codificada)"""
+        pontos = decodificar(path)
+        acumulado = distancias_acumuladas_m(pontos)
+        alvo = np.linspace(0, acumulado[-1], samples)
+        lat, lng = np.interp(alvo, acumulado, pontos[:, 0]), np.interp(alvo, acumulado, pontos[:, 1])
+        return [{"elevation": round(float(e), 1), "location": {"lat": float(a), "lng": float(o)}}
+                for a, o, e in zip(lat, lng, _relevo(lat, lng))]
+
+    def _local(self, local):
+        """Coordenadas de um ponto "lat,lng" ou de um endereço (geocodificação sintética)"""
+        try:
+            return _parse(local)
+        except ValueError:
+            posicao = self.geocode(local)[0]["geometry"]["location"]
+            return posicao["lat"], posicao["lng"]
+
+    def _trecho_m(self, a, b):
+        """Distância pela malha sintética entre dois pontos (linha reta × circuidade com ruído)"""
+        semente = zlib.crc32(repr([round(c, 4) for c in a + b]).encode("utf-8"))
+        fator = self.circuidade * (1 + self.ruido * ((semente % 1000) / 1000 - 0.5) * 2)
+        return int(distancias_m(a[0], a[1], b[0], b[1]) * fator)
+
+    def _ajustar(self, ponto):
+        """Posiciona o waypoint no cruzamento mais próximo da malha sintética"""
+        return tuple(round(c / self.malha) * self.malha for c in ponto)
+
+
+def _relevo(lat, lng):
+    """Relevo sintético suave (vale do Paraíba: ~560-680 m)"""
+    return 600 + 40 * np.sin((lat - CENTRO_SJC[0]) * 150) + 25 * np.cos((lng - CENTRO_SJC[1]) * 120)
+
+
+def _parse(local):
+    lat, lng = local.split(",")
+    return float(lat), float(lng)
+
+
+def _rumo_cardeal(a, b):
+    """Rumo aproximado de a para b como ponto cardeal em inglês (formato da API)"""
+    if abs(b[0] - a[0]) >= abs(b[1] - a[1]):
+        return "north" if b[0] > a[0] else "south"
+    return "east" if b[1] > a[1] else "west"
+
+
+def executar_grade(gmaps, origem, lat, lng, distancia, perfil_fator, lat_bias, lng_bias):
+    """Reproduz a varredura em grade de gerar_rota_e_embed (avaliação sequencial)"""
+    # Um worker só: contagem de chamadas determinística, igual à busca sequencial
+    return buscar_rota_grade(gmaps, origem, lat, lng, distancia, perfil_fator=perfil_fator,
+                             lat_bias=lat_bias, lng_bias=lng_bias, max_workers=1)
+
+
+def executar_secante(gmaps, origem, lat, lng, distancia, perfil_fator, lat_bias, lng_bias):
+    """Executa a busca por secante do fator de deslocamento"""
+    avaliar = avaliador_de_fator(gmaps, origem, lat, lng, lat_bias=lat_bias, lng_bias=lng_bias)
+    return buscar_fator_secante(avaliar, distancia, fator_inicial(distancia, perfil_fator))
+
+
+def comparar(cliente, origens=ORIGENS, distancias=DISTANCIAS, perfil_fator=0.8, lat_bias=0.8, lng_bias=1.2):
+    """
+    Executa as duas estratégias para cada origem × distância
+
+    Args:
+        cliente: Cliente do Google Maps (real ou sintético)
+        origens (list): Endereços de origem
+        distancias (list): Distâncias solicitadas em km
+        perfil_fator (float): Fator do perfil do ciclista (Intermediário = 0.8)
+        lat_bias (float): Ajuste norte/sul do estilo (urbano = 0.8)
+        lng_bias (float): Ajuste leste/oeste do estilo (urbano = 1.2)
+
+    Returns:
+        list: Uma linha por execução com estratégia, chamadas e erro em km
+    """
+    linhas = []
+    for origem in origens:
+        geocode_result = cliente.geocode(origem)
+        if not geocode_result:
+            print(f"Origem não encontrada: {origem}")
+            continue
+        location = geocode_result[0]["geometry"]["location"]
+        origem_latlng = f"{location['lat']},{location['lng']}"
+
+        for distancia in distancias:
+            for nome, estrategia in (("grade", executar_grade), ("secante", executar_secante)):
+                contador = ClienteContador(cliente)
+                melhor = estrategia(contador, origem_latlng, location["lat"], location["lng"],
+                                    distancia, perfil_fator, lat_bias, lng_bias)
+                linhas.append({
+                    "origem": origem.split(",")[0],
+                    "distancia": distancia,
+                    "estrategia": nome,
+                    "chamadas": contador.chamadas,
+                    "erro_km": melhor["diff"] if melhor else None,
+                })
+    return linhas
+
+
+def imprimir_relatorio(linhas):
+    """Imprime as execuções e o resumo por estratégia"""
+    print(f"{'Origem':<28} {'km':>3} {'Estratégia':<10} {'Chamadas':>8} {'Erro (km)':>10}")
+    for linha in linhas:
+        erro = f"{linha['erro_km']:.2f}" if linha["erro_km"] is not None else "-"
+        print(f"{linha['origem'][:28]:<28} {linha['distancia']:>3} {linha['estrategia']:<10} "
+              f"{linha['chamadas']:>8} {erro:>10}")
+
+    print("\nResumo:")
+    for estrategia in ("grade", "secante"):
+        execucoes = [l for l in linhas if l["estrategia"] == estrategia]
+        if not execucoes:
+            continue
+        erros = [l["erro_km"] for l in execucoes if l["erro_km"] is not None]
+        chamadas = sum(l["chamadas"] for l in execucoes) / len(execucoes)
+        dentro = sum(1 for e in erros if e <= 2.0)
+        erro_medio = sum(erros) / len(erros) if erros else float("nan")
+        print(f"- {estrategia}: {chamadas:.1f} chamadas/rota, erro médio {erro_medio:.2f} km, "
+              f"{dentro}/{len(execucoes)} rotas dentro da tolerância de 2km")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara a busca em grade com a busca por secante")
+    parser.add_argument("--sintetico", action="store_true", help="Usar o modelo local de distâncias (sem rede)")
+    parser.add_argument("--distancias", type=int, nargs="+", default=DISTANCIAS, help="Distâncias em km")
+    args = parser.parse_args()
+
+    cliente = None if args.sintetico else cliente_maps()
+    if cliente is None:
+        if not args.sintetico:
+            print("GOOGLE_MAPS_API_KEY não definida: usando o modelo sintético.\n")
+        cliente = ClienteSintetico()
+
+    imprimir_relatorio(comparar(cliente, distancias=args.distancias))
+
+
+if __name__ == "__main__":
+    main()
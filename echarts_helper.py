@@ -2,6 +2,8 @@ import json
 import random
 from datetime import datetime, timedelta
 
+from utils.geodesia import inclinacoes_pct
+
 def generate_sensor_gauge_chart(sensor_key, value, label, unit, range_values):
     """
     Generate an ECharts gauge chart for a sensor
@@ -635,15 +637,7 @@ def generate_route_elevation_chart(elevation_data):
     elevation_diff = max_elevation - min_elevation
     
     # Calculate steepness data (just for visualization)
-    steepness = []
-    for i in range(1, len(elevations)):
-        if distances[i] - distances[i-1] > 0:
-            # Calculate slope percentage
-            slope = (elevations[i] - elevations[i-1]) / (distances[i] - distances[i-1]) * 100
-            steepness.append(round(slope, 1))
-        else:
-            steepness.append(0)
-    steepness.insert(0, 0)  # Add a zero to the beginning for the first point
+    steepness = [round(slope, 1) for slope in inclinacoes_pct(distances, elevations).tolist()]
     
     # Generate HTML for the chart
     html = f"""
@@ -0,0 +1,326 @@
+"""
+Gera rotas em lote para clubes e eventos, sem a interface do Streamlit.
+
+Lê um CSV ou JSONL de pedidos (endereco, nivel, distancia e, opcionalmente, id,
+estilo e modo) e executa o motor de rotas num pool de processos (ou threads).
+Cada rota é gravada em <saida>/<id>.json (rota da API, waypoints, passos e perfil
+de elevação) e, com --pdf, em <saida>/<id>.pdf; cada pedido concluído é
+acrescentado a <saida>/resultados.jsonl assim que termina. Rotas curtas aceitam a
+rota mais próxima mesmo fora da tolerância: essas linhas vêm com fora_tolerancia
+e diff_km, e o total aparece no resumo final. Pedidos cujo JSON já existe são
+pulados, então o lote pode ser interrompido e retomado.
+
+Os processos compartilham os caches em disco (respostas do Maps, elevação e
+circuidade aprendida), abertos em modo WAL e com espera por bloqueio
+(utils.sqlite_store); a taxa de chamadas à API é dividida entre eles.
+
+Uso:
+    python gerar_rotas_lote.py pedidos.csv --saida rotas_evento --workers 4
+    python gerar_rotas_lote.py pedidos.jsonl --saida rotas_evento --taxa 5 --pdf
+    python gerar_rotas_lote.py pedidos.csv --saida rotas_evento --pool threads --workers 8
+"""
+import os
+import io
+import re
+import sys
+import csv
+import json
+import math
+import time
+import base64
+import hashlib
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from utils.address_index import validar_endereco
+from utils.geodesia import metricas_perfil
+from utils.maps_provider import cliente_maps
+from utils.rate_limit import LimitadorTaxa, com_limite
+from utils.route_budget import MODO_PADRAO, MODOS_BUSCA, OrcamentoBusca
+from utils.route_candidates import CICLISTA_FATORES, ESTILO_AJUSTES, TOLERANCIA_KM
+from utils.route_engine import EstrategiaCurta, gerar_rota_circular
+from utils.route_engine.render import extrair_instrucoes
+
+# Cidade acrescentada aos endereços dos pedidos (como no formulário)
+CIDADE = "São José dos Campos - SP"
+
+# Chamadas por segundo à API do Google Maps, somando todos os workers
+TAXA_PADRAO = 10.0
+
+# Rotas até esta distância usam a estratégia de rotas curtas (como no app)
+DISTANCIA_ROTA_CURTA_KM = 10
+
+# Arquivo com uma linha por pedido concluído
+ARQUIVO_RESULTADOS = "resultados.jsonl"
+
+# Cliente do processo (criado pelo inicializador do pool)
+_cliente = None
+
+
+def ler_pedidos(caminho):
+    """
+    Lê os pedidos de um CSV (com cabeçalho) ou JSONL
+
+    Args:
+        caminho (str): Arquivo .csv ou .jsonl
+
+    Returns:
+        list: Dicts com os campos de cada pedido, na ordem do arquivo
+    """
+    with open(caminho, encoding="utf-8-sig", newline="") as arquivo:
+        if caminho.endswith((".jsonl", ".ndjson")):
+            return [json.loads(linha) for linha in arquivo if linha.strip()]
+        return [dict(linha) for linha in csv.DictReader(arquivo)]
+
+
+def normalizar_pedido(bruto, modo_padrao=MODO_PADRAO):
+    """
+    Valida os campos de um pedido e completa os opcionais
+
+    Args:
+        bruto (dict): Pedido como lido do arquivo
+        modo_padrao (str): Modo de busca quando o pedido não define um
+
+    Returns:
+        dict: id, endereco, nivel, distancia, estilo e modo
+
+    Raises:
+        ValueError: Se algum campo obrigatório falta ou é inválido
+    """
+    endereco = str(bruto.get("endereco") or "").strip()
+    if not endereco:
+        raise ValueError("endereço ausente")
+    nivel = str(bruto.get("nivel") or "Intermediário").strip()
+    if nivel not in CICLISTA_FATORES:
+        raise ValueError(f"nível desconhecido: {nivel}")
+    try:
+        distancia = float(str(bruto.get("distancia")).replace(",", "."))
+    except ValueError:
+        raise ValueError(f"distância inválida: {bruto.get('distancia')}")
+    # float() aceita "nan" e "inf"
+    if not math.isfinite(distancia) or distancia <= 0:
+        raise ValueError(f"distância inválida: {bruto.get('distancia')}")
+    estilo = str(bruto.get("estilo") or "urbano").strip()
+    if estilo not in ESTILO_AJUSTES:
+        raise ValueError(f"estilo desconhecido: {estilo}")
+    modo = str(bruto.get("modo") or modo_padrao).strip()
+    if modo not in MODOS_BUSCA:
+        raise ValueError(f"modo desconhecido: {modo}")
+
+    id_ = str(bruto.get("id") or "").strip()
+    if not id_:
+        # Pedidos iguais (mesmo endereço, nível, distância, estilo e modo) têm a mesma rota
+        texto = json.dumps([endereco, nivel, distancia, estilo, modo], ensure_ascii=False)
+        id_ = hashlib.sha1(texto.encode("utf-8")).hexdigest()[:12]
+    # O id vira nome de arquivo
+    id_ = re.sub(r"[^\w.-]+", "_", id_)
+    return {"id": id_, "endereco": endereco, "nivel": nivel, "distancia": distancia, "estilo": estilo, "modo": modo}
+
+
+def _iniciar_worker(taxa, silencioso):
+    """Cria o cliente do Maps do processo, com a sua parte do limite de taxa"""
+    global _cliente
+    if silencioso:
+        sys.stdout = open(os.devnull, "w")
+    _cliente = com_limite(cliente_maps(), LimitadorTaxa(taxa) if taxa else None)
+
+
+def _gravar_json(caminho, dados):
+    """Grava o JSON de forma atômica (um lote interrompido não deixa arquivo pela metade)"""
+    temporario = f"{caminho}.tmp"
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        json.dump(dados, arquivo, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+def _gravar_pdf(caminho, pedido, resultado, passos):
+    from pdf_generator import gerar_pdf_roteiro
+
+    rota = {"passos": passos, "distancia_total": f"{resultado.distancia_km:.1f} km",
+            "elevation_data": resultado.elevation_data}
+    guia = re.sub(r"<[^>]+>|[#*]", "", resultado.texto).strip()
+    conteudo = gerar_pdf_roteiro(guia, rota, {}, pedido["endereco"], pedido["distancia"], pedido["nivel"],
+                                 "-", pedido["estilo"])
+    with open(caminho, "wb") as arquivo:
+        arquivo.write(base64.b64decode(conteudo))
+
+
+def processar_pedido(pedido, saida, pdf=False):
+    """
+    Gera e grava a rota de um pedido (executado nos workers)
+
+    Args:
+        pedido (dict): Pedido normalizado
+        saida (str): Diretório de saída
+        pdf (bool): Se True, grava também o roteiro em PDF
+
+    Returns:
+        dict: Linha de resultados.jsonl (id, ok, distância, diferença, fora_tolerancia,
+            estratégia, chamadas, erro, segundos)
+    """
+    inicio = time.perf_counter()
+    linha = {"id": pedido["id"], "ok": False}
+    try:
+        # Endereços recusados pelo índice local falham sem chamada à API
+        validacao = validar_endereco(pedido["endereco"])
+        if validacao["status"] == "invalido":
+            raise ValueError(validacao["mensagem"])
+        endereco = pedido["endereco"] if CIDADE.split(" - ")[0] in pedido["endereco"] \
+            else f"{pedido['endereco']}, {CIDADE}"
+
+        # Mesma escolha de estratégias do app
+        argumentos = {}
+        if pedido["distancia"] <= DISTANCIA_ROTA_CURTA_KM:
+            argumentos = {"estrategias": [EstrategiaCurta()], "exigir_tolerancia": False, "trajeto_fechado": True}
+        else:
+            argumentos = {"modo_busca": "matriz" if pedido["modo"] == "rapido" else "grade"}
+        resultado = gerar_rota_circular(
+            endereco, pedido["distancia"], nivel=pedido["nivel"], estilo=pedido["estilo"],
+            origem_coords=validacao["coords"], orcamento=OrcamentoBusca.de_modo(pedido["modo"]),
+            gmaps=_cliente, **argumentos
+        )
+        if not resultado.ok:
+            raise ValueError(resultado.erro)
+
+        # Rotas curtas não exigem a tolerância: a rota fica, mas a falta é sinalizada
+        fora_tolerancia = resultado.diff > TOLERANCIA_KM
+        passos = extrair_instrucoes(resultado.route)
+        perfil = resultado.elevation_data
+        metricas = metricas_perfil([p["distance"] for p in perfil], [p["elevation"] for p in perfil]) if perfil else {}
+        _gravar_json(os.path.join(saida, f"{pedido['id']}.json"), {
+            "pedido": pedido,
+            "distancia_km": resultado.distancia_km,
+            "diff_km": resultado.diff,
+            "fora_tolerancia": fora_tolerancia,
+            "estrategia": resultado.estrategia,
+            "chamadas": resultado.chamadas,
+            "waypoints": resultado.waypoints,
+            "passos": passos,
+            "elevacao": perfil,
+            "metricas_elevacao": metricas,
+            "ciclovias": resultado.ciclovias,
+            "route": resultado.route,
+        })
+        if pdf:
+            _gravar_pdf(os.path.join(saida, f"{pedido['id']}.pdf"), pedido, resultado, passos)
+        linha.update(ok=True, distancia_km=round(resultado.distancia_km, 2), diff_km=round(resultado.diff, 2),
+                     fora_tolerancia=fora_tolerancia, estrategia=resultado.estrategia, chamadas=resultado.chamadas)
+    except Exception as e:
+        linha["erro"] = str(e)
+    linha["segundos"] = round(time.perf_counter() - inicio, 2)
+    return linha
+
+
+def pendentes(pedidos, saida):
+    """
+    Pedidos ainda sem rota gravada no diretório de saída
+
+    Returns:
+        list: Pedidos a processar (ids repetidos aparecem uma vez)
+    """
+    vistos = set()
+    restantes = []
+    for pedido in pedidos:
+        if pedido["id"] in vistos or os.path.exists(os.path.join(saida, f"{pedido['id']}.json")):
+            continue
+        vistos.add(pedido["id"])
+        restantes.append(pedido)
+    return restantes
+
+
+def executar_lote(pedidos, saida, workers=4, pool="processos", taxa=TAXA_PADRAO, pdf=False, silencioso=True):
+    """
+    Processa os pedidos em paralelo, gravando cada resultado assim que fica pronto
+
+    Args:
+        pedidos (list): Pedidos normalizados ainda pendentes
+        saida (str): Diretório de saída
+        workers (int): Processos ou threads simultâneos
+        pool (str): "processos" ou "threads"
+        taxa (float): Chamadas por segundo à API, somando todos os workers (0 = sem limite)
+        pdf (bool): Gravar também os PDFs
+        silencioso (bool): Descartar o log do motor de rotas
+
+    Returns:
+        dict: Contadores ok, fora_tolerancia (entre as ok) e falhas
+    """
+    contadores = {"ok": 0, "fora_tolerancia": 0, "falhas": 0}
+    if pool == "processos":
+        # Cada processo tem o seu limitador: a taxa total é dividida entre eles
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_iniciar_worker,
+                                       initargs=(taxa / workers if taxa else 0, silencioso))
+    else:
+        _iniciar_worker(taxa, False)
+        executor = ThreadPoolExecutor(max_workers=workers)
+
+    saida_motor = io.StringIO() if silencioso and pool == "threads" else None
+    with executor, open(os.path.join(saida, ARQUIVO_RESULTADOS), "a", encoding="utf-8") as resultados, \
+            (contextlib.redirect_stdout(saida_motor) if saida_motor is not None else contextlib.nullcontext()):
+        futuros = {executor.submit(processar_pedido, pedido, saida, pdf): pedido for pedido in pedidos}
+        for feitos, futuro in enumerate(as_completed(futuros), start=1):
+            linha = futuro.result()
+            resultados.write(json.dumps(linha, ensure_ascii=False) + "\n")
+            resultados.flush()
+            if linha["ok"]:
+                contadores["ok"] += 1
+                resumo = f"{linha['distancia_km']:.1f}km ({linha['estrategia']}, {linha['chamadas']} chamadas)"
+                if linha["fora_tolerancia"]:
+                    contadores["fora_tolerancia"] += 1
+                    resumo += f" ⚠️ fora da tolerância de ±{TOLERANCIA_KM:.0f}km (diferença {linha['diff_km']:.1f}km)"
+            else:
+                contadores["falhas"] += 1
+                resumo = f"falhou: {linha['erro']}"
+            print(f"[{feitos}/{len(pedidos)}] {linha['id']}: {resumo}", file=sys.stderr)
+            if saida_motor is not None:
+                # O log do motor é descartado a cada pedido para não acumular na memória
+                saida_motor.seek(0)
+                saida_motor.truncate()
+    return contadores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera rotas em lote a partir de um CSV ou JSONL de pedidos")
+    parser.add_argument("pedidos", help="Arquivo .csv (com cabeçalho) ou .jsonl com endereco, nivel e distancia")
+    parser.add_argument("--saida", required=True, help="Diretório das rotas geradas")
+    parser.add_argument("--workers", type=int, default=4, help="Processos ou threads simultâneos")
+    parser.add_argument("--pool", choices=["processos", "threads"], default="processos")
+    parser.add_argument("--taxa", type=float, default=TAXA_PADRAO,
+                        help="Chamadas por segundo à API do Google Maps, no total (0 = sem limite)")
+    parser.add_argument("--modo", choices=list(MODOS_BUSCA), default=MODO_PADRAO,
+                        help="Modo de busca dos pedidos que não definem um")
+    parser.add_argument("--pdf", action="store_true", help="Gravar também o roteiro em PDF")
+    parser.add_argument("--verboso", action="store_true", help="Mostrar o log do motor de rotas")
+    args = parser.parse_args()
+
+    if cliente_maps() is None:
+        parser.error("GOOGLE_MAPS_API_KEY não definida (ou PEDALA_MAPS_MODO=replay com o armazém de respostas)")
+    if args.pdf:
+        try:
+            import fpdf  # noqa: F401
+        except ImportError:
+            parser.error("--pdf requer o pacote fpdf")
+
+    pedidos, invalidos = [], []
+    for numero, bruto in enumerate(ler_pedidos(args.pedidos), start=1):
+        try:
+            pedidos.append(normalizar_pedido(bruto, args.modo))
+        except ValueError as e:
+            invalidos.append(f"linha {numero}: {e}")
+    for invalido in invalidos:
+        print(f"Pedido ignorado ({invalido})", file=sys.stderr)
+
+    os.makedirs(args.saida, exist_ok=True)
+    restantes = pendentes(pedidos, args.saida)
+    print(f"{len(pedidos)} pedidos, {len(pedidos) - len(restantes)} já gerados, {len(restantes)} a gerar",
+          file=sys.stderr)
+    contadores = executar_lote(restantes, args.saida, workers=args.workers, pool=args.pool, taxa=args.taxa,
+                               pdf=args.pdf, silencioso=not args.verboso)
+    print(f"\nGeradas: {contadores['ok']} ({contadores['fora_tolerancia']} fora da tolerância), "
+          f"falhas: {contadores['falhas']}, "
+          f"inválidos: {len(invalidos)}", file=sys.stderr)
+    sys.exit(1 if contadores["falhas"] else 0)
+
+
+if __name__ == "__main__":
+    main()
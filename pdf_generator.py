@@ -4,9 +4,12 @@ Módulo para gerar arquivos PDF dos roteiros de pedalada
 import os
 import base64
 import re
+import tempfile
 from datetime import datetime
 from fpdf import FPDF
 
+from utils.geodesia import metricas_perfil
+
 # Função para remover emojis e caracteres não-ASCII
 def limpar_texto(texto):
     """Remove emojis e caracteres especiais incompatíveis com FPDF"""
@@ -202,17 +205,29 @@ def gerar_pdf_roteiro(guia, rota, dados_sensor, endereco, distancia, nivel, hora
     
     # Obter a distância real da rota
     distancia_real = "Desconhecida"
+    metricas = {}
+    if rota.get("elevation_data"):
+        perfil = rota["elevation_data"]
+        metricas = metricas_perfil([p["distance"] for p in perfil], [p["elevation"] for p in perfil])
     if "distancia_total" in rota and rota["distancia_total"]:
         distancia_real = rota["distancia_total"]
+    elif metricas:
+        distancia_real = f"{metricas['distancia_km']:.1f} km"
     pdf.texto(f"Distância total: {distancia_real}")
+    if metricas:
+        # Métricas calculadas localmente a partir do perfil de elevação da rota
+        pdf.texto(f"Subida acumulada: {metricas['subida_m']:.0f} m | Descida acumulada: {metricas['descida_m']:.0f} m")
+        pdf.texto(f"Altitude: {metricas['elevacao_min_m']:.0f} a {metricas['elevacao_max_m']:.0f} m | "
+                  f"Inclinação máxima: {metricas['inclinacao_max_pct']:.1f}%")
     
     # Adicionar passos da rota
     pdf.subtitulo("Passos detalhados:")
     if "passos" in rota and rota["passos"]:
         pdf.lista_numerada(rota["passos"])
     
-    # Salvar o PDF em memória
-    pdf_output = f"roteiro_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    # Salvar o PDF num arquivo temporário exclusivo (vários roteiros podem ser gerados ao mesmo tempo)
+    descritor, pdf_output = tempfile.mkstemp(prefix="roteiro_", suffix=".pdf")
+    os.close(descritor)
     pdf.output(pdf_output)
     
     # Converter para base64 para download
@@ -0,0 +1,167 @@
+"""
+Pré-calcula a biblioteca de rotas circulares (utils/route_library.py).
+
+Para cada célula de uma grade ao redor do centro × distâncias do slider × nível do
+ciclista, gera um circuito com o mesmo gerador do app (varredura em grade) ou com o
+roteamento offline, e grava o resultado na biblioteca. Circuitos já existentes são
+pulados, então o job pode ser interrompido e retomado.
+
+Uso:
+    python precomputar_rotas.py --raio-km 5 --passo-m 1000
+    python precomputar_rotas.py --offline --niveis Iniciante Intermediário
+"""
+import argparse
+
+import numpy as np
+
+from utils.geodesia import metros_para_graus
+from utils.route_candidates import CICLISTA_FATORES, TOLERANCIA_KM, buscar_rota_grade
+from utils.maps_provider import cliente_maps
+from utils.polyline import codificar
+from utils.route_engine.render import extrair_instrucoes
+from utils.route_library import BIBLIOTECA_PATH, BibliotecaRotas, waypoints_na_ordem
+
+# Centro aproximado de São José dos Campos
+CENTRO_SJC = (-23.1794, -45.8869)
+
+# Passos do slider de distância do formulário
+DISTANCIAS = [5, 10, 15, 20, 25, 30]
+
+
+def pontos_da_grade(centro, raio_km, passo_m):
+    """
+    Centros das células de partida dentro de um círculo ao redor do centro
+
+    Args:
+        centro (tuple): (lat, lng) do centro
+        raio_km (float): Raio da área coberta
+        passo_m (float): Espaçamento entre os pontos
+
+    Returns:
+        list: Tuplas (lat, lng)
+    """
+    lat0, lng0 = centro
+    passos = int(raio_km * 1000 // passo_m)
+    i, j = np.mgrid[-passos:passos + 1, -passos:passos + 1].reshape(2, -1) * passo_m
+    dentro = np.hypot(i, j) <= raio_km * 1000
+    dlat, dlng = metros_para_graus(i[dentro], j[dentro], lat0)
+    return list(zip((lat0 + dlat).tolist(), (lng0 + dlng).tolist()))
+
+
+def gerar_circuito_google(gmaps, lat, lng, distancia, nivel):
+    """Gera um circuito com a varredura em grade do app e o converte para a biblioteca"""
+    origem = f"{lat},{lng}"
+    melhor = buscar_rota_grade(gmaps, origem, lat, lng, distancia, perfil_fator=CICLISTA_FATORES[nivel])
+    if not melhor or melhor["diff"] > TOLERANCIA_KM:
+        return None
+    leg = melhor["route"][0]["legs"][0]
+    return {
+        # Início ajustado pela API ao ponto mais próximo da malha viária
+        "lat": leg["start_location"]["lat"],
+        "lng": leg["start_location"]["lng"],
+        "distancia_km": melhor["distance"],
+        "waypoints": waypoints_na_ordem(melhor),
+        "passos": extrair_instrucoes(melhor["route"]),
+        "polyline": melhor["route"][0].get("overview_polyline", {}).get("points"),
+    }
+
+
+def gerar_circuito_offline(grafo, lat, lng, distancia, nivel):
+    """Gera um circuito com o roteamento local (o nível não altera o grafo)"""
+    import rotas_offline
+    melhor = rotas_offline.buscar_rota_circular(grafo, lat, lng, distancia)
+    if not melhor or melhor["diff"] > TOLERANCIA_KM:
+        return None
+    arestas = melhor["route"]
+    nos = np.append(grafo.origem_das_arestas(arestas), grafo.indices[arestas[-1]])
+    inicio = int(nos[0])
+    return {
+        "lat": float(grafo.lat[inicio]),
+        "lng": float(grafo.lng[inicio]),
+        "distancia_km": melhor["distance"],
+        "waypoints": melhor["waypoints"],
+        "passos": rotas_offline.gerar_instrucoes(grafo, melhor["route"]),
+        "polyline": codificar(np.column_stack([grafo.lat[nos], grafo.lng[nos]])),
+    }
+
+
+def precomputar(biblioteca, gerar, pontos, distancias, niveis, raio_existente_m=None):
+    """
+    Preenche a biblioteca para todas as combinações ainda ausentes
+
+    Args:
+        biblioteca (BibliotecaRotas): Biblioteca de destino
+        gerar (callable): gerar(lat, lng, distancia, nivel) -> dict do circuito ou None
+        pontos (list): Pontos de partida (lat, lng)
+        distancias (list): Distâncias em km
+        niveis (list): Níveis do ciclista
+        raio_existente_m (float): Raio em que um circuito já gravado conta como existente
+
+    Returns:
+        dict: Contadores gerados, pulados e falhas
+    """
+    contadores = {"gerados": 0, "pulados": 0, "falhas": 0}
+    total = len(pontos) * len(distancias) * len(niveis)
+    feitos = 0
+    for lat, lng in pontos:
+        for nivel in niveis:
+            for distancia in distancias:
+                feitos += 1
+                if biblioteca.existe(lat, lng, nivel, distancia, raio_m=raio_existente_m):
+                    contadores["pulados"] += 1
+                    continue
+                try:
+                    circuito = gerar(lat, lng, distancia, nivel)
+                except Exception as e:
+                    print(f"Erro ao gerar circuito em {lat:.5f},{lng:.5f} ({distancia}km, {nivel}): {str(e)}")
+                    circuito = None
+                if circuito is None:
+                    contadores["falhas"] += 1
+                    continue
+                biblioteca.adicionar(
+                    circuito["lat"], circuito["lng"], nivel, distancia, circuito["distancia_km"],
+                    circuito["waypoints"], passos=circuito["passos"], polyline=circuito["polyline"]
+                )
+                contadores["gerados"] += 1
+                print(f"[{feitos}/{total}] {distancia}km {nivel} em {lat:.5f},{lng:.5f}: "
+                      f"{circuito['distancia_km']:.1f}km")
+    return contadores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pré-calcula a biblioteca de rotas circulares")
+    parser.add_argument("--centro", default=f"{CENTRO_SJC[0]},{CENTRO_SJC[1]}", help="Centro da grade (lat,lng)")
+    parser.add_argument("--raio-km", type=float, default=5.0, help="Raio da área coberta em km")
+    parser.add_argument("--passo-m", type=float, default=1000.0, help="Espaçamento entre as partidas em metros")
+    parser.add_argument("--distancias", type=int, nargs="+", default=DISTANCIAS, help="Distâncias em km")
+    parser.add_argument("--niveis", nargs="+", default=list(CICLISTA_FATORES), help="Níveis do ciclista")
+    parser.add_argument("--biblioteca", default=BIBLIOTECA_PATH, help="Arquivo da biblioteca")
+    parser.add_argument("--offline", action="store_true", help="Usar o roteamento offline em vez da API do Google")
+    args = parser.parse_args()
+
+    centro = tuple(float(v) for v in args.centro.split(","))
+    pontos = pontos_da_grade(centro, args.raio_km, args.passo_m)
+
+    if args.offline:
+        import rotas_offline
+        if not rotas_offline.disponivel():
+            parser.error(f"Extrato OSM não encontrado em {rotas_offline.CAMINHO_OSM}")
+        grafo = rotas_offline.carregar_grafo()
+        gerar = lambda lat, lng, d, n: gerar_circuito_offline(grafo, lat, lng, d, n)
+    else:
+        gmaps = cliente_maps()
+        if gmaps is None:
+            parser.error("GOOGLE_MAPS_API_KEY não definida (use --offline para o roteamento local)")
+        gerar = lambda lat, lng, d, n: gerar_circuito_google(gmaps, lat, lng, d, n)
+
+    biblioteca = BibliotecaRotas(args.biblioteca)
+    print(f"{len(pontos)} partidas × {len(args.distancias)} distâncias × {len(args.niveis)} níveis")
+    contadores = precomputar(biblioteca, gerar, pontos, args.distancias, args.niveis,
+                             raio_existente_m=args.passo_m / 2)
+    print(f"\nGerados: {contadores['gerados']}, já existentes: {contadores['pulados']}, "
+          f"falhas: {contadores['falhas']}")
+    print(f"Biblioteca: {biblioteca.estatisticas()}")
+
+
+if __name__ == "__main__":
+    main()
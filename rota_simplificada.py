@@ -1,11 +1,7 @@
 import re
-import html
-import os
-import googlemaps
-from openai import OpenAI
 
 # Evitar importação de Streamlit para não causar erro de configuração de página
-def gerar_rota_simplificada(origem, passos, distancia=15, mapa_html=None, texto_completo=None, elevation_data=None, gerar_rota_e_embed=None, forcar_distancia=True):
+def gerar_rota_simplificada(origem, passos, distancia=15, mapa_html=None, texto_completo=None, elevation_data=None, gerar_rota_e_embed=None, forcar_distancia=True, orcamento=None):
     """
     Versão simplificada da função gerar_rota_e_embed que mostra apenas pontos principais
     
@@ -18,10 +14,16 @@ def gerar_rota_simplificada(origem, passos, distancia=15, mapa_html=None, texto_
         elevation_data (list): Dados de elevação (se já gerados)
         gerar_rota_e_embed (callable): Função de geração de rota
         forcar_distancia (bool): Se True, força a distância a ficar próxima do valor solicitado
+        orcamento (OrcamentoBusca): Orçamento da requisição, repassado ao gerador
         
     Returns:
         tuple: HTML do mapa, texto simplificado da rota, dados de elevação
     """
+    # Repassar o orçamento apenas se houver um (geradores antigos não o aceitam)
+    argumentos = {"forcar_distancia": forcar_distancia}
+    if orcamento is not None:
+        argumentos["orcamento"] = orcamento
+    
     try:
         # Evitar importações circulares
         if mapa_html is None or texto_completo is None or elevation_data is None:
@@ -29,13 +31,8 @@ def gerar_rota_simplificada(origem, passos, distancia=15, mapa_html=None, texto_
                 # Não podemos continuar sem a função ou os dados
                 return "", "<p>Erro: Função de geração de rota não fornecida</p>", []
             
-            # Recuperar as chaves e criar clientes
-            GMAPS_KEY = os.environ.get("GOOGLE_MAPS_API_KEY", "")
-            client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY", ""))
-            gmaps = googlemaps.Client(key=GMAPS_KEY)
-            
-            # Usar a função fornecida para gerar a rota
-            mapa_html, texto_completo, elevation_data = gerar_rota_e_embed(origem, passos, distancia, forcar_distancia=forcar_distancia)
+            # Usar a função fornecida para gerar a rota (uma única vez)
+            mapa_html, texto_completo, elevation_data = gerar_rota_e_embed(origem, passos, distancia, **argumentos)
         
         # Extrair as ruas do texto completo
         ruas_padrao = r'<li>(.*?)</li>'
@@ -81,6 +78,10 @@ def gerar_rota_simplificada(origem, passos, distancia=15, mapa_html=None, texto_
         else:
             distancia_total = f"{distancia} km (aprox.)"
             
+        # Manter a linha de ciclovias e ciclofaixas do texto original
+        ciclovias_match = re.search(r'(\*\*Ciclovias e ciclofaixas:\*\* .*?  \n)', texto_completo)
+        linha_ciclovias = ciclovias_match.group(1) if ciclovias_match else ""
+
         # Extrair a primeira e a última rua da rota completa para comprovar trajeto fechado
         primeira_rua = ruas_traduzidas[0] if ruas_traduzidas else "Início do trajeto"
         ultima_rua = ruas_traduzidas[-1] if ruas_traduzidas else "Fim do trajeto"
@@ -90,7 +91,7 @@ def gerar_rota_simplificada(origem, passos, distancia=15, mapa_html=None, texto_
 ### 🗺️ Resumo da Rota  
 **Origem e retorno:** {origem}  
 **Distância total:** {distancia_total}  
-
+{linha_ciclovias}
 **Trajeto fechado confirmado:**
 - **Início:** {primeira_rua}
 - **Fim:** {ultima_rua}
@@ -107,13 +108,9 @@ def gerar_rota_simplificada(origem, passos, distancia=15, mapa_html=None, texto_
         erro_msg = f"Erro ao gerar resumo simplificado: {str(e)}"
         print(erro_msg)  # Usar print para debug
         
-        # Se houve erro e gerar_rota_e_embed foi fornecido, tentar usar diretamente
-        if gerar_rota_e_embed is not None:
-            try:
-                return gerar_rota_e_embed(origem, passos, distancia, forcar_distancia=forcar_distancia)
-            except Exception as e2:
-                erro_msg = f"Não foi possível gerar rota: {str(e2)}"
-                print(erro_msg)
+        # A rota não é gerada de novo: se ela já existe, devolver o texto completo sem resumo
+        if mapa_html is not None and texto_completo is not None:
+            return mapa_html, texto_completo, elevation_data or []
                 
         # Retornar erro genérico se tudo falhar
         return "", f"<p>Não foi possível gerar rota: {str(e)}</p>", []
\ No newline at end of file
@@ -0,0 +1,310 @@
+"""
+Roteamento local (offline) a partir de um extrato do OpenStreetMap de São José dos Campos.
+
+Gera rotas circulares inteiramente no processo, sem chamadas ao Google Directions,
+usando o grafo viário compacto de utils.osm_graph. Mantém o mesmo contrato de
+retorno de gerar_rota_e_embed / gerar_rota_curta: (mapa_html, texto, elevation_data).
+"""
+import os
+import re
+import json
+import math
+import threading
+
+import numpy as np
+
+from utils.geodesia import deslocar, rumos_graus
+from utils.osm_graph import GrafoViario
+from utils.radius_search import buscar_fator_secante
+from utils.route_engine.render import elevacao_geometria
+
+# Extrato OSM (.osm, .osm.gz, .osm.bz2) ou grafo já convertido (.npz)
+CAMINHO_OSM = os.environ.get("PEDALA_OSM_EXTRACT", os.path.join("dados", "osm", "sjc.npz"))
+
+# Rotações (em graus) do par de waypoints ao redor da origem: NE, SE, SW, NW
+ROTACOES = [0, 90, 180, 270]
+
+_grafos = {}
+_grafos_lock = threading.Lock()
+
+
+def disponivel(caminho=CAMINHO_OSM):
+    """Indica se há um extrato OSM local para o roteamento offline"""
+    return bool(caminho) and os.path.exists(caminho)
+
+
+def carregar_grafo(caminho=CAMINHO_OSM):
+    """
+    Carrega (uma vez por processo) o grafo viário do extrato local
+
+    Args:
+        caminho (str): Caminho do extrato .osm ou do grafo .npz
+
+    Returns:
+        GrafoViario: Grafo carregado
+    """
+    with _grafos_lock:
+        if caminho not in _grafos:
+            _grafos[caminho] = GrafoViario.carregar(caminho)
+        return _grafos[caminho]
+
+
+def _ponto_deslocado(lat, lng, raio_km, angulo_graus):
+    """Ponto a raio_km da origem na direção indicada (0° = norte, 90° = leste)"""
+    lat_p, lng_p = deslocar(lat, lng, raio_km * 1000, angulo_graus)
+    return float(lat_p), float(lng_p)
+
+
+def _rota_circular(grafo, no_origem, raio_km, rotacao):
+    """
+    Monta a rota origem → A → B → origem com A e B a raio_km, separados por 90°
+
+    Os trechos já usados são penalizados nos dois sentidos nas pernas seguintes,
+    para evitar voltar pela mesma via da ida.
+    """
+    lat0, lng0 = grafo.lat[no_origem], grafo.lng[no_origem]
+    nos = [no_origem]
+    for angulo in (rotacao, rotacao + 90):
+        nos.append(grafo.no_mais_proximo(*_ponto_deslocado(lat0, lng0, raio_km, angulo)))
+    nos.append(no_origem)
+
+    arestas = []
+    usadas = set()
+    for a, b in zip(nos, nos[1:]):
+        perna = grafo.menor_caminho(a, b, penalizadas=usadas)
+        if perna is None:
+            return None
+        arestas.extend(perna)
+        usadas.update(grafo.trechos[perna].tolist())
+
+    if not arestas:
+        return None
+    km = float(grafo.comprimento[arestas].sum()) / 1000
+    waypoints = [f"{grafo.lat[n]},{grafo.lng[n]}" for n in nos[1:-1]]
+    return {"route": arestas, "distance": km, "waypoints": waypoints}
+
+
+def buscar_rota_circular(grafo, lat, lng, distancia, tolerancia=2.0):
+    """
+    Busca uma rota circular de comprimento próximo a distancia partindo de (lat, lng)
+
+    Args:
+        grafo (GrafoViario): Grafo viário
+        lat (float): Latitude da origem
+        lng (float): Longitude da origem
+        distancia (float): Distância desejada em km
+        tolerancia (float): Tolerância máxima em km
+
+    Returns:
+        dict: Melhor candidato (route = lista de arestas, distance, diff, waypoints) ou None
+    """
+    no_origem = grafo.no_mais_proximo(lat, lng)
+    # Triângulo origem-A-B com lados r, r, r√2 e circuidade urbana típica de ~1.3
+    raio_inicial = distancia / ((2 + math.sqrt(2)) * 1.3)
+
+    melhor = None
+    for rotacao in ROTACOES:
+        candidato = buscar_fator_secante(
+            lambda raio: _rota_circular(grafo, no_origem, raio, rotacao),
+            distancia, raio_inicial, tolerancia=tolerancia
+        )
+        if candidato and (melhor is None or candidato["diff"] < melhor["diff"]):
+            melhor = candidato
+        if melhor and melhor["diff"] <= tolerancia and melhor["distance"] <= distancia:
+            break
+    return melhor
+
+
+def fracao_repetida(grafo, arestas):
+    """
+    Fração do comprimento da rota em trechos percorridos mais de uma vez (em qualquer sentido)
+
+    Args:
+        grafo (GrafoViario): Grafo viário
+        arestas (list): Índices das arestas da rota
+
+    Returns:
+        float: De 0 (sem ida e volta) a 1
+    """
+    arestas = np.asarray(arestas, dtype=np.int64)
+    if not len(arestas):
+        return 0.0
+    trechos = grafo.trechos[arestas]
+    unicos, contagem = np.unique(trechos, return_counts=True)
+    repetidos = np.isin(trechos, unicos[contagem > 1])
+    comprimento = grafo.comprimento[arestas].astype(np.float64)
+    return float(comprimento[repetidos].sum() / comprimento.sum())
+
+
+def gerar_instrucoes(grafo, arestas):
+    """
+    Converte a sequência de arestas em instruções de navegação em português
+
+    Args:
+        grafo (GrafoViario): Grafo viário
+        arestas (list): Índices das arestas da rota
+
+    Returns:
+        list: Instruções (uma por trecho de mesma via)
+    """
+    origens = grafo.origem_das_arestas(arestas)
+    destinos = grafo.indices[np.asarray(arestas, dtype=np.int64)]
+    # Rumo de todas as arestas em uma única operação
+    rumos = rumos_graus(grafo.lat[origens], grafo.lng[origens], grafo.lat[destinos], grafo.lng[destinos])
+    trechos = []
+    for e, rumo in zip(arestas, rumos.tolist()):
+        nome = grafo.nomes[int(grafo.nome_idx[e])] or "via sem nome"
+        if trechos and trechos[-1]["nome"] == nome:
+            trechos[-1]["metros"] += float(grafo.comprimento[e])
+            trechos[-1]["rumo_final"] = rumo
+        else:
+            trechos.append({"nome": nome, "metros": float(grafo.comprimento[e]), "rumo_inicial": rumo, "rumo_final": rumo})
+
+    instrucoes = []
+    for i, trecho in enumerate(trechos):
+        metros = f"{trecho['metros'] / 1000:.1f} km" if trecho["metros"] >= 1000 else f"{trecho['metros']:.0f} m"
+        if i == 0:
+            instrucoes.append(f"Siga pela {trecho['nome']} por {metros}")
+            continue
+        giro = (trecho["rumo_inicial"] - trechos[i - 1]["rumo_final"] + 540) % 360 - 180
+        if abs(giro) < 30:
+            acao = "Continue pela"
+        elif abs(giro) > 150:
+            acao = "Faça o retorno na"
+        elif giro > 0:
+            acao = "Vire à direita na"
+        else:
+            acao = "Vire à esquerda na"
+        instrucoes.append(f"{acao} {trecho['nome']} por {metros}")
+    instrucoes.append("Destino: chegada ao ponto de partida")
+    return instrucoes
+
+
+def gerar_mapa_html(coordenadas):
+    """
+    Gera o HTML de um mapa Leaflet (tiles do OpenStreetMap) com a rota desenhada
+
+    Args:
+        coordenadas (list): Lista de [lat, lng] da rota
+
+    Returns:
+        str: HTML embutível do mapa
+    """
+    pontos = json.dumps([[round(lat, 6), round(lng, 6)] for lat, lng in coordenadas])
+    return f"""
+<link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css"/>
+<div id="map" style="height:500px; border-radius:12px; box-shadow: 0 4px 8px rgba(0,0,0,0.3);"></div>
+<script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+<script>
+  const pontos = {pontos};
+  const map = L.map("map");
+  L.tileLayer("https://{{s}}.tile.openstreetmap.org/{{z}}/{{x}}/{{y}}.png", {{
+    maxZoom: 19,
+    attribution: "&copy; OpenStreetMap"
+  }}).addTo(map);
+  const rota = L.polyline(pontos, {{ color: "#e74c3c", weight: 6, opacity: 0.9 }}).addTo(map);
+  L.marker(pontos[0]).addTo(map).bindPopup("Partida e chegada");
+  map.fitBounds(rota.getBounds());
+</script>
+"""
+
+
+def _resolver_origem(grafo, origem, origem_coords):
+    """Obtém as coordenadas da origem sem rede: coordenadas dadas, "lat,lng" ou nome da rua"""
+    if origem_coords:
+        return origem_coords['lat'], origem_coords['lng']
+    match = re.match(r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$", origem)
+    if match:
+        return float(match.group(1)), float(match.group(2))
+    no = grafo.localizar_rua(origem)
+    if no is None:
+        return None
+    return float(grafo.lat[no]), float(grafo.lng[no])
+
+
+def gerar_rota_offline(origem: str, distancia: int = 15, origem_coords: dict = None, caminho: str = CAMINHO_OSM,
+                       gmaps=None):
+    """
+    Gera uma rota circular usando apenas o grafo viário local
+
+    O perfil de elevação vem dos tiles locais (PEDALA_DEM_DIR), como no caminho
+    online; só se a rota sair dos tiles e houver cliente é usada a API de elevação.
+
+    Args:
+        origem (str): Endereço de origem (e retorno) da rota
+        distancia (int): Distância desejada em km
+        origem_coords (dict): Coordenadas já resolvidas da origem ({'lat', 'lng'})
+        caminho (str): Extrato OSM ou grafo .npz
+        gmaps: Cliente do Google Maps para a elevação fora dos tiles locais (opcional)
+
+    Returns:
+        tuple: HTML do mapa, texto descritivo da rota, dados de elevação
+    """
+    if not disponivel(caminho):
+        return "", "<p>Roteamento offline indisponível: extrato do OpenStreetMap não encontrado.</p>", []
+
+    try:
+        grafo = carregar_grafo(caminho)
+        inicio = _resolver_origem(grafo, origem, origem_coords)
+        if inicio is None:
+            return "", "<p>Não foi possível localizar o endereço no mapa offline.</p>", []
+
+        melhor = buscar_rota_circular(grafo, inicio[0], inicio[1], distancia)
+        if not melhor:
+            return "", "<p>Não foi possível encontrar uma rota adequada para a distância solicitada.</p>", []
+        if melhor["diff"] > 2.0:
+            print(f"ERRO: A melhor rota offline tem {melhor['distance']:.1f}km, "
+                  f"fora da tolerância de ±2km da distância solicitada ({distancia}km)")
+
+        arestas = melhor["route"]
+        nos = np.append(grafo.origem_das_arestas(arestas), grafo.indices[arestas[-1]])
+        coordenadas = list(zip(grafo.lat[nos].tolist(), grafo.lng[nos].tolist()))
+        instrucoes = gerar_instrucoes(grafo, arestas)
+        try:
+            elevation_data = elevacao_geometria(gmaps, np.array(coordenadas))
+        except Exception as e:
+            # A rota continua útil sem o gráfico de elevação
+            print(f"Erro ao obter a elevação da rota offline: {str(e)}")
+            elevation_data = []
+
+        texto = f"""
+### 🗺️ Resumo da Rota  
+**Origem e retorno:** {origem}  
+**Distância total:** {melhor['distance']:.1f} km  
+
+**Passos detalhados:**  
+<ol>
+{''.join(f"<li>{passo}</li>" for passo in instrucoes)}
+</ol>
+"""
+        return gerar_mapa_html(coordenadas), texto, elevation_data
+
+    except Exception as e:
+        print(f"Erro ao gerar rota offline: {str(e)}")
+        return "", f"<p>Não foi possível gerar a rota offline: {str(e)}</p>", []
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    # Verificação do roteamento offline contra um extrato (padrão: malha de teste versionada)
+    caminho = sys.argv[1] if len(sys.argv) > 1 else os.path.join("dados", "fixtures", "osm_sjc_malha.osm.gz")
+    grafo = carregar_grafo(caminho)
+    print(f"{caminho}: {grafo.num_nos} nós, {grafo.num_arestas} arestas")
+    lat, lng = float(np.median(grafo.lat)), float(np.median(grafo.lng))
+    falhas = 0
+    for distancia in (5, 10, 15):
+        inicio = time.perf_counter()
+        melhor = buscar_rota_circular(grafo, lat, lng, distancia)
+        ms = (time.perf_counter() - inicio) * 1000
+        if melhor is None:
+            print(f"{distancia:>3} km: sem rota")
+            falhas += 1
+            continue
+        repetida = fracao_repetida(grafo, melhor["route"])
+        ok = melhor["diff"] <= 2.0 and repetida <= 0.25
+        falhas += not ok
+        print(f"{distancia:>3} km: {melhor['distance']:.1f} km, {repetida:.0%} repetido, {ms:.0f} ms"
+              f"{'' if ok else '  ✗'}")
+    sys.exit(1 if falhas else 0)
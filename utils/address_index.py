@@ -0,0 +1,403 @@
+"""
+Índice local de logradouros para autocompletar e validar o endereço de partida.
+
+Ruas e avenidas de São José dos Campos ficam em dados/logradouros_sjc.json com a
+geometria e a faixa de numeração de cada via. Como a numeração é métrica (o
+número é a distância em metros desde o início da via), a coordenada de
+"Rua X, 123" é interpolada ao longo da geometria, sem chamada à API. Os nomes
+normalizados ficam num índice ordenado de sufixos de palavras (busca por prefixo
+a partir de qualquer palavra do nome, ex.: "jose mont") e num índice de
+trigramas (nomes digitados com erro).
+
+Com um extrato do OpenStreetMap o índice pode ser refeito com todas as vias:
+
+    python -m utils.address_index --osm sjc.osm
+"""
+import os
+import re
+import json
+import math
+import bisect
+import threading
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from utils.gazetteer import gazetteer_padrao, normalizar_nome, trigramas
+from utils.geodesia import distancias_acumuladas_m, distancias_m
+from utils.osm_graph import _abrir
+
+# Arquivo padrão do índice (pode ser alterado pela variável de ambiente)
+LOGRADOUROS_PATH = os.environ.get("PEDALA_LOGRADOUROS", os.path.join("dados", "logradouros_sjc.json"))
+
+# Semelhança mínima (Jaccard de trigramas) para sugerir um logradouro parecido
+LIMIAR_SUGESTAO = 0.4
+
+# Acima desta semelhança o nome desconhecido é tratado como erro de digitação,
+# mesmo com o índice parcial ("Rua Coronel José Monterio")
+LIMIAR_ERRO_DIGITACAO = 0.7
+
+# Marco zero da numeração (Praça Afonso Pena): as vias extraídas do OSM começam
+# pela extremidade mais próxima dele
+MARCO_ZERO = (-23.1838, -45.8847)
+
+# Número isolado depois do nome da via ("Rua X 123" ou "123 - Centro")
+_NUMERO = re.compile(r"^(?:n[o.]?\s*)?(\d+)\b", re.IGNORECASE)
+_NUMERO_FINAL = re.compile(r"^(.*\D)\s+(\d+)$")
+
+
+def separar_numero(texto):
+    """
+    Separa o nome da via e o número de um endereço digitado
+
+    Args:
+        texto (str): Endereço ("Rua Coronel José Monteiro, 123 - Centro")
+
+    Returns:
+        tuple: (nome da via, número ou None)
+    """
+    partes = [p.strip() for p in str(texto).split(",")]
+    rua = partes[0]
+    encontrado = _NUMERO_FINAL.match(rua)
+    if encontrado:
+        return encontrado.group(1).strip(), int(encontrado.group(2))
+    for parte in partes[1:]:
+        encontrado = _NUMERO.match(parte)
+        if encontrado:
+            return rua, int(encontrado.group(1))
+    return rua, None
+
+
+def _sufixos(nome):
+    """Sufixos de palavras do nome ("rua jose monteiro" -> "jose monteiro", "monteiro")"""
+    palavras = nome.split(" ")
+    return [" ".join(palavras[i:]) for i in range(len(palavras))]
+
+
+class IndiceLogradouros:
+    """Logradouros com geometria e numeração, indexados por prefixo e por trigramas"""
+
+    def __init__(self, logradouros, cidade="", completo=False):
+        """
+        Args:
+            logradouros (list): Dicts com nome, numeros ([primeiro, último]), pontos ([[lat, lng], ...])
+                e, opcionalmente, bairro
+            cidade (str): Cidade acrescentada ao endereço formatado
+            completo (bool): Se True, o índice cobre todas as vias da cidade e um nome
+                desconhecido é um endereço inválido
+        """
+        self.logradouros = list(logradouros)
+        self.cidade = cidade
+        self.completo = completo
+        self._por_nome = {}
+        for indice, logradouro in enumerate(self.logradouros):
+            self._por_nome.setdefault(normalizar_nome(logradouro["nome"]), indice)
+        # Sufixos ordenados para a busca por prefixo (bisect)
+        self._chaves = sorted(
+            (sufixo, indice) for nome, indice in self._por_nome.items() for sufixo in _sufixos(nome)
+        )
+        self._trigramas = {nome: trigramas(nome) for nome in self._por_nome}
+        self._indice_trigramas = {}
+        for nome, grupo in self._trigramas.items():
+            for trigrama in grupo:
+                self._indice_trigramas.setdefault(trigrama, set()).add(nome)
+        self._geometrias = {}
+
+    @classmethod
+    def carregar(cls, caminho=LOGRADOUROS_PATH):
+        """
+        Carrega o índice de um arquivo JSON
+
+        Returns:
+            IndiceLogradouros: Índice carregado (vazio se o arquivo não existe)
+        """
+        if not os.path.exists(caminho):
+            return cls([])
+        with open(caminho, encoding="utf-8") as arquivo:
+            dados = json.load(arquivo)
+        return cls(dados.get("logradouros", []), dados.get("cidade", ""), dados.get("completo", False))
+
+    @classmethod
+    def de_osm(cls, caminho, cidade="São José dos Campos, SP"):
+        """
+        Constrói o índice com todas as vias nomeadas de um extrato .osm
+
+        As vias de mesmo nome que compartilham extremidades são encadeadas e a
+        cadeia mais longa define a geometria, orientada a partir do marco zero.
+
+        Args:
+            caminho (str): Caminho do arquivo .osm (XML, opcionalmente .gz/.bz2)
+            cidade (str): Cidade do endereço formatado
+
+        Returns:
+            IndiceLogradouros: Índice completo
+        """
+        coords = {}
+        vias = {}
+        with _abrir(caminho) as arquivo:
+            for _, elem in ET.iterparse(arquivo, events=("end",)):
+                if elem.tag == "node":
+                    coords[int(elem.get("id"))] = (float(elem.get("lat")), float(elem.get("lon")))
+                    elem.clear()
+                elif elem.tag == "way":
+                    tags = {t.get("k"): t.get("v") for t in elem.findall("tag")}
+                    if tags.get("highway") and tags.get("name"):
+                        nos = [int(nd.get("ref")) for nd in elem.findall("nd")]
+                        vias.setdefault(tags["name"], []).append(nos)
+                    elem.clear()
+                elif elem.tag == "relation":
+                    elem.clear()
+
+        logradouros = []
+        for nome, trechos in sorted(vias.items()):
+            cadeias = [[coords[n] for n in cadeia if n in coords] for cadeia in _encadear(trechos)]
+            cadeias = [np.array(c) for c in cadeias if len(c) >= 2]
+            if not cadeias:
+                continue
+            comprimentos = [distancias_acumuladas_m(c)[-1] for c in cadeias]
+            pontos = cadeias[int(np.argmax(comprimentos))]
+            inicio = distancias_m(pontos[0, 0], pontos[0, 1], *MARCO_ZERO)
+            fim = distancias_m(pontos[-1, 0], pontos[-1, 1], *MARCO_ZERO)
+            if fim < inicio:
+                pontos = pontos[::-1]
+            logradouros.append({
+                "nome": nome,
+                "numeros": [1, int(math.ceil(max(comprimentos) / 10) * 10)],
+                "pontos": [[round(lat, 6), round(lng, 6)] for lat, lng in pontos],
+            })
+        return cls(logradouros, cidade, completo=True)
+
+    def salvar(self, caminho=LOGRADOUROS_PATH):
+        """Salva o índice em JSON"""
+        dados = {"cidade": self.cidade, "completo": self.completo, "logradouros": self.logradouros}
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            json.dump(dados, arquivo, ensure_ascii=False, indent=2)
+
+    def __len__(self):
+        return len(self.logradouros)
+
+    def localizar(self, nome):
+        """
+        Returns:
+            dict: Logradouro cujo nome normalizado é igual ao nome, ou None
+        """
+        indice = self._por_nome.get(normalizar_nome(nome))
+        return self.logradouros[indice] if indice is not None else None
+
+    def buscar_prefixo(self, prefixo, limite=10):
+        """
+        Logradouros com alguma palavra do nome começando pelo prefixo
+
+        Args:
+            prefixo (str): Início do nome, a partir de qualquer palavra ("jose mont")
+            limite (int): Número máximo de logradouros
+
+        Returns:
+            list: Logradouros distintos, em ordem alfabética do trecho encontrado
+        """
+        prefixo = normalizar_nome(prefixo)
+        if not prefixo:
+            return []
+        encontrados = []
+        inicio = bisect.bisect_left(self._chaves, (prefixo,))
+        for chave, indice in self._chaves[inicio:]:
+            if not chave.startswith(prefixo) or len(encontrados) >= limite:
+                break
+            logradouro = self.logradouros[indice]
+            if logradouro not in encontrados:
+                encontrados.append(logradouro)
+        return encontrados
+
+    def semelhantes(self, nome, limite=5):
+        """
+        Logradouros com nome parecido (semelhança de Jaccard entre trigramas)
+
+        Returns:
+            list: Tuplas (semelhança, logradouro), da mais parecida para a menos
+        """
+        alvo = trigramas(normalizar_nome(nome))
+        candidatos = set()
+        for trigrama in alvo:
+            candidatos |= self._indice_trigramas.get(trigrama, set())
+        pontuados = []
+        for candidato in candidatos:
+            grupo = self._trigramas[candidato]
+            pontuados.append((len(alvo & grupo) / len(alvo | grupo), self._por_nome[candidato]))
+        pontuados.sort(key=lambda item: -item[0])
+        return [(semelhanca, self.logradouros[indice]) for semelhanca, indice in pontuados[:limite]]
+
+    def coordenada(self, logradouro, numero=None):
+        """
+        Coordenada de um número da via, interpolada ao longo da geometria
+
+        Args:
+            logradouro (dict): Logradouro do índice
+            numero (int): Número do imóvel (None usa o meio da via)
+
+        Returns:
+            tuple: (lat, lng), ou None se o número está fora da numeração da via
+        """
+        primeiro, ultimo = logradouro["numeros"]
+        if numero is None:
+            fracao = 0.5
+        elif primeiro <= numero <= ultimo:
+            fracao = (numero - primeiro) / max(ultimo - primeiro, 1)
+        else:
+            return None
+        nome = logradouro["nome"]
+        if nome not in self._geometrias:
+            pontos = np.asarray(logradouro["pontos"], dtype=np.float64)
+            self._geometrias[nome] = (pontos, distancias_acumuladas_m(pontos))
+        pontos, acumulado = self._geometrias[nome]
+        alvo = fracao * acumulado[-1]
+        return float(np.interp(alvo, acumulado, pontos[:, 0])), float(np.interp(alvo, acumulado, pontos[:, 1]))
+
+    def sugerir(self, texto, limite=5):
+        """
+        Endereços completos para o texto digitado até agora
+
+        Logradouros cujo nome começa pelo texto vêm primeiro, seguidos dos de nome
+        parecido e dos pontos de referência do gazetteer. O número digitado é mantido.
+
+        Args:
+            texto (str): Texto do campo de endereço
+            limite (int): Número máximo de sugestões
+
+        Returns:
+            list: Endereços sugeridos ("Rua Coronel José Monteiro, 123")
+        """
+        rua, numero = separar_numero(texto)
+        if not normalizar_nome(rua):
+            return []
+        logradouros = self.buscar_prefixo(rua, limite)
+        for semelhanca, logradouro in self.semelhantes(rua, limite):
+            if semelhanca >= LIMIAR_SUGESTAO and logradouro not in logradouros:
+                logradouros.append(logradouro)
+        sugestoes = [f"{l['nome']}, {numero}" if numero is not None else l["nome"] for l in logradouros]
+        sugestoes += [local["nome"] for local in gazetteer_padrao().buscar_prefixo(rua, limite)]
+        return sugestoes[:limite]
+
+    def validar(self, texto):
+        """
+        Valida um endereço de partida sem chamar a API
+
+        Args:
+            texto (str): Endereço digitado, "lat,lng" ou nome de um ponto de referência
+
+        Returns:
+            dict: status ("validado", "invalido" ou "desconhecido"), mensagem, coords
+                (formato de utils.geocoding.geocodificar, ou None) e sugestoes
+        """
+        resultado = {"status": "invalido", "mensagem": "", "coords": None, "sugestoes": []}
+        if not normalizar_nome(texto):
+            resultado["mensagem"] = "Informe o endereço de partida"
+            return resultado
+        try:
+            lat, lng = (float(v) for v in str(texto).split(","))
+            resultado.update(status="validado", coords={"lat": lat, "lng": lng, "endereco_formatado": texto})
+            return resultado
+        except ValueError:
+            pass
+
+        coords = gazetteer_padrao().coordenadas(texto, aproximado=False)
+        if coords is not None:
+            resultado.update(status="validado", coords=coords)
+            return resultado
+
+        rua, numero = separar_numero(texto)
+        logradouro = self.localizar(rua)
+        if logradouro is None:
+            resultado["sugestoes"] = self.sugerir(texto)
+            parecidos = self.semelhantes(rua, limite=1)
+            if parecidos and parecidos[0][0] >= LIMIAR_ERRO_DIGITACAO:
+                resultado["mensagem"] = f"Logradouro não encontrado. Você quis dizer {parecidos[0][1]['nome']}?"
+            elif self.completo:
+                resultado["mensagem"] = f"Logradouro não encontrado em {self.cidade or 'na cidade'}: {rua}"
+            else:
+                # Índice parcial: o endereço ainda pode existir e será geocodificado na busca
+                resultado.update(status="desconhecido", mensagem="Endereço fora do índice local")
+            return resultado
+
+        posicao = self.coordenada(logradouro, numero)
+        if posicao is None:
+            primeiro, ultimo = logradouro["numeros"]
+            resultado["mensagem"] = f"Número {numero} fora da numeração de {logradouro['nome']} ({primeiro} a {ultimo})"
+            return resultado
+        formatado = logradouro["nome"] if numero is None else f"{logradouro['nome']}, {numero}"
+        if logradouro.get("bairro"):
+            formatado += f" - {logradouro['bairro']}"
+        if self.cidade:
+            formatado += f", {self.cidade}"
+        resultado.update(status="validado", coords={"lat": posicao[0], "lng": posicao[1], "endereco_formatado": formatado})
+        if numero is None:
+            resultado["mensagem"] = "Sem número: usando o meio da via"
+        return resultado
+
+
+def _encadear(trechos):
+    """Une as listas de nós que compartilham extremidades (vias de mesmo nome)"""
+    cadeias = [list(t) for t in trechos if t]
+    unido = True
+    while unido:
+        unido = False
+        for i in range(len(cadeias)):
+            for j in range(i + 1, len(cadeias)):
+                a, b = cadeias[i], cadeias[j]
+                if a[-1] == b[0]:
+                    cadeias[i] = a + b[1:]
+                elif a[-1] == b[-1]:
+                    cadeias[i] = a + b[-2::-1]
+                elif a[0] == b[-1]:
+                    cadeias[i] = b + a[1:]
+                elif a[0] == b[0]:
+                    cadeias[i] = b[::-1] + a[1:]
+                else:
+                    continue
+                del cadeias[j]
+                unido = True
+                break
+            if unido:
+                break
+    return cadeias
+
+
+_indice = None
+_indice_lock = threading.Lock()
+
+
+def indice_logradouros_padrao():
+    """Índice compartilhado pelo processo (carregado de LOGRADOUROS_PATH sob demanda)"""
+    global _indice
+    with _indice_lock:
+        if _indice is None:
+            _indice = IndiceLogradouros.carregar()
+        return _indice
+
+
+def validar_endereco(texto):
+    """Valida um endereço pelo índice compartilhado (ver IndiceLogradouros.validar)"""
+    return indice_logradouros_padrao().validar(texto)
+
+
+def sugerir_enderecos(texto, limite=5):
+    """Sugestões do índice compartilhado (ver IndiceLogradouros.sugerir)"""
+    return indice_logradouros_padrao().sugerir(texto, limite)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) in (3, 4) and sys.argv[1] == "--osm":
+        saida = sys.argv[3] if len(sys.argv) == 4 else LOGRADOUROS_PATH
+        indice = IndiceLogradouros.de_osm(sys.argv[2])
+        indice.salvar(saida)
+        print(f"Índice salvo em {saida}: {len(indice)} logradouros")
+    elif sys.argv[1:]:
+        consulta = " ".join(sys.argv[1:])
+        validacao = validar_endereco(consulta)
+        print(f"{validacao['status']}: {validacao['mensagem'] or validacao['coords']}")
+        for sugestao in validacao["sugestoes"] or sugerir_enderecos(consulta):
+            print(f"  {sugestao}")
+    else:
+        print("Uso: python -m utils.address_index --osm <extrato.osm> [saida.json] | python -m utils.address_index <endereço>")
+        sys.exit(1)
@@ -0,0 +1,330 @@
+"""
+Modelo de circuidade aprendido com as respostas do Google Directions.
+
+Cada perna de uma rota recebida informa a distância real pela malha viária entre
+dois pontos conhecidos. A razão entre ela e a distância em linha reta (circuidade)
+é acumulada por célula espacial (~1 km) e por setor de rumo (8 setores de 45°),
+em log e com memória limitada, de modo que o modelo acompanha a malha de cada
+bairro e direção. As estimativas são encolhidas para a média da célula e, na
+falta de observações, para a circuidade urbana padrão.
+
+O motor usa o modelo para escolher o fator de deslocamento inicial cujo circuito
+tem, pela previsão, a distância pedida; com o tempo a primeira chamada tende a
+acertar. O modelo é persistido em SQLite e compartilhado entre processos.
+"""
+import os
+import sqlite3
+import asyncio
+import threading
+
+import numpy as np
+
+from utils.geodesia import distancias_m, rumos_graus
+from utils.maps_async import ClienteAsyncComCache
+from utils.maps_cache import ClienteMapsComCache
+from utils.route_candidates import CIRCUIDADE_URBANA
+from utils.sqlite_store import conectar
+
+# Local padrão do arquivo do modelo (pode ser alterado pela variável de ambiente)
+MODELO_CIRCUIDADE_PATH = os.environ.get("PEDALA_CIRCUIDADE_PATH", os.path.join(".cache", "pedala_circuidade.sqlite"))
+
+# Lado da célula em graus (~1,1 km)
+TAMANHO_CELULA_GRAUS = 0.01
+
+# Número de setores de rumo
+SETORES = 8
+
+# Pernas mais curtas que isto (em linha reta) não entram no modelo
+DISTANCIA_MIN_M = 300
+
+# Circuidades fora desta faixa são descartadas (respostas anômalas)
+CIRCUIDADE_VALIDA = (1.0, 4.0)
+
+# Observações lembradas por célula e setor (as antigas perdem peso além disso)
+MEMORIA_OBSERVACOES = 100
+
+# Peso, em observações, da estimativa mais geral no encolhimento
+PESO_PRIORI = 2.0
+
+# Iterações do ajuste do fator (a célula dos waypoints muda com o fator)
+ITERACOES_FATOR = 3
+
+
+def _celulas(lat, lng):
+    """Identificador int64 da célula de cada ponto"""
+    linha = np.floor(np.asarray(lat, dtype=np.float64) / TAMANHO_CELULA_GRAUS).astype(np.int64)
+    coluna = np.floor(np.asarray(lng, dtype=np.float64) / TAMANHO_CELULA_GRAUS).astype(np.int64)
+    return coluna * 100000 + linha
+
+
+def _setores(rumos):
+    """Setor (0 = norte, sentido horário) de cada rumo em graus"""
+    largura = 360 / SETORES
+    return ((np.asarray(rumos) + largura / 2) // largura).astype(np.int64) % SETORES
+
+
+def _parse(waypoint):
+    lat, lng = str(waypoint).split(",")
+    return float(lat), float(lng)
+
+
+class ModeloCircuidade:
+    """Circuidade média (em log) por célula e setor, com encolhimento e persistência"""
+
+    def __init__(self, caminho=MODELO_CIRCUIDADE_PATH):
+        """
+        Args:
+            caminho (str): Caminho do arquivo SQLite (":memory:" para modelo volátil)
+        """
+        self.caminho = caminho
+        self.observacoes = 0
+        self.erros = 0
+        self._lock = threading.Lock()
+        self._conn = self._conectar(caminho)
+        # (célula, setor) -> [peso, soma dos logs]; o modelo inteiro cabe em memória
+        try:
+            self._estatisticas = {
+                (celula, setor): [peso, soma]
+                for celula, setor, peso, soma in self._conn.execute(
+                    "SELECT celula, setor, peso, soma_log FROM circuidade")
+            }
+        except sqlite3.Error as e:
+            self._estatisticas = {}
+            self._falha("carregar", e)
+
+    def _conectar(self, caminho):
+        # Sem acesso ao disco (ou banco bloqueado além da espera): modelo apenas em memória
+        conn, self.caminho = conectar(caminho, """
+            CREATE TABLE IF NOT EXISTS circuidade (
+                celula INTEGER NOT NULL,
+                setor INTEGER NOT NULL,
+                peso REAL NOT NULL,
+                soma_log REAL NOT NULL,
+                PRIMARY KEY (celula, setor)
+            );
+        """, "Modelo de circuidade")
+        return conn
+
+    def _falha(self, operacao, erro):
+        """Registra um erro do SQLite (banco bloqueado, disco cheio...): o modelo segue em memória"""
+        self.erros += 1
+        print(f"Modelo de circuidade: falha ao {operacao} ({str(erro)}); seguindo com o modelo em memória")
+        try:
+            self._conn.rollback()
+        except sqlite3.Error:
+            pass
+
+    def aprender(self, route):
+        """
+        Acumula a circuidade de cada perna de uma resposta do gmaps.directions
+
+        Args:
+            route (list): Resposta da API de rotas
+
+        Returns:
+            int: Número de pernas aproveitadas
+        """
+        try:
+            legs = route[0]["legs"]
+            inicio = np.array([[l["start_location"]["lat"], l["start_location"]["lng"]] for l in legs])
+            fim = np.array([[l["end_location"]["lat"], l["end_location"]["lng"]] for l in legs])
+            rede = np.array([l["distance"]["value"] for l in legs], dtype=np.float64)
+        except (IndexError, KeyError, TypeError):
+            return 0
+        if not len(legs):
+            return 0
+
+        reta = distancias_m(inicio[:, 0], inicio[:, 1], fim[:, 0], fim[:, 1])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            circuidade = rede / reta
+        validas = ((reta >= DISTANCIA_MIN_M) & (circuidade >= CIRCUIDADE_VALIDA[0])
+                   & (circuidade <= CIRCUIDADE_VALIDA[1]))
+        if not validas.any():
+            return 0
+        chaves = zip(_celulas(inicio[validas, 0], inicio[validas, 1]).tolist(),
+                     _setores(rumos_graus(inicio[validas, 0], inicio[validas, 1],
+                                          fim[validas, 0], fim[validas, 1])).tolist())
+
+        linhas = []
+        with self._lock:
+            for chave, valor in zip(chaves, np.log(circuidade[validas]).tolist()):
+                peso, soma = self._estatisticas.get(chave, (0.0, 0.0))
+                if peso >= MEMORIA_OBSERVACOES:
+                    # Memória limitada: as observações antigas perdem peso proporcionalmente
+                    fracao = (MEMORIA_OBSERVACOES - 1) / peso
+                    peso, soma = peso * fracao, soma * fracao
+                self._estatisticas[chave] = [peso + 1, soma + valor]
+                linhas.append((chave[0], chave[1], peso + 1, soma + valor))
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO circuidade (celula, setor, peso, soma_log) VALUES (?, ?, ?, ?)", linhas
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                self._falha("gravar", e)
+            self.observacoes += len(linhas)
+        return len(linhas)
+
+    def _log_celula(self, celula):
+        """Log da circuidade da célula (todos os setores), encolhido para o padrão urbano"""
+        peso, soma = 0.0, 0.0
+        for setor in range(SETORES):
+            p, s = self._estatisticas.get((celula, setor), (0.0, 0.0))
+            peso, soma = peso + p, soma + s
+        return (soma + PESO_PRIORI * np.log(CIRCUIDADE_URBANA)) / (peso + PESO_PRIORI)
+
+    def circuidades(self, inicio, fim):
+        """
+        Circuidade prevista de trechos em linha reta
+
+        Args:
+            inicio (np.ndarray): Array (n, 2) com lat e lng de partida
+            fim (np.ndarray): Array (n, 2) com lat e lng de chegada
+
+        Returns:
+            np.ndarray: Circuidade (n,) de cada trecho
+        """
+        inicio, fim = np.asarray(inicio, dtype=np.float64), np.asarray(fim, dtype=np.float64)
+        celulas = _celulas(inicio[:, 0], inicio[:, 1]).tolist()
+        setores = _setores(rumos_graus(inicio[:, 0], inicio[:, 1], fim[:, 0], fim[:, 1])).tolist()
+        with self._lock:
+            logs = []
+            for celula, setor in zip(celulas, setores):
+                priori = self._log_celula(celula)
+                peso, soma = self._estatisticas.get((celula, setor), (0.0, 0.0))
+                logs.append((soma + PESO_PRIORI * priori) / (peso + PESO_PRIORI))
+        return np.exp(np.array(logs))
+
+    def circuidade_local(self, lat, lng):
+        """
+        Returns:
+            float: Circuidade média prevista na célula do ponto (todas as direções)
+        """
+        with self._lock:
+            return float(np.exp(self._log_celula(int(_celulas(lat, lng)))))
+
+    def comprimento_previsto_km(self, lat, lng, waypoints):
+        """
+        Distância prevista do circuito origem → waypoints → origem (na ordem dada)
+
+        Returns:
+            float: Distância em km, ou None se algum waypoint é um endereço
+        """
+        try:
+            pontos = np.array([(lat, lng)] + [_parse(w) for w in waypoints] + [(lat, lng)])
+        except ValueError:
+            return None
+        reta = distancias_m(pontos[:-1, 0], pontos[:-1, 1], pontos[1:, 0], pontos[1:, 1])
+        return float((reta * self.circuidades(pontos[:-1], pontos[1:])).sum()) / 1000
+
+    def fator_para(self, lat, lng, alvo_km, gerar_waypoints, fator):
+        """
+        Fator de deslocamento cujo circuito tem, pela previsão, a distância alvo
+
+        Args:
+            lat (float): Latitude da origem
+            lng (float): Longitude da origem
+            alvo_km (float): Distância desejada do circuito
+            gerar_waypoints (callable): gerar_waypoints(fator) -> waypoints "lat,lng"
+            fator (float): Fator de partida do ajuste
+
+        Returns:
+            float: Fator ajustado (o de partida, se não há previsão)
+        """
+        for _ in range(ITERACOES_FATOR):
+            previsto = self.comprimento_previsto_km(lat, lng, gerar_waypoints(fator))
+            if not previsto:
+                break
+            # A distância cresce de forma aproximadamente proporcional ao fator
+            fator *= alvo_km / previsto
+        return fator
+
+    def estatisticas(self):
+        """
+        Returns:
+            dict: Observações aprendidas neste processo, erros do SQLite, pares
+                célula/setor e células conhecidas
+        """
+        with self._lock:
+            return {
+                "observacoes": self.observacoes,
+                "erros": self.erros,
+                "setores": len(self._estatisticas),
+                "celulas": len({celula for celula, _ in self._estatisticas}),
+            }
+
+
+class ClienteComAprendizado:
+    """Alimenta o modelo de circuidade com cada resposta de rotas recebida"""
+
+    def __init__(self, cliente, modelo):
+        self.cliente = cliente
+        self.modelo = modelo
+
+    def directions(self, *args, **kwargs):
+        resultado = self.cliente.directions(*args, **kwargs)
+        if resultado:
+            self.modelo.aprender(resultado)
+        return resultado
+
+    def __getattr__(self, nome):
+        return getattr(self.cliente, nome)
+
+
+class ClienteAsyncComAprendizado(ClienteComAprendizado):
+    """Versão de ClienteComAprendizado para clientes assíncronos"""
+
+    async def directions(self, *args, **kwargs):
+        resultado = await self.cliente.directions(*args, **kwargs)
+        if resultado:
+            self.modelo.aprender(resultado)
+        return resultado
+
+
+def com_aprendizado(cliente, modelo=None):
+    """
+    Faz o modelo aprender com as respostas de rotas de um cliente (síncrono ou assíncrono)
+
+    Como o orçamento, o aprendizado fica por baixo do cache: respostas repetidas
+    vindas do cache não são contadas de novo.
+
+    Args:
+        cliente: Cliente do Maps, com ou sem cache
+        modelo (ModeloCircuidade): Modelo a alimentar (padrão: modelo compartilhado)
+
+    Returns:
+        Cliente com o aprendizado aplicado
+    """
+    modelo = modelo if modelo is not None else get_modelo_circuidade()
+    if isinstance(cliente, ClienteAsyncComCache):
+        return ClienteAsyncComCache(ClienteAsyncComAprendizado(cliente.cliente, modelo), cliente.cache)
+    if isinstance(cliente, ClienteMapsComCache):
+        return ClienteMapsComCache(ClienteComAprendizado(cliente.cliente, modelo), cliente.cache)
+    if asyncio.iscoroutinefunction(cliente.directions):
+        return ClienteAsyncComAprendizado(cliente, modelo)
+    return ClienteComAprendizado(cliente, modelo)
+
+
+_modelo_padrao = None
+_modelo_padrao_lock = threading.Lock()
+
+
+def get_modelo_circuidade():
+    """Retorna a instância compartilhada do modelo de circuidade (criada sob demanda)"""
+    global _modelo_padrao
+    with _modelo_padrao_lock:
+        if _modelo_padrao is None:
+            _modelo_padrao = ModeloCircuidade()
+        return _modelo_padrao
+
+
+def definir_modelo_circuidade(modelo):
+    """
+    Substitui a instância compartilhada do modelo (ex.: modelo em memória em benchmarks)
+
+    Args:
+        modelo (ModeloCircuidade): Novo modelo compartilhado
+    """
+    global _modelo_padrao
+    with _modelo_padrao_lock:
+        _modelo_padrao = modelo
@@ -0,0 +1,328 @@
+"""
+Índice espacial local das ciclovias e ciclofaixas de São José dos Campos.
+
+Os trechos de infraestrutura cicloviária ficam em dados/ciclovias_sjc.geojson
+(LineString/MultiLineString com nome e tipo). Os segmentos são projetados num
+plano métrico local e distribuídos numa grade regular (arrays no formato CSR:
+células ordenadas, início de cada célula e segmentos). A rota é reamostrada a
+intervalos fixos e todas as amostras são comparadas de uma vez com os segmentos
+das suas células: uma amostra está na ciclovia quando fica perto de um segmento
+e segue a mesma direção (cruzar uma ciclovia não conta). A fração de amostras é
+a fração dos km da rota em infraestrutura protegida, sem chamadas à API.
+
+Com um extrato do OpenStreetMap o arquivo pode ser refeito com todos os trechos:
+
+    python -m utils.cycleways --osm sjc.osm
+"""
+import os
+import json
+import threading
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from utils.geodesia import METROS_POR_GRAU, comprimento_m, reamostrar
+from utils.osm_graph import _abrir
+
+# Arquivo padrão das ciclovias (pode ser alterado pela variável de ambiente)
+CICLOVIAS_PATH = os.environ.get("PEDALA_CICLOVIAS", os.path.join("dados", "ciclovias_sjc.geojson"))
+
+# Tipos de infraestrutura protegida; ciclorrotas (faixa compartilhada) não contam
+TIPOS_PROTEGIDOS = ("ciclovia", "ciclofaixa")
+
+# Lado das células da grade (m)
+TAMANHO_CELULA_M = 100.0
+
+# Distância máxima entre a amostra da rota e o eixo da ciclovia (m); cobre a
+# largura da avenida quando a ciclovia é desenhada pelo canteiro central
+DISTANCIA_MAXIMA_M = 25.0
+
+# |cos| mínimo entre a direção da rota e a do segmento (~45°)
+ALINHAMENTO_MINIMO = 0.7
+
+# Espaçamento das amostras da rota (m)
+INTERVALO_AMOSTRAS_M = 10.0
+
+
+def tipo_osm(tags):
+    """
+    Tipo de infraestrutura cicloviária de uma via do OSM
+
+    Returns:
+        str: "ciclovia", "ciclofaixa" ou None
+    """
+    if tags.get("highway") == "cycleway":
+        return "ciclovia"
+    lados = [tags.get(k) for k in ("cycleway", "cycleway:left", "cycleway:right", "cycleway:both")]
+    if "track" in lados:
+        return "ciclovia"
+    if "lane" in lados:
+        return "ciclofaixa"
+    return None
+
+
+class IndiceCiclovias:
+    """Trechos de ciclovia numa grade regular, para medir a cobertura de rotas"""
+
+    def __init__(self, trechos, cidade=""):
+        """
+        Args:
+            trechos (list): Dicts com nome, tipo e pontos ([[lat, lng], ...])
+            cidade (str): Cidade dos trechos
+        """
+        self.trechos = [t for t in trechos if t.get("tipo") in TIPOS_PROTEGIDOS and len(t.get("pontos", [])) >= 2]
+        self.cidade = cidade
+
+        inicio, fim, trecho_do_segmento = [], [], []
+        for i, trecho in enumerate(self.trechos):
+            pontos = np.asarray(trecho["pontos"], dtype=np.float64)
+            inicio.append(pontos[:-1])
+            fim.append(pontos[1:])
+            trecho_do_segmento.append(np.full(len(pontos) - 1, i))
+        if not self.trechos:
+            inicio = fim = [np.empty((0, 2))]
+            trecho_do_segmento = [np.empty(0, dtype=np.int64)]
+
+        inicio, fim = np.concatenate(inicio), np.concatenate(fim)
+        # Plano local: a escala da longitude é fixada na latitude média dos trechos
+        self._lat_ref = float(inicio[:, 0].mean()) if len(inicio) else 0.0
+        self._a, self._b = self._projetar(inicio), self._projetar(fim)
+        self._trecho = np.concatenate(trecho_do_segmento).astype(np.int64)
+        self._montar_grade()
+
+    def _projetar(self, pontos):
+        """Coordenadas (n, 2) em metros (leste, norte) no plano local"""
+        pontos = np.asarray(pontos, dtype=np.float64).reshape(-1, 2)
+        return np.column_stack([pontos[:, 1] * METROS_POR_GRAU * np.cos(np.radians(self._lat_ref)),
+                                pontos[:, 0] * METROS_POR_GRAU])
+
+    @staticmethod
+    def _chaves(x, y):
+        """Identificador int64 da célula de cada par de índices de coluna e linha"""
+        return x.astype(np.int64) * (1 << 32) + y.astype(np.int64)
+
+    def _montar_grade(self):
+        """Distribui cada segmento por todas as células que sua faixa de busca toca"""
+        minimo = (np.minimum(self._a, self._b) - DISTANCIA_MAXIMA_M) // TAMANHO_CELULA_M
+        maximo = (np.maximum(self._a, self._b) + DISTANCIA_MAXIMA_M) // TAMANHO_CELULA_M
+        chaves, segmentos = [], []
+        for s in range(len(self._a)):
+            xs, ys = np.meshgrid(np.arange(minimo[s, 0], maximo[s, 0] + 1), np.arange(minimo[s, 1], maximo[s, 1] + 1))
+            chaves.append(self._chaves(xs.ravel(), ys.ravel()))
+            segmentos.append(np.full(xs.size, s))
+        chaves = np.concatenate(chaves) if chaves else np.empty(0, dtype=np.int64)
+        segmentos = np.concatenate(segmentos) if segmentos else np.empty(0, dtype=np.int64)
+        ordem = np.argsort(chaves, kind="stable")
+        self._celulas, posicoes = np.unique(chaves[ordem], return_index=True)
+        self._inicio = np.append(posicoes, len(ordem)).astype(np.int64)
+        self._segmentos = segmentos[ordem].astype(np.int64)
+
+    @classmethod
+    def carregar(cls, caminho=CICLOVIAS_PATH):
+        """
+        Carrega as ciclovias de um GeoJSON
+
+        Returns:
+            IndiceCiclovias: Índice carregado (vazio se o arquivo não existe)
+        """
+        if not os.path.exists(caminho):
+            return cls([])
+        with open(caminho, encoding="utf-8") as arquivo:
+            dados = json.load(arquivo)
+        trechos = []
+        for feature in dados.get("features", []):
+            geometria = feature.get("geometry") or {}
+            propriedades = feature.get("properties") or {}
+            if geometria.get("type") == "LineString":
+                linhas = [geometria["coordinates"]]
+            elif geometria.get("type") == "MultiLineString":
+                linhas = geometria["coordinates"]
+            else:
+                continue
+            for linha in linhas:
+                # GeoJSON guarda [lng, lat]
+                trechos.append({"nome": propriedades.get("nome", ""), "tipo": propriedades.get("tipo", "ciclovia"),
+                                "pontos": [[lat, lng] for lng, lat, *_ in linha]})
+        return cls(trechos, dados.get("cidade", ""))
+
+    @classmethod
+    def de_osm(cls, caminho, cidade="São José dos Campos, SP"):
+        """
+        Constrói o índice com todas as ciclovias e ciclofaixas de um extrato .osm
+
+        Args:
+            caminho (str): Caminho do arquivo .osm (XML, opcionalmente .gz/.bz2)
+            cidade (str): Cidade dos trechos
+
+        Returns:
+            IndiceCiclovias: Índice com um trecho por via do OSM
+        """
+        coords = {}
+        vias = []
+        with _abrir(caminho) as arquivo:
+            for _, elem in ET.iterparse(arquivo, events=("end",)):
+                if elem.tag == "node":
+                    coords[int(elem.get("id"))] = (float(elem.get("lat")), float(elem.get("lon")))
+                    elem.clear()
+                elif elem.tag == "way":
+                    tags = {t.get("k"): t.get("v") for t in elem.findall("tag")}
+                    tipo = tipo_osm(tags)
+                    if tipo:
+                        nos = [int(nd.get("ref")) for nd in elem.findall("nd")]
+                        vias.append((tags.get("name", tipo.capitalize()), tipo, nos))
+                    elem.clear()
+                elif elem.tag == "relation":
+                    elem.clear()
+        trechos = [{"nome": nome, "tipo": tipo, "pontos": [coords[n] for n in nos if n in coords]}
+                   for nome, tipo, nos in vias]
+        return cls(trechos, cidade)
+
+    def salvar(self, caminho=CICLOVIAS_PATH):
+        """Grava os trechos como GeoJSON"""
+        os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        features = [{
+            "type": "Feature",
+            "properties": {"nome": t["nome"], "tipo": t["tipo"]},
+            "geometry": {"type": "LineString",
+                         "coordinates": [[round(lng, 6), round(lat, 6)] for lat, lng in t["pontos"]]},
+        } for t in self.trechos]
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            json.dump({"type": "FeatureCollection", "cidade": self.cidade, "features": features},
+                      arquivo, ensure_ascii=False, indent=1)
+
+    def __len__(self):
+        return len(self.trechos)
+
+    def trechos_das_amostras(self, pontos):
+        """
+        Trecho de ciclovia percorrido em cada amostra da rota
+
+        Args:
+            pontos (np.ndarray): Amostras (n, 2) com lat e lng, em ordem ao longo da rota
+
+        Returns:
+            np.ndarray: Índice int64 do trecho mais próximo de cada amostra, -1 fora das ciclovias
+        """
+        pontos = np.asarray(pontos, dtype=np.float64).reshape(-1, 2)
+        resultado = np.full(len(pontos), -1, dtype=np.int64)
+        if len(pontos) < 2 or not len(self._celulas):
+            return resultado
+        xy = self._projetar(pontos)
+
+        # Segmentos candidatos de cada amostra: os da sua célula (faixas CSR concatenadas)
+        celula = (xy // TAMANHO_CELULA_M).astype(np.int64)
+        chaves = self._chaves(celula[:, 0], celula[:, 1])
+        posicao = np.minimum(np.searchsorted(self._celulas, chaves), len(self._celulas) - 1)
+        encontrada = self._celulas[posicao] == chaves
+        contagem = np.where(encontrada, self._inicio[posicao + 1] - self._inicio[posicao], 0)
+        if not contagem.sum():
+            return resultado
+        amostra = np.repeat(np.arange(len(pontos)), contagem)
+        deslocamento = np.arange(contagem.sum()) - np.repeat(np.cumsum(contagem) - contagem, contagem)
+        segmento = self._segmentos[np.repeat(self._inicio[posicao], contagem) + deslocamento]
+
+        # Distância de cada amostra ao seu segmento candidato
+        a, b, p = self._a[segmento], self._b[segmento], xy[amostra]
+        ab = b - a
+        comprimento2 = np.einsum("ij,ij->i", ab, ab)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t = np.clip(np.einsum("ij,ij->i", p - a, ab) / comprimento2, 0.0, 1.0)
+        t = np.nan_to_num(t)
+        distancia = np.hypot(*(p - (a + t[:, None] * ab)).T)
+
+        # Direção da rota em cada amostra contra a do segmento (em qualquer sentido)
+        direcao = np.gradient(xy, axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            alinhamento = np.abs(np.einsum("ij,ij->i", direcao[amostra], ab)) / (
+                np.hypot(*direcao[amostra].T) * np.sqrt(comprimento2))
+        validos = (distancia <= DISTANCIA_MAXIMA_M) & (np.nan_to_num(alinhamento) >= ALINHAMENTO_MINIMO)
+        if not validos.any():
+            return resultado
+
+        # Mais de um segmento perto da amostra: fica o mais próximo
+        amostra, segmento, distancia = amostra[validos], segmento[validos], distancia[validos]
+        ordem = np.lexsort((distancia, amostra))
+        unicas, primeiras = np.unique(amostra[ordem], return_index=True)
+        resultado[unicas] = self._trecho[segmento[ordem][primeiras]]
+        return resultado
+
+    def cobertura(self, geometria):
+        """
+        Parte da rota em ciclovias e ciclofaixas
+
+        Args:
+            geometria (np.ndarray): Pontos (n, 2) da rota com lat e lng
+
+        Returns:
+            dict: fracao (0 a 1), km_total, km_ciclovia e vias (nome, tipo e km de cada
+                trecho percorrido, na ordem da rota)
+        """
+        km_total = comprimento_m(geometria) / 1000
+        _, pontos = reamostrar(geometria, INTERVALO_AMOSTRAS_M)
+        trechos = self.trechos_das_amostras(pontos)
+        if not len(trechos):
+            return {"fracao": 0.0, "km_total": km_total, "km_ciclovia": 0.0, "vias": []}
+        fracao = float((trechos >= 0).mean())
+        # Trechos de mesmo nome (vários segmentos da mesma avenida) somam seus km
+        km_por_amostra = km_total / len(trechos)
+        vias = {}
+        for indice in trechos[trechos >= 0]:
+            trecho = self.trechos[indice]
+            via = vias.setdefault(trecho["nome"], {"nome": trecho["nome"], "tipo": trecho["tipo"], "km": 0.0})
+            via["km"] += km_por_amostra
+        return {"fracao": fracao, "km_total": km_total, "km_ciclovia": fracao * km_total,
+                "vias": [via for via in vias.values() if via["km"] >= 0.1]}
+
+
+_indice = None
+_indice_lock = threading.Lock()
+
+
+def indice_ciclovias_padrao():
+    """Índice compartilhado pelo processo (carregado de CICLOVIAS_PATH sob demanda)"""
+    global _indice
+    with _indice_lock:
+        if _indice is None:
+            _indice = IndiceCiclovias.carregar()
+        return _indice
+
+
+def cobertura_ciclovias(geometria):
+    """Cobertura de ciclovias da rota pelo índice compartilhado (ver IndiceCiclovias.cobertura)"""
+    return indice_ciclovias_padrao().cobertura(geometria)
+
+
+def resumo_ciclovias(cobertura):
+    """
+    Resumo da cobertura em uma linha, para o texto da rota e o guia
+
+    Args:
+        cobertura (dict): Saída de IndiceCiclovias.cobertura
+
+    Returns:
+        str: "3.2 km (35%): Ciclovia da Av. ... (ciclovia, 2.1 km), ..." ou "" sem ciclovias
+    """
+    if not cobertura or not cobertura.get("vias"):
+        return ""
+    vias = ", ".join(f"{via['nome']} ({via['tipo']}, {via['km']:.1f} km)" for via in cobertura["vias"])
+    return f"{cobertura['km_ciclovia']:.1f} km ({cobertura['fracao']:.0%}): {vias}"
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) in (3, 4) and sys.argv[1] == "--osm":
+        saida = sys.argv[3] if len(sys.argv) == 4 else CICLOVIAS_PATH
+        indice = IndiceCiclovias.de_osm(sys.argv[2])
+        indice.salvar(saida)
+        print(f"Ciclovias salvas em {saida}: {len(indice)} trechos")
+    elif len(sys.argv) == 2:
+        from utils.polyline import decodificar
+
+        # Polyline codificada de uma rota (overview_polyline.points)
+        cobertura = cobertura_ciclovias(decodificar(sys.argv[1]))
+        print(f"{cobertura['km_total']:.1f} km, {cobertura['fracao']:.0%} em ciclovias")
+        print(resumo_ciclovias(cobertura))
+    else:
+        print("Uso: python -m utils.cycleways --osm <extrato.osm> [saida.geojson] | python -m utils.cycleways <polyline>")
+        sys.exit(1)
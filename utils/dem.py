@@ -0,0 +1,362 @@
+"""
+Modelo digital de elevação local (tiles SRTM .hgt ou GeoTIFF).
+
+Cada tile .hgt cobre 1° × 1° (nome como S24W046.hgt = canto sudoeste em
+-24, -46) com uma grade quadrada de inteiros de 16 bits big-endian, da borda
+norte para a sul. Os arquivos são abertos com np.memmap: só as páginas tocadas
+são lidas do disco e a consulta de milhares de pontos é uma única operação
+vetorizada de interpolação bilinear por tile, sem cota nem rede.
+
+Arquivos .tif/.tiff (GeoTIFF de uma banda em coordenadas geográficas, como os
+recortes SRTM exportados pelo GDAL) são lidos sem dependências externas: sem
+compressão ou com deflate (com ou sem preditor horizontal), em faixas ou blocos.
+A georreferência vem das tags ModelPixelScale e ModelTiepoint e o valor de
+ausência, da tag GDAL_NODATA. Esses arquivos são descompactados para a memória.
+
+O ModeloElevacaoLocal também responde elevation() e elevation_along_path() no
+formato do googlemaps.Client, podendo substituí-lo onde a elevação é consultada:
+a resposta tem sempre um resultado por ponto, e os pontos sem dado local vêm do
+cliente de apoio (ou levantam ElevacaoIndisponivel, se não houver apoio).
+"""
+import os
+import re
+import glob
+import zlib
+import struct
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from utils.elevation import INTERVALO_AMOSTRAS_M, amostrar_rota
+from utils.geodesia import distancias_acumuladas_m, ganho_perda_m
+from utils.polyline import decodificar
+
+# Diretório padrão dos tiles de elevação
+DEM_DIR = os.environ.get("PEDALA_DEM_DIR", os.path.join("dados", "dem"))
+
+# Valor de ausência de dado nos tiles SRTM
+VALOR_VAZIO = -32768
+
+_NOME_TILE = re.compile(r"^([NS])(\d{2})([EW])(\d{3})\.hgt$", re.IGNORECASE)
+
+# Grade de elevação georreferenciada: linha 0 ao norte; norte/oeste são o centro
+# do primeiro pixel e os passos, graus entre centros vizinhos
+Raster = namedtuple("Raster", "dados norte oeste passo_lat passo_lng vazio")
+
+
+def canto_do_tile(nome):
+    """
+    Canto sudoeste (lat, lng) do tile a partir do nome do arquivo
+
+    Returns:
+        tuple: (lat, lng) inteiros, ou None se o nome não segue o padrão SRTM
+    """
+    match = _NOME_TILE.match(os.path.basename(nome))
+    if not match:
+        return None
+    lat = int(match.group(2)) * (1 if match.group(1).upper() == "N" else -1)
+    lng = int(match.group(4)) * (1 if match.group(3).upper() == "E" else -1)
+    return lat, lng
+
+
+class ElevacaoIndisponivel(ValueError):
+    """Levantada quando há pontos sem dado nos tiles e nenhum cliente de apoio"""
+
+
+class ModeloElevacaoLocal:
+    """Elevação por interpolação bilinear em tiles .hgt (mapeados em memória) e GeoTIFF"""
+
+    def __init__(self, diretorio=DEM_DIR, apoio=None):
+        """
+        Args:
+            diretorio (str): Diretório com os tiles .hgt, .tif ou .tiff
+            apoio: Cliente do Maps consultado nos pontos sem dado local (fora dos
+                tiles ou em vazios do SRTM) em elevation() e elevation_along_path()
+        """
+        self.diretorio = diretorio
+        self.apoio = apoio
+        self.tiles = []
+        for caminho in sorted(glob.glob(os.path.join(diretorio, "*"))):
+            extensao = os.path.splitext(caminho)[1].lower()
+            if extensao == ".hgt":
+                raster = _abrir_hgt(caminho)
+            elif extensao in (".tif", ".tiff"):
+                try:
+                    raster = ler_geotiff(caminho)
+                except (OSError, ValueError, zlib.error, struct.error) as e:
+                    print(f"GeoTIFF de elevação ignorado ({caminho}): {str(e)}")
+                    continue
+            else:
+                continue
+            if raster is not None:
+                self.tiles.append(raster)
+
+    def __len__(self):
+        return len(self.tiles)
+
+    def elevacoes(self, lat, lng):
+        """
+        Elevação interpolada para arrays de pontos
+
+        Args:
+            lat (array): Latitudes
+            lng (array): Longitudes
+
+        Returns:
+            np.ndarray: Elevações em metros (NaN fora dos tiles ou sem dado)
+        """
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lng = np.atleast_1d(np.asarray(lng, dtype=np.float64))
+        resultado = np.full(lat.shape, np.nan)
+
+        # Um passo vetorizado por tile (normalmente um só para a cidade inteira); nas
+        # bordas compartilhadas e sobreposições fica o primeiro tile com dado
+        for raster in self.tiles:
+            linha = (raster.norte - lat) / raster.passo_lat
+            coluna = (lng - raster.oeste) / raster.passo_lng
+            altura, largura = raster.dados.shape
+            mascara = (np.isnan(resultado) & (linha >= 0) & (linha <= altura - 1)
+                       & (coluna >= 0) & (coluna <= largura - 1))
+            if mascara.any():
+                resultado[mascara] = _bilinear(raster, linha[mascara], coluna[mascara])
+        return resultado
+
+    def perfil(self, geometria, intervalo_m=INTERVALO_AMOSTRAS_M, descartar_vazios=True):
+        """
+        Perfil de elevação da geometria amostrada a intervalos fixos
+
+        Args:
+            geometria (np.ndarray): Array (n, 2) com lat e lng
+            intervalo_m (float): Espaçamento entre as amostras
+            descartar_vazios (bool): Se False, as amostras sem dado ficam como NaN
+
+        Returns:
+            tuple: (distâncias em km, elevações em m), sem os pontos sem dado
+        """
+        distancias_km, pontos = amostrar_rota(geometria, intervalo_m)
+        elevacoes = self.elevacoes(pontos[:, 0], pontos[:, 1])
+        if not descartar_vazios:
+            return distancias_km, elevacoes
+        validos = ~np.isnan(elevacoes)
+        return distancias_km[validos], elevacoes[validos]
+
+    def subida_m(self, geometria, intervalo_m=INTERVALO_AMOSTRAS_M):
+        """
+        Ganho de elevação acumulado ao longo da geometria
+
+        Barato o bastante para ser calculado em todos os candidatos de uma busca.
+
+        Returns:
+            float: Soma das subidas em metros
+        """
+        _, elevacoes = self.perfil(geometria, intervalo_m)
+        return ganho_perda_m(elevacoes)[0]
+
+    def elevation(self, locations):
+        """Mesmo formato de googlemaps.Client.elevation"""
+        if isinstance(locations, (list, tuple)) and locations and isinstance(locations[0], (list, tuple, dict)):
+            pontos = np.array([_latlng(p) for p in locations], dtype=np.float64)
+        else:
+            pontos = np.array([_latlng(locations)], dtype=np.float64)
+        return self._resultados(pontos, self.elevacoes(pontos[:, 0], pontos[:, 1]))
+
+    def elevation_along_path(self, path, samples):
+        """Mesmo formato de googlemaps.Client.elevation_along_path (path codificado ou lista)"""
+        pontos = decodificar(path) if isinstance(path, str) else np.array([_latlng(p) for p in path], dtype=float)
+        acumulado = distancias_acumuladas_m(pontos)
+        alvo = np.linspace(0, acumulado[-1], samples)
+        amostras = np.column_stack([np.interp(alvo, acumulado, pontos[:, 0]),
+                                    np.interp(alvo, acumulado, pontos[:, 1])])
+        return self._resultados(amostras, self.elevacoes(amostras[:, 0], amostras[:, 1]))
+
+    def _resultados(self, pontos, elevacoes):
+        """
+        Um resultado por ponto, na ordem dos pontos (quem chama pareia pelo índice)
+
+        Raises:
+            ElevacaoIndisponivel: Se há pontos sem dado local e não há cliente de apoio
+        """
+        faltantes = np.flatnonzero(np.isnan(elevacoes))
+        if len(faltantes):
+            if self.apoio is None:
+                raise ElevacaoIndisponivel(f"{len(faltantes)} de {len(pontos)} pontos sem dado nos tiles de elevação")
+            elevacoes = elevacoes.copy()
+            respostas = self.apoio.elevation([(float(pontos[i, 0]), float(pontos[i, 1])) for i in faltantes])
+            if len(respostas) != len(faltantes):
+                raise ElevacaoIndisponivel("O cliente de apoio não devolveu a elevação de todos os pontos")
+            elevacoes[faltantes] = [r["elevation"] for r in respostas]
+        return [{"elevation": float(e), "location": {"lat": float(p[0]), "lng": float(p[1])}}
+                for p, e in zip(pontos, elevacoes)]
+
+
+def _abrir_hgt(caminho):
+    """
+    Tile SRTM .hgt mapeado em memória
+
+    Returns:
+        Raster: Grade do tile, ou None se o nome ou o tamanho não seguem o padrão SRTM
+    """
+    canto = canto_do_tile(caminho)
+    if canto is None:
+        return None
+    lado = int(round(np.sqrt(os.path.getsize(caminho) // 2)))
+    if lado < 2 or lado * lado * 2 != os.path.getsize(caminho):
+        print(f"Tile de elevação com tamanho inválido ignorado: {caminho}")
+        return None
+    dados = np.memmap(caminho, dtype=">i2", mode="r", shape=(lado, lado))
+    return Raster(dados, canto[0] + 1, canto[1], 1 / (lado - 1), 1 / (lado - 1), VALOR_VAZIO)
+
+
+# Tipos de campo do TIFF: código -> formato do struct/numpy (BYTE, ASCII, SHORT, LONG, RATIONAL,
+# SBYTE, UNDEFINED, SSHORT, SLONG, SRATIONAL, FLOAT, DOUBLE)
+_TIPOS_TIFF = {1: "B", 2: "s", 3: "H", 4: "I", 5: "II", 6: "b", 7: "B", 8: "h", 9: "i", 10: "ii",
+               11: "f", 12: "d"}
+
+
+def _tags_tiff(buf, ordem, offset):
+    """Tags do primeiro IFD: número da tag -> tupla de valores (ou bytes, para ASCII)"""
+    tags = {}
+    (quantidade,) = struct.unpack_from(ordem + "H", buf, offset)
+    for k in range(quantidade):
+        tag, tipo, contagem = struct.unpack_from(ordem + "HHI", buf, offset + 2 + 12 * k)
+        formato = _TIPOS_TIFF.get(tipo)
+        if formato is None:
+            continue
+        tamanho = struct.calcsize(ordem + formato) * contagem
+        posicao = offset + 2 + 12 * k + 8
+        if tamanho > 4:
+            (posicao,) = struct.unpack_from(ordem + "I", buf, posicao)
+        if formato == "s":
+            tags[tag] = bytes(buf[posicao:posicao + contagem]).rstrip(b"\0")
+        else:
+            tags[tag] = struct.unpack_from(ordem + formato * contagem, buf, posicao)
+    return tags
+
+
+def ler_geotiff(caminho):
+    """
+    Lê um GeoTIFF de elevação (uma banda, coordenadas geográficas)
+
+    Args:
+        caminho (str): Arquivo .tif ou .tiff
+
+    Returns:
+        Raster: Grade de elevações georreferenciada
+
+    Raises:
+        ValueError: Se o arquivo usa um recurso não suportado (BigTIFF, LZW,
+            várias bandas, projeção métrica...)
+    """
+    with open(caminho, "rb") as arquivo:
+        buf = arquivo.read()
+    ordem = {b"II": "<", b"MM": ">"}.get(buf[:2])
+    if ordem is None:
+        raise ValueError("não é um arquivo TIFF")
+    versao, offset = struct.unpack_from(ordem + "HI", buf, 2)
+    if versao != 42:
+        raise ValueError("BigTIFF não suportado")
+    tags = _tags_tiff(buf, ordem, offset)
+
+    largura, altura = tags[256][0], tags[257][0]
+    if largura < 2 or altura < 2:
+        raise ValueError("grade menor que 2 × 2")
+    bits = tags.get(258, (1,))[0]
+    compressao = tags.get(259, (1,))[0]
+    preditor = tags.get(317, (1,))[0]
+    formato = tags.get(339, (1,))[0]
+    if tags.get(277, (1,))[0] != 1:
+        raise ValueError("só GeoTIFF de uma banda é suportado")
+    if compressao not in (1, 8, 32946):
+        raise ValueError(f"compressão TIFF {compressao} não suportada (use sem compressão ou deflate)")
+    if preditor not in (1, 2) or (preditor == 2 and formato == 3):
+        raise ValueError(f"preditor TIFF {preditor} não suportado")
+    tipo = np.dtype(ordem + {1: "u", 2: "i", 3: "f"}[formato] + str(bits // 8))
+
+    if 322 in tags:
+        bloco_largura, bloco_altura = tags[322][0], tags[323][0]
+        offsets, tamanhos = tags[324], tags[325]
+    else:
+        bloco_largura, bloco_altura = largura, tags.get(278, (altura,))[0]
+        offsets, tamanhos = tags[273], tags[279]
+    por_linha = -(-largura // bloco_largura)
+
+    dados = np.empty((altura, largura), dtype=tipo.newbyteorder("="))
+    for k, (inicio, tamanho) in enumerate(zip(offsets, tamanhos)):
+        bruto = buf[inicio:inicio + tamanho]
+        if compressao != 1:
+            bruto = zlib.decompress(bruto)
+        linha0, coluna0 = (k // por_linha) * bloco_altura, (k % por_linha) * bloco_largura
+        # Faixas: a última pode ser mais curta; blocos têm sempre o tamanho cheio
+        linhas = min(bloco_altura, altura - linha0) if 322 not in tags else bloco_altura
+        bloco = np.frombuffer(bruto, dtype=tipo, count=linhas * bloco_largura).reshape(linhas, bloco_largura)
+        if preditor == 2:
+            # Diferenças horizontais: a soma acumulada no próprio tipo desfaz o preditor
+            bloco = np.cumsum(bloco, axis=1, dtype=tipo)
+        linhas, colunas = min(linhas, altura - linha0), min(bloco_largura, largura - coluna0)
+        dados[linha0:linha0 + linhas, coluna0:coluna0 + colunas] = bloco[:linhas, :colunas]
+
+    if 33550 not in tags or 33922 not in tags:
+        raise ValueError("sem georreferência (ModelPixelScale/ModelTiepoint)")
+    passo_lng, passo_lat = tags[33550][0], tags[33550][1]
+    i, j, _, x, y, _ = tags[33922][:6]
+    chaves = tags.get(34735, ())
+    geokeys = {chaves[n]: chaves[n + 3] for n in range(4, len(chaves) - 3, 4) if chaves[n + 1] == 0}
+    if geokeys.get(1024, 2) != 2:
+        raise ValueError("só GeoTIFF em coordenadas geográficas (graus) é suportado")
+    # Pixel como área (padrão): a tie point marca o canto do pixel, não o centro
+    meio = 0.5 if geokeys.get(1025, 1) == 1 else 0.0
+    vazio = tags.get(42113)
+    vazio = float(vazio.decode("ascii")) if vazio else None
+    return Raster(dados, y + (j - meio) * passo_lat, x + (meio - i) * passo_lng, passo_lat, passo_lng, vazio)
+
+
+def _bilinear(raster, linha, coluna):
+    """Interpolação bilinear nas posições (linha, coluna) fracionárias de um tile"""
+    dados = raster.dados
+    altura, largura = dados.shape
+    i = np.clip(np.floor(linha).astype(np.int64), 0, altura - 2)
+    j = np.clip(np.floor(coluna).astype(np.int64), 0, largura - 2)
+    fi, fj = linha - i, coluna - j
+
+    cantos = np.stack([dados[i, j], dados[i, j + 1], dados[i + 1, j], dados[i + 1, j + 1]]).astype(np.float64)
+    pesos = np.stack([(1 - fi) * (1 - fj), (1 - fi) * fj, fi * (1 - fj), fi * fj])
+    # Vizinhos sem dado saem da média ponderada
+    validos = ~np.isnan(cantos)
+    if raster.vazio is not None:
+        validos &= cantos != raster.vazio
+    pesos = np.where(validos, pesos, 0.0)
+    soma = pesos.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(soma > 0, (np.where(validos, cantos, 0.0) * pesos).sum(axis=0) / soma, np.nan)
+
+
+def _latlng(local):
+    if isinstance(local, dict):
+        return float(local["lat"]), float(local["lng"])
+    if isinstance(local, str):
+        lat, lng = local.split(",")
+        return float(lat), float(lng)
+    return float(local[0]), float(local[1])
+
+
+_modelo = None
+_modelo_carregado = False
+_modelo_lock = threading.Lock()
+
+
+def modelo_elevacao_padrao():
+    """
+    Modelo local compartilhado pelo processo
+
+    Returns:
+        ModeloElevacaoLocal: Modelo com os tiles (.hgt ou GeoTIFF) de PEDALA_DEM_DIR, ou None se não houver tiles
+    """
+    global _modelo, _modelo_carregado
+    with _modelo_lock:
+        if not _modelo_carregado:
+            _modelo_carregado = True
+            if os.path.isdir(DEM_DIR):
+                modelo = ModeloElevacaoLocal(DEM_DIR)
+                _modelo = modelo if len(modelo) else None
+        return _modelo
@@ -0,0 +1,137 @@
+"""
+Perfil de elevação ao longo de toda a rota.
+
+A geometria decodificada da rota é amostrada a intervalos fixos e cada amostra
+é ajustada a uma célula da grade de utils.elevation_cache. As células já
+conhecidas vêm do cache; as demais são pedidas ao endpoint de elevação em poucos
+lotes (polyline codificada), respeitando o limite de pontos e o tamanho da URL.
+O resultado são arrays de distância (km) e elevação (m) prontos para o gráfico.
+"""
+import math
+import asyncio
+
+import numpy as np
+
+from utils.elevation_cache import celulas, centros, get_cache_elevacao
+from utils.geodesia import reamostrar
+from utils.polyline import codificar
+
+# Espaçamento das amostras ao longo da rota (m)
+INTERVALO_AMOSTRAS_M = 100
+
+# Limite de amostras por requisição da API de elevação
+MAX_AMOSTRAS_POR_CHAMADA = 512
+
+# Tamanho máximo da polyline de pontos por requisição (a URL inteira é limitada a 8192 caracteres)
+MAX_CARACTERES_PATH = 6000
+
+
+def amostrar_rota(geometria, intervalo_m=INTERVALO_AMOSTRAS_M):
+    """
+    Pontos igualmente espaçados ao longo da rota
+
+    Args:
+        geometria (np.ndarray): Array (n, 2) com lat e lng
+        intervalo_m (float): Espaçamento desejado entre amostras
+
+    Returns:
+        tuple: (distâncias das amostras em km, array (m, 2) com lat e lng das amostras)
+    """
+    distancias_m, pontos = reamostrar(geometria, intervalo_m)
+    return distancias_m / 1000, pontos
+
+
+class _ConsultaPerfil:
+    """Amostras da rota divididas entre células já em cache e lotes a pedir à API"""
+
+    def __init__(self, geometria, intervalo_m, cache):
+        self.cache = cache if cache is not None else get_cache_elevacao()
+        self.distancias_km, pontos = amostrar_rota(geometria, intervalo_m)
+        ids = celulas(pontos)
+        # Células únicas na ordem da rota (lotes contíguos geram polylines curtas)
+        _, primeiros, self.inversa = np.unique(ids, return_index=True, return_inverse=True)
+        ordem = np.argsort(primeiros)
+        self.ids = ids[primeiros[ordem]]
+        self.inversa = np.argsort(ordem)[self.inversa]
+        self.elevacoes = self.cache.consultar(self.ids)
+        self.lotes = _dividir_lotes(np.flatnonzero(np.isnan(self.elevacoes)), centros(self.ids))
+
+    def pontos_do_lote(self, lote):
+        """Centros das células do lote como pares (lat, lng)"""
+        return [tuple(p) for p in centros(self.ids[lote]).tolist()]
+
+    def registrar(self, lote, resposta):
+        """Guarda a resposta de um lote (ignorada se incompleta)"""
+        if not resposta or len(resposta) != len(lote):
+            return
+        self.elevacoes[lote] = [r["elevation"] for r in resposta]
+        self.cache.gravar(self.ids[lote], self.elevacoes[lote])
+
+    def perfil(self):
+        """Arrays finais, sem as amostras que ficaram sem elevação"""
+        elevacoes = self.elevacoes[self.inversa]
+        validos = ~np.isnan(elevacoes)
+        return self.distancias_km[validos], elevacoes[validos]
+
+
+def _dividir_lotes(faltantes, pontos):
+    """Divide as células faltantes em lotes dentro dos limites de amostras e de URL"""
+    if not len(faltantes):
+        return []
+    num_lotes = max(math.ceil(len(faltantes) / MAX_AMOSTRAS_POR_CHAMADA),
+                    math.ceil(len(codificar(pontos[faltantes])) / MAX_CARACTERES_PATH))
+    return [lote for lote in np.array_split(faltantes, num_lotes) if len(lote)]
+
+
+def perfil_elevacao(gmaps, geometria, intervalo_m=INTERVALO_AMOSTRAS_M, cache=None):
+    """
+    Perfil de elevação da rota, consultando a API só para as células fora do cache
+
+    Args:
+        gmaps: Cliente do Google Maps
+        geometria (np.ndarray): Array (n, 2) com lat e lng da rota
+        intervalo_m (float): Espaçamento desejado entre amostras
+        cache (CacheElevacao): Cache de elevação (padrão: cache compartilhado)
+
+    Returns:
+        tuple: (distâncias em km, elevações em m) como arrays float64
+    """
+    consulta = _ConsultaPerfil(geometria, intervalo_m, cache)
+    for lote in consulta.lotes:
+        try:
+            consulta.registrar(lote, gmaps.elevation(consulta.pontos_do_lote(lote)))
+        except Exception as e:
+            # Lote sem elevação: o perfil segue com os demais
+            print(f"Erro ao obter elevação: {str(e)}")
+    return consulta.perfil()
+
+
+async def perfil_elevacao_async(gmaps, geometria, intervalo_m=INTERVALO_AMOSTRAS_M, cache=None):
+    """
+    Versão assíncrona de perfil_elevacao: os lotes faltantes são pedidos em paralelo
+
+    Returns:
+        tuple: (distâncias em km, elevações em m) como arrays float64
+    """
+    consulta = _ConsultaPerfil(geometria, intervalo_m, cache)
+    respostas = await asyncio.gather(
+        *(gmaps.elevation(consulta.pontos_do_lote(lote)) for lote in consulta.lotes),
+        return_exceptions=True
+    )
+    for lote, resposta in zip(consulta.lotes, respostas):
+        if isinstance(resposta, Exception):
+            print(f"Erro ao obter elevação: {str(resposta)}")
+            continue
+        consulta.registrar(lote, resposta)
+    return consulta.perfil()
+
+
+def como_dados_grafico(distancias_km, elevacoes):
+    """
+    Converte os arrays do perfil para o formato de generate_route_elevation_chart
+
+    Returns:
+        list: Dicts {'distance', 'elevation'} (km com 2 casas, m com 1 casa)
+    """
+    return [{"distance": round(float(d), 2), "elevation": round(float(e), 1)}
+            for d, e in zip(distancias_km, elevacoes)]
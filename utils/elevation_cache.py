@@ -0,0 +1,242 @@
+"""
+Cache persistente de elevações por célula espacial.
+
+Rotas dos mesmos bairros passam pelas mesmas ruas, e a elevação de um ponto não
+muda. As amostras do perfil são ajustadas a uma grade fixa (~10 m) e a elevação
+de cada célula fica gravada em SQLite, compartilhada entre processos; só as
+células ainda desconhecidas vão para a API. O arquivo é mantido abaixo de um
+número máximo de células removendo as acessadas há mais tempo.
+"""
+import os
+import time
+import sqlite3
+import threading
+
+import numpy as np
+
+from utils.sqlite_store import conectar
+
+# Local padrão do arquivo de cache (pode ser alterado pela variável de ambiente)
+CACHE_ELEVACAO_PATH = os.environ.get("PEDALA_ELEVACAO_CACHE", os.path.join(".cache", "pedala_elevacao.sqlite"))
+
+# Lado da célula em graus (~11 m em latitude, ~10 m em longitude em SJC)
+TAMANHO_CELULA_GRAUS = 1e-4
+
+# Número máximo de células armazenadas (~40 MB)
+MAX_CELULAS_PADRAO = 1_000_000
+
+# Acessos registrados em memória e gravados em lote (um perfil consulta centenas de células)
+LOTE_ACESSOS = 2048
+INTERVALO_ACESSOS_S = 30.0
+
+# Parâmetros por consulta SQLite (limite conservador do SQLite)
+_LOTE_SQL = 900
+
+# Deslocamentos que tornam os índices de linha/coluna não negativos
+_LINHAS = int(round(180 / TAMANHO_CELULA_GRAUS)) + 1
+_OFFSET_LAT = int(round(90 / TAMANHO_CELULA_GRAUS))
+_OFFSET_LNG = int(round(180 / TAMANHO_CELULA_GRAUS))
+
+
+def celulas(pontos):
+    """
+    Célula da grade de cada ponto
+
+    Args:
+        pontos (np.ndarray): Array (n, 2) com lat e lng
+
+    Returns:
+        np.ndarray: Identificadores int64 das células
+    """
+    pontos = np.asarray(pontos, dtype=np.float64).reshape(-1, 2)
+    linha = np.round(pontos[:, 0] / TAMANHO_CELULA_GRAUS).astype(np.int64) + _OFFSET_LAT
+    coluna = np.round(pontos[:, 1] / TAMANHO_CELULA_GRAUS).astype(np.int64) + _OFFSET_LNG
+    return coluna * _LINHAS + linha
+
+
+def centros(ids):
+    """
+    Coordenadas do centro de cada célula (ponto efetivamente consultado na API)
+
+    Returns:
+        np.ndarray: Array (n, 2) com lat e lng
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    linha, coluna = ids % _LINHAS - _OFFSET_LAT, ids // _LINHAS - _OFFSET_LNG
+    return np.column_stack([linha * TAMANHO_CELULA_GRAUS, coluna * TAMANHO_CELULA_GRAUS])
+
+
+class CacheElevacao:
+    """Elevação por célula em SQLite, com remoção das menos acessadas e contadores"""
+
+    def __init__(self, caminho=CACHE_ELEVACAO_PATH, max_celulas=MAX_CELULAS_PADRAO):
+        """
+        Args:
+            caminho (str): Caminho do arquivo SQLite (":memory:" para cache volátil)
+            max_celulas (int): Número máximo de células armazenadas
+        """
+        self.caminho = caminho
+        self.max_celulas = max_celulas
+        self.hits = 0
+        self.misses = 0
+        self.erros = 0
+        self._lock = threading.Lock()
+        self._acessos = {}
+        self._ultima_gravacao_acessos = time.monotonic()
+        self._conn = self._conectar(caminho)
+
+    def _conectar(self, caminho):
+        # Sem acesso ao disco (ou banco bloqueado além da espera): cache apenas em memória
+        conn, self.caminho = conectar(caminho, """
+            CREATE TABLE IF NOT EXISTS elevacoes (
+                celula INTEGER PRIMARY KEY,
+                elevacao REAL NOT NULL,
+                acessado_em REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_elevacoes_acesso ON elevacoes (acessado_em);
+        """, "Cache de elevação")
+        return conn
+
+    def _falha(self, operacao, erro):
+        """Registra um erro do SQLite (banco bloqueado, disco cheio...): o cache é ignorado"""
+        self.erros += 1
+        print(f"Cache de elevação: falha ao {operacao} ({str(erro)}); seguindo sem o cache")
+        try:
+            self._conn.rollback()
+        except sqlite3.Error:
+            pass
+
+    def _gravar_acessos(self, forcar=False):
+        """Grava em lote as horas de acesso acumuladas (chamado com o lock)"""
+        if not self._acessos:
+            return
+        if not forcar and len(self._acessos) < LOTE_ACESSOS and \
+                time.monotonic() - self._ultima_gravacao_acessos < INTERVALO_ACESSOS_S:
+            return
+        acessos, self._acessos = self._acessos, {}
+        self._ultima_gravacao_acessos = time.monotonic()
+        self._conn.executemany("UPDATE elevacoes SET acessado_em = ? WHERE celula = ?",
+                               [(agora, celula) for celula, agora in acessos.items()])
+        self._conn.commit()
+
+    def consultar(self, ids):
+        """
+        Elevações conhecidas de um lote de células
+
+        Args:
+            ids (np.ndarray): Identificadores das células (sem repetição)
+
+        Returns:
+            np.ndarray: Elevações em metros, NaN para as células ausentes
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        encontrados = {}
+        agora = time.time()
+        with self._lock:
+            try:
+                for inicio in range(0, len(ids), _LOTE_SQL):
+                    lote = ids[inicio:inicio + _LOTE_SQL].tolist()
+                    marcadores = ",".join("?" * len(lote))
+                    encontrados.update(self._conn.execute(
+                        f"SELECT celula, elevacao FROM elevacoes WHERE celula IN ({marcadores})", lote
+                    ).fetchall())
+            except sqlite3.Error as e:
+                # As células não lidas vão para a API
+                self._falha("consultar", e)
+            self.hits += len(encontrados)
+            self.misses += len(ids) - len(encontrados)
+            # A hora de acesso só é gravada em lote: uma leitura não vira escrita
+            self._acessos.update(dict.fromkeys(encontrados, agora))
+            try:
+                self._gravar_acessos()
+            except sqlite3.Error as e:
+                self._falha("gravar acessos", e)
+        return np.array([encontrados.get(c, np.nan) for c in ids.tolist()], dtype=np.float64)
+
+    def gravar(self, ids, elevacoes):
+        """
+        Armazena as elevações de um lote de células
+
+        Args:
+            ids (np.ndarray): Identificadores das células
+            elevacoes (np.ndarray): Elevações em metros (NaN é ignorado)
+        """
+        agora = time.time()
+        linhas = [(int(c), float(e), agora) for c, e in zip(ids, elevacoes) if not np.isnan(e)]
+        if not linhas:
+            return
+        with self._lock:
+            try:
+                # A gravação já escreve no arquivo: os acessos pendentes vão antes (a inserção é mais recente)
+                self._gravar_acessos(forcar=True)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO elevacoes (celula, elevacao, acessado_em) VALUES (?, ?, ?)", linhas
+                )
+                self._remover_excedentes()
+                self._conn.commit()
+            except sqlite3.Error as e:
+                self._falha("gravar", e)
+
+    def _remover_excedentes(self):
+        """Remove as células menos acessadas até o cache caber em max_celulas"""
+        total = self._conn.execute("SELECT COUNT(*) FROM elevacoes").fetchone()[0]
+        if total > self.max_celulas:
+            self._conn.execute(
+                "DELETE FROM elevacoes WHERE celula IN "
+                "(SELECT celula FROM elevacoes ORDER BY acessado_em ASC LIMIT ?)",
+                (total - self.max_celulas,)
+            )
+
+    def gravar_acessos(self):
+        """Grava as horas de acesso ainda pendentes (ex.: ao fim de um processo em lote)"""
+        with self._lock:
+            try:
+                self._gravar_acessos(forcar=True)
+            except sqlite3.Error as e:
+                self._falha("gravar acessos", e)
+
+    def estatisticas(self):
+        """
+        Retorna os contadores do cache
+
+        Returns:
+            dict: hits, misses, taxa de acerto, erros do SQLite e número de células
+        """
+        with self._lock:
+            try:
+                total = self._conn.execute("SELECT COUNT(*) FROM elevacoes").fetchone()[0]
+            except sqlite3.Error:
+                total = None
+        consultas = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / consultas if consultas else 0.0,
+            "erros": self.erros,
+            "celulas": total,
+        }
+
+
+_cache_padrao = None
+_cache_padrao_lock = threading.Lock()
+
+
+def get_cache_elevacao():
+    """Retorna a instância compartilhada do cache de elevação (criada sob demanda)"""
+    global _cache_padrao
+    with _cache_padrao_lock:
+        if _cache_padrao is None:
+            _cache_padrao = CacheElevacao()
+        return _cache_padrao
+
+
+def definir_cache_elevacao(cache):
+    """
+    Substitui a instância compartilhada do cache (ex.: cache em memória em benchmarks)
+
+    Args:
+        cache (CacheElevacao): Novo cache compartilhado
+    """
+    global _cache_padrao
+    with _cache_padrao_lock:
+        _cache_padrao = cache
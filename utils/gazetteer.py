@@ -0,0 +1,263 @@
+"""
+Gazetteer local de pontos de referência de São José dos Campos.
+
+Os nomes de lugares usados como waypoints (pontos fixos do formulário, pontos
+centrais da estratégia de rotas curtas e locais extraídos do guia) são resolvidos
+para coordenadas canônicas a partir de dados/gazetteer_sjc.json, sem
+geocodificação no servidor a cada chamada de rota. Nomes e apelidos normalizados
+ficam num índice ordenado (busca por prefixo) e num índice de trigramas (nomes
+escritos de forma aproximada).
+
+As coordenadas do arquivo podem ser refeitas uma única vez pela API de
+geocodificação com:
+
+    python -m utils.gazetteer --atualizar
+"""
+import os
+import json
+import bisect
+import threading
+
+from utils.maps_cache import normalizar_endereco
+
+# Arquivo padrão do gazetteer (pode ser alterado pela variável de ambiente)
+GAZETTEER_PATH = os.environ.get("PEDALA_GAZETTEER", os.path.join("dados", "gazetteer_sjc.json"))
+
+# Semelhança mínima (Jaccard de trigramas) para aceitar um nome aproximado
+LIMIAR_SEMELHANCA = 0.55
+
+# Logradouros nunca são resolvidos por aproximação ("Rua Santos Dumont" não é o parque)
+_LOGRADOUROS = ("rua", "avenida", "alameda", "travessa", "estrada", "rodovia")
+
+# Sufixos de cidade removidos antes da comparação (já normalizados)
+_SUFIXOS_CIDADE = ("sao jose dos campos sp brasil", "sao jose dos campos sp", "sao jose dos campos", "sp", "brasil")
+
+
+def normalizar_nome(texto):
+    """
+    Forma normalizada de um nome de lugar, sem acentos e sem a cidade no final
+
+    Args:
+        texto (str): Nome como digitado ("Parque Vicentina Aranha, São José dos Campos, SP")
+
+    Returns:
+        str: Nome normalizado ("parque vicentina aranha")
+    """
+    nome = normalizar_endereco(texto)
+    for sufixo in _SUFIXOS_CIDADE:
+        if nome.endswith(" " + sufixo):
+            nome = nome[:-len(sufixo) - 1]
+    return nome
+
+
+def trigramas(nome):
+    """
+    Returns:
+        set: Trigramas do nome normalizado, com bordas marcadas por espaço
+    """
+    texto = f"  {nome} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class Gazetteer:
+    """Lugares com nome, apelidos e coordenadas, indexados por prefixo e por trigramas"""
+
+    def __init__(self, locais, cidade=""):
+        """
+        Args:
+            locais (list): Dicts com nome, lat, lng e, opcionalmente, apelidos e tipo
+            cidade (str): Cidade acrescentada ao endereço formatado
+        """
+        self.locais = list(locais)
+        self.cidade = cidade
+        self._por_nome = {}
+        for indice, local in enumerate(self.locais):
+            for nome in [local["nome"]] + list(local.get("apelidos", [])):
+                self._por_nome.setdefault(normalizar_nome(nome), indice)
+        # Nomes ordenados para a busca por prefixo (bisect)
+        self._nomes = sorted(self._por_nome)
+        self._trigramas = {nome: trigramas(nome) for nome in self._nomes}
+        self._indice_trigramas = {}
+        for nome, grupo in self._trigramas.items():
+            for trigrama in grupo:
+                self._indice_trigramas.setdefault(trigrama, set()).add(nome)
+
+    @classmethod
+    def carregar(cls, caminho=GAZETTEER_PATH):
+        """
+        Carrega o gazetteer de um arquivo JSON
+
+        Returns:
+            Gazetteer: Gazetteer carregado (vazio se o arquivo não existe)
+        """
+        if not os.path.exists(caminho):
+            return cls([])
+        with open(caminho, encoding="utf-8") as arquivo:
+            dados = json.load(arquivo)
+        return cls(dados.get("locais", []), dados.get("cidade", ""))
+
+    def __len__(self):
+        return len(self.locais)
+
+    def exato(self, texto):
+        """
+        Returns:
+            dict: Lugar cujo nome ou apelido normalizado é igual ao texto, ou None
+        """
+        indice = self._por_nome.get(normalizar_nome(texto))
+        return self.locais[indice] if indice is not None else None
+
+    def buscar_prefixo(self, prefixo, limite=10):
+        """
+        Lugares cujo nome ou apelido começa com o prefixo
+
+        Args:
+            prefixo (str): Início do nome (normalizado aqui)
+            limite (int): Número máximo de lugares
+
+        Returns:
+            list: Lugares distintos, em ordem alfabética do nome encontrado
+        """
+        prefixo = normalizar_endereco(prefixo)
+        encontrados = []
+        inicio = bisect.bisect_left(self._nomes, prefixo)
+        for nome in self._nomes[inicio:]:
+            if not nome.startswith(prefixo) or len(encontrados) >= limite:
+                break
+            local = self.locais[self._por_nome[nome]]
+            if local not in encontrados:
+                encontrados.append(local)
+        return encontrados
+
+    def semelhantes(self, texto, limite=5):
+        """
+        Lugares com nome parecido (semelhança de Jaccard entre trigramas)
+
+        Returns:
+            list: Tuplas (semelhança, lugar), da mais parecida para a menos
+        """
+        alvo = trigramas(normalizar_nome(texto))
+        candidatos = set()
+        for trigrama in alvo:
+            candidatos |= self._indice_trigramas.get(trigrama, set())
+        pontuados = {}
+        for nome in candidatos:
+            grupo = self._trigramas[nome]
+            semelhanca = len(alvo & grupo) / len(alvo | grupo)
+            indice = self._por_nome[nome]
+            pontuados[indice] = max(semelhanca, pontuados.get(indice, 0.0))
+        ordenados = sorted(pontuados.items(), key=lambda item: -item[1])[:limite]
+        return [(semelhanca, self.locais[indice]) for indice, semelhanca in ordenados]
+
+    def resolver(self, texto, aproximado=True):
+        """
+        Lugar correspondente a um texto
+
+        Args:
+            texto (str): Nome do lugar, com ou sem a cidade
+            aproximado (bool): Se True, aceita o nome mais parecido acima de LIMIAR_SEMELHANCA
+                (exceto para ruas e avenidas)
+
+        Returns:
+            dict: Lugar (nome, lat, lng, ...) ou None
+        """
+        local = self.exato(texto)
+        if local is None and aproximado and normalizar_nome(texto).split(" ")[0] not in _LOGRADOUROS:
+            parecidos = self.semelhantes(texto, limite=1)
+            if parecidos and parecidos[0][0] >= LIMIAR_SEMELHANCA:
+                local = parecidos[0][1]
+        return local
+
+    def coordenadas(self, texto, aproximado=True):
+        """
+        Mesmo formato de utils.geocoding.geocodificar
+
+        Returns:
+            dict: {'lat', 'lng', 'endereco_formatado'} ou None se o lugar não está no gazetteer
+        """
+        local = self.resolver(texto, aproximado)
+        if local is None:
+            return None
+        formatado = f"{local['nome']}, {self.cidade}" if self.cidade else local["nome"]
+        return {"lat": local["lat"], "lng": local["lng"], "endereco_formatado": formatado}
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def gazetteer_padrao():
+    """Gazetteer compartilhado pelo processo (carregado de GAZETTEER_PATH sob demanda)"""
+    global _gazetteer
+    with _gazetteer_lock:
+        if _gazetteer is None:
+            _gazetteer = Gazetteer.carregar()
+        return _gazetteer
+
+
+def resolver_waypoint(texto):
+    """
+    Waypoint em coordenadas quando o lugar está no gazetteer
+
+    Args:
+        texto (str): Nome do lugar ou "lat,lng"
+
+    Returns:
+        str: "lat,lng" do lugar, ou o próprio texto se ele não foi reconhecido
+    """
+    try:
+        lat, lng = str(texto).split(",")
+        float(lat), float(lng)
+        return texto
+    except ValueError:
+        pass
+    coords = gazetteer_padrao().coordenadas(texto)
+    return f"{coords['lat']},{coords['lng']}" if coords else texto
+
+
+def atualizar_coordenadas(gmaps, caminho=GAZETTEER_PATH):
+    """
+    Refaz as coordenadas de todos os lugares pela API de geocodificação (uma vez)
+
+    Args:
+        gmaps: Cliente do Google Maps
+        caminho (str): Arquivo JSON do gazetteer
+
+    Returns:
+        int: Número de lugares atualizados
+    """
+    with open(caminho, encoding="utf-8") as arquivo:
+        dados = json.load(arquivo)
+    atualizados = 0
+    for local in dados["locais"]:
+        resultado = gmaps.geocode(f"{local['nome']}, {dados.get('cidade', '')}")
+        if not resultado:
+            print(f"Lugar não encontrado: {local['nome']}")
+            continue
+        posicao = resultado[0]["geometry"]["location"]
+        local["lat"], local["lng"] = round(posicao["lat"], 6), round(posicao["lng"], 6)
+        atualizados += 1
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(dados, arquivo, ensure_ascii=False, indent=2)
+    return atualizados
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] == ["--atualizar"]:
+        from utils.maps_provider import cliente_maps
+
+        cliente = cliente_maps()
+        if cliente is None:
+            print("Defina GOOGLE_MAPS_API_KEY para atualizar as coordenadas")
+            sys.exit(1)
+        print(f"{atualizar_coordenadas(cliente)} lugares atualizados em {GAZETTEER_PATH}")
+    elif sys.argv[1:]:
+        consulta = " ".join(sys.argv[1:])
+        gazetteer = gazetteer_padrao()
+        for semelhanca, local in gazetteer.semelhantes(consulta):
+            print(f"{semelhanca:.2f}  {local['nome']} ({local['lat']}, {local['lng']})")
+    else:
+        print("Uso: python -m utils.gazetteer --atualizar | python -m utils.gazetteer <nome>")
+        sys.exit(1)
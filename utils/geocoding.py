@@ -0,0 +1,132 @@
+"""
+Camada de geocodificação com memoização.
+
+Resolve endereços para coordenadas uma única vez: os resultados ficam em memória
+no processo e no cache persistente do Maps (compartilhado entre sessões), sempre
+indexados pelo endereço normalizado. Pontos de referência conhecidos vêm do
+gazetteer local (utils.gazetteer), sem chamada à API.
+"""
+import threading
+
+from utils.gazetteer import gazetteer_padrao
+from utils.maps_cache import get_cache_padrao, chave_requisicao, normalizar_endereco
+
+# Quantidade máxima de endereços mantidos em memória
+MAX_ENDERECOS_MEMORIA = 512
+
+_memoria = {}
+_memoria_lock = threading.Lock()
+
+
+def _lembrado(normalizado):
+    with _memoria_lock:
+        return _memoria.get(normalizado)
+
+
+def _lembrar(normalizado, resultado):
+    with _memoria_lock:
+        if len(_memoria) >= MAX_ENDERECOS_MEMORIA:
+            # Descartar o endereço mais antigo (dicts preservam a ordem de inserção)
+            _memoria.pop(next(iter(_memoria)))
+        _memoria[normalizado] = resultado
+
+
+def _coordenadas(geocode_result, endereco):
+    location = geocode_result[0]['geometry']['location']
+    return {
+        'lat': location['lat'],
+        'lng': location['lng'],
+        'endereco_formatado': geocode_result[0].get('formatted_address', endereco)
+    }
+
+
+def geocodificar(gmaps, endereco, cache=None):
+    """
+    Obtém as coordenadas de um endereço, consultando a API apenas se necessário
+
+    Args:
+        gmaps: Cliente do Google Maps
+        endereco (str): Endereço a geocodificar
+        cache (CacheMaps): Cache persistente (padrão: cache compartilhado do Maps)
+
+    Returns:
+        dict: {'lat', 'lng', 'endereco_formatado'} ou None se o endereço não foi encontrado
+    """
+    normalizado = normalizar_endereco(endereco)
+    resultado = _lembrado(normalizado)
+    if resultado is not None:
+        return resultado
+    # Endereços digitados só casam com o gazetteer pelo nome exato
+    resultado = gazetteer_padrao().coordenadas(endereco, aproximado=False)
+    if resultado is not None:
+        _lembrar(normalizado, resultado)
+        return resultado
+
+    cache = cache if cache is not None else get_cache_padrao()
+    chave = chave_requisicao("geocode", address=endereco)
+    resultado = cache.get(chave)
+
+    if resultado is None:
+        geocode_result = gmaps.geocode(endereco)
+        if not geocode_result:
+            return None
+        resultado = _coordenadas(geocode_result, endereco)
+        cache.set(chave, resultado, tipo="geocode")
+
+    _lembrar(normalizado, resultado)
+    return resultado
+
+
+async def geocodificar_async(gmaps, endereco, cache=None):
+    """
+    Versão assíncrona de geocodificar (mesma memoização e mesmo cache)
+
+    Args:
+        gmaps: Cliente assíncrono do Google Maps (utils.maps_async)
+        endereco (str): Endereço a geocodificar
+        cache (CacheMaps): Cache persistente (padrão: cache compartilhado do Maps)
+
+    Returns:
+        dict: {'lat', 'lng', 'endereco_formatado'} ou None se o endereço não foi encontrado
+    """
+    normalizado = normalizar_endereco(endereco)
+    resultado = _lembrado(normalizado)
+    if resultado is not None:
+        return resultado
+    resultado = gazetteer_padrao().coordenadas(endereco, aproximado=False)
+    if resultado is not None:
+        _lembrar(normalizado, resultado)
+        return resultado
+
+    cache = cache if cache is not None else get_cache_padrao()
+    chave = chave_requisicao("geocode", address=endereco)
+    resultado = cache.get(chave)
+
+    if resultado is None:
+        geocode_result = await gmaps.geocode(endereco)
+        if not geocode_result:
+            return None
+        resultado = _coordenadas(geocode_result, endereco)
+        cache.set(chave, resultado, tipo="geocode")
+
+    _lembrar(normalizado, resultado)
+    return resultado
+
+
+def limpar_memoria():
+    """Esvazia a memoização em processo (o cache persistente não é alterado)"""
+    with _memoria_lock:
+        _memoria.clear()
+
+
+def como_latlng(coords):
+    """
+    Formata coordenadas no formato "lat,lng" aceito pela API de rotas
+
+    Args:
+        coords (dict): Dict com as chaves lat e lng
+
+    Returns:
+        str: Coordenadas no formato "lat,lng"
+    """
+    return f"{coords['lat']},{coords['lng']}"
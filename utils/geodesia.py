@@ -0,0 +1,184 @@
+"""
+Operações geodésicas vetorizadas para métricas de rota.
+
+Todas as funções aceitam escalares ou arrays NumPy (com broadcasting) e trabalham
+em metros e graus decimais: distâncias e rumos entre pontos, distância acumulada
+ao longo de uma geometria (n, 2), reamostragem a intervalos fixos, inclinação e
+ganho/perda de elevação, e conversão de deslocamentos em metros para graus na
+latitude do ponto (um grau de longitude encolhe com o cosseno da latitude).
+"""
+import math
+
+import numpy as np
+
+RAIO_TERRA_M = 6371000.0
+
+# Metros por grau de latitude (e de longitude no equador)
+METROS_POR_GRAU = 111320.0
+
+
+def distancias_m(lat1, lng1, lat2, lng2):
+    """
+    Distância haversine entre pares de pontos
+
+    Args:
+        lat1, lng1: Latitude e longitude de origem (escalares ou arrays)
+        lat2, lng2: Latitude e longitude de destino (escalares ou arrays)
+
+    Returns:
+        Distâncias em metros (mesma forma do broadcasting das entradas)
+    """
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * RAIO_TERRA_M * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def rumos_graus(lat1, lng1, lat2, lng2):
+    """
+    Rumo inicial de cada origem para o respectivo destino
+
+    Returns:
+        Rumos em graus de 0 a 360 (0 = norte, 90 = leste)
+    """
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    y = np.sin(lng2 - lng1) * np.cos(lat2)
+    x = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(lng2 - lng1)
+    return (np.degrees(np.arctan2(y, x)) + 360) % 360
+
+
+def distancias_acumuladas_m(geometria):
+    """
+    Distância percorrida até cada ponto da geometria
+
+    Args:
+        geometria (np.ndarray): Array (n, 2) com lat e lng
+
+    Returns:
+        np.ndarray: Array (n,) em metros, começando em 0
+    """
+    geometria = np.asarray(geometria, dtype=np.float64).reshape(-1, 2)
+    if len(geometria) < 2:
+        return np.zeros(len(geometria))
+    trechos = distancias_m(geometria[:-1, 0], geometria[:-1, 1], geometria[1:, 0], geometria[1:, 1])
+    return np.concatenate(([0.0], np.cumsum(trechos)))
+
+
+def comprimento_m(geometria):
+    """
+    Returns:
+        float: Comprimento total da geometria em metros
+    """
+    acumulado = distancias_acumuladas_m(geometria)
+    return float(acumulado[-1]) if len(acumulado) else 0.0
+
+
+def reamostrar(geometria, intervalo_m):
+    """
+    Pontos igualmente espaçados ao longo da geometria (interpolação linear)
+
+    Args:
+        geometria (np.ndarray): Array (n, 2) com lat e lng
+        intervalo_m (float): Espaçamento máximo entre os pontos
+
+    Returns:
+        tuple: (distâncias dos pontos em m, array (m, 2) com lat e lng)
+    """
+    geometria = np.asarray(geometria, dtype=np.float64).reshape(-1, 2)
+    acumulado = distancias_acumuladas_m(geometria)
+    if len(geometria) < 2 or acumulado[-1] <= 0:
+        return np.empty(0), np.empty((0, 2))
+    alvo = np.linspace(0, acumulado[-1], math.ceil(acumulado[-1] / intervalo_m) + 1)
+    pontos = np.column_stack([np.interp(alvo, acumulado, geometria[:, 0]),
+                              np.interp(alvo, acumulado, geometria[:, 1])])
+    return alvo, pontos
+
+
+def inclinacoes_pct(distancias_km, elevacoes):
+    """
+    Inclinação de cada trecho do perfil
+
+    Args:
+        distancias_km (array): Distâncias acumuladas em km
+        elevacoes (array): Elevações em metros
+
+    Returns:
+        np.ndarray: Inclinação (%) de cada ponto em relação ao anterior; 0 no primeiro
+            ponto e em trechos de comprimento nulo
+    """
+    metros = np.asarray(distancias_km, dtype=np.float64) * 1000
+    elevacoes = np.asarray(elevacoes, dtype=np.float64)
+    if len(elevacoes) < 2:
+        return np.zeros(len(elevacoes))
+    trechos = np.diff(metros)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        inclinacao = np.where(trechos > 0, np.diff(elevacoes) / trechos * 100, 0.0)
+    return np.concatenate(([0.0], inclinacao))
+
+
+def ganho_perda_m(elevacoes):
+    """
+    Returns:
+        tuple: (soma das subidas, soma das descidas) em metros, ambas positivas
+    """
+    variacao = np.diff(np.asarray(elevacoes, dtype=np.float64))
+    return float(variacao[variacao > 0].sum()), float(-variacao[variacao < 0].sum())
+
+
+def metricas_perfil(distancias_km, elevacoes):
+    """
+    Resumo do perfil de elevação
+
+    Returns:
+        dict: distancia_km, subida_m, descida_m, elevacao_min/max_m e inclinacao_max_pct
+    """
+    elevacoes = np.asarray(elevacoes, dtype=np.float64)
+    if len(elevacoes) == 0:
+        return {}
+    subida, descida = ganho_perda_m(elevacoes)
+    return {
+        "distancia_km": float(distancias_km[-1]),
+        "subida_m": subida,
+        "descida_m": descida,
+        "elevacao_min_m": float(elevacoes.min()),
+        "elevacao_max_m": float(elevacoes.max()),
+        "inclinacao_max_pct": float(np.abs(inclinacoes_pct(distancias_km, elevacoes)).max()),
+    }
+
+
+def metros_para_graus(norte_m, leste_m, lat):
+    """
+    Converte deslocamentos em metros para graus na latitude indicada
+
+    Args:
+        norte_m: Deslocamento para o norte em metros (negativo = sul)
+        leste_m: Deslocamento para o leste em metros (negativo = oeste)
+        lat: Latitude de referência em graus
+
+    Returns:
+        tuple: (graus de latitude, graus de longitude)
+    """
+    return (np.asarray(norte_m) / METROS_POR_GRAU,
+            np.asarray(leste_m) / (METROS_POR_GRAU * np.cos(np.radians(lat))))
+
+
+def graus_para_metros(dlat, dlng, lat):
+    """
+    Operação inversa de metros_para_graus
+
+    Returns:
+        tuple: (metros para o norte, metros para o leste)
+    """
+    return (np.asarray(dlat) * METROS_POR_GRAU,
+            np.asarray(dlng) * METROS_POR_GRAU * np.cos(np.radians(lat)))
+
+
+def deslocar(lat, lng, distancia_m, rumo_graus):
+    """
+    Ponto a uma distância e rumo da origem (aproximação plana, adequada a alguns km)
+
+    Returns:
+        tuple: (lat, lng) do ponto deslocado
+    """
+    rumo = np.radians(rumo_graus)
+    dlat, dlng = metros_para_graus(distancia_m * np.cos(rumo), distancia_m * np.sin(rumo), lat)
+    return lat + dlat, lng + dlng
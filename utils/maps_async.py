@@ -0,0 +1,265 @@
+"""
+Clientes assíncronos da API do Google Maps.
+
+O ClienteMapsAsync fala diretamente com os endpoints HTTP (directions, distance
+matrix, geocode e elevation, por ponto ou ao longo de um caminho) sobre um único httpx.AsyncClient
+com pool de conexões e limite de chamadas simultâneas, de modo que um event loop
+avalia dezenas de candidatos sem uma thread por chamada. As respostas têm o mesmo formato do googlemaps.Client.
+
+ClienteAsyncSincrono adapta um cliente síncrono (record/replay, modelo sintético)
+à mesma interface, e os envoltórios de cache e orçamento seguem as regras de
+utils.maps_cache e utils.route_budget.
+"""
+import os
+import asyncio
+
+from utils.maps_cache import ClienteMapsComCache, chave_requisicao, get_cache_padrao
+from utils.maps_provider import MODO_PROVEDOR_PADRAO, cliente_maps
+from utils.polyline import codificar
+from utils.route_budget import OrcamentoEsgotado
+
+# Endpoints da API web do Google Maps
+URL_BASE = "https://maps.googleapis.com/maps/api/"
+
+# Chamadas HTTP simultâneas por cliente
+MAX_CONCORRENCIA_HTTP = 16
+
+# Tempo máximo de cada requisição HTTP em segundos
+TIMEOUT_HTTP = 10.0
+
+
+class ErroApiMaps(Exception):
+    """Resposta da API com status diferente de OK/ZERO_RESULTS"""
+
+
+def _formatar_local(local):
+    """Ponto no formato dos parâmetros da API ("lat,lng" ou endereço)"""
+    if isinstance(local, dict):
+        return f"{local['lat']},{local['lng']}"
+    if isinstance(local, (list, tuple)):
+        return f"{local[0]},{local[1]}"
+    return str(local)
+
+
+def _formatar_locais(locations):
+    """Um ou mais pontos separados por | (mesma regra do googlemaps.Client)"""
+    if isinstance(locations, (list, tuple)) and locations and isinstance(locations[0], (list, tuple, dict, str)):
+        return "|".join(_formatar_local(p) for p in locations)
+    return _formatar_local(locations)
+
+
+class ClienteMapsAsync:
+    """
+    Cliente HTTP assíncrono dos endpoints directions, distance matrix, geocode e elevation
+
+    Deve ser usado dentro de um único event loop e fechado com aclose() (ou como
+    "async with").
+    """
+
+    def __init__(self, chave, max_concorrencia=MAX_CONCORRENCIA_HTTP, timeout=TIMEOUT_HTTP):
+        """
+        Args:
+            chave (str): Chave da API do Google Maps
+            max_concorrencia (int): Número máximo de requisições simultâneas
+            timeout (float): Tempo máximo de cada requisição em segundos
+        """
+        import httpx
+        self.chave = chave
+        self._limite = asyncio.Semaphore(max_concorrencia)
+        self._http = httpx.AsyncClient(
+            base_url=URL_BASE,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_concorrencia, max_keepalive_connections=max_concorrencia)
+        )
+
+    async def _get(self, endpoint, params, campo=None):
+        params = {**params, "key": self.chave}
+        async with self._limite:
+            resposta = await self._http.get(f"{endpoint}/json", params=params)
+        resposta.raise_for_status()
+        corpo = resposta.json()
+        status = corpo.get("status")
+        if status == "ZERO_RESULTS":
+            return []
+        if status != "OK":
+            raise ErroApiMaps(f"{endpoint}: {status} {corpo.get('error_message', '')}".strip())
+        # Sem campo, a resposta inteira (formato do googlemaps.Client.distance_matrix)
+        return corpo[campo] if campo else corpo
+
+    async def directions(self, origin, destination, waypoints=None, mode=None, optimize_waypoints=False, **kwargs):
+        params = {"origin": _formatar_local(origin), "destination": _formatar_local(destination)}
+        if mode:
+            params["mode"] = mode
+        if waypoints:
+            pontos = [_formatar_local(w) for w in waypoints]
+            if optimize_waypoints:
+                pontos = ["optimize:true"] + pontos
+            params["waypoints"] = "|".join(pontos)
+        params.update(kwargs)
+        return await self._get("directions", params, "routes")
+
+    async def distance_matrix(self, origins, destinations, mode=None, **kwargs):
+        params = {"origins": _formatar_locais(list(origins)), "destinations": _formatar_locais(list(destinations))}
+        if mode:
+            params["mode"] = mode
+        params.update(kwargs)
+        return await self._get("distancematrix", params)
+
+    async def geocode(self, address, **kwargs):
+        return await self._get("geocode", {"address": address, **kwargs}, "results")
+
+    async def elevation(self, locations):
+        locais = _formatar_locais(locations)
+        if "|" in locais and all(isinstance(p, (list, tuple)) for p in locations):
+            # Como no googlemaps.Client: listas de pontos vão como polyline quando é mais curto
+            codificado = f"enc:{codificar(locations)}"
+            locais = codificado if len(codificado) < len(locais) else locais
+        return await self._get("elevation", {"locations": locais}, "results")
+
+    async def elevation_along_path(self, path, samples):
+        path = f"enc:{path}" if isinstance(path, str) else _formatar_locais(path)
+        return await self._get("elevation", {"path": path, "samples": samples}, "results")
+
+    async def aclose(self):
+        await self._http.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+
+class ClienteAsyncSincrono:
+    """
+    Adapta um cliente síncrono à interface assíncrona
+
+    Cada chamada roda no pool de threads padrão do loop, com no máximo
+    max_concorrencia em andamento. Usado nos modos record/replay e com clientes
+    locais, que não falam HTTP diretamente.
+    """
+
+    def __init__(self, cliente, max_concorrencia=MAX_CONCORRENCIA_HTTP):
+        self.cliente = cliente
+        self._limite = asyncio.Semaphore(max_concorrencia)
+
+    async def _chamar(self, metodo, *args, **kwargs):
+        async with self._limite:
+            return await asyncio.to_thread(getattr(self.cliente, metodo), *args, **kwargs)
+
+    async def directions(self, *args, **kwargs):
+        return await self._chamar("directions", *args, **kwargs)
+
+    async def distance_matrix(self, *args, **kwargs):
+        return await self._chamar("distance_matrix", *args, **kwargs)
+
+    async def geocode(self, *args, **kwargs):
+        return await self._chamar("geocode", *args, **kwargs)
+
+    async def elevation(self, *args, **kwargs):
+        return await self._chamar("elevation", *args, **kwargs)
+
+    async def elevation_along_path(self, *args, **kwargs):
+        return await self._chamar("elevation_along_path", *args, **kwargs)
+
+    async def aclose(self):
+        pass
+
+
+class ClienteAsyncComCache:
+    """Cache das chamadas de rotas e de matriz para clientes assíncronos (mesmas chaves de ClienteMapsComCache)"""
+
+    def __init__(self, cliente, cache=None):
+        self.cliente = cliente
+        self.cache = cache if cache is not None else get_cache_padrao()
+
+    async def directions(self, origin, destination, waypoints=None, mode=None, optimize_waypoints=False, **kwargs):
+        chave = chave_requisicao(
+            "directions", origin=origin, destination=destination, waypoints=waypoints,
+            mode=mode, optimize_waypoints=optimize_waypoints, **kwargs
+        )
+        resultado = self.cache.get(chave)
+        if resultado is not None:
+            return resultado
+
+        resultado = await self.cliente.directions(
+            origin, destination, waypoints=waypoints, mode=mode,
+            optimize_waypoints=optimize_waypoints, **kwargs
+        )
+        # Respostas vazias não são armazenadas para permitir novas tentativas
+        if resultado:
+            self.cache.set(chave, resultado, tipo="directions")
+        return resultado
+
+    async def distance_matrix(self, origins, destinations, mode=None, **kwargs):
+        chave = chave_requisicao("distance_matrix", origins=origins, destinations=destinations, mode=mode, **kwargs)
+        resultado = self.cache.get(chave)
+        if resultado is not None:
+            return resultado
+
+        resultado = await self.cliente.distance_matrix(origins, destinations, mode=mode, **kwargs)
+        if resultado and resultado.get("rows"):
+            self.cache.set(chave, resultado, tipo="distance_matrix")
+        return resultado
+
+    def __getattr__(self, nome):
+        return getattr(self.cliente, nome)
+
+
+class ClienteAsyncComOrcamento:
+    """Desconta cada chamada de rotas ou de matriz do orçamento (OrcamentoEsgotado quando acaba)"""
+
+    def __init__(self, cliente, orcamento):
+        self.cliente = cliente
+        self.orcamento = orcamento
+
+    async def directions(self, *args, **kwargs):
+        if not self.orcamento.reservar():
+            raise OrcamentoEsgotado(f"Orçamento da busca esgotado ({self.orcamento.chamadas} chamadas)")
+        return await self.cliente.directions(*args, **kwargs)
+
+    async def distance_matrix(self, *args, **kwargs):
+        if not self.orcamento.reservar():
+            raise OrcamentoEsgotado(f"Orçamento da busca esgotado ({self.orcamento.chamadas} chamadas)")
+        return await self.cliente.distance_matrix(*args, **kwargs)
+
+    def __getattr__(self, nome):
+        return getattr(self.cliente, nome)
+
+
+def com_orcamento_async(cliente, orcamento):
+    """
+    Aplica um orçamento a um cliente assíncrono, por baixo do cache se houver
+
+    Returns:
+        Cliente assíncrono com o orçamento aplicado
+    """
+    if orcamento is None:
+        return cliente
+    if isinstance(cliente, ClienteAsyncComCache):
+        return ClienteAsyncComCache(ClienteAsyncComOrcamento(cliente.cliente, orcamento), cliente.cache)
+    return ClienteAsyncComOrcamento(cliente, orcamento)
+
+
+def criar_cliente_maps_async(max_concorrencia=MAX_CONCORRENCIA_HTTP):
+    """
+    Cria o cliente assíncrono para o modo configurado em PEDALA_MAPS_MODO
+
+    No modo live usa HTTP assíncrono direto; nos modos record e replay adapta o
+    cliente compartilhado de utils.maps_provider (que grava/serve as respostas).
+    Deve ser chamado dentro do event loop que vai usá-lo.
+
+    Returns:
+        Cliente assíncrono com cache, ou None se não houver chave do Google Maps
+    """
+    modo = (os.environ.get("PEDALA_MAPS_MODO") or MODO_PROVEDOR_PADRAO).strip().lower()
+    chave = os.environ.get("GOOGLE_MAPS_API_KEY", "").strip()
+    if modo == "live" and chave:
+        return ClienteAsyncComCache(ClienteMapsAsync(chave, max_concorrencia=max_concorrencia))
+
+    cliente = cliente_maps()
+    if cliente is None:
+        return None
+    # O cache já faz parte do cliente compartilhado; o orçamento é aplicado por cima
+    base = cliente.cliente if isinstance(cliente, ClienteMapsComCache) else cliente
+    return ClienteAsyncComCache(ClienteAsyncSincrono(base, max_concorrencia=max_concorrencia))
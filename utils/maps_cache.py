@@ -0,0 +1,429 @@
+"""
+Cache persistente (SQLite) para respostas da API do Google Maps.
+
+As chaves são construídas a partir de entradas canonicalizadas: coordenadas são
+arredondadas para uma precisão fixa e endereços são normalizados (minúsculas, sem
+acentos, pontuação e abreviações padronizadas). Cada entrada tem validade (TTL),
+é armazenada comprimida e o arquivo é mantido abaixo de um tamanho máximo
+removendo as entradas acessadas há mais tempo.
+"""
+import os
+import re
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+
+from utils.sqlite_store import conectar
+
+# Local padrão do arquivo de cache (pode ser alterado pela variável de ambiente)
+CACHE_PATH = os.environ.get("PEDALA_MAPS_CACHE", os.path.join(".cache", "pedala_maps.sqlite"))
+
+# Validade padrão das entradas: 7 dias
+TTL_PADRAO = 7 * 24 * 3600
+
+# Tamanho máximo do cache em bytes (payload comprimido): 64 MB
+MAX_BYTES_PADRAO = 64 * 1024 * 1024
+
+# Acessos registrados em memória e gravados em lote (o LRU não precisa da hora exata)
+LOTE_ACESSOS = 64
+INTERVALO_ACESSOS_S = 30.0
+
+# Inserções entre recontagens do tamanho total (outros processos também gravam)
+INSERCOES_ENTRE_RECONTAGENS = 200
+
+# Casas decimais das coordenadas nas chaves (~1 m)
+PRECISAO_COORDENADAS = 5
+
+# Abreviações comuns em endereços de São José dos Campos
+_ABREVIACOES = {
+    "av": "avenida",
+    "r": "rua",
+    "pca": "praca",
+    "pc": "praca",
+    "al": "alameda",
+    "rod": "rodovia",
+    "estr": "estrada",
+    "cel": "coronel",
+    "dr": "doutor",
+    "eng": "engenheiro",
+    "prof": "professor",
+    "sjc": "sao jose dos campos",
+}
+
+_COORDENADA_RE = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$")
+
+
+def normalizar_endereco(endereco):
+    """
+    Normaliza um endereço para uso em chaves de cache
+
+    Args:
+        endereco (str): Endereço em texto livre
+
+    Returns:
+        str: Endereço sem acentos, em minúsculas e com abreviações expandidas
+    """
+    texto = unicodedata.normalize("NFKD", str(endereco))
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).lower()
+    # Vírgulas, hífens e pontos são apenas separadores: "Rua X, 123 - SP" == "Rua X 123 SP"
+    palavras = re.sub(r"[^\w]+", " ", texto).split()
+    return " ".join(_ABREVIACOES.get(p, p) for p in palavras)
+
+
+def canonicalizar_local(local, precisao=PRECISAO_COORDENADAS):
+    """
+    Converte um local (endereço, "lat,lng", tupla ou dict) para a forma canônica
+
+    Args:
+        local: Endereço, string "lat,lng", tupla (lat, lng) ou dict com lat/lng
+        precisao (int): Casas decimais das coordenadas
+
+    Returns:
+        str: Representação canônica do local
+    """
+    if isinstance(local, dict) and "lat" in local and "lng" in local:
+        return f"{round(float(local['lat']), precisao)},{round(float(local['lng']), precisao)}"
+    if isinstance(local, (list, tuple)) and len(local) == 2:
+        return f"{round(float(local[0]), precisao)},{round(float(local[1]), precisao)}"
+    if isinstance(local, str):
+        match = _COORDENADA_RE.match(local)
+        if match:
+            return f"{round(float(match.group(1)), precisao)},{round(float(match.group(2)), precisao)}"
+    return normalizar_endereco(local)
+
+
+def chave_requisicao(tipo, **params):
+    """
+    Monta a chave de cache de uma requisição a partir dos parâmetros canonicalizados
+
+    Args:
+        tipo (str): Tipo de requisição (directions, geocode, ...)
+        **params: Parâmetros da requisição
+
+    Returns:
+        str: Hash SHA-1 da requisição canonicalizada
+    """
+    canonico = {}
+    for nome, valor in params.items():
+        if valor is None:
+            continue
+        if nome in ("origin", "destination", "address"):
+            valor = canonicalizar_local(valor)
+        elif nome in ("waypoints", "origins", "destinations"):
+            if isinstance(valor, (str, dict)):
+                valor = [valor]
+            valor = [canonicalizar_local(w) for w in valor]
+        canonico[nome] = valor
+    texto = json.dumps({"tipo": tipo, "params": canonico}, sort_keys=True, default=str)
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+
+class CacheMaps:
+    """Cache em disco com TTL, compressão, remoção por tamanho e contadores"""
+
+    def __init__(self, caminho=CACHE_PATH, ttl=TTL_PADRAO, max_bytes=MAX_BYTES_PADRAO):
+        """
+        Args:
+            caminho (str): Caminho do arquivo SQLite (":memory:" para cache volátil)
+            ttl (int): Validade das entradas em segundos
+            max_bytes (int): Tamanho máximo dos payloads comprimidos em bytes
+        """
+        self.caminho = caminho
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.erros = 0
+        self._lock = threading.Lock()
+        self._acessos = {}
+        self._ultima_gravacao_acessos = time.monotonic()
+        self._conn = self._conectar(caminho)
+        self._total_bytes = self._somar_tamanhos()
+        self._insercoes = 0
+
+    def _conectar(self, caminho):
+        # Sem acesso ao disco (ou banco bloqueado além da espera): cache apenas em memória
+        conn, self.caminho = conectar(caminho, """
+            CREATE TABLE IF NOT EXISTS entradas (
+                chave TEXT PRIMARY KEY,
+                tipo TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                tamanho INTEGER NOT NULL,
+                criado_em REAL NOT NULL,
+                acessado_em REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_entradas_acesso ON entradas (acessado_em);
+        """, "Cache do Maps")
+        return conn
+
+    def _somar_tamanhos(self):
+        try:
+            return self._conn.execute("SELECT COALESCE(SUM(tamanho), 0) FROM entradas").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def _falha(self, operacao, erro):
+        """Registra um erro do SQLite (banco bloqueado, disco cheio...): o cache é ignorado"""
+        self.erros += 1
+        print(f"Cache do Maps: falha ao {operacao} ({str(erro)}); seguindo sem o cache")
+        try:
+            self._conn.rollback()
+        except sqlite3.Error:
+            pass
+
+    def _gravar_acessos(self, forcar=False):
+        """Grava em lote as horas de acesso acumuladas (chamado com o lock)"""
+        if not self._acessos:
+            return
+        if not forcar and len(self._acessos) < LOTE_ACESSOS and \
+                time.monotonic() - self._ultima_gravacao_acessos < INTERVALO_ACESSOS_S:
+            return
+        acessos, self._acessos = self._acessos, {}
+        self._ultima_gravacao_acessos = time.monotonic()
+        self._conn.executemany("UPDATE entradas SET acessado_em = ? WHERE chave = ?",
+                               [(agora, chave) for chave, agora in acessos.items()])
+        self._conn.commit()
+
+    def get(self, chave):
+        """
+        Obtém um valor do cache
+
+        Um erro do SQLite é tratado como ausência da entrada (a chamada vai à API), e
+        uma entrada que não pode ser descomprimida ou decodificada é removida.
+
+        Args:
+            chave (str): Chave da entrada
+
+        Returns:
+            O valor armazenado, ou None se não existir, estiver expirado ou corrompido
+        """
+        agora = time.time()
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    "SELECT payload, criado_em FROM entradas WHERE chave = ?", (chave,)
+                ).fetchone()
+                if row is None or agora - row[1] > self.ttl:
+                    if row is not None:
+                        self._conn.execute("DELETE FROM entradas WHERE chave = ?", (chave,))
+                        self._conn.commit()
+                    self.misses += 1
+                    return None
+            except sqlite3.Error as e:
+                self._falha("ler", e)
+                self.misses += 1
+                return None
+            self.hits += 1
+            # A hora de acesso só é gravada em lote: uma leitura não vira escrita
+            self._acessos[chave] = agora
+            try:
+                self._gravar_acessos()
+            except sqlite3.Error as e:
+                self._falha("gravar acessos", e)
+        try:
+            return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+        except (zlib.error, ValueError) as e:
+            # Payload corrompido (gravação interrompida, arquivo danificado): a entrada é descartada
+            print(f"Cache do Maps: entrada corrompida removida ({str(e)})")
+            self._descartar(chave, len(row[0]))
+            return None
+
+    def _descartar(self, chave, tamanho):
+        """Remove uma entrada ilegível e conta a consulta como ausência"""
+        with self._lock:
+            self.hits -= 1
+            self.misses += 1
+            self._acessos.pop(chave, None)
+            try:
+                self._conn.execute("DELETE FROM entradas WHERE chave = ?", (chave,))
+                self._conn.commit()
+                self._total_bytes -= tamanho
+            except sqlite3.Error as e:
+                self._falha("remover entrada corrompida", e)
+
+    def set(self, chave, valor, tipo="directions"):
+        """
+        Armazena um valor no cache e remove entradas antigas se o limite de tamanho for excedido
+
+        Um erro do SQLite apenas deixa de gravar a entrada.
+
+        Args:
+            chave (str): Chave da entrada
+            valor: Valor serializável em JSON
+            tipo (str): Tipo de requisição (apenas informativo)
+        """
+        payload = zlib.compress(json.dumps(valor).encode("utf-8"), 6)
+        agora = time.time()
+        with self._lock:
+            try:
+                anterior = self._conn.execute("SELECT tamanho FROM entradas WHERE chave = ?", (chave,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entradas (chave, tipo, payload, tamanho, criado_em, acessado_em) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (chave, tipo, payload, len(payload), agora, agora)
+                )
+                self._total_bytes += len(payload) - (anterior[0] if anterior else 0)
+                self._insercoes += 1
+                self._remover_excedentes()
+                self._conn.commit()
+                self._gravar_acessos()
+            except sqlite3.Error as e:
+                self._falha("gravar", e)
+
+    def _remover_excedentes(self):
+        """
+        Remove as entradas menos acessadas até o cache caber em max_bytes
+
+        O tamanho total é mantido em memória; a soma da tabela só é refeita quando
+        ele passa do limite ou a cada INSERCOES_ENTRE_RECONTAGENS inserções.
+        """
+        if self._total_bytes <= self.max_bytes and self._insercoes < INSERCOES_ENTRE_RECONTAGENS:
+            return
+        self._insercoes = 0
+        self._total_bytes = total = self._somar_tamanhos()
+        if total <= self.max_bytes:
+            return
+        # As horas de acesso pendentes entram na ordem de remoção
+        self._gravar_acessos(forcar=True)
+        for chave, tamanho in self._conn.execute(
+            "SELECT chave, tamanho FROM entradas ORDER BY acessado_em ASC"
+        ).fetchall():
+            self._conn.execute("DELETE FROM entradas WHERE chave = ?", (chave,))
+            self._acessos.pop(chave, None)
+            total -= tamanho
+            if total <= self.max_bytes:
+                break
+        self._total_bytes = total
+
+    def limpar_expirados(self):
+        """Remove todas as entradas com validade vencida"""
+        with self._lock:
+            try:
+                self._conn.execute("DELETE FROM entradas WHERE criado_em < ?", (time.time() - self.ttl,))
+                self._conn.commit()
+            except sqlite3.Error as e:
+                self._falha("limpar", e)
+            self._total_bytes = self._somar_tamanhos()
+
+    def gravar_acessos(self):
+        """Grava as horas de acesso ainda pendentes (ex.: ao fim de um processo em lote)"""
+        with self._lock:
+            try:
+                self._gravar_acessos(forcar=True)
+            except sqlite3.Error as e:
+                self._falha("gravar acessos", e)
+
+    def estatisticas(self):
+        """
+        Retorna os contadores do cache
+
+        Returns:
+            dict: hits, misses, taxa de acerto, número de entradas e bytes ocupados
+        """
+        with self._lock:
+            try:
+                entradas, total = self._conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM entradas"
+                ).fetchone()
+            except sqlite3.Error:
+                entradas, total = None, None
+        consultas = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / consultas if consultas else 0.0,
+            "erros": self.erros,
+            "entradas": entradas,
+            "bytes": total,
+        }
+
+
+_cache_padrao = None
+_cache_padrao_lock = threading.Lock()
+
+
+def get_cache_padrao():
+    """Retorna a instância compartilhada do cache do Maps (criada sob demanda)"""
+    global _cache_padrao
+    with _cache_padrao_lock:
+        if _cache_padrao is None:
+            _cache_padrao = CacheMaps()
+        return _cache_padrao
+
+
+def definir_cache_padrao(cache):
+    """
+    Substitui a instância compartilhada do cache (ex.: cache em memória em benchmarks)
+
+    Args:
+        cache (CacheMaps): Novo cache compartilhado
+    """
+    global _cache_padrao
+    with _cache_padrao_lock:
+        _cache_padrao = cache
+
+
+class ClienteMapsComCache:
+    """
+    Envolve um googlemaps.Client adicionando cache às chamadas de rotas e de matriz de distâncias.
+
+    Os demais métodos (geocode, elevation, ...) são repassados ao cliente original.
+    """
+
+    def __init__(self, cliente, cache=None):
+        self.cliente = cliente
+        self.cache = cache if cache is not None else get_cache_padrao()
+
+    def directions(self, origin, destination, waypoints=None, mode=None, optimize_waypoints=False, **kwargs):
+        """Mesma assinatura do googlemaps.Client.directions, com cache"""
+        chave = chave_requisicao(
+            "directions", origin=origin, destination=destination, waypoints=waypoints,
+            mode=mode, optimize_waypoints=optimize_waypoints, **kwargs
+        )
+        resultado = self.cache.get(chave)
+        if resultado is not None:
+            return resultado
+
+        resultado = self.cliente.directions(
+            origin, destination, waypoints=waypoints, mode=mode,
+            optimize_waypoints=optimize_waypoints, **kwargs
+        )
+        # Respostas vazias não são armazenadas para permitir novas tentativas
+        if resultado:
+            self.cache.set(chave, resultado, tipo="directions")
+        return resultado
+
+    def distance_matrix(self, origins, destinations, mode=None, **kwargs):
+        """Mesma assinatura do googlemaps.Client.distance_matrix, com cache"""
+        chave = chave_requisicao("distance_matrix", origins=origins, destinations=destinations, mode=mode, **kwargs)
+        resultado = self.cache.get(chave)
+        if resultado is not None:
+            return resultado
+
+        resultado = self.cliente.distance_matrix(origins, destinations, mode=mode, **kwargs)
+        if resultado and resultado.get("rows"):
+            self.cache.set(chave, resultado, tipo="distance_matrix")
+        return resultado
+
+    def __getattr__(self, nome):
+        return getattr(self.cliente, nome)
+
+
+def com_cache(cliente, cache=None):
+    """
+    Adiciona cache a um cliente do Google Maps (sem efeito se já tiver cache)
+
+    Args:
+        cliente: googlemaps.Client ou cliente já envolvido
+        cache (CacheMaps): Cache a usar (padrão: cache compartilhado)
+
+    Returns:
+        ClienteMapsComCache: Cliente com cache
+    """
+    if cliente is None or isinstance(cliente, ClienteMapsComCache):
+        return cliente
+    return ClienteMapsComCache(cliente, cache)
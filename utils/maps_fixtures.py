@@ -0,0 +1,191 @@
+"""
+Armazém local de respostas gravadas da API do Google Maps.
+
+Cada resposta é guardada com a chave canonicalizada da requisição (a mesma do
+cache do Maps) num arquivo JSONL comprimido, versionável junto com o código.
+O ClienteFixtures serve essas respostas sem rede (opcionalmente com latência
+injetada), para benchmarks e testes de regressão determinísticos. Respostas
+geradas por um cliente de apoio sintético (atributo sintetico) são marcadas no
+registro, para que o benchmark não as confunda com respostas reais da API.
+"""
+import os
+import gzip
+import json
+import time
+import random
+import threading
+
+from utils.maps_cache import chave_requisicao, canonicalizar_local
+
+# Armazém padrão do corpus de benchmark
+FIXTURES_PATH = os.environ.get("PEDALA_MAPS_FIXTURES", os.path.join("dados", "fixtures", "maps_sjc.jsonl.gz"))
+
+
+class RespostaNaoGravada(LookupError):
+    """Levantada quando uma requisição não existe no armazém e não há cliente de apoio"""
+
+
+def chave_elevacao(locations):
+    """Chave de uma consulta de elevação (um ponto ou lista de pontos)"""
+    if isinstance(locations, (list, tuple)) and locations and isinstance(locations[0], (list, tuple, dict, str)):
+        pontos = [canonicalizar_local(p) for p in locations]
+    else:
+        pontos = [canonicalizar_local(locations)]
+    return chave_requisicao("elevation", locations=pontos)
+
+
+class ArmazemFixtures:
+    """Respostas gravadas indexadas pela chave canonicalizada da requisição"""
+
+    def __init__(self, caminho=FIXTURES_PATH, anexar=False):
+        """
+        Args:
+            caminho (str): Arquivo .jsonl ou .jsonl.gz (None para armazém só em memória)
+            anexar (bool): Se True, cada resposta nova é acrescentada ao arquivo assim que
+                é gravada (modo de gravação de processos longos, como o app)
+        """
+        self.caminho = caminho
+        self.anexar = anexar and bool(caminho)
+        self.entradas = {}
+        self.alterado = False
+        self._lock = threading.Lock()
+        if caminho and os.path.exists(caminho):
+            self.carregar()
+
+    def _abrir(self, modo):
+        if self.caminho.endswith(".gz"):
+            return gzip.open(self.caminho, modo + "t", encoding="utf-8")
+        return open(self.caminho, modo, encoding="utf-8")
+
+    def carregar(self):
+        """Lê todas as respostas do arquivo"""
+        with self._abrir("r") as arquivo:
+            for linha in arquivo:
+                if linha.strip():
+                    registro = json.loads(linha)
+                    self.entradas[registro["chave"]] = registro
+
+    def salvar(self):
+        """Grava o armazém em disco (ordenado pela chave para diffs estáveis)"""
+        if not self.caminho:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.caminho)), exist_ok=True)
+        with self._lock:
+            registros = [self.entradas[chave] for chave in sorted(self.entradas)]
+            with self._abrir("w") as arquivo:
+                for registro in registros:
+                    arquivo.write(json.dumps(registro, ensure_ascii=False, sort_keys=True) + "\n")
+            self.alterado = False
+
+    def get(self, chave):
+        """
+        Returns:
+            A resposta gravada para a chave ou None
+        """
+        registro = self.entradas.get(chave)
+        return registro["resposta"] if registro else None
+
+    def set(self, chave, tipo, resposta, sintetica=False):
+        """
+        Grava uma resposta no armazém (em memória até salvar(), ou já no arquivo se anexar)
+
+        Args:
+            chave (str): Chave canonicalizada da requisição
+            tipo (str): Tipo de requisição (directions, geocode, ...)
+            resposta: Resposta da API
+            sintetica (bool): Se a resposta veio de um modelo local e não da API
+        """
+        registro = {"chave": chave, "tipo": tipo, "resposta": resposta}
+        if sintetica:
+            registro["sintetica"] = True
+        with self._lock:
+            self.entradas[chave] = registro
+            if not self.anexar:
+                self.alterado = True
+                return
+            # Membros gzip concatenados continuam legíveis como um único arquivo
+            os.makedirs(os.path.dirname(os.path.abspath(self.caminho)), exist_ok=True)
+            with self._abrir("a") as arquivo:
+                arquivo.write(json.dumps(registro, ensure_ascii=False, sort_keys=True) + "\n")
+
+    @property
+    def sinteticas(self):
+        """Número de respostas geradas por um modelo local e não pela API"""
+        return sum(1 for registro in self.entradas.values() if registro.get("sintetica"))
+
+    def __len__(self):
+        return len(self.entradas)
+
+
+class ClienteFixtures:
+    """
+    Cliente do Maps que responde a partir de um ArmazemFixtures
+
+    Requisições ausentes são repassadas ao cliente de apoio (e gravadas no
+    armazém), ou levantam RespostaNaoGravada se não houver apoio. Respostas
+    servidas do armazém podem esperar uma latência simulada, para reproduzir o
+    tempo de resposta da API sem rede.
+    """
+
+    def __init__(self, armazem, apoio=None, latencia_ms=0, variacao_ms=0, semente=0):
+        """
+        Args:
+            armazem (ArmazemFixtures): Respostas gravadas
+            apoio: Cliente usado para as requisições ausentes (opcional)
+            latencia_ms (float): Latência média injetada em cada resposta gravada
+            variacao_ms (float): Variação uniforme (±) da latência injetada
+            semente (int): Semente da variação, para execuções reproduzíveis
+        """
+        self.armazem = armazem
+        self.apoio = apoio
+        self.latencia_ms = latencia_ms
+        self.variacao_ms = variacao_ms
+        self.faltas = 0
+        self._aleatorio = random.Random(semente)
+        self._lock = threading.Lock()
+
+    def _esperar(self):
+        if self.latencia_ms <= 0 and self.variacao_ms <= 0:
+            return
+        with self._lock:
+            variacao = self._aleatorio.uniform(-self.variacao_ms, self.variacao_ms)
+        time.sleep(max(0.0, self.latencia_ms + variacao) / 1000)
+
+    def _responder(self, tipo, chave, chamar):
+        resposta = self.armazem.get(chave)
+        if resposta is not None:
+            self._esperar()
+            return resposta
+        with self._lock:
+            self.faltas += 1
+        if self.apoio is None:
+            raise RespostaNaoGravada(f"Requisição {tipo} não gravada ({chave[:10]})")
+        resposta = chamar(self.apoio)
+        self.armazem.set(chave, tipo, resposta, sintetica=getattr(self.apoio, "sintetico", False))
+        return resposta
+
+    def directions(self, origin, destination, waypoints=None, mode=None, optimize_waypoints=False, **kwargs):
+        chave = chave_requisicao(
+            "directions", origin=origin, destination=destination, waypoints=waypoints,
+            mode=mode, optimize_waypoints=optimize_waypoints, **kwargs
+        )
+        return self._responder("directions", chave, lambda c: c.directions(
+            origin, destination, waypoints=waypoints, mode=mode, optimize_waypoints=optimize_waypoints, **kwargs
+        ))
+
+    def distance_matrix(self, origins, destinations, mode=None, **kwargs):
+        chave = chave_requisicao("distance_matrix", origins=origins, destinations=destinations, mode=mode, **kwargs)
+        return self._responder("distance_matrix", chave, lambda c: c.distance_matrix(
+            origins, destinations, mode=mode, **kwargs
+        ))
+
+    def geocode(self, address, **kwargs):
+        chave = chave_requisicao("geocode", address=address, **kwargs)
+        return self._responder("geocode", chave, lambda c: c.geocode(address, **kwargs))
+
+    def elevation(self, locations):
+        return self._responder("elevation", chave_elevacao(locations), lambda c: c.elevation(locations))
+
+    def elevation_along_path(self, path, samples):
+        chave = chave_requisicao("elevation_along_path", path=path, samples=samples)
+        return self._responder("elevation_along_path", chave, lambda c: c.elevation_along_path(path, samples))
@@ -0,0 +1,104 @@
+"""
+Provedor único do cliente do Google Maps.
+
+Todos os pontos do app que chamam o Maps obtêm o cliente daqui, em um de três modos:
+
+- live: googlemaps.Client com a chave GOOGLE_MAPS_API_KEY
+- record: como live, mas cada par requisição → resposta é gravado no armazém local
+- replay: responde só a partir do armazém, sem rede, com latência injetada opcional
+
+O modo e os parâmetros vêm das variáveis de ambiente PEDALA_MAPS_MODO,
+PEDALA_MAPS_FIXTURES e PEDALA_MAPS_LATENCIA_MS (ex.: "250" ou "250:80" para
+média e variação em ms).
+"""
+import os
+import threading
+
+from utils.maps_cache import com_cache
+from utils.maps_fixtures import FIXTURES_PATH, ArmazemFixtures, ClienteFixtures
+
+MODOS_PROVEDOR = ("live", "record", "replay")
+MODO_PROVEDOR_PADRAO = "live"
+
+_cliente = None
+_cliente_lock = threading.Lock()
+
+
+def _latencia_do_ambiente():
+    """
+    Returns:
+        tuple: (latência média, variação) em ms lidas de PEDALA_MAPS_LATENCIA_MS
+    """
+    valor = os.environ.get("PEDALA_MAPS_LATENCIA_MS", "").strip()
+    if not valor:
+        return 0.0, 0.0
+    media, _, variacao = valor.partition(":")
+    return float(media), float(variacao or 0)
+
+
+def criar_cliente_maps(modo=None, chave=None, caminho=None, latencia_ms=None, variacao_ms=None, cache=True):
+    """
+    Cria o cliente do Maps no modo pedido
+
+    Args:
+        modo (str): "live", "record" ou "replay" (padrão: PEDALA_MAPS_MODO ou "live")
+        chave (str): Chave da API (padrão: GOOGLE_MAPS_API_KEY); não é usada no replay
+        caminho (str): Armazém de respostas dos modos record e replay (padrão: PEDALA_MAPS_FIXTURES)
+        latencia_ms (float): Latência média injetada no replay (padrão: PEDALA_MAPS_LATENCIA_MS)
+        variacao_ms (float): Variação (±) da latência injetada no replay
+        cache (bool): Se True, envolve o cliente no cache SQLite compartilhado
+
+    Returns:
+        Cliente do Maps, ou None se o modo exige a chave e ela não está definida
+    """
+    modo = (modo or os.environ.get("PEDALA_MAPS_MODO") or MODO_PROVEDOR_PADRAO).strip().lower()
+    if modo not in MODOS_PROVEDOR:
+        raise ValueError(f"Modo do provedor Maps inválido: {modo} (use {', '.join(MODOS_PROVEDOR)})")
+    caminho = caminho or FIXTURES_PATH
+
+    if modo == "replay":
+        latencia_padrao, variacao_padrao = _latencia_do_ambiente()
+        cliente = ClienteFixtures(
+            ArmazemFixtures(caminho),
+            latencia_ms=latencia_padrao if latencia_ms is None else latencia_ms,
+            variacao_ms=variacao_padrao if variacao_ms is None else variacao_ms
+        )
+        print(f"Maps em modo replay: {len(cliente.armazem)} respostas gravadas em {caminho}")
+    else:
+        chave = chave if chave is not None else os.environ.get("GOOGLE_MAPS_API_KEY", "")
+        if not chave or not chave.strip():
+            return None
+        import googlemaps
+        cliente = googlemaps.Client(key=chave)
+        if modo == "record":
+            # As respostas já gravadas são reaproveitadas; as novas são anexadas ao arquivo
+            cliente = ClienteFixtures(ArmazemFixtures(caminho, anexar=True), apoio=cliente)
+            print(f"Maps em modo record: gravando respostas em {caminho}")
+
+    return com_cache(cliente) if cache else cliente
+
+
+def cliente_maps():
+    """
+    Cliente do Maps compartilhado pelo processo (com cache), no modo configurado
+
+    Returns:
+        Cliente do Maps, ou None se o modo exige a chave e ela não está definida
+    """
+    global _cliente
+    with _cliente_lock:
+        if _cliente is None:
+            _cliente = criar_cliente_maps()
+        return _cliente
+
+
+def definir_cliente_maps(cliente):
+    """
+    Substitui o cliente compartilhado (ex.: cliente de replay em testes de carga)
+
+    Args:
+        cliente: Novo cliente do Maps (None para recriar a partir do ambiente)
+    """
+    global _cliente
+    with _cliente_lock:
+        _cliente = cliente
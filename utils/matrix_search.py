@@ -0,0 +1,211 @@
+"""
+Escolha dos waypoints pela matriz de distâncias, com uma única chamada de rotas.
+
+Em vez de pedir um circuito completo por candidato, um anel de waypoints é
+posicionado ao redor da origem e as distâncias pela malha entre a origem e cada
+ponto do anel (e entre os pontos do anel) vêm de uma ou duas requisições de
+matriz de distâncias. O comprimento de todos os circuitos origem → i → j → origem
+e origem → i → j → k → origem é então somado localmente, de forma vetorizada, e
+só o circuito escolhido é pedido à API de rotas, na ordem resolvida.
+"""
+import asyncio
+
+import numpy as np
+
+from utils.geodesia import deslocar
+from utils.route_candidates import CIRCUIDADE_URBANA, TOLERANCIA_KM, distancia_rota_km
+
+# Pontos do anel: com a origem, 9 × 9 = 81 elementos cabem numa requisição
+PONTOS_ANEL = 8
+
+# Elementos (origens × destinos) por requisição de matriz de distâncias
+MAX_ELEMENTOS_MATRIZ = 100
+
+# Razão entre o circuito de dois waypoints e o raio do anel: os pares medem de
+# 2,77 (vizinhos) a 4 (opostos) raios e os trios até 6, vezes a circuidade
+RAZAO_CIRCUITO_RAIO = 3.4
+
+# Penalidade (km) por waypoint a mais: um trio só vence um par claramente melhor
+PENALIDADE_WAYPOINT_KM = 0.3
+
+
+def anel_waypoints(lat, lng, distancia, circuidade=CIRCUIDADE_URBANA, pontos=PONTOS_ANEL,
+                   lat_bias=1.0, lng_bias=1.0):
+    """
+    Waypoints igualmente espaçados num anel ao redor da origem
+
+    Args:
+        lat (float): Latitude da origem
+        lng (float): Longitude da origem
+        distancia (float): Comprimento desejado do circuito em km
+        circuidade (float): Razão distância pela malha / linha reta
+        pontos (int): Número de pontos do anel
+        lat_bias (float): Multiplicador do raio norte/sul (estilo)
+        lng_bias (float): Multiplicador do raio leste/oeste (estilo)
+
+    Returns:
+        list: Waypoints "lat,lng", começando pelo norte em sentido horário
+    """
+    raio_m = distancia * 1000 / (RAZAO_CIRCUITO_RAIO * circuidade)
+    rumos = np.arange(pontos) * 360.0 / pontos
+    # Elipse: o estilo alonga o anel na direção preferida
+    norte = raio_m * lat_bias * np.cos(np.radians(rumos))
+    leste = raio_m * lng_bias * np.sin(np.radians(rumos))
+    raios = np.hypot(norte, leste)
+    anel_lat, anel_lng = deslocar(lat, lng, raios, np.degrees(np.arctan2(leste, norte)))
+    return [f"{a},{o}" for a, o in zip(anel_lat, anel_lng)]
+
+
+def lotes_matriz(pontos, max_elementos=MAX_ELEMENTOS_MATRIZ):
+    """
+    Faixas de linhas (origens) de cada requisição da matriz pontos × pontos
+
+    Returns:
+        list: Tuplas (início, fim) das origens de cada requisição
+    """
+    linhas = max(1, max_elementos // max(pontos, 1))
+    return [(inicio, min(inicio + linhas, pontos)) for inicio in range(0, pontos, linhas)]
+
+
+def _preencher(matriz, inicio, resposta):
+    for i, linha in enumerate((resposta or {}).get("rows", [])):
+        for j, elemento in enumerate(linha.get("elements", [])):
+            if elemento.get("status") == "OK":
+                matriz[inicio + i, j] = elemento["distance"]["value"] / 1000
+
+
+def matriz_distancias(gmaps, pontos, max_elementos=MAX_ELEMENTOS_MATRIZ):
+    """
+    Distâncias de bicicleta pela malha entre todos os pontos
+
+    Args:
+        gmaps: Cliente do Google Maps
+        pontos (list): Locais ("lat,lng" ou endereços); o primeiro é a origem
+        max_elementos (int): Elementos por requisição
+
+    Returns:
+        np.ndarray: Matriz (n, n) em km, NaN onde não há rota
+    """
+    matriz = np.full((len(pontos), len(pontos)), np.nan)
+    for inicio, fim in lotes_matriz(len(pontos), max_elementos):
+        resposta = gmaps.distance_matrix(pontos[inicio:fim], pontos, mode="bicycling")
+        _preencher(matriz, inicio, resposta)
+    return matriz
+
+
+async def matriz_distancias_async(gmaps, pontos, max_elementos=MAX_ELEMENTOS_MATRIZ):
+    """
+    Versão assíncrona de matriz_distancias (os lotes são pedidos ao mesmo tempo)
+
+    Returns:
+        np.ndarray: Matriz (n, n) em km, NaN onde não há rota
+    """
+    matriz = np.full((len(pontos), len(pontos)), np.nan)
+    lotes = lotes_matriz(len(pontos), max_elementos)
+    respostas = await asyncio.gather(*[
+        gmaps.distance_matrix(pontos[inicio:fim], pontos, mode="bicycling") for inicio, fim in lotes
+    ])
+    for (inicio, _), resposta in zip(lotes, respostas):
+        _preencher(matriz, inicio, resposta)
+    return matriz
+
+
+def resolver_circuito(matriz, alvo, max_waypoints=3):
+    """
+    Circuito de 2 ou 3 pontos do anel cujo comprimento previsto mais se aproxima do alvo
+
+    Args:
+        matriz (np.ndarray): Distâncias (n, n) em km; índice 0 é a origem
+        alvo (float): Comprimento desejado em km
+        max_waypoints (int): 2 (só pares) ou 3 (pares e trios)
+
+    Returns:
+        tuple: (índices dos waypoints em ordem de visita, comprimento previsto em km),
+            ou (None, None) se nenhum circuito tem todas as distâncias
+    """
+    n = len(matriz) - 1
+    if n < 2:
+        return None, None
+    ida, volta, anel = matriz[0, 1:], matriz[1:, 0], matriz[1:, 1:].copy()
+    np.fill_diagonal(anel, np.nan)
+
+    melhor, comprimento, melhor_erro = None, None, np.inf
+    pares = ida[:, None] + anel + volta[None, :]
+    if np.isfinite(pares).any():
+        i, j = np.unravel_index(np.nanargmin(np.abs(pares - alvo)), pares.shape)
+        melhor, comprimento = [i + 1, j + 1], float(pares[i, j])
+        melhor_erro = abs(comprimento - alvo)
+
+    if max_waypoints >= 3 and n >= 3:
+        trios = ida[:, None, None] + anel[:, :, None] + anel[None, :, :] + volta[None, None, :]
+        # i → j → k com três pontos distintos (i == k seria ida e volta pelo mesmo waypoint)
+        indices = np.arange(n)
+        trios[indices, :, indices] = np.nan
+        if np.isfinite(trios).any():
+            i, j, k = np.unravel_index(np.nanargmin(np.abs(trios - alvo)), trios.shape)
+            if abs(trios[i, j, k] - alvo) + PENALIDADE_WAYPOINT_KM < melhor_erro:
+                melhor, comprimento = [i + 1, j + 1, k + 1], float(trios[i, j, k])
+    return melhor, comprimento
+
+
+def circuito_por_matriz(gmaps, origem, lat, lng, distancia, tolerancia=TOLERANCIA_KM,
+                        circuidade=CIRCUIDADE_URBANA, lat_bias=1.0, lng_bias=1.0):
+    """
+    Escolhe os waypoints pela matriz de distâncias e pede só o circuito escolhido
+
+    O alvo interno é o mesmo da busca por secante: o meio da faixa preferida
+    [distancia - tolerancia, distancia].
+
+    Args:
+        gmaps: Cliente do Google Maps
+        origem (str): Origem (e retorno) no formato das chamadas ("lat,lng")
+        lat (float): Latitude da origem
+        lng (float): Longitude da origem
+        distancia (float): Distância solicitada em km
+        tolerancia (float): Tolerância máxima em km
+        circuidade (float): Circuidade da região (raio do anel)
+        lat_bias (float): Multiplicador norte/sul do estilo
+        lng_bias (float): Multiplicador leste/oeste do estilo
+
+    Returns:
+        dict: Candidato (route, distance, diff, waypoints, previsto_km) ou None
+    """
+    alvo = distancia - tolerancia / 2
+    anel = anel_waypoints(lat, lng, alvo, circuidade, lat_bias=lat_bias, lng_bias=lng_bias)
+    pontos = [origem] + anel
+    ordem, previsto = resolver_circuito(matriz_distancias(gmaps, pontos), alvo)
+    if ordem is None:
+        return None
+    waypoints = [pontos[i] for i in ordem]
+    route = gmaps.directions(origin=origem, destination=origem, waypoints=waypoints,
+                             mode="bicycling", optimize_waypoints=False)
+    return _candidato(route, waypoints, distancia, previsto)
+
+
+async def circuito_por_matriz_async(gmaps, origem, lat, lng, distancia, tolerancia=TOLERANCIA_KM,
+                                    circuidade=CIRCUIDADE_URBANA, lat_bias=1.0, lng_bias=1.0):
+    """
+    Versão assíncrona de circuito_por_matriz
+
+    Returns:
+        dict: Candidato (route, distance, diff, waypoints, previsto_km) ou None
+    """
+    alvo = distancia - tolerancia / 2
+    anel = anel_waypoints(lat, lng, alvo, circuidade, lat_bias=lat_bias, lng_bias=lng_bias)
+    pontos = [origem] + anel
+    ordem, previsto = resolver_circuito(await matriz_distancias_async(gmaps, pontos), alvo)
+    if ordem is None:
+        return None
+    waypoints = [pontos[i] for i in ordem]
+    route = await gmaps.directions(origin=origem, destination=origem, waypoints=waypoints,
+                                   mode="bicycling", optimize_waypoints=False)
+    return _candidato(route, waypoints, distancia, previsto)
+
+
+def _candidato(route, waypoints, distancia, previsto):
+    if not route:
+        return None
+    distance = distancia_rota_km(route)
+    print(f"Matriz de distâncias: circuito previsto de {previsto:.1f}km, rota de {distance:.1f}km")
+    return {"route": route, "distance": distance, "diff": abs(distance - distancia),
+            "waypoints": waypoints, "previsto_km": previsto}
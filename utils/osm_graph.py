@@ -0,0 +1,361 @@
+"""
+Grafo viário compacto carregado de um extrato do OpenStreetMap.
+
+O grafo é armazenado em arrays NumPy no formato CSR (compressed sparse row):
+para o nó u, as arestas de saída são indices[indptr[u]:indptr[u+1]], com
+comprimento (m), custo de roteamento e flags de acesso por bicicleta nos arrays
+paralelos. Extratos .osm (XML) são convertidos uma vez e podem ser salvos em .npz
+para carregamento rápido.
+"""
+import bz2
+import gzip
+import heapq
+import math
+import unicodedata
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from utils.geodesia import METROS_POR_GRAU, distancias_m
+
+# Flags das arestas
+FLAG_BICICLETA = 1       # bicicleta permitida
+FLAG_CICLOVIA = 2        # ciclovia ou ciclofaixa
+FLAG_VIA_PRINCIPAL = 4   # via arterial (primary/secondary/trunk)
+
+# Tipos de via roteáveis para bicicleta e o multiplicador de custo de cada um
+CUSTO_POR_TIPO = {
+    "cycleway": 0.8,
+    "residential": 1.0,
+    "living_street": 1.0,
+    "unclassified": 1.0,
+    "road": 1.0,
+    "service": 1.1,
+    "tertiary": 1.05,
+    "tertiary_link": 1.05,
+    "secondary": 1.2,
+    "secondary_link": 1.2,
+    "primary": 1.4,
+    "primary_link": 1.4,
+    "trunk": 1.8,
+    "trunk_link": 1.8,
+    "track": 1.3,
+    "path": 1.2,
+    "footway": 1.5,
+    "pedestrian": 1.5,
+}
+
+# Tipos que só são roteáveis com bicycle=yes/designated explícito
+TIPOS_SOMENTE_COM_PERMISSAO = {"footway", "pedestrian", "path", "trunk", "trunk_link"}
+
+VIAS_PRINCIPAIS = {"primary", "primary_link", "secondary", "secondary_link", "trunk", "trunk_link"}
+
+# Menor multiplicador de custo (mantém a heurística do A* admissível)
+CUSTO_MINIMO = min(CUSTO_POR_TIPO.values())
+
+
+def _normalizar_nome(nome):
+    texto = unicodedata.normalize("NFKD", nome)
+    return " ".join("".join(c for c in texto if not unicodedata.combining(c)).lower().split())
+
+
+def _abrir(caminho):
+    if caminho.endswith(".gz"):
+        return gzip.open(caminho, "rb")
+    if caminho.endswith(".bz2"):
+        return bz2.open(caminho, "rb")
+    return open(caminho, "rb")
+
+
+def _way_roteavel(tags):
+    """Retorna (roteável, flags, custo) para as tags de uma via"""
+    tipo = tags.get("highway")
+    if tipo not in CUSTO_POR_TIPO:
+        return False, 0, 0.0
+
+    bicycle = tags.get("bicycle")
+    if bicycle == "no" or (tags.get("access") in ("no", "private") and bicycle not in ("yes", "designated")):
+        return False, 0, 0.0
+    if tipo in TIPOS_SOMENTE_COM_PERMISSAO and bicycle not in ("yes", "designated"):
+        return False, 0, 0.0
+
+    flags = FLAG_BICICLETA
+    custo = CUSTO_POR_TIPO[tipo]
+    ciclovia = (
+        tipo == "cycleway" or bicycle == "designated"
+        or any(tags.get(k) in ("lane", "track") for k in ("cycleway", "cycleway:left", "cycleway:right", "cycleway:both"))
+    )
+    if ciclovia:
+        flags |= FLAG_CICLOVIA
+        custo = min(custo, CUSTO_POR_TIPO["cycleway"])
+    if tipo in VIAS_PRINCIPAIS:
+        flags |= FLAG_VIA_PRINCIPAL
+    return True, flags, custo
+
+
+def _sentido_unico(tags):
+    """Retorna 1 (sentido da via), -1 (sentido contrário) ou 0 (mão dupla) para bicicletas"""
+    if tags.get("oneway:bicycle") == "no" or tags.get("highway") == "cycleway":
+        return 0
+    oneway = tags.get("oneway")
+    if oneway in ("yes", "true", "1") or tags.get("junction") == "roundabout":
+        return 1
+    if oneway == "-1":
+        return -1
+    return 0
+
+
+class GrafoViario:
+    """Grafo viário em formato CSR com arrays NumPy"""
+
+    def __init__(self, lat, lng, indptr, indices, comprimento, custo, flags, nome_idx, nomes):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lng = np.asarray(lng, dtype=np.float64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.comprimento = np.asarray(comprimento, dtype=np.float32)
+        self.custo = np.asarray(custo, dtype=np.float32)
+        self.flags = np.asarray(flags, dtype=np.uint8)
+        self.nome_idx = np.asarray(nome_idx, dtype=np.int32)
+        self.nomes = list(nomes)
+        self._listas = None
+        self._nomes_normalizados = None
+        self._trechos = None
+
+    @property
+    def num_nos(self):
+        return len(self.lat)
+
+    @property
+    def num_arestas(self):
+        return len(self.indices)
+
+    @classmethod
+    def de_osm(cls, caminho):
+        """
+        Constrói o grafo a partir de um extrato .osm (XML, opcionalmente .gz/.bz2)
+
+        Args:
+            caminho (str): Caminho do arquivo .osm
+
+        Returns:
+            GrafoViario: Grafo com as vias roteáveis para bicicleta
+        """
+        coords = {}
+        vias = []
+        with _abrir(caminho) as arquivo:
+            for _, elem in ET.iterparse(arquivo, events=("end",)):
+                if elem.tag == "node":
+                    coords[int(elem.get("id"))] = (float(elem.get("lat")), float(elem.get("lon")))
+                    elem.clear()
+                elif elem.tag == "way":
+                    tags = {t.get("k"): t.get("v") for t in elem.findall("tag")}
+                    roteavel, flags, custo = _way_roteavel(tags)
+                    if roteavel:
+                        nos = [int(nd.get("ref")) for nd in elem.findall("nd")]
+                        vias.append((nos, flags, custo, _sentido_unico(tags), tags.get("name", "")))
+                    elem.clear()
+                elif elem.tag == "relation":
+                    elem.clear()
+        return cls._de_vias(coords, vias)
+
+    @classmethod
+    def _de_vias(cls, coords, vias):
+        """Monta os arrays CSR a partir das vias já filtradas"""
+        indice_no = {}
+        nomes = [""]
+        indice_nome = {"": 0}
+        origem, destino, custos, flags_arestas, nomes_arestas = [], [], [], [], []
+
+        for nos, flags, custo, sentido, nome in vias:
+            nos = [n for n in nos if n in coords]
+            if nome not in indice_nome:
+                indice_nome[nome] = len(nomes)
+                nomes.append(nome)
+            for a, b in zip(nos, nos[1:]):
+                ia = indice_no.setdefault(a, len(indice_no))
+                ib = indice_no.setdefault(b, len(indice_no))
+                if sentido >= 0:
+                    origem.append(ia); destino.append(ib)
+                    custos.append(custo); flags_arestas.append(flags); nomes_arestas.append(indice_nome[nome])
+                if sentido <= 0:
+                    origem.append(ib); destino.append(ia)
+                    custos.append(custo); flags_arestas.append(flags); nomes_arestas.append(indice_nome[nome])
+
+        ids = np.fromiter(indice_no.keys(), dtype=np.int64, count=len(indice_no))
+        lat = np.array([coords[i][0] for i in ids], dtype=np.float64)
+        lng = np.array([coords[i][1] for i in ids], dtype=np.float64)
+
+        origem = np.asarray(origem, dtype=np.int64)
+        destino = np.asarray(destino, dtype=np.int32)
+        comprimento = distancias_m(lat[origem], lng[origem], lat[destino], lng[destino]).astype(np.float32)
+        custo = comprimento * np.asarray(custos, dtype=np.float32)
+
+        ordem = np.argsort(origem, kind="stable")
+        indptr = np.zeros(len(lat) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(origem, minlength=len(lat)), out=indptr[1:])
+
+        return cls(
+            lat, lng, indptr, destino[ordem], comprimento[ordem], custo[ordem],
+            np.asarray(flags_arestas, dtype=np.uint8)[ordem],
+            np.asarray(nomes_arestas, dtype=np.int32)[ordem], nomes
+        )
+
+    def salvar(self, caminho):
+        """Salva o grafo em .npz para carregamento rápido"""
+        np.savez_compressed(
+            caminho, lat=self.lat, lng=self.lng, indptr=self.indptr, indices=self.indices,
+            comprimento=self.comprimento, custo=self.custo, flags=self.flags,
+            nome_idx=self.nome_idx, nomes=np.array(self.nomes, dtype=str)
+        )
+
+    @classmethod
+    def carregar(cls, caminho):
+        """
+        Carrega o grafo de um .npz salvo ou de um extrato .osm
+
+        Args:
+            caminho (str): Caminho do arquivo
+
+        Returns:
+            GrafoViario: Grafo carregado
+        """
+        if not caminho.endswith(".npz"):
+            return cls.de_osm(caminho)
+        with np.load(caminho) as dados:
+            return cls(
+                dados["lat"], dados["lng"], dados["indptr"], dados["indices"], dados["comprimento"],
+                dados["custo"], dados["flags"], dados["nome_idx"], dados["nomes"].tolist()
+            )
+
+    def no_mais_proximo(self, lat, lng):
+        """
+        Encontra o nó do grafo mais próximo de uma coordenada
+
+        Args:
+            lat (float): Latitude
+            lng (float): Longitude
+
+        Returns:
+            int: Índice do nó
+        """
+        dy = (self.lat - lat) * METROS_POR_GRAU
+        dx = (self.lng - lng) * METROS_POR_GRAU * math.cos(math.radians(lat))
+        return int(np.argmin(dx * dx + dy * dy))
+
+    def localizar_rua(self, endereco):
+        """
+        Localiza offline a primeira via cujo nome aparece no endereço
+
+        Args:
+            endereco (str): Endereço em texto livre (ex: "Rua X, 123, São José dos Campos")
+
+        Returns:
+            int: Índice de um nó da via, ou None se nenhuma via corresponder
+        """
+        if self._nomes_normalizados is None:
+            self._nomes_normalizados = [_normalizar_nome(n) for n in self.nomes]
+        rua = _normalizar_nome(endereco.split(",")[0])
+        if not rua:
+            return None
+        for idx, nome in enumerate(self._nomes_normalizados):
+            if nome and nome == rua:
+                arestas = np.flatnonzero(self.nome_idx == idx)
+                if len(arestas):
+                    return int(self.indices[arestas[0]])
+        return None
+
+    @property
+    def trechos(self):
+        """
+        Trecho (par de nós, sem sentido) de cada aresta: a → b e b → a têm o mesmo trecho
+
+        Returns:
+            np.ndarray: Identificador int64 do trecho de cada aresta
+        """
+        if self._trechos is None:
+            origens = self.origem_das_arestas(np.arange(self.num_arestas)).astype(np.int64)
+            destinos = self.indices.astype(np.int64)
+            pares = np.minimum(origens, destinos) * self.num_nos + np.maximum(origens, destinos)
+            self._trechos = np.unique(pares, return_inverse=True)[1].astype(np.int64)
+        return self._trechos
+
+    def _listas_python(self):
+        """Cópias em listas Python para o laço do A* (indexar arrays NumPy elemento a elemento é lento)"""
+        if self._listas is None:
+            self._listas = (
+                self.indptr.tolist(), self.indices.tolist(), self.custo.tolist(),
+                self.lat.tolist(), self.lng.tolist(), self.trechos.tolist()
+            )
+        return self._listas
+
+    def menor_caminho(self, origem, destino, penalizadas=None, penalidade=2.0):
+        """
+        Calcula o caminho de menor custo entre dois nós (A* com heurística de distância)
+
+        Args:
+            origem (int): Nó de origem
+            destino (int): Nó de destino
+            penalizadas (set): Trechos (ver trechos) cujo custo deve ser multiplicado nos dois
+                sentidos, de modo que voltar pela via da ida também custa mais
+            penalidade (float): Multiplicador de custo das arestas penalizadas
+
+        Returns:
+            list: Índices das arestas do caminho, ou None se não houver caminho
+        """
+        if origem == destino:
+            return []
+        indptr, indices, custo, lat, lng, trechos = self._listas_python()
+        lat_d, lng_d = lat[destino], lng[destino]
+        escala_lng = math.cos(math.radians(lat_d))
+        fator_h = METROS_POR_GRAU * CUSTO_MINIMO * 0.99
+
+        def heuristica(v):
+            dy = lat[v] - lat_d
+            dx = (lng[v] - lng_d) * escala_lng
+            return math.sqrt(dx * dx + dy * dy) * fator_h
+
+        melhor = {origem: 0.0}
+        anterior = {}
+        heap = [(heuristica(origem), 0.0, origem)]
+        while heap:
+            _, g, u = heapq.heappop(heap)
+            if u == destino:
+                break
+            if g > melhor[u]:
+                continue
+            for e in range(indptr[u], indptr[u + 1]):
+                v = indices[e]
+                w = custo[e]
+                if penalizadas and trechos[e] in penalizadas:
+                    w *= penalidade
+                ng = g + w
+                if ng < melhor.get(v, math.inf):
+                    melhor[v] = ng
+                    anterior[v] = (u, e)
+                    heapq.heappush(heap, (ng + heuristica(v), ng, v))
+
+        if destino not in anterior:
+            return None
+        arestas = []
+        v = destino
+        while v != origem:
+            v, e = anterior[v]
+            arestas.append(e)
+        arestas.reverse()
+        return arestas
+
+    def origem_das_arestas(self, arestas):
+        """Retorna o nó de origem de cada aresta (busca vetorizada no indptr)"""
+        return np.searchsorted(self.indptr, np.asarray(arestas, dtype=np.int64), side="right") - 1
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 3:
+        print("Uso: python -m utils.osm_graph <extrato.osm> <grafo.npz>")
+        sys.exit(1)
+    grafo = GrafoViario.de_osm(sys.argv[1])
+    grafo.salvar(sys.argv[2])
+    print(f"Grafo salvo em {sys.argv[2]}: {grafo.num_nos} nós, {grafo.num_arestas} arestas")
@@ -0,0 +1,111 @@
+"""
+Codificação e decodificação vetorizadas de polylines do Google.
+
+O formato guarda cada coordenada como diferença para o ponto anterior, em
+inteiros (×1e5) com zigue-zague e divididos em blocos de 5 bits. Aqui os blocos
+são tratados como arrays NumPy (agrupamento por fim de valor, reduceat e soma
+acumulada), sem laço Python por ponto, e a geometria da rota vira um array
+float64 de forma (n, 2) com colunas lat e lng.
+"""
+import numpy as np
+
+# Casas decimais do formato padrão do Google
+PRECISAO_PADRAO = 5
+
+# Blocos de 5 bits suficientes para qualquer delta de 32 bits
+_MAX_BLOCOS = 7
+
+
+def decodificar(texto, precisao=PRECISAO_PADRAO):
+    """
+    Decodifica uma polyline codificada
+
+    Args:
+        texto (str): Polyline codificada (ex.: overview_polyline.points)
+        precisao (int): Casas decimais usadas na codificação
+
+    Returns:
+        np.ndarray: Array float64 (n, 2) com lat e lng
+    """
+    if not texto:
+        return np.empty((0, 2), dtype=np.float64)
+    blocos = np.frombuffer(texto.encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+
+    # Cada valor termina no primeiro bloco sem o bit de continuação (0x20)
+    fins = np.flatnonzero(blocos < 0x20)
+    inicios = np.concatenate(([0], fins[:-1] + 1))
+    posicao = np.arange(blocos.size) - np.repeat(inicios, fins - inicios + 1)
+    valores = np.add.reduceat((blocos & 0x1F) << (5 * posicao), inicios)
+
+    # Zigue-zague: bit menos significativo indica valor negativo
+    deltas = np.where(valores & 1, ~(valores >> 1), valores >> 1)
+    if deltas.size % 2:
+        raise ValueError("Polyline inválida: número ímpar de valores")
+    return np.cumsum(deltas.reshape(-1, 2), axis=0) / 10.0 ** precisao
+
+
+def codificar(pontos, precisao=PRECISAO_PADRAO):
+    """
+    Codifica coordenadas no formato de polyline do Google
+
+    Args:
+        pontos: Array (n, 2) ou sequência de pares (lat, lng)
+        precisao (int): Casas decimais da codificação
+
+    Returns:
+        str: Polyline codificada
+    """
+    pontos = np.asarray(pontos, dtype=np.float64).reshape(-1, 2)
+    if pontos.size == 0:
+        return ""
+    inteiros = np.round(pontos * 10.0 ** precisao).astype(np.int64)
+    deltas = np.diff(inteiros, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    valores = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+    # Blocos de 5 bits de cada valor; só os necessários são emitidos
+    blocos = (valores[:, None] >> (5 * np.arange(_MAX_BLOCOS))) & 0x1F
+    necessarios = np.maximum(1, (_bits(valores) + 4) // 5)
+    indice = np.arange(_MAX_BLOCOS)
+    emitir = indice < necessarios[:, None]
+    continua = indice < (necessarios - 1)[:, None]
+    caracteres = (blocos | np.where(continua, 0x20, 0)) + 63
+    return caracteres[emitir].astype(np.uint8).tobytes().decode("ascii")
+
+
+def _bits(valores):
+    """Número de bits significativos de inteiros não negativos (valores < 2**53)"""
+    return np.frexp(valores.astype(np.float64))[1].astype(np.int64)
+
+
+def geometria_rota(route):
+    """
+    Geometria detalhada de uma resposta do Directions
+
+    Usa as polylines dos passos (mais detalhadas); sem elas, a overview_polyline;
+    sem nenhuma, o início de cada passo e o fim de cada perna.
+
+    Args:
+        route (list): Resposta de gmaps.directions
+
+    Returns:
+        np.ndarray: Array float64 (n, 2) com lat e lng ao longo da rota
+    """
+    if not route:
+        return np.empty((0, 2), dtype=np.float64)
+    passos = [step for leg in route[0]["legs"] for step in leg.get("steps", [])]
+    if passos and all(step.get("polyline", {}).get("points") for step in passos):
+        trechos = [decodificar(step["polyline"]["points"]) for step in passos]
+        # O fim de cada passo repete o início do seguinte
+        trechos = [trechos[0]] + [t[1:] for t in trechos[1:]]
+        return np.concatenate(trechos)
+
+    overview = route[0].get("overview_polyline", {}).get("points")
+    if overview:
+        return decodificar(overview)
+
+    pontos = []
+    for leg in route[0]["legs"]:
+        for step in leg.get("steps", []):
+            pontos.append((step["start_location"]["lat"], step["start_location"]["lng"]))
+        pontos.append((leg["end_location"]["lat"], leg["end_location"]["lng"]))
+    return np.array(pontos, dtype=np.float64).reshape(-1, 2)
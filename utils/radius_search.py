@@ -0,0 +1,232 @@
+"""
+Busca unidimensional do fator de deslocamento dos waypoints.
+
+A distância da rota circular cresce aproximadamente de forma monotônica com o
+deslocamento dos waypoints em relação à origem. Em vez de varrer uma grade fixa de
+multiplicadores, tratamos "km da rota em função do fator" como um problema de raiz
+e convergimos para a distância solicitada com passos de secante, mantendo um
+intervalo (bracket) entre um fator curto demais e um longo demais.
+"""
+from utils.route_budget import OrcamentoEsgotado
+from utils.route_candidates import (
+    TOLERANCIA_KM, candidatos_pontos_cardeais, distancia_rota_km, rota_satisfatoria
+)
+
+# Número máximo de chamadas à API por busca
+MAX_CHAMADAS = 6
+
+# Limites de segurança para o fator em relação ao fator inicial
+FATOR_MIN_RELATIVO = 0.1
+FATOR_MAX_RELATIVO = 4.0
+
+
+def avaliador_de_fator(gmaps, origem, start_lat, start_lng, lat_bias=1.0, lng_bias=1.0, combinacao="NE"):
+    """
+    Cria a função km(fator) para uma combinação fixa de pontos cardeais
+
+    Args:
+        gmaps: Cliente do Google Maps
+        origem (str): Endereço ou coordenada de origem (e retorno)
+        start_lat (float): Latitude da origem
+        start_lng (float): Longitude da origem
+        lat_bias (float): Multiplicador do deslocamento norte/sul
+        lng_bias (float): Multiplicador do deslocamento leste/oeste
+        combinacao (str): Combinação de pontos cardeais (ex: "NE")
+
+    Returns:
+        callable: avaliar(fator) -> dict com route, distance e waypoints (ou None)
+    """
+    def avaliar(fator):
+        waypoints = candidatos_pontos_cardeais(
+            start_lat, start_lng, fator, lat_bias=lat_bias, lng_bias=lng_bias, combinacoes=[combinacao]
+        )[0]
+        route = gmaps.directions(
+            origin=origem,
+            destination=origem,
+            waypoints=waypoints,
+            mode="bicycling",
+            optimize_waypoints=True
+        )
+        if not route:
+            return None
+        return {"route": route, "distance": distancia_rota_km(route), "waypoints": waypoints}
+
+    return avaliar
+
+
+def avaliador_de_fator_async(gmaps, origem, start_lat, start_lng, lat_bias=1.0, lng_bias=1.0, combinacao="NE"):
+    """
+    Versão assíncrona de avaliador_de_fator para clientes com métodos async
+
+    Returns:
+        callable: corrotina avaliar(fator) -> dict com route, distance e waypoints (ou None)
+    """
+    async def avaliar(fator):
+        waypoints = candidatos_pontos_cardeais(
+            start_lat, start_lng, fator, lat_bias=lat_bias, lng_bias=lng_bias, combinacoes=[combinacao]
+        )[0]
+        route = await gmaps.directions(
+            origin=origem,
+            destination=origem,
+            waypoints=waypoints,
+            mode="bicycling",
+            optimize_waypoints=True
+        )
+        if not route:
+            return None
+        return {"route": route, "distance": distancia_rota_km(route), "waypoints": waypoints}
+
+    return avaliar
+
+
+class BuscaSecante:
+    """
+    Estado da busca secante com bracketing, independente de como o fator é avaliado
+
+    proximo_fator() indica o fator a testar e registrar() recebe o resultado; assim
+    a mesma busca é conduzida por avaliações síncronas (buscar_fator_secante) ou
+    assíncronas (EstrategiaSecante.buscar_async).
+    """
+
+    def __init__(self, distancia, fator_inicial, tolerancia=TOLERANCIA_KM, max_chamadas=MAX_CHAMADAS):
+        """
+        Args:
+            distancia (float): Distância solicitada em km
+            fator_inicial (float): Primeiro fator a testar
+            tolerancia (float): Tolerância máxima em km
+            max_chamadas (int): Número máximo de avaliações
+        """
+        self.distancia = distancia
+        self.tolerancia = tolerancia
+        self.max_chamadas = max_chamadas
+        self.alvo = distancia - tolerancia / 2
+        self.fator_min = fator_inicial * FATOR_MIN_RELATIVO
+        self.fator_max = fator_inicial * FATOR_MAX_RELATIVO
+
+        self.melhor = None
+        self.chamadas = 0
+        self.historico = []  # (fator, distância) das avaliações bem-sucedidas
+        self.curto = None    # maior fator conhecido com rota abaixo do alvo
+        self.longo = None    # menor fator conhecido com rota acima do alvo
+        self.fator = fator_inicial
+        self.concluida = False
+
+    def proximo_fator(self, orcamento=None):
+        """
+        Returns:
+            float: Próximo fator a avaliar, ou None se a busca terminou
+        """
+        if self.concluida or self.chamadas >= self.max_chamadas:
+            return None
+        if orcamento is not None and orcamento.esgotado:
+            return None
+        self.chamadas += 1
+        return self.fator
+
+    def registrar(self, candidato):
+        """
+        Registra a avaliação do fator devolvido por proximo_fator()
+
+        Args:
+            candidato (dict): Resultado com a chave distance, ou None se a avaliação falhou
+        """
+        fator = self.fator
+        if candidato is None:
+            # Perturbar levemente o fator para escapar de um ponto sem rota
+            self.fator = min(self.fator_max, fator * 1.05)
+            return
+
+        km = candidato["distance"]
+        candidato["diff"] = abs(km - self.distancia)
+        candidato["fator"] = fator
+        self.historico.append((fator, km))
+
+        # Mesma regra de seleção da grade: nunca ultrapassar a distância + tolerância
+        if km <= self.distancia + self.tolerancia and (
+                self.melhor is None or _preferivel(candidato, self.melhor, self.distancia, self.tolerancia)):
+            self.melhor = candidato
+        if rota_satisfatoria(km, self.distancia, self.tolerancia):
+            self.concluida = True
+            return
+
+        if km < self.alvo:
+            self.curto = (fator, km) if self.curto is None or fator > self.curto[0] else self.curto
+        else:
+            self.longo = (fator, km) if self.longo is None or fator < self.longo[0] else self.longo
+
+        proximo = _proximo_fator(self.historico, self.alvo, self.curto, self.longo)
+        self.fator = max(self.fator_min, min(self.fator_max, proximo))
+
+    def resultado(self):
+        """
+        Returns:
+            dict: Melhor candidato (com as chaves diff, fator e chamadas) ou None
+        """
+        if self.melhor is not None:
+            self.melhor["chamadas"] = self.chamadas
+        return self.melhor
+
+
+def buscar_fator_secante(avaliar, distancia, fator_inicial, tolerancia=TOLERANCIA_KM, max_chamadas=MAX_CHAMADAS,
+                         orcamento=None):
+    """
+    Converge para o fator cuja rota tem a distância solicitada usando secante com bracketing
+
+    O alvo interno fica no meio da faixa preferida [distancia - tolerancia, distancia],
+    de modo que a busca tende a parar em rotas que não ultrapassam a distância pedida.
+
+    Args:
+        avaliar (callable): avaliar(fator) -> dict com a chave distance (ou None em caso de falha)
+        distancia (float): Distância solicitada em km
+        fator_inicial (float): Primeiro fator a testar
+        tolerancia (float): Tolerância máxima em km
+        max_chamadas (int): Número máximo de avaliações
+        orcamento (OrcamentoBusca): Limite de chamadas e de tempo da requisição; ao se
+            esgotar, devolve o melhor candidato até ali
+
+    Returns:
+        dict: Melhor candidato (com as chaves diff, fator e chamadas) ou None se nenhuma
+            avaliação teve sucesso
+    """
+    busca = BuscaSecante(distancia, fator_inicial, tolerancia=tolerancia, max_chamadas=max_chamadas)
+    while (fator := busca.proximo_fator(orcamento)) is not None:
+        try:
+            candidato = avaliar(fator)
+        except OrcamentoEsgotado:
+            break
+        except Exception as e:
+            print(f"Erro ao gerar rota teste: {str(e)}")
+            candidato = None
+        busca.registrar(candidato)
+    return busca.resultado()
+
+
+def _preferivel(candidato, atual, distancia, tolerancia=TOLERANCIA_KM):
+    """
+    Entre rotas dentro da tolerância, prefere as que não ultrapassam a distância;
+    nos demais casos, a menor diferença
+    """
+    if candidato["diff"] <= tolerancia and atual["diff"] <= tolerancia:
+        abaixo_candidato = candidato["distance"] <= distancia
+        abaixo_atual = atual["distance"] <= distancia
+        if abaixo_candidato != abaixo_atual:
+            return abaixo_candidato
+    return candidato["diff"] < atual["diff"]
+
+
+def _proximo_fator(historico, alvo, curto, longo):
+    """Calcula o próximo fator: secante entre os dois últimos pontos, limitada ao bracket"""
+    fator, km = historico[-1]
+    if len(historico) == 1 or historico[-1][1] == historico[-2][1]:
+        # Sem inclinação conhecida: supor distância proporcional ao fator
+        proximo = fator * alvo / km if km > 0 else fator * 2
+    else:
+        f0, d0 = historico[-2]
+        proximo = fator + (alvo - km) * (fator - f0) / (km - d0)
+
+    if curto is not None and longo is not None:
+        baixo, alto = curto[0], longo[0]
+        if not (min(baixo, alto) < proximo < max(baixo, alto)):
+            # Secante saiu do intervalo (curva não monotônica): usar falsa posição
+            proximo = baixo + (alvo - curto[1]) * (alto - baixo) / (longo[1] - curto[1])
+    return proximo
@@ -0,0 +1,111 @@
+"""
+Limite de taxa das chamadas à API do Google Maps.
+
+Um LimitadorTaxa (balde de fichas) é compartilhado pelas threads de um processo;
+o ClienteComLimite espera uma ficha antes de cada chamada real. Quando o cliente
+tem cache, o limite é aplicado por baixo dele: respostas do cache não esperam.
+"""
+import time
+import threading
+
+from utils.maps_cache import ClienteMapsComCache
+
+
+class LimitadorTaxa:
+    """Balde de fichas: no máximo `taxa` chamadas por segundo, com rajadas de até `rajada`"""
+
+    def __init__(self, taxa, rajada=None):
+        """
+        Args:
+            taxa (float): Chamadas por segundo
+            rajada (float): Fichas acumuláveis (padrão: um segundo de chamadas, no mínimo 1)
+        """
+        self.taxa = float(taxa)
+        self.rajada = float(rajada) if rajada is not None else max(1.0, self.taxa)
+        self.esperas = 0
+        self.segundos_espera = 0.0
+        self._fichas = self.rajada
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        """
+        Reserva uma ficha, esperando se o balde estiver vazio
+
+        Returns:
+            float: Segundos de espera
+        """
+        with self._lock:
+            agora = time.monotonic()
+            self._fichas = min(self.rajada, self._fichas + (agora - self._ultimo) * self.taxa)
+            self._ultimo = agora
+            # A ficha é reservada já: chamadas concorrentes esperam em fila, sem disputa
+            self._fichas -= 1
+            espera = -self._fichas / self.taxa if self._fichas < 0 else 0.0
+            if espera > 0:
+                self.esperas += 1
+                self.segundos_espera += espera
+        if espera > 0:
+            time.sleep(espera)
+        return espera
+
+    def estatisticas(self):
+        """
+        Returns:
+            dict: Taxa, número de esperas e tempo total esperado
+        """
+        with self._lock:
+            return {"taxa": self.taxa, "esperas": self.esperas, "segundos_espera": round(self.segundos_espera, 2)}
+
+
+class ClienteComLimite:
+    """
+    Envolve um cliente do Maps esperando o limitador antes de cada chamada à API
+
+    Os demais atributos são repassados ao cliente original.
+    """
+
+    def __init__(self, cliente, limitador):
+        self.cliente = cliente
+        self.limitador = limitador
+
+    def directions(self, *args, **kwargs):
+        self.limitador.aguardar()
+        return self.cliente.directions(*args, **kwargs)
+
+    def distance_matrix(self, *args, **kwargs):
+        self.limitador.aguardar()
+        return self.cliente.distance_matrix(*args, **kwargs)
+
+    def geocode(self, *args, **kwargs):
+        self.limitador.aguardar()
+        return self.cliente.geocode(*args, **kwargs)
+
+    def elevation(self, *args, **kwargs):
+        self.limitador.aguardar()
+        return self.cliente.elevation(*args, **kwargs)
+
+    def elevation_along_path(self, *args, **kwargs):
+        self.limitador.aguardar()
+        return self.cliente.elevation_along_path(*args, **kwargs)
+
+    def __getattr__(self, nome):
+        return getattr(self.cliente, nome)
+
+
+def com_limite(cliente, limitador):
+    """
+    Aplica um limite de taxa a um cliente do Maps, por baixo do cache se houver
+
+    Args:
+        cliente: Cliente do Google Maps (com ou sem cache)
+        limitador (LimitadorTaxa): Limitador compartilhado (None = cliente inalterado)
+
+    Returns:
+        Cliente com o limite aplicado
+    """
+    if limitador is None or cliente is None:
+        return cliente
+    if isinstance(cliente, ClienteMapsComCache):
+        return ClienteMapsComCache(ClienteComLimite(cliente.cliente, limitador), cliente.cache)
+    return ClienteComLimite(cliente, limitador)
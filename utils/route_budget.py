@@ -0,0 +1,147 @@
+"""
+Orçamento de chamadas e de tempo por requisição de rota.
+
+Cada carregamento de página cria um OrcamentoBusca que limita quantas chamadas
+reais à API de rotas podem ser feitas e por quanto tempo a busca pode rodar.
+Os geradores consultam o orçamento entre as tentativas e, quando ele se esgota,
+param e devolvem a melhor rota encontrada até ali.
+"""
+import time
+import threading
+
+from utils.maps_cache import ClienteMapsComCache
+
+# Limites por modo de busca escolhido no formulário
+MODOS_BUSCA = {
+    "rapido": {"max_chamadas": 12, "max_segundos": 8.0},
+    "preciso": {"max_chamadas": 80, "max_segundos": 45.0},
+}
+
+MODO_PADRAO = "preciso"
+
+
+class OrcamentoEsgotado(Exception):
+    """Levantada quando uma chamada à API é recusada por falta de orçamento"""
+
+
+class OrcamentoBusca:
+    """Limite de chamadas à API de rotas e de tempo de parede para uma requisição"""
+
+    def __init__(self, max_chamadas=None, max_segundos=None):
+        """
+        Args:
+            max_chamadas (int): Número máximo de chamadas reais à API (None = sem limite)
+            max_segundos (float): Tempo máximo de busca em segundos (None = sem limite)
+        """
+        self.max_chamadas = max_chamadas
+        self.max_segundos = max_segundos
+        self.chamadas = 0
+        self.recusadas = 0
+        self.inicio = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def de_modo(cls, modo):
+        """
+        Cria o orçamento de um modo de busca ("rapido" ou "preciso")
+
+        Args:
+            modo (str): Nome do modo (valores desconhecidos usam MODO_PADRAO)
+
+        Returns:
+            OrcamentoBusca: Orçamento com os limites do modo
+        """
+        return cls(**MODOS_BUSCA.get(modo, MODOS_BUSCA[MODO_PADRAO]))
+
+    @property
+    def decorrido(self):
+        """Segundos desde a criação do orçamento"""
+        return time.monotonic() - self.inicio
+
+    @property
+    def tempo_restante(self):
+        """Segundos restantes (None se não houver limite de tempo)"""
+        if self.max_segundos is None:
+            return None
+        return max(0.0, self.max_segundos - self.decorrido)
+
+    @property
+    def esgotado(self):
+        """True se o limite de chamadas ou de tempo foi atingido"""
+        if self.max_chamadas is not None and self.chamadas >= self.max_chamadas:
+            return True
+        return self.tempo_restante == 0.0
+
+    def reservar(self):
+        """
+        Reserva uma chamada à API
+
+        Returns:
+            bool: True se a chamada pode ser feita; False se o orçamento acabou
+        """
+        with self._lock:
+            if self.esgotado:
+                self.recusadas += 1
+                return False
+            self.chamadas += 1
+            return True
+
+    def estatisticas(self):
+        """
+        Returns:
+            dict: Chamadas feitas, recusadas, tempo decorrido e se o orçamento se esgotou
+        """
+        return {
+            "chamadas": self.chamadas,
+            "recusadas": self.recusadas,
+            "segundos": round(self.decorrido, 2),
+            "esgotado": self.esgotado,
+        }
+
+
+class ClienteComOrcamento:
+    """
+    Envolve um cliente do Maps descontando cada chamada de rotas (ou de matriz de
+    distâncias) do orçamento.
+
+    Sem orçamento, a chamada levanta OrcamentoEsgotado. Os demais métodos são
+    repassados ao cliente original.
+    """
+
+    def __init__(self, cliente, orcamento):
+        self.cliente = cliente
+        self.orcamento = orcamento
+
+    def directions(self, *args, **kwargs):
+        if not self.orcamento.reservar():
+            raise OrcamentoEsgotado(f"Orçamento da busca esgotado ({self.orcamento.chamadas} chamadas)")
+        return self.cliente.directions(*args, **kwargs)
+
+    def distance_matrix(self, *args, **kwargs):
+        if not self.orcamento.reservar():
+            raise OrcamentoEsgotado(f"Orçamento da busca esgotado ({self.orcamento.chamadas} chamadas)")
+        return self.cliente.distance_matrix(*args, **kwargs)
+
+    def __getattr__(self, nome):
+        return getattr(self.cliente, nome)
+
+
+def com_orcamento(cliente, orcamento):
+    """
+    Aplica um orçamento a um cliente do Maps
+
+    Quando o cliente tem cache, o orçamento é aplicado por baixo dele: respostas
+    vindas do cache não consomem chamadas.
+
+    Args:
+        cliente: Cliente do Google Maps (com ou sem cache)
+        orcamento (OrcamentoBusca): Orçamento da requisição (None = cliente inalterado)
+
+    Returns:
+        Cliente com o orçamento aplicado
+    """
+    if orcamento is None:
+        return cliente
+    if isinstance(cliente, ClienteMapsComCache):
+        return ClienteMapsComCache(ClienteComOrcamento(cliente.cliente, orcamento), cliente.cache)
+    return ClienteComOrcamento(cliente, orcamento)
@@ -0,0 +1,537 @@
+"""
+Módulo para avaliar candidatos de rota circular em paralelo.
+
+Cada candidato é um conjunto de waypoints; a avaliação consiste em pedir a rota
+origem → waypoints → origem ao Google Maps e comparar a distância obtida com a
+distância solicitada. As chamadas são distribuídas em um pool de threads limitado
+e nenhum candidato novo é submetido depois da primeira rota satisfatória (com
+pontuação, as chamadas já em andamento terminam e entram na comparação).
+"""
+import math
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+from utils.dem import modelo_elevacao_padrao
+from utils.geodesia import METROS_POR_GRAU, metros_para_graus
+from utils.polyline import geometria_rota
+from utils.route_budget import OrcamentoEsgotado
+from utils.route_fingerprint import DetectorDuplicatas
+
+# Tolerância máxima (em km) entre a distância da rota e a distância solicitada
+TOLERANCIA_KM = 2.0
+
+# Número máximo de chamadas simultâneas à API de rotas
+MAX_WORKERS = 6
+
+# Chamadas simultâneas da busca assíncrona (sem uma thread por chamada)
+MAX_CONCORRENCIA_ASYNC = 16
+
+# Razão típica entre a distância pela malha viária e a distância em linha reta
+CIRCUIDADE_URBANA = 1.3
+
+# Multiplicadores do fator base usados na varredura em grade
+MULTIPLICADORES_GRADE = [0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.1, 1.2, 1.3, 1.4]
+
+# Perfis de ciclista para personalizar a rota
+CICLISTA_FATORES = {
+    "Iniciante": 0.6,       # Iniciantes: rotas mais curtas
+    "Intermediário": 0.8,   # Intermediários: rotas médias
+    "Avançado": 1.0,        # Avançados: rotas completas
+    "Profissional": 1.2     # Profissionais: rotas mais desafiadoras
+}
+
+# Ajustes por estilo de pedalada
+# peso_subida soma-se à penalidade de subida do nível (negativo = prefere subir) e
+# peso_vias_principais penaliza avenidas e rodovias e peso_ciclovia, a parte da
+# rota fora de ciclovias e ciclofaixas (ver utils.route_scoring)
+ESTILO_AJUSTES = {
+    "urbano": {"lat_bias": 0.8, "lng_bias": 1.2,     # Urbano: áreas centrais
+               "peso_subida": 0.0, "peso_vias_principais": 0.2, "peso_ciclovia": 0.0},
+    "montanha": {"lat_bias": 1.5, "lng_bias": 0.8,   # Montanha: mais elevação
+                 "peso_subida": -0.3, "peso_vias_principais": 0.3, "peso_ciclovia": 0.0},
+    "parques": {"lat_bias": 1.2, "lng_bias": 1.0,    # Parques: equilibrado
+                "peso_subida": 0.0, "peso_vias_principais": 0.5, "peso_ciclovia": 0.0},
+    "familiar": {"lat_bias": 0.6, "lng_bias": 0.6,   # Familiar: rotas mais curtas
+                 "peso_subida": 0.3, "peso_vias_principais": 1.0, "peso_ciclovia": 0.8}
+}
+
+
+def distancia_rota_km(route):
+    """
+    Calcula a distância total de uma resposta do gmaps.directions
+
+    Args:
+        route (list): Resposta da API de rotas
+
+    Returns:
+        float: Distância total em km
+    """
+    return sum(leg['distance']['value'] for leg in route[0]['legs'])/1000
+
+
+def fator_inicial(distancia, perfil_fator=1.0, circuidade=CIRCUIDADE_URBANA):
+    """
+    Fator de deslocamento cujo circuito deve medir aproximadamente a distância pedida
+
+    Triângulo origem → N → E → origem com lados r, r√2 e r, vezes a circuidade.
+
+    Args:
+        distancia (float): Distância solicitada em km
+        perfil_fator (float): Fator do nível do ciclista (CICLISTA_FATORES)
+        circuidade (float): Circuidade da região (padrão: CIRCUIDADE_URBANA; ver
+            utils.circuity_model para a aprendida)
+
+    Returns:
+        float: Deslocamento em graus de latitude
+    """
+    raio_m = distancia * 1000 / ((2 + math.sqrt(2)) * circuidade)
+    return raio_m * perfil_fator / METROS_POR_GRAU
+
+
+def candidatos_pontos_cardeais(start_lat, start_lng, factor, lat_bias=1.0, lng_bias=1.0, combinacoes=None):
+    """
+    Gera conjuntos de waypoints cardeais ao redor da origem para um fator de deslocamento
+
+    Args:
+        start_lat (float): Latitude da origem
+        start_lng (float): Longitude da origem
+        factor (float): Deslocamento em graus de latitude a partir da origem (convertido
+            para graus de longitude na latitude da origem, mesma distância em metros)
+        lat_bias (float): Multiplicador do deslocamento norte/sul
+        lng_bias (float): Multiplicador do deslocamento leste/oeste
+        combinacoes (list): Pares de direções a usar (padrão: as seis combinações)
+
+    Returns:
+        list: Lista de conjuntos de waypoints no formato "lat,lng"
+    """
+    dlat, dlng = metros_para_graus(factor * lat_bias * METROS_POR_GRAU, factor * lng_bias * METROS_POR_GRAU, start_lat)
+    pontos = {
+        "N": f"{start_lat + dlat},{start_lng}",
+        "E": f"{start_lat},{start_lng + dlng}",
+        "S": f"{start_lat - dlat},{start_lng}",
+        "W": f"{start_lat},{start_lng - dlng}",
+    }
+    if combinacoes is None:
+        combinacoes = ["NE", "NW", "SE", "SW", "NS", "EW"]
+    return [[pontos[c] for c in combinacao] for combinacao in combinacoes]
+
+
+def rota_satisfatoria(test_distance, distancia, tolerancia=TOLERANCIA_KM):
+    """
+    Regra de parada da busca: dentro da tolerância e sem ultrapassar a distância solicitada
+
+    Args:
+        test_distance (float): Distância da rota candidata em km
+        distancia (float): Distância solicitada em km
+        tolerancia (float): Tolerância máxima em km
+
+    Returns:
+        bool: True se a rota pode ser aceita imediatamente
+    """
+    return abs(test_distance - distancia) <= tolerancia and test_distance <= distancia
+
+
+class SelecaoCandidatos:
+    """
+    Regras de escolha entre os candidatos avaliados de uma busca
+
+    Compartilhada pela busca com threads (avaliar_candidatos) e pela assíncrona
+    (avaliar_candidatos_async): rotas que ultrapassam a distância solicitada em mais
+    que a tolerância são descartadas, a primeira rota aceita (na ordem dos
+    candidatos) encerra a busca e, sem rota aceita, fica a de menor diferença.
+
+    Com pontuação, nenhum candidato novo é submetido depois da primeira rota
+    aceita, mas as chamadas já em andamento terminam (já foram pagas) e todas as
+    rotas aceitas são pontuadas juntas, na ordem dos candidatos; no empate fica a de
+    menor índice. Com janela (opcional), os candidatos seguintes à rota aceita de
+    menor índice também são avaliados, ao custo de chamadas extras, e a escolha não
+    depende da ordem em que as chamadas terminam.
+    """
+
+    def __init__(self, distancia, tolerancia=TOLERANCIA_KM, aceitar=None, descartar_excedentes=True, detector=None,
+                 pontuar=None, janela=None):
+        """
+        Args:
+            distancia (float): Distância solicitada em km
+            tolerancia (float): Tolerância máxima em km
+            aceitar (callable): Regra de parada aceitar(test_distance, distancia) -> bool
+                (padrão: rota_satisfatoria)
+            descartar_excedentes (bool): Se True, rotas acima de distancia + tolerancia
+                nunca são escolhidas como melhor rota
+            detector (DetectorDuplicatas): Detector onde as rotas recebidas são registradas
+            pontuar (callable): pontuar(candidatos) -> pontuações (utils.route_scoring); com
+                ela, entre as rotas aceitas fica a de menor pontuação, e não a primeira
+            janela (int): Candidatos avaliados a partir da rota aceita de menor índice
+                (padrão: nenhum além das chamadas em andamento, sem chamadas extras)
+        """
+        if aceitar is None:
+            aceitar = lambda test_distance, alvo: rota_satisfatoria(test_distance, alvo, tolerancia)
+        self.distancia = distancia
+        self.tolerancia = tolerancia
+        self.aceitar = aceitar
+        self.descartar_excedentes = descartar_excedentes
+        self.detector = detector
+        self.pontuar = pontuar
+        self.janela = None if janela is None else max(1, janela)
+        self.limite = None
+        self.avaliados = []
+        self.aceitos = []
+        self._melhor = None
+        self._escolhido = None
+        self.encontrou = False
+
+    @property
+    def melhor(self):
+        """Candidato escolhido até aqui (as rotas aceitas são pontuadas juntas)"""
+        if self.pontuar is None or not self.encontrou:
+            return self._melhor
+        if self._escolhido is None:
+            # Ordem dos candidatos: no empate, argmin fica com o de menor índice
+            comparados = sorted((c for c in self.aceitos if self.limite is None or c["indice"] < self.limite),
+                                key=lambda c: c["indice"])
+            if len(comparados) < 2:
+                self._escolhido = self._melhor
+            else:
+                self._escolhido = comparados[int(np.argmin(self.pontuar(comparados)))]
+        return self._escolhido
+
+    def precisa(self, indice, em_andamento=False):
+        """
+        Indica se o candidato ainda pode mudar a escolha
+
+        Args:
+            indice (int): Posição do candidato na lista original
+            em_andamento (bool): Se a chamada do candidato já foi feita
+
+        Returns:
+            bool: Depois da primeira rota aceita, False sem pontuação; com pontuação,
+                True só para as chamadas em andamento ou, com janela, para os
+                candidatos dentro dela
+        """
+        if not self.encontrou:
+            return True
+        if self.pontuar is None:
+            return False
+        if self.janela is None:
+            return em_andamento
+        return indice < self.limite
+
+    def registrar(self, indice, waypoints, test_route):
+        """
+        Considera a rota recebida para um candidato
+
+        Args:
+            indice (int): Posição do candidato na lista original
+            waypoints (list): Waypoints do candidato
+            test_route (list): Resposta da API de rotas (vazia se não houve rota)
+        """
+        if not test_route:
+            return
+        if self.detector is not None:
+            self.detector.registrar(waypoints, test_route)
+
+        test_distance = distancia_rota_km(test_route)
+        candidato = {
+            "route": test_route,
+            "distance": test_distance,
+            "diff": abs(test_distance - self.distancia),
+            "waypoints": waypoints,
+            "indice": indice
+        }
+        # Com o modelo de elevação local cada candidato recebe sua subida acumulada
+        modelo = modelo_elevacao_padrao()
+        if modelo is not None:
+            candidato["subida_m"] = modelo.subida_m(geometria_rota(test_route))
+        self.avaliados.append(candidato)
+
+        # Rotas que ultrapassam a distância em mais que a tolerância nunca são escolhidas
+        if self.descartar_excedentes and test_distance > self.distancia + self.tolerancia:
+            return
+
+        if self.aceitar(test_distance, self.distancia):
+            self.aceitos.append(candidato)
+            self._escolhido = None
+            if not self.encontrou or indice < self._melhor["indice"]:
+                self._melhor = candidato
+                if self.janela is not None:
+                    self.limite = indice + self.janela
+            self.encontrou = True
+        elif not self.encontrou and (self._melhor is None or candidato["diff"] < self._melhor["diff"]):
+            self._melhor = candidato
+
+    def relatar_duplicatas(self):
+        """Imprime as chamadas economizadas pela detecção de rotas repetidas"""
+        detector = self.detector
+        if detector is not None and (detector.puladas or detector.duplicatas):
+            estatisticas = detector.estatisticas()
+            print(f"Rotas repetidas: {estatisticas['puladas']} chamadas puladas, "
+                  f"{estatisticas['duplicatas']} duplicatas recebidas")
+
+
+def _avaliar(gmaps, origem, waypoints, optimize_waypoints):
+    """Executa uma chamada de rota para um candidato (roda dentro do pool)"""
+    return gmaps.directions(
+        origin=origem,
+        destination=origem,
+        waypoints=waypoints,
+        mode="bicycling",
+        optimize_waypoints=optimize_waypoints
+    )
+
+
+def avaliar_candidatos(gmaps, origem, candidatos, distancia, tolerancia=TOLERANCIA_KM,
+                       aceitar=None, max_workers=MAX_WORKERS, optimize_waypoints=True,
+                       descartar_excedentes=True, orcamento=None, deduplicar=True, detector=None, pontuar=None,
+                       filtro=None, janela=None):
+    """
+    Avalia candidatos de waypoints em paralelo e devolve a melhor rota encontrada
+
+    Os candidatos são submetidos na ordem recebida a um pool de threads limitado,
+    com no máximo max_workers chamadas em andamento. Assim que um candidato
+    satisfaz a regra de parada, os candidatos ainda não iniciados são descartados
+    (com pontuar, as chamadas em andamento terminam e entram na comparação; ver
+    SelecaoCandidatos).
+    Mantém as regras de seleção da busca sequencial: rotas que ultrapassam a
+    distância solicitada em mais que a tolerância são descartadas e, entre as
+    restantes, fica a de menor diferença.
+
+    Args:
+        gmaps: Cliente do Google Maps
+        origem (str): Endereço ou coordenada de origem (e retorno)
+        candidatos (list): Lista de conjuntos de waypoints
+        distancia (float): Distância solicitada em km
+        tolerancia (float): Tolerância máxima em km
+        aceitar (callable): Regra de parada aceitar(test_distance, distancia) -> bool
+            (padrão: rota_satisfatoria)
+        max_workers (int): Número máximo de chamadas simultâneas
+        optimize_waypoints (bool): Repassado ao gmaps.directions
+        descartar_excedentes (bool): Se True, rotas acima de distancia + tolerancia
+            nunca são escolhidas como melhor rota
+        orcamento (OrcamentoBusca): Limite de chamadas e de tempo; ao se esgotar, a
+            busca para e devolve o melhor candidato até ali
+        deduplicar (bool): Se True, pula candidatos que devem repetir uma rota já recebida
+        detector (DetectorDuplicatas): Detector a usar (permite compartilhar entre buscas)
+        pontuar (callable): Pontuação que desempata as rotas aceitas (ver SelecaoCandidatos)
+        janela (int): Candidatos avaliados para a pontuação a partir da primeira rota
+            aceita, com chamadas extras (padrão: só as chamadas em andamento)
+        filtro (FiltroPreditivo): Pré-filtro que pula os candidatos de distância prevista
+            fora da tolerância (utils.route_prefilter)
+
+    Returns:
+        tuple: (melhor candidato ou None, lista de candidatos avaliados). Cada
+            candidato é um dict com as chaves route, distance, diff e waypoints
+    """
+    if not candidatos:
+        return None, []
+    if detector is None and deduplicar:
+        detector = DetectorDuplicatas()
+    selecao = SelecaoCandidatos(distancia, tolerancia, aceitar, descartar_excedentes, detector, pontuar, janela)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(candidatos))))
+    fila = iter(enumerate(candidatos))
+    futures = {}
+
+    def submeter_proximo():
+        """Submete o próximo candidato da fila; mantém no máximo max_workers em andamento"""
+        if orcamento is not None and orcamento.esgotado:
+            return None
+        for indice, waypoints in fila:
+            if not selecao.precisa(indice):
+                # Depois da primeira rota aceita (ou fora da janela de comparação)
+                return None
+            if filtro is not None and filtro.descartar(waypoints):
+                # Perímetro × circuidade fora da tolerância: a rota seria curta ou longa demais
+                continue
+            if detector is not None and detector.prever_duplicata(waypoints):
+                # Mesmos pontos ajustados de uma rota já vista: a chamada repetiria a rota
+                continue
+            future = executor.submit(_avaliar, gmaps, origem, waypoints, optimize_waypoints)
+            futures[future] = (indice, waypoints)
+            return future
+        return None
+
+    vagas = max(1, min(max_workers, len(candidatos)))
+    try:
+        pendentes = set()
+        for _ in range(vagas):
+            future = submeter_proximo()
+            if future is not None:
+                pendentes.add(future)
+
+        while pendentes:
+            timeout = orcamento.tempo_restante if orcamento is not None else None
+            concluidos, pendentes = wait(pendentes, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not concluidos:
+                # Tempo da busca esgotado: ficar com o melhor candidato até aqui
+                print(f"Tempo de busca esgotado com {len(pendentes)} chamadas em andamento")
+                break
+
+            # Processar na ordem original para manter a preferência da busca sequencial
+            for future in sorted(concluidos, key=lambda f: futures[f][0]):
+                indice, waypoints = futures[future]
+                try:
+                    test_route = future.result()
+                except OrcamentoEsgotado:
+                    continue
+                except Exception as e:
+                    # Silenciosamente continuar para a próxima tentativa
+                    print(f"Erro ao gerar rota teste: {str(e)}")
+                    continue
+                selecao.registrar(indice, waypoints, test_route)
+
+            # Descartar as chamadas que já não mudam a escolha e repor as vagas liberadas
+            for future in [f for f in pendentes if not selecao.precisa(futures[f][0], em_andamento=True)]:
+                future.cancel()
+                pendentes.discard(future)
+            while len(pendentes) < vagas:
+                future = submeter_proximo()
+                if future is None:
+                    break
+                pendentes.add(future)
+    finally:
+        # Não esperar chamadas ainda em andamento: o resultado delas é descartado
+        executor.shutdown(wait=False, cancel_futures=True)
+    selecao.relatar_duplicatas()
+    return selecao.melhor, selecao.avaliados
+
+
+async def avaliar_candidatos_async(gmaps, origem, candidatos, distancia, tolerancia=TOLERANCIA_KM,
+                                   aceitar=None, max_concorrencia=MAX_CONCORRENCIA_ASYNC, optimize_waypoints=True,
+                                   descartar_excedentes=True, orcamento=None, deduplicar=True, detector=None,
+                                   pontuar=None, filtro=None, janela=None):
+    """
+    Versão assíncrona de avaliar_candidatos para clientes com métodos async (utils.maps_async)
+
+    As chamadas ficam no mesmo event loop, com no máximo max_concorrencia em
+    andamento; as regras de submissão, parada e escolha são as da versão com threads.
+
+    Args:
+        gmaps: Cliente assíncrono do Google Maps
+        max_concorrencia (int): Número máximo de chamadas simultâneas
+        (demais argumentos como em avaliar_candidatos)
+
+    Returns:
+        tuple: (melhor candidato ou None, lista de candidatos avaliados)
+    """
+    if not candidatos:
+        return None, []
+    if detector is None and deduplicar:
+        detector = DetectorDuplicatas()
+    selecao = SelecaoCandidatos(distancia, tolerancia, aceitar, descartar_excedentes, detector, pontuar, janela)
+
+    fila = iter(enumerate(candidatos))
+    tarefas = {}
+
+    def submeter_proximo():
+        """Cria a tarefa do próximo candidato da fila (None se acabou ou sem orçamento)"""
+        if orcamento is not None and orcamento.esgotado:
+            return None
+        for indice, waypoints in fila:
+            if not selecao.precisa(indice):
+                return None
+            if filtro is not None and filtro.descartar(waypoints):
+                continue
+            if detector is not None and detector.prever_duplicata(waypoints):
+                continue
+            tarefa = asyncio.ensure_future(gmaps.directions(
+                origin=origem, destination=origem, waypoints=waypoints,
+                mode="bicycling", optimize_waypoints=optimize_waypoints
+            ))
+            tarefas[tarefa] = (indice, waypoints)
+            return tarefa
+        return None
+
+    vagas = max(1, min(max_concorrencia, len(candidatos)))
+    pendentes = set()
+    try:
+        for _ in range(vagas):
+            tarefa = submeter_proximo()
+            if tarefa is not None:
+                pendentes.add(tarefa)
+
+        while pendentes:
+            timeout = orcamento.tempo_restante if orcamento is not None else None
+            concluidas, pendentes = await asyncio.wait(pendentes, timeout=timeout,
+                                                       return_when=asyncio.FIRST_COMPLETED)
+            if not concluidas:
+                print(f"Tempo de busca esgotado com {len(pendentes)} chamadas em andamento")
+                break
+
+            for tarefa in sorted(concluidas, key=lambda t: tarefas[t][0]):
+                indice, waypoints = tarefas[tarefa]
+                try:
+                    test_route = tarefa.result()
+                except OrcamentoEsgotado:
+                    continue
+                except Exception as e:
+                    print(f"Erro ao gerar rota teste: {str(e)}")
+                    continue
+                selecao.registrar(indice, waypoints, test_route)
+
+            for tarefa in [t for t in pendentes if not selecao.precisa(tarefas[t][0], em_andamento=True)]:
+                tarefa.cancel()
+                pendentes.discard(tarefa)
+            while len(pendentes) < vagas:
+                tarefa = submeter_proximo()
+                if tarefa is None:
+                    break
+                pendentes.add(tarefa)
+    finally:
+        # Chamadas ainda em andamento são canceladas: o resultado delas seria descartado
+        for tarefa in pendentes:
+            tarefa.cancel()
+    selecao.relatar_duplicatas()
+    return selecao.melhor, selecao.avaliados
+
+
+def candidatos_grade(start_lat, start_lng, distancia, perfil_fator=0.8, lat_bias=1.0, lng_bias=1.0,
+                     circuidade=CIRCUIDADE_URBANA):
+    """
+    Candidatos da varredura em grade, na ordem de preferência
+
+    Returns:
+        list: Conjuntos de waypoints (multiplicadores × seis combinações de pontos cardeais)
+    """
+    base_factor = fator_inicial(distancia, circuidade=circuidade)
+    candidatos = []
+    for factor_mult in MULTIPLICADORES_GRADE:
+        candidatos.extend(candidatos_pontos_cardeais(
+            start_lat, start_lng, base_factor * factor_mult * perfil_fator,
+            lat_bias=lat_bias, lng_bias=lng_bias
+        ))
+    return candidatos
+
+
+def buscar_rota_grade(gmaps, origem, start_lat, start_lng, distancia, perfil_fator=0.8,
+                      lat_bias=1.0, lng_bias=1.0, tolerancia=TOLERANCIA_KM, max_workers=MAX_WORKERS,
+                      orcamento=None, detector=None, pontuar=None, filtro=None, circuidade=CIRCUIDADE_URBANA):
+    """
+    Varredura em grade: todos os multiplicadores × seis combinações de pontos cardeais
+
+    Args:
+        gmaps: Cliente do Google Maps
+        origem (str): Endereço ou coordenada de origem (e retorno)
+        start_lat (float): Latitude da origem
+        start_lng (float): Longitude da origem
+        distancia (float): Distância solicitada em km
+        perfil_fator (float): Fator do nível do ciclista (CICLISTA_FATORES)
+        lat_bias (float): Ajuste norte/sul do estilo (ESTILO_AJUSTES)
+        lng_bias (float): Ajuste leste/oeste do estilo (ESTILO_AJUSTES)
+        tolerancia (float): Tolerância máxima em km
+        max_workers (int): Número máximo de chamadas simultâneas
+        orcamento (OrcamentoBusca): Limite de chamadas e de tempo da requisição
+        detector (DetectorDuplicatas): Detector de rotas repetidas compartilhado
+        pontuar (callable): Pontuação que desempata as rotas aceitas (utils.route_scoring)
+        filtro (FiltroPreditivo): Pré-filtro dos candidatos (utils.route_prefilter)
+        circuidade (float): Circuidade da região, que define o fator base
+
+    Returns:
+        dict: Melhor candidato (route, distance, diff, waypoints) ou None
+    """
+    candidatos = candidatos_grade(start_lat, start_lng, distancia, perfil_fator, lat_bias, lng_bias, circuidade)
+    melhor, _ = avaliar_candidatos(gmaps, origem, candidatos, distancia, tolerancia=tolerancia,
+                                   max_workers=max_workers, orcamento=orcamento, detector=detector,
+                                   pontuar=pontuar, filtro=filtro)
+    return melhor
@@ -0,0 +1,34 @@
+"""
+Motor único de rotas circulares.
+
+Substitui as cópias divergentes do algoritmo (app.gerar_rota_e_embed,
+rotas_curtas.gerar_rota_curta e new_route_function.gerar_rota_e_embed): as
+estratégias de busca são plugáveis, compartilham cache, orçamento e detecção de
+rotas repetidas, e o resultado é sempre um ResultadoRota. gerar_rota_circular_async
+executa as mesmas estratégias sobre um cliente HTTP assíncrono.
+"""
+from utils.route_engine.result import ResultadoRota
+from utils.route_engine.strategies import (
+    ContextoBusca, Estrategia, EstrategiaMarcos, EstrategiaBiblioteca, EstrategiaSecante, EstrategiaMatriz,
+    EstrategiaGrade, EstrategiaCurta, EstrategiaSimples, ESTRATEGIAS, estrategias_padrao
+)
+from utils.route_engine.engine import MotorRotas, gerar_rota_circular, gerar_rota_circular_async, cliente_maps
+
+__all__ = [
+    "ResultadoRota",
+    "ContextoBusca",
+    "Estrategia",
+    "EstrategiaMarcos",
+    "EstrategiaBiblioteca",
+    "EstrategiaSecante",
+    "EstrategiaMatriz",
+    "EstrategiaGrade",
+    "EstrategiaCurta",
+    "EstrategiaSimples",
+    "ESTRATEGIAS",
+    "estrategias_padrao",
+    "MotorRotas",
+    "gerar_rota_circular",
+    "gerar_rota_circular_async",
+    "cliente_maps",
+]
@@ -0,0 +1,250 @@
+"""
+Motor de rotas circulares: executa as estratégias em ordem sobre um único contexto.
+
+Todas as estratégias compartilham o mesmo cliente (com cache e orçamento), o mesmo
+detector de rotas repetidas e a mesma regra de escolha, e o resultado é sempre
+um ResultadoRota.
+"""
+import os
+
+from utils.circuity_model import com_aprendizado
+from utils.cycleways import cobertura_ciclovias
+from utils.maps_provider import cliente_maps
+from utils.maps_async import com_orcamento_async, criar_cliente_maps_async
+from utils.geocoding import geocodificar, geocodificar_async, como_latlng
+from utils.route_budget import OrcamentoBusca, OrcamentoEsgotado, MODO_PADRAO, com_orcamento
+from utils.route_candidates import TOLERANCIA_KM
+from utils.polyline import geometria_rota
+from utils.route_engine.result import ResultadoRota
+from utils.route_engine.strategies import ContextoBusca, ESTRATEGIAS, estrategias_padrao
+from utils.route_engine import render
+
+
+class MotorRotas:
+    """Executa uma sequência de estratégias e escolhe a rota da requisição"""
+
+    def __init__(self, estrategias, exigir_tolerancia=True):
+        """
+        Args:
+            estrategias (list): Instâncias de Estrategia (ou nomes em ESTRATEGIAS), na ordem
+            exigir_tolerancia (bool): Se True, rotas fora da tolerância só são aceitas
+                quando o orçamento se esgota
+        """
+        self.estrategias = [ESTRATEGIAS[e]() if isinstance(e, str) else e for e in estrategias]
+        self.exigir_tolerancia = exigir_tolerancia
+
+    def buscar(self, contexto):
+        """
+        Executa as estratégias até uma delas devolver rota dentro da tolerância
+
+        Args:
+            contexto (ContextoBusca): Dados da requisição
+
+        Returns:
+            dict: Candidato escolhido (com a chave estrategia) ou None
+        """
+        melhor = None
+        for estrategia in self.estrategias:
+            if contexto.orcamento is not None and contexto.orcamento.esgotado:
+                break
+            try:
+                candidato = estrategia.buscar(contexto)
+            except OrcamentoEsgotado:
+                break
+            except Exception as e:
+                print(f"Erro na estratégia {estrategia.nome}: {str(e)}")
+                continue
+            melhor, encerrar = self._considerar(melhor, candidato, estrategia, contexto)
+            if encerrar:
+                break
+        return self._decidir(melhor, contexto)
+
+    async def buscar_async(self, contexto):
+        """
+        Mesma busca de buscar(), com as estratégias assíncronas (contexto.gmaps assíncrono)
+
+        Args:
+            contexto (ContextoBusca): Dados da requisição
+
+        Returns:
+            dict: Candidato escolhido (com a chave estrategia) ou None
+        """
+        melhor = None
+        for estrategia in self.estrategias:
+            if contexto.orcamento is not None and contexto.orcamento.esgotado:
+                break
+            try:
+                candidato = await estrategia.buscar_async(contexto)
+            except OrcamentoEsgotado:
+                break
+            except Exception as e:
+                print(f"Erro na estratégia {estrategia.nome}: {str(e)}")
+                continue
+            melhor, encerrar = self._considerar(melhor, candidato, estrategia, contexto)
+            if encerrar:
+                break
+        return self._decidir(melhor, contexto)
+
+    @staticmethod
+    def _considerar(melhor, candidato, estrategia, contexto):
+        """
+        Returns:
+            tuple: (melhor candidato até aqui, True se a busca deve parar)
+        """
+        if not candidato:
+            return melhor, False
+        candidato["estrategia"] = estrategia.nome
+        if candidato["diff"] <= contexto.tolerancia:
+            # A primeira estratégia com rota dentro da tolerância tem preferência
+            return candidato, True
+        if melhor is None or candidato["diff"] < melhor["diff"]:
+            melhor = candidato
+        return melhor, False
+
+    def _decidir(self, melhor, contexto):
+        """Aplica a exigência de tolerância e confere o pré-filtro com a rota escolhida"""
+        escolhido = self._exigir_tolerancia(melhor, contexto)
+        if contexto.filtro is not None:
+            contexto.filtro.conferir(escolhido)
+        return escolhido
+
+    def _exigir_tolerancia(self, melhor, contexto):
+        """Aplica a exigência de tolerância ao melhor candidato das estratégias"""
+        if melhor is None or melhor["diff"] <= contexto.tolerancia or not self.exigir_tolerancia:
+            return melhor
+        if contexto.orcamento is not None and contexto.orcamento.esgotado:
+            print(f"Orçamento esgotado ({contexto.orcamento.estatisticas()}): "
+                  f"usando a melhor rota, de {melhor['distance']:.1f}km")
+            return melhor
+        print(f"ERRO: Nenhuma rota dentro da tolerância de ±{contexto.tolerancia:.0f}km foi encontrada. "
+              f"A melhor rota tem {melhor['distance']:.1f}km")
+        return None
+
+
+def gerar_rota_circular(origem, distancia=15, passos=None, nivel="Intermediário", estilo="urbano",
+                        origem_coords=None, estrategias=None, modo_busca="grade", orcamento=None,
+                        gmaps=None, exigir_tolerancia=True, trajeto_fechado=False):
+    """
+    Gera uma rota circular completa (busca, elevação, mapa e texto)
+
+    Args:
+        origem (str): Endereço de origem (e retorno) da rota
+        distancia (float): Distância desejada em km
+        passos (list): Pontos de referência do guia (estratégia de marcos)
+        nivel (str): Nível do ciclista
+        estilo (str): Estilo de pedalada
+        origem_coords (dict): Coordenadas já resolvidas da origem ({'lat', 'lng'})
+        estrategias (list): Estratégias ou nomes (padrão: estrategias_padrao(modo_busca))
+        modo_busca (str): "grade", "secante" ou "matriz" (usado apenas sem estrategias)
+        orcamento (OrcamentoBusca): Orçamento da requisição (padrão: modo "preciso")
+        gmaps: Cliente do Maps (padrão: cliente compartilhado com cache)
+        exigir_tolerancia (bool): Rejeitar rotas fora da tolerância de 2km
+        trajeto_fechado (bool): Destacar início e fim no texto
+
+    Returns:
+        ResultadoRota: Rota escolhida e sua apresentação (ou erro)
+    """
+    gmaps = gmaps if gmaps is not None else cliente_maps()
+    if gmaps is None:
+        return ResultadoRota(erro="Mapa não disponível sem a chave do Google Maps API")
+    if orcamento is None:
+        orcamento = OrcamentoBusca.de_modo(MODO_PADRAO)
+
+    # Resolver a origem uma única vez e usar lat/lng nas chamadas de rota
+    if origem_coords is None:
+        origem_coords = geocodificar(gmaps, origem)
+    origem_latlng = como_latlng(origem_coords) if origem_coords else origem
+
+    # Cada rota nova recebida alimenta o modelo de circuidade
+    contexto = ContextoBusca(
+        com_orcamento(com_aprendizado(gmaps), orcamento), origem, origem_latlng,
+        origem_coords['lat'] if origem_coords else None,
+        origem_coords['lng'] if origem_coords else None,
+        distancia, nivel=nivel, estilo=estilo, passos=passos,
+        tolerancia=TOLERANCIA_KM, orcamento=orcamento
+    )
+    motor = MotorRotas(estrategias if estrategias is not None else estrategias_padrao(modo_busca),
+                       exigir_tolerancia=exigir_tolerancia)
+    candidato = motor.buscar(contexto)
+    if not candidato:
+        return ResultadoRota(erro="Não foi possível gerar um roteiro para o endereço especificado.",
+                             chamadas=orcamento.chamadas)
+
+    return _montar_resultado(candidato, origem, orcamento, render.obter_elevacao(gmaps, candidato["route"]),
+                             trajeto_fechado)
+
+
+def _montar_resultado(candidato, origem, orcamento, elevation_data, trajeto_fechado):
+    """Monta o ResultadoRota do candidato escolhido (mapa, texto, elevação e ciclovias)"""
+    route = candidato["route"]
+    instrucoes = render.extrair_instrucoes(route)
+    geometria = geometria_rota(route)
+    ciclovias = cobertura_ciclovias(geometria)
+    chave_api = os.environ.get("GOOGLE_MAPS_API_KEY", "")
+    subida = f", {candidato['subida_m']:.0f}m de subida" if "subida_m" in candidato else ""
+    print(f"✓ Rota de {candidato['distance']:.1f}km{subida} pela estratégia {candidato['estrategia']} "
+          f"({orcamento.chamadas} chamadas)")
+    return ResultadoRota(
+        route=route,
+        distancia_km=candidato["distance"],
+        diff=candidato["diff"],
+        waypoints=candidato["waypoints"],
+        geometria=geometria,
+        estrategia=candidato["estrategia"],
+        mapa_html=render.gerar_mapa_html(route, origem, candidato["waypoints"], chave_api,
+                                         otimizar=candidato.get("otimizar", True)),
+        texto=render.gerar_texto_rota(origem, candidato["distance"], instrucoes, trajeto_fechado, ciclovias),
+        elevation_data=elevation_data,
+        ciclovias=ciclovias,
+        chamadas=orcamento.chamadas,
+    )
+
+
+async def gerar_rota_circular_async(origem, distancia=15, passos=None, nivel="Intermediário", estilo="urbano",
+                                    origem_coords=None, estrategias=None, modo_busca="grade", orcamento=None,
+                                    gmaps=None, exigir_tolerancia=True, trajeto_fechado=False):
+    """
+    Versão assíncrona de gerar_rota_circular (mesmos argumentos e mesmo resultado)
+
+    Geocodificação, rotas e elevação usam um cliente assíncrono (utils.maps_async):
+    os candidatos da grade são avaliados concorrentemente no mesmo event loop e
+    vários pedidos podem ser atendidos por um único loop.
+
+    Args:
+        gmaps: Cliente assíncrono (padrão: criar_cliente_maps_async(), fechado ao final)
+        (demais argumentos como em gerar_rota_circular)
+
+    Returns:
+        ResultadoRota: Rota escolhida e sua apresentação (ou erro)
+    """
+    proprio = gmaps is None
+    gmaps = gmaps if gmaps is not None else criar_cliente_maps_async()
+    if gmaps is None:
+        return ResultadoRota(erro="Mapa não disponível sem a chave do Google Maps API")
+    if orcamento is None:
+        orcamento = OrcamentoBusca.de_modo(MODO_PADRAO)
+
+    try:
+        if origem_coords is None:
+            origem_coords = await geocodificar_async(gmaps, origem)
+        origem_latlng = como_latlng(origem_coords) if origem_coords else origem
+
+        contexto = ContextoBusca(
+            com_orcamento_async(com_aprendizado(gmaps), orcamento), origem, origem_latlng,
+            origem_coords['lat'] if origem_coords else None,
+            origem_coords['lng'] if origem_coords else None,
+            distancia, nivel=nivel, estilo=estilo, passos=passos,
+            tolerancia=TOLERANCIA_KM, orcamento=orcamento
+        )
+        motor = MotorRotas(estrategias if estrategias is not None else estrategias_padrao(modo_busca),
+                           exigir_tolerancia=exigir_tolerancia)
+        candidato = await motor.buscar_async(contexto)
+        if not candidato:
+            return ResultadoRota(erro="Não foi possível gerar um roteiro para o endereço especificado.",
+                                 chamadas=orcamento.chamadas)
+
+        elevation_data = await render.obter_elevacao_async(gmaps, candidato["route"])
+        return _montar_resultado(candidato, origem, orcamento, elevation_data, trajeto_fechado)
+    finally:
+        if proprio:
+            await gmaps.aclose()
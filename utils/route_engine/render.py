@@ -0,0 +1,265 @@
+"""
+Apresentação da rota escolhida: instruções traduzidas, elevação, mapa e texto.
+"""
+import re
+import html
+import json
+
+import numpy as np
+
+from utils.cycleways import resumo_ciclovias
+from utils.dem import modelo_elevacao_padrao
+from utils.elevation import INTERVALO_AMOSTRAS_M, como_dados_grafico, perfil_elevacao, perfil_elevacao_async
+from utils.polyline import geometria_rota
+
+# Substituições de inglês para português aplicadas às instruções, em ordem
+TRADUCOES_INSTRUCOES = [
+    ("Turn right", "Vire à direita"),
+    ("Turn left", "Vire à esquerda"),
+    ("Continue onto", "Continue pela"),
+    ("Continue to follow", "Continue seguindo pela"),
+    ("Head", "Siga"),
+    ("Destination", "Destino"),
+    ("north", "norte"),
+    ("south", "sul"),
+    ("east", "leste"),
+    ("west", "oeste"),
+    ("Walk your bicycle", "Desça da bicicleta"),
+    ("toward", "em direção a"),
+    ("Pass by", "Passe por"),
+    ("on the right", "à direita"),
+    ("on the left", "à esquerda"),
+    ("in", "em"),
+    # Traduções adicionais (caso rota simplificada não funcione)
+    ("take the", "pegue a"),
+    ("exit", "saída"),
+    ("At the roundabout", "Na rotatória"),
+    ("At", "Em"),
+    ("roundabout", "rotatória"),
+    ("Enter", "Entre na"),
+    ("and", "e"),
+    ("the", "a"),
+    ("your", "sua"),
+    ("until", "até"),
+    ("will be", "estará"),
+    ("for", "por"),
+    ("next", "próximo"),
+    ("Slight", "Levemente"),
+    ("Keep", "Mantenha-se"),
+    ("right", "direita"),
+    ("left", "esquerda"),
+]
+
+# Estilo escuro do mapa do Google
+ESTILO_MAPA = """[
+        { "featureType": "all", "elementType": "labels.text.fill", "stylers": [{ "color": "#ffffff" }] },
+        { "featureType": "all", "elementType": "labels.text.stroke", "stylers": [{ "color": "#000000" }, { "lightness": 13 }] },
+        { "featureType": "administrative", "elementType": "geometry.fill", "stylers": [{ "color": "#000000" }] },
+        { "featureType": "administrative", "elementType": "geometry.stroke", "stylers": [{ "color": "#144b53" }, { "lightness": 14 }, { "weight": 1.4 }] },
+        { "featureType": "landscape", "elementType": "all", "stylers": [{ "color": "#08304b" }] },
+        { "featureType": "poi", "elementType": "geometry", "stylers": [{ "color": "#0c4152" }, { "lightness": 5 }] },
+        { "featureType": "road.highway", "elementType": "geometry.fill", "stylers": [{ "color": "#3498db" }] },
+        { "featureType": "road.highway", "elementType": "geometry.stroke", "stylers": [{ "color": "#2980b9" }, { "lightness": 25 }] },
+        { "featureType": "road.arterial", "elementType": "geometry.fill", "stylers": [{ "color": "#2c3e50" }] },
+        { "featureType": "road.arterial", "elementType": "geometry.stroke", "stylers": [{ "color": "#0b3d51" }, { "lightness": 16 }] },
+        { "featureType": "road.local", "elementType": "geometry", "stylers": [{ "color": "#000000" }] },
+        { "featureType": "transit", "elementType": "all", "stylers": [{ "color": "#146474" }] },
+        { "featureType": "water", "elementType": "all", "stylers": [{ "color": "#021019" }] }
+      ]"""
+
+
+def traduzir_instrucao(instrucao):
+    """
+    Traduz uma instrução da API de rotas para o português
+
+    Args:
+        instrucao (str): Instrução em texto puro
+
+    Returns:
+        str: Instrução traduzida
+    """
+    for original, traducao in TRADUCOES_INSTRUCOES:
+        instrucao = instrucao.replace(original, traducao)
+    return instrucao
+
+
+def extrair_instrucoes(route):
+    """
+    Instruções da rota em texto puro e traduzidas
+
+    Args:
+        route (list): Resposta de gmaps.directions
+
+    Returns:
+        list: Instruções traduzidas, na ordem da rota
+    """
+    ruas = [html.unescape(re.sub(r'<[^>]+>', '', step['html_instructions']))
+            for leg in route[0]['legs'] for step in leg['steps']]
+    return [traduzir_instrucao(rua) for rua in ruas]
+
+
+def _perfil_local(geometria, intervalo_m):
+    """Perfil pelo modelo de elevação local, ou None sem tiles ou se alguma amostra fica sem dado"""
+    modelo = modelo_elevacao_padrao()
+    if modelo is None:
+        return None
+    distancias_km, elevacoes = modelo.perfil(geometria, intervalo_m, descartar_vazios=False)
+    if np.isnan(elevacoes).any():
+        print(f"Rota fora dos tiles de elevação ({int(np.isnan(elevacoes).sum())} de {len(elevacoes)} "
+              "amostras): perfil pela API")
+        return None
+    return distancias_km, elevacoes
+
+
+def elevacao_geometria(gmaps, geometria, intervalo_m=INTERVALO_AMOSTRAS_M):
+    """
+    Perfil de elevação de uma geometria qualquer (ex.: rota do roteamento offline)
+
+    Com tiles em PEDALA_DEM_DIR o perfil vem do modelo local; se a geometria sai dos
+    tiles, o perfil inteiro vem da API de elevação; sem cliente (gmaps None), a rota
+    fica sem perfil.
+
+    Args:
+        gmaps: Cliente do Google Maps (ou None)
+        geometria (np.ndarray): Array (n, 2) com lat e lng
+        intervalo_m (float): Espaçamento entre as amostras em metros
+
+    Returns:
+        list: Dicts {'distance', 'elevation'} no formato do gráfico
+    """
+    perfil = _perfil_local(geometria, intervalo_m)
+    if perfil is not None:
+        return como_dados_grafico(*perfil)
+    if gmaps is None:
+        print("Perfil de elevação indisponível: sem tiles locais para a rota e sem cliente do Google Maps")
+        return []
+    return como_dados_grafico(*perfil_elevacao(gmaps, geometria, intervalo_m))
+
+
+def obter_elevacao(gmaps, route, intervalo_m=INTERVALO_AMOSTRAS_M):
+    """
+    Perfil de elevação da rota inteira, amostrado a intervalos fixos
+
+    Com tiles em PEDALA_DEM_DIR o perfil vem do modelo local, sem chamadas à API;
+    se a rota sai dos tiles (ou passa por vazios), o perfil inteiro vem da API, em
+    vez de um perfil cortado.
+
+    Args:
+        gmaps: Cliente do Google Maps
+        route (list): Resposta de gmaps.directions
+        intervalo_m (float): Espaçamento entre as amostras em metros
+
+    Returns:
+        list: Dicts {'distance', 'elevation'} no formato do gráfico
+    """
+    return elevacao_geometria(gmaps, geometria_rota(route), intervalo_m)
+
+
+async def obter_elevacao_async(gmaps, route, intervalo_m=INTERVALO_AMOSTRAS_M):
+    """
+    Versão assíncrona de obter_elevacao (trechos pedidos em paralelo)
+
+    Returns:
+        list: Dicts {'distance', 'elevation'} no formato do gráfico
+    """
+    geometria = geometria_rota(route)
+    perfil = _perfil_local(geometria, intervalo_m)
+    if perfil is not None:
+        return como_dados_grafico(*perfil)
+    return como_dados_grafico(*await perfil_elevacao_async(gmaps, geometria, intervalo_m))
+
+
+def gerar_mapa_html(route, origem, waypoints, chave_api, otimizar=True):
+    """
+    HTML do mapa do Google redesenhando a rota com os mesmos waypoints usados na busca
+
+    Args:
+        route (list): Resposta de gmaps.directions
+        origem (str): Origem (e destino) da rota
+        waypoints (list): Waypoints ("lat,lng" ou endereços) usados para obter a rota
+        chave_api (str): Chave da API JavaScript do Google Maps
+        otimizar (bool): Se a ordem dos waypoints pode ser otimizada (como na busca)
+
+    Returns:
+        str: HTML embutível do mapa
+    """
+    inicio = route[0]['legs'][0]['start_location']
+    pontos_js = []
+    for waypoint in waypoints:
+        partes = str(waypoint).split(',')
+        try:
+            lat, lng = (float(p) for p in partes)
+            pontos_js.append(f"{{ location: new google.maps.LatLng({lat}, {lng}) }}")
+        except ValueError:
+            pontos_js.append(f"{{ location: {json.dumps(str(waypoint), ensure_ascii=False)} }}")
+
+    return f"""
+<div id="map" style="height:500px; border-radius:12px; box-shadow: 0 4px 8px rgba(0,0,0,0.3);"></div>
+<script>
+  function initMap() {{
+    const map = new google.maps.Map(document.getElementById("map"), {{
+      zoom: 14,
+      center: {{ lat: {inicio['lat']}, lng: {inicio['lng']} }},
+      styles: {ESTILO_MAPA}
+    }});
+    const directionsService = new google.maps.DirectionsService();
+    const directionsRenderer = new google.maps.DirectionsRenderer({{
+      map: map,
+      polylineOptions: {{
+        strokeColor: '#e74c3c',
+        strokeWeight: 6,
+        strokeOpacity: 0.9
+      }}
+    }});
+    // Usar OS MESMOS waypoints que foram usados para calcular a rota
+    directionsService.route({{
+      origin: "{origem}",
+      destination: "{origem}",
+      waypoints: [{", ".join(pontos_js)}],
+      travelMode: google.maps.TravelMode.BICYCLING,
+      optimizeWaypoints: {'true' if otimizar else 'false'},
+    }}, (result, status) => {{
+      if (status === "OK") directionsRenderer.setDirections(result);
+      else alert("Falha na rota: " + status);
+    }});
+  }}
+</script>
+<script src="https://maps.googleapis.com/maps/api/js?key={chave_api}&callback=initMap" async defer></script>
+"""
+
+
+def gerar_texto_rota(origem, distancia_km, instrucoes, trajeto_fechado=False, ciclovias=None):
+    """
+    Texto descritivo da rota
+
+    Args:
+        origem (str): Endereço de origem (e retorno)
+        distancia_km (float): Distância total em km
+        instrucoes (list): Instruções traduzidas
+        trajeto_fechado (bool): Se True, destaca a primeira e a última instrução
+        ciclovias (dict): Cobertura de ciclovias da rota (utils.cycleways), se houver
+
+    Returns:
+        str: Texto em markdown/HTML
+    """
+    confirmacao = ""
+    if trajeto_fechado:
+        primeira_rua = instrucoes[0] if instrucoes else "Início do trajeto"
+        ultima_rua = instrucoes[-1] if instrucoes else "Fim do trajeto"
+        confirmacao = f"""**Trajeto fechado confirmado:**
+- **Início:** {primeira_rua}
+- **Fim:** {ultima_rua}
+
+"""
+    resumo = resumo_ciclovias(ciclovias)
+    linha_ciclovias = f"**Ciclovias e ciclofaixas:** {resumo}  \n" if resumo else ""
+    return f"""
+### 🗺️ Resumo da Rota  
+**Origem e retorno:** {origem}  
+**Distância total:** {distancia_km:.1f} km  
+{linha_ciclovias}
+{confirmacao}**Passos detalhados:**  
+<ol>
+{''.join(f"<li>{rua}</li>" for rua in instrucoes)}
+</ol>
+"""
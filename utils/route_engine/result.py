@@ -0,0 +1,55 @@
+"""
+Tipo de resultado único do motor de rotas.
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+
+
+@dataclass
+class ResultadoRota:
+    """
+    Resultado de uma geração de rota circular
+
+    Attributes:
+        route (list): Resposta do Directions escolhida (None se nenhuma rota serviu)
+        distancia_km (float): Distância real da rota em km
+        diff (float): Diferença em km para a distância solicitada
+        waypoints (list): Waypoints usados para obter a rota
+        geometria (np.ndarray): Pontos da rota, float64 (n, 2) com lat e lng
+        estrategia (str): Nome da estratégia que produziu a rota
+        mapa_html (str): HTML embutível do mapa
+        texto (str): Texto descritivo da rota (markdown/HTML)
+        elevation_data (list): Dados de elevação no formato do gráfico
+        chamadas (int): Chamadas reais à API de rotas feitas na requisição
+        ciclovias (dict): Cobertura de ciclovias e ciclofaixas (utils.cycleways)
+        erro (str): Mensagem de erro quando não há rota
+    """
+    route: list = None
+    distancia_km: float = 0.0
+    diff: float = float("inf")
+    waypoints: list = field(default_factory=list)
+    geometria: np.ndarray = field(default_factory=lambda: np.empty((0, 2), dtype=np.float64))
+    estrategia: str = None
+    mapa_html: str = ""
+    texto: str = ""
+    elevation_data: list = field(default_factory=list)
+    chamadas: int = 0
+    ciclovias: dict = field(default_factory=dict)
+    erro: str = None
+
+    @property
+    def ok(self):
+        """True se uma rota foi encontrada"""
+        return self.route is not None
+
+    def como_tupla(self):
+        """
+        Contrato legado dos geradores (gerar_rota_e_embed, gerar_rota_curta)
+
+        Returns:
+            tuple: HTML do mapa, texto descritivo da rota, dados de elevação
+        """
+        if not self.ok:
+            return "", f"<p>{self.erro or 'Não foi possível gerar a rota.'}</p>", []
+        return self.mapa_html, self.texto, self.elevation_data
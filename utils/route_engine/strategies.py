@@ -0,0 +1,450 @@
+"""
+Estratégias de busca do motor de rotas.
+
+Cada estratégia recebe o ContextoBusca da requisição e devolve um candidato
+(dict com route, distance, diff e waypoints) ou None. O motor executa as
+estratégias em ordem; novas estratégias só precisam implementar buscar().
+buscar_async() é a mesma busca sobre um cliente assíncrono (utils.maps_async).
+"""
+from utils.circuity_model import get_modelo_circuidade
+from utils.gazetteer import resolver_waypoint
+from utils.route_budget import OrcamentoEsgotado
+from utils.route_candidates import (
+    CICLISTA_FATORES, CIRCUIDADE_URBANA, ESTILO_AJUSTES, MAX_CONCORRENCIA_ASYNC, MAX_WORKERS, TOLERANCIA_KM,
+    avaliar_candidatos, avaliar_candidatos_async, buscar_rota_grade, candidatos_grade,
+    candidatos_pontos_cardeais, distancia_rota_km, fator_inicial
+)
+from utils.geodesia import METROS_POR_GRAU, metros_para_graus
+from utils.matrix_search import circuito_por_matriz, circuito_por_matriz_async
+from utils.radius_search import BuscaSecante, avaliador_de_fator, avaliador_de_fator_async, buscar_fator_secante
+from utils.route_library import candidato_da_biblioteca, ligacao_da_biblioteca, rota_da_biblioteca
+from utils.route_fingerprint import DetectorDuplicatas
+from utils.route_prefilter import criar_filtro
+from utils.route_scoring import pontuador
+
+# Pontos de referência centrais usados pela estratégia de rotas curtas (resolvidos pelo gazetteer)
+PONTOS_CENTRAIS = [
+    "Praça Afonso Pena, São José dos Campos, SP",
+    "Parque Vicentina Aranha, São José dos Campos, SP",
+    "Mercado Municipal, São José dos Campos, SP"
+]
+
+# Limite de waypoints intermediários da estratégia de marcos do guia
+MAX_MARCOS = 5
+
+
+class ContextoBusca:
+    """Dados de uma requisição compartilhados por todas as estratégias"""
+
+    def __init__(self, gmaps, origem, origem_latlng, lat, lng, distancia, nivel="Intermediário",
+                 estilo="urbano", passos=None, tolerancia=TOLERANCIA_KM, orcamento=None):
+        """
+        Args:
+            gmaps: Cliente do Maps (já com cache e orçamento aplicados; assíncrono em buscar_async)
+            origem (str): Endereço de origem como digitado
+            origem_latlng (str): Origem no formato usado nas chamadas ("lat,lng" ou o endereço)
+            lat (float): Latitude da origem (None se não foi geocodificada)
+            lng (float): Longitude da origem (None se não foi geocodificada)
+            distancia (float): Distância solicitada em km
+            nivel (str): Nível do ciclista
+            estilo (str): Estilo de pedalada
+            passos (list): Pontos de referência extraídos do guia
+            tolerancia (float): Tolerância máxima em km
+            orcamento (OrcamentoBusca): Orçamento da requisição
+        """
+        self.gmaps = gmaps
+        self.origem = origem
+        self.origem_latlng = origem_latlng
+        self.lat = lat
+        self.lng = lng
+        self.distancia = distancia
+        self.nivel = nivel
+        self.estilo = estilo
+        self.passos = passos or []
+        self.tolerancia = tolerancia
+        self.orcamento = orcamento
+        self.perfil_fator = CICLISTA_FATORES.get(nivel, 0.8)
+        ajustes = ESTILO_AJUSTES.get(estilo, {"lat_bias": 1.0, "lng_bias": 1.0})
+        self.lat_bias = ajustes["lat_bias"]
+        self.lng_bias = ajustes["lng_bias"]
+        # Rotas repetidas são detectadas entre todas as estratégias da requisição
+        self.detector = DetectorDuplicatas()
+        # Entre rotas igualmente aceitáveis, a escolha segue o nível e o estilo
+        self.pontuar = pontuador(distancia, nivel, estilo, tolerancia)
+        # Candidatos de distância prevista fora da tolerância são pulados antes da chamada
+        self.filtro = criar_filtro(lat, lng, distancia, tolerancia)
+        # Circuidade aprendida com as rotas já recebidas nos arredores da origem
+        self.modelo_circuidade = get_modelo_circuidade()
+        self.circuidade = (self.modelo_circuidade.circuidade_local(lat, lng)
+                           if self.tem_coordenadas else CIRCUIDADE_URBANA)
+
+    @property
+    def tem_coordenadas(self):
+        return self.lat is not None and self.lng is not None
+
+    def fator_previsto(self, alvo_km, combinacao="NE"):
+        """
+        Fator cujo circuito da combinação de pontos cardeais deve medir alvo_km,
+        pela circuidade aprendida em cada trecho
+
+        Args:
+            alvo_km (float): Distância desejada do circuito
+            combinacao (str): Combinação de pontos cardeais (ex: "NE")
+
+        Returns:
+            float: Deslocamento em graus de latitude
+        """
+        def waypoints(fator):
+            return candidatos_pontos_cardeais(self.lat, self.lng, fator, lat_bias=self.lat_bias,
+                                              lng_bias=self.lng_bias, combinacoes=[combinacao])[0]
+
+        return self.modelo_circuidade.fator_para(self.lat, self.lng, alvo_km, waypoints,
+                                                 fator_inicial(alvo_km, circuidade=self.circuidade))
+
+
+class Estrategia:
+    """Interface das estratégias de busca"""
+
+    nome = "base"
+
+    def buscar(self, contexto):
+        """
+        Args:
+            contexto (ContextoBusca): Dados da requisição
+
+        Returns:
+            dict: Candidato (route, distance, diff, waypoints) ou None
+        """
+        raise NotImplementedError
+
+    async def buscar_async(self, contexto):
+        """
+        Mesma busca de buscar(), com contexto.gmaps assíncrono
+
+        Returns:
+            dict: Candidato (route, distance, diff, waypoints) ou None
+        """
+        raise NotImplementedError
+
+
+def _candidato(route, waypoints, distancia):
+    distance = distancia_rota_km(route)
+    return {"route": route, "distance": distance, "diff": abs(distance - distancia), "waypoints": waypoints}
+
+
+class EstrategiaMarcos(Estrategia):
+    """Rota passando pelos pontos de referência do guia (uma chamada)"""
+
+    nome = "marcos"
+
+    @staticmethod
+    def _waypoints(contexto):
+        waypoints = []
+        for passo in contexto.passos[:MAX_MARCOS]:
+            # Lugares conhecidos vão como coordenadas, sem geocodificação no servidor
+            waypoint = resolver_waypoint(passo)
+            # Certificar que cada endereço desconhecido tem a cidade incluída
+            if waypoint == passo and "São José dos Campos" not in passo and "SJC" not in passo:
+                waypoint = f"{passo}, São José dos Campos, SP"
+            waypoints.append(waypoint)
+        return waypoints if len(waypoints) >= 2 else None
+
+    def buscar(self, contexto):
+        waypoints = self._waypoints(contexto)
+        if waypoints is None:
+            return None
+        route = contexto.gmaps.directions(
+            origin=contexto.origem_latlng,
+            destination=contexto.origem_latlng,
+            waypoints=waypoints,
+            mode="bicycling",
+            optimize_waypoints=True
+        )
+        return _candidato(route, waypoints, contexto.distancia) if route else None
+
+    async def buscar_async(self, contexto):
+        waypoints = self._waypoints(contexto)
+        if waypoints is None:
+            return None
+        route = await contexto.gmaps.directions(
+            origin=contexto.origem_latlng,
+            destination=contexto.origem_latlng,
+            waypoints=waypoints,
+            mode="bicycling",
+            optimize_waypoints=True
+        )
+        return _candidato(route, waypoints, contexto.distancia) if route else None
+
+
+class EstrategiaBiblioteca(Estrategia):
+    """Circuito pré-calculado mais próximo (no máximo uma chamada)"""
+
+    nome = "biblioteca"
+
+    def buscar(self, contexto):
+        if not contexto.tem_coordenadas:
+            return None
+        return rota_da_biblioteca(
+            contexto.gmaps, contexto.origem_latlng, contexto.lat, contexto.lng,
+            contexto.distancia, contexto.nivel, tolerancia=contexto.tolerancia
+        )
+
+    async def buscar_async(self, contexto):
+        if not contexto.tem_coordenadas:
+            return None
+        ligacao = ligacao_da_biblioteca(contexto.lat, contexto.lng, contexto.distancia, contexto.nivel,
+                                        tolerancia=contexto.tolerancia)
+        if ligacao is None:
+            return None
+        circuito, waypoints = ligacao
+        try:
+            route = await contexto.gmaps.directions(
+                origin=contexto.origem_latlng,
+                destination=contexto.origem_latlng,
+                waypoints=waypoints,
+                mode="bicycling",
+                optimize_waypoints=False
+            )
+        except Exception as e:
+            print(f"Erro ao ligar a origem ao circuito pré-calculado: {str(e)}")
+            return None
+        return candidato_da_biblioteca(circuito, waypoints, route, contexto.distancia, contexto.tolerancia)
+
+
+class EstrategiaSecante(Estrategia):
+    """Converge no fator de deslocamento dos waypoints (3-6 chamadas)"""
+
+    nome = "secante"
+
+    @staticmethod
+    def _fator_inicial(contexto):
+        # Mesmo alvo interno da BuscaSecante: o meio da faixa [distancia - tolerancia, distancia]
+        return contexto.fator_previsto(contexto.distancia - contexto.tolerancia / 2)
+
+    def buscar(self, contexto):
+        if not contexto.tem_coordenadas:
+            return None
+        avaliar = avaliador_de_fator(
+            contexto.gmaps, contexto.origem_latlng, contexto.lat, contexto.lng,
+            lat_bias=contexto.lat_bias, lng_bias=contexto.lng_bias
+        )
+        return buscar_fator_secante(avaliar, contexto.distancia, self._fator_inicial(contexto),
+                                    tolerancia=contexto.tolerancia, orcamento=contexto.orcamento)
+
+    async def buscar_async(self, contexto):
+        if not contexto.tem_coordenadas:
+            return None
+        avaliar = avaliador_de_fator_async(
+            contexto.gmaps, contexto.origem_latlng, contexto.lat, contexto.lng,
+            lat_bias=contexto.lat_bias, lng_bias=contexto.lng_bias
+        )
+        # Cada fator depende do anterior: as avaliações são sequenciais também no async
+        busca = BuscaSecante(contexto.distancia, self._fator_inicial(contexto), tolerancia=contexto.tolerancia)
+        while (fator := busca.proximo_fator(contexto.orcamento)) is not None:
+            try:
+                candidato = await avaliar(fator)
+            except OrcamentoEsgotado:
+                break
+            except Exception as e:
+                print(f"Erro ao gerar rota teste: {str(e)}")
+                candidato = None
+            busca.registrar(candidato)
+        return busca.resultado()
+
+
+class EstrategiaMatriz(Estrategia):
+    """Waypoints escolhidos pela matriz de distâncias de um anel (1 matriz + 1 rota)"""
+
+    nome = "matriz"
+
+    def buscar(self, contexto):
+        if not contexto.tem_coordenadas:
+            return None
+        return circuito_por_matriz(
+            contexto.gmaps, contexto.origem_latlng, contexto.lat, contexto.lng, contexto.distancia,
+            tolerancia=contexto.tolerancia, circuidade=contexto.circuidade,
+            lat_bias=contexto.lat_bias, lng_bias=contexto.lng_bias
+        )
+
+    async def buscar_async(self, contexto):
+        if not contexto.tem_coordenadas:
+            return None
+        return await circuito_por_matriz_async(
+            contexto.gmaps, contexto.origem_latlng, contexto.lat, contexto.lng, contexto.distancia,
+            tolerancia=contexto.tolerancia, circuidade=contexto.circuidade,
+            lat_bias=contexto.lat_bias, lng_bias=contexto.lng_bias
+        )
+
+
+class EstrategiaGrade(Estrategia):
+    """Varredura de multiplicadores × pontos cardeais em paralelo"""
+
+    nome = "grade"
+
+    def __init__(self, max_workers=MAX_WORKERS, max_concorrencia=MAX_CONCORRENCIA_ASYNC):
+        self.max_workers = max_workers
+        self.max_concorrencia = max_concorrencia
+
+    def buscar(self, contexto):
+        if not contexto.tem_coordenadas:
+            return None
+        return buscar_rota_grade(
+            contexto.gmaps, contexto.origem_latlng, contexto.lat, contexto.lng, contexto.distancia,
+            perfil_fator=contexto.perfil_fator, lat_bias=contexto.lat_bias, lng_bias=contexto.lng_bias,
+            tolerancia=contexto.tolerancia, max_workers=self.max_workers,
+            orcamento=contexto.orcamento, detector=contexto.detector, pontuar=contexto.pontuar,
+            filtro=contexto.filtro, circuidade=contexto.circuidade
+        )
+
+    async def buscar_async(self, contexto):
+        if not contexto.tem_coordenadas:
+            return None
+        candidatos = candidatos_grade(contexto.lat, contexto.lng, contexto.distancia, contexto.perfil_fator,
+                                      contexto.lat_bias, contexto.lng_bias, contexto.circuidade)
+        melhor, _ = await avaliar_candidatos_async(
+            contexto.gmaps, contexto.origem_latlng, candidatos, contexto.distancia,
+            tolerancia=contexto.tolerancia, max_concorrencia=self.max_concorrencia,
+            orcamento=contexto.orcamento, detector=contexto.detector, pontuar=contexto.pontuar,
+            filtro=contexto.filtro
+        )
+        return melhor
+
+
+class EstrategiaCurta(Estrategia):
+    """
+    Rotas curtas (≤10km): waypoints muito próximos, priorizando a distância exata
+
+    Sem pré-filtro: na falta de rota dentro da tolerância fica a mais próxima, que
+    pode ser justamente um candidato de distância prevista fora da tolerância.
+    """
+
+    nome = "curta"
+
+    def __init__(self, max_workers=MAX_WORKERS, max_concorrencia=MAX_CONCORRENCIA_ASYNC):
+        self.max_workers = max_workers
+        self.max_concorrencia = max_concorrencia
+
+    @staticmethod
+    def _aceitar(distance, alvo):
+        # Se a rota estiver dentro de 0.5km, encerrar a busca
+        return abs(distance - alvo) <= 0.5
+
+    @staticmethod
+    def _relatar(avaliados):
+        for candidato in sorted(avaliados, key=lambda c: c["diff"])[:3]:
+            print(f"Opção com waypoints {candidato['waypoints']}: {candidato['distance']:.1f}km "
+                  f"(diferença: {candidato['diff']:.1f}km)")
+
+    @staticmethod
+    def _candidatos(contexto):
+        lat, lng, distancia = contexto.lat, contexto.lng, contexto.distancia
+
+        # Um waypoint: ida e volta (2r pela malha); dois: triângulo origem → N → E (fator_inicial)
+        factor = distancia * 1000 / (2 * contexto.circuidade) / METROS_POR_GRAU
+        meio = fator_inicial(distancia, circuidade=contexto.circuidade)
+        print(f"Usando fator de coordenadas: {factor:.4f}")
+        # Mesmo deslocamento em metros nas duas direções
+        _, factor_lng = metros_para_graus(0, factor * METROS_POR_GRAU, lat)
+        _, meio_lng = metros_para_graus(0, meio * METROS_POR_GRAU, lat)
+
+        candidatos = [
+            [f"{lat + factor},{lng}"],                              # Norte
+            [f"{lat - factor},{lng}"],                              # Sul
+            [f"{lat},{lng + factor_lng}"],                          # Leste
+            [f"{lat},{lng - factor_lng}"],                          # Oeste
+            [f"{lat + factor * 0.7},{lng + factor_lng * 0.7}"],     # Nordeste
+            [resolver_waypoint(PONTOS_CENTRAIS[0])],
+            [resolver_waypoint(PONTOS_CENTRAIS[1])]
+        ]
+        # Para rotas um pouco mais longas, adicionar dois waypoints
+        if distancia >= 5:
+            candidatos.extend([
+                [f"{lat + meio},{lng}", f"{lat},{lng + meio_lng}"],   # Norte e Leste
+                [f"{lat + meio},{lng}", f"{lat},{lng - meio_lng}"],   # Norte e Oeste
+                [f"{lat - meio},{lng}", f"{lat},{lng + meio_lng}"],   # Sul e Leste
+                [f"{lat - meio},{lng}", f"{lat},{lng - meio_lng}"]    # Sul e Oeste
+            ])
+        return candidatos
+
+    def buscar(self, contexto):
+        if not contexto.tem_coordenadas:
+            return None
+        melhor, avaliados = avaliar_candidatos(
+            contexto.gmaps, contexto.origem_latlng, self._candidatos(contexto), contexto.distancia,
+            tolerancia=contexto.tolerancia,
+            aceitar=self._aceitar,
+            descartar_excedentes=False,
+            max_workers=self.max_workers,
+            orcamento=contexto.orcamento,
+            detector=contexto.detector,
+            pontuar=contexto.pontuar
+        )
+        self._relatar(avaliados)
+        return melhor
+
+    async def buscar_async(self, contexto):
+        if not contexto.tem_coordenadas:
+            return None
+        melhor, avaliados = await avaliar_candidatos_async(
+            contexto.gmaps, contexto.origem_latlng, self._candidatos(contexto), contexto.distancia,
+            tolerancia=contexto.tolerancia,
+            aceitar=self._aceitar,
+            descartar_excedentes=False,
+            max_concorrencia=self.max_concorrencia,
+            orcamento=contexto.orcamento,
+            detector=contexto.detector,
+            pontuar=contexto.pontuar
+        )
+        self._relatar(avaliados)
+        return melhor
+
+
+class EstrategiaSimples(Estrategia):
+    """Último recurso: rota da origem a ela mesma sem waypoints"""
+
+    nome = "simples"
+
+    def buscar(self, contexto):
+        route = contexto.gmaps.directions(
+            origin=contexto.origem_latlng,
+            destination=contexto.origem_latlng,
+            mode="bicycling"
+        )
+        return _candidato(route, [], contexto.distancia) if route else None
+
+    async def buscar_async(self, contexto):
+        route = await contexto.gmaps.directions(
+            origin=contexto.origem_latlng,
+            destination=contexto.origem_latlng,
+            mode="bicycling"
+        )
+        return _candidato(route, [], contexto.distancia) if route else None
+
+
+# Estratégias disponíveis por nome
+ESTRATEGIAS = {
+    estrategia.nome: estrategia
+    for estrategia in (EstrategiaMarcos, EstrategiaBiblioteca, EstrategiaSecante, EstrategiaMatriz,
+                       EstrategiaGrade, EstrategiaCurta, EstrategiaSimples)
+}
+
+
+def estrategias_padrao(modo_busca="grade"):
+    """
+    Sequência de estratégias do gerador principal
+
+    Os marcos do guia têm preferência; depois vem o circuito pré-calculado, a busca
+    (secante ou matriz de distâncias seguida da grade, ou só a grade) e, por fim,
+    a rota simples.
+
+    Args:
+        modo_busca (str): "grade", "secante" ou "matriz"
+
+    Returns:
+        list: Instâncias das estratégias, na ordem de execução
+    """
+    nomes = ["marcos", "biblioteca"]
+    if modo_busca in ("secante", "matriz"):
+        nomes.append(modo_busca)
+    nomes.extend(["grade", "simples"])
+    return [ESTRATEGIAS[nome]() for nome in nomes]
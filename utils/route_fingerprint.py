@@ -0,0 +1,177 @@
+"""
+Detecção de rotas duplicadas durante a busca de candidatos.
+
+Várias combinações sintéticas de waypoints (N+E e N+W com fatores pequenos, pontos
+cardeais que caem na mesma avenida) produzem a mesma sequência de vias. Cada rota
+recebida ganha uma impressão digital (hash da overview_polyline decodificada) e o
+detector aprende para onde a API "puxou" cada waypoint. Um novo conjunto de
+waypoints cujos pontos cairiam nos mesmos pontos ajustados de uma rota já vista é
+considerado duplicata e pulado antes da chamada.
+"""
+import hashlib
+import threading
+from itertools import permutations
+
+import numpy as np
+
+from utils.geodesia import distancias_m
+from utils.polyline import decodificar, geometria_rota
+
+# Casas decimais das coordenadas na impressão digital (~11 m)
+PRECISAO_IMPRESSAO = 4
+
+# Raio mínimo (em metros) para prever que um waypoint cairá no mesmo ponto ajustado
+RAIO_MIN_M = 60
+
+# Fração da distância de ajuste observada usada como raio de previsão
+FRACAO_AJUSTE = 0.9
+
+
+def _pontos_da_rota(route):
+    """Geometria da rota: overview_polyline ou, na falta dela, a geometria dos passos"""
+    polyline = route[0].get("overview_polyline", {}).get("points")
+    if polyline:
+        return decodificar(polyline)
+    return geometria_rota(route)
+
+
+def impressao_rota(route, precisao=PRECISAO_IMPRESSAO):
+    """
+    Impressão digital de uma rota, independente dos waypoints que a geraram
+
+    Args:
+        route (list): Resposta de gmaps.directions
+        precisao (int): Casas decimais das coordenadas arredondadas
+
+    Returns:
+        str: Hash SHA-1 da sequência de pontos arredondados, ou None se a rota não tem geometria
+    """
+    try:
+        pontos = _pontos_da_rota(route)
+    except (KeyError, IndexError, TypeError, ValueError):
+        return None
+    if not len(pontos):
+        return None
+    # Inteiros na precisão pedida, sem repetições consecutivas
+    sequencia = np.round(pontos * 10 ** precisao).astype(np.int64)
+    mudou = np.concatenate(([True], np.any(sequencia[1:] != sequencia[:-1], axis=1)))
+    return hashlib.sha1(np.ascontiguousarray(sequencia[mudou]).tobytes()).hexdigest()
+
+
+def _parse(waypoint):
+    lat, lng = str(waypoint).split(",")
+    return float(lat), float(lng)
+
+
+def pontos_ajustados(route, waypoints):
+    """
+    Para cada waypoint pedido, o ponto da malha viária em que a API o posicionou
+
+    Args:
+        route (list): Resposta de gmaps.directions
+        waypoints (list): Waypoints "lat,lng" na ordem em que foram pedidos
+
+    Returns:
+        list: Tuplas (lat, lng) ajustadas, na ordem dos waypoints pedidos
+    """
+    legs = route[0]["legs"]
+    ordem = route[0].get("waypoint_order") or list(range(len(waypoints)))
+    ajustados = [None] * len(waypoints)
+    # A perna k termina no k-ésimo waypoint percorrido (ordem otimizada)
+    for k, original in enumerate(ordem[:len(legs) - 1]):
+        fim = legs[k]["end_location"]
+        ajustados[original] = (fim["lat"], fim["lng"])
+    return ajustados
+
+
+class DetectorDuplicatas:
+    """Registra as rotas já vistas numa busca e prevê conjuntos de waypoints duplicados"""
+
+    def __init__(self, raio_min_m=RAIO_MIN_M):
+        self.raio_min_m = raio_min_m
+        self.impressoes = {}   # impressão -> primeiro conjunto de waypoints que a gerou
+        self._vistos = []      # (ajustados, raios) de cada rota registrada
+        self.registradas = 0
+        self.duplicatas = 0
+        self.puladas = 0
+        self._lock = threading.Lock()
+
+    def registrar(self, waypoints, route):
+        """
+        Registra a rota obtida para um conjunto de waypoints
+
+        Args:
+            waypoints (list): Waypoints pedidos
+            route (list): Resposta de gmaps.directions
+
+        Returns:
+            bool: True se a rota é idêntica a uma já registrada
+        """
+        impressao = impressao_rota(route)
+        try:
+            coordenadas = [_parse(w) for w in waypoints]
+            ajustados = pontos_ajustados(route, waypoints)
+        except (ValueError, KeyError, IndexError, TypeError):
+            # Waypoints por endereço: sem previsão, apenas a impressão digital
+            coordenadas, ajustados = None, None
+
+        with self._lock:
+            self.registradas += 1
+            duplicata = impressao is not None and impressao in self.impressoes
+            if duplicata:
+                self.duplicatas += 1
+            elif impressao is not None:
+                self.impressoes[impressao] = list(waypoints)
+
+            if coordenadas and ajustados and None not in ajustados:
+                # Quanto mais longe a API puxou o waypoint, maior a região que cai no mesmo ponto
+                c, a = np.array(coordenadas), np.array(ajustados)
+                raios = np.maximum(self.raio_min_m, FRACAO_AJUSTE * distancias_m(c[:, 0], c[:, 1], a[:, 0], a[:, 1]))
+                self._vistos.append((ajustados, raios))
+        return duplicata
+
+    def prever_duplicata(self, waypoints):
+        """
+        Indica se os waypoints devem cair nos mesmos pontos ajustados de uma rota já vista
+
+        A comparação ignora a ordem dos waypoints (a API pode reordená-los).
+
+        Args:
+            waypoints (list): Waypoints "lat,lng" a testar
+
+        Returns:
+            bool: True se a chamada provavelmente devolveria uma rota repetida
+        """
+        try:
+            coordenadas = np.array([_parse(w) for w in waypoints])
+        except ValueError:
+            return False
+
+        with self._lock:
+            vistos = list(self._vistos)
+        for ajustados, raios in vistos:
+            if len(ajustados) != len(coordenadas):
+                continue
+            # Matriz waypoint × ponto ajustado, calculada uma vez para todas as permutações
+            a = np.array(ajustados)
+            dentro = distancias_m(coordenadas[:, None, 0], coordenadas[:, None, 1],
+                                  a[None, :, 0], a[None, :, 1]) <= raios[None, :]
+            for perm in permutations(range(len(coordenadas))):
+                if dentro[np.arange(len(perm)), list(perm)].all():
+                    with self._lock:
+                        self.puladas += 1
+                    return True
+        return False
+
+    def estatisticas(self):
+        """
+        Returns:
+            dict: Rotas registradas, duplicatas recebidas, chamadas puladas e rotas distintas
+        """
+        with self._lock:
+            return {
+                "registradas": self.registradas,
+                "duplicatas": self.duplicatas,
+                "puladas": self.puladas,
+                "distintas": len(self.impressoes),
+            }
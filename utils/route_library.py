@@ -0,0 +1,364 @@
+"""
+Biblioteca de rotas circulares pré-calculadas.
+
+A maior parte das requisições pede as distâncias do slider (5 a 30 km) a partir de
+poucos bairros. O job precomputar_rotas.py gera circuitos para uma grade de células
+de partida × distâncias × nível do ciclista e os grava aqui, em SQLite com payload
+comprimido e índice espacial por célula. Na requisição, a origem é ligada ao início
+do circuito pré-calculado mais próximo com uma única chamada à API de rotas.
+"""
+import os
+import math
+import json
+import zlib
+import time
+import threading
+
+from utils.geodesia import distancias_m, graus_para_metros
+from utils.route_candidates import TOLERANCIA_KM, distancia_rota_km, rota_satisfatoria
+from utils.sqlite_store import conectar
+
+# Arquivo da biblioteca (gerado por precomputar_rotas.py)
+BIBLIOTECA_PATH = os.environ.get("PEDALA_BIBLIOTECA_ROTAS", os.path.join("dados", "biblioteca_rotas.sqlite"))
+
+# Lado das células do índice espacial em metros
+TAMANHO_CELULA_M = 500
+
+# Distância máxima (em linha reta) entre a origem e o início do circuito
+RAIO_MAX_M = 1500
+
+# Latitude de referência para converter longitude em metros (São José dos Campos)
+LATITUDE_REFERENCIA = -23.18
+
+# Fator de circuidade para estimar o trecho de ligação a partir da distância em linha reta
+CIRCUIDADE_LIGACAO = 1.3
+
+# Abaixo desta distância a origem é considerada o próprio início do circuito
+LIGACAO_DESPREZIVEL_M = 50
+
+def waypoints_na_ordem(candidato):
+    """Waypoints do candidato na ordem devolvida pela API (optimize_waypoints reordena)"""
+    waypoints = list(candidato["waypoints"])
+    ordem = candidato["route"][0].get("waypoint_order") or list(range(len(waypoints)))
+    return [waypoints[i] for i in ordem]
+
+
+class BibliotecaRotas:
+    """Circuitos pré-calculados indexados por célula de partida, distância e nível"""
+
+    def __init__(self, caminho=BIBLIOTECA_PATH, tamanho_celula_m=TAMANHO_CELULA_M):
+        """
+        Args:
+            caminho (str): Caminho do arquivo SQLite (":memory:" para biblioteca volátil)
+            tamanho_celula_m (float): Lado das células do índice espacial (usado ao criar o arquivo)
+        """
+        self._lock = threading.Lock()
+        self._conn = self._conectar(caminho)
+        row = self._conn.execute("SELECT valor FROM meta WHERE chave = 'tamanho_celula_m'").fetchone()
+        if row is None:
+            self._conn.execute("INSERT INTO meta (chave, valor) VALUES ('tamanho_celula_m', ?)", (str(tamanho_celula_m),))
+            self.tamanho_celula_m = float(tamanho_celula_m)
+        else:
+            # A grade do índice é fixada na criação do arquivo
+            self.tamanho_celula_m = float(row[0])
+        self._conn.commit()
+
+    def _conectar(self, caminho):
+        # Sem acesso ao disco: biblioteca apenas em memória (o job ainda grava, mas nada persiste)
+        conn, self.caminho = conectar(caminho, """
+            CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS circuitos (
+                id INTEGER PRIMARY KEY,
+                celula_i INTEGER NOT NULL,
+                celula_j INTEGER NOT NULL,
+                lat REAL NOT NULL,
+                lng REAL NOT NULL,
+                nivel TEXT NOT NULL,
+                distancia_alvo INTEGER NOT NULL,
+                distancia_km REAL NOT NULL,
+                title TEXT,
+                starting_point TEXT,
+                waypoints TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                criado_em REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_circuitos_celula ON circuitos (celula_i, celula_j, nivel, distancia_alvo);
+        """, "Biblioteca de rotas")
+        return conn
+
+    def celula(self, lat, lng):
+        """
+        Célula do índice espacial que contém o ponto
+
+        Returns:
+            tuple: (i, j) inteiros da célula
+        """
+        norte_m, leste_m = graus_para_metros(lat, lng, LATITUDE_REFERENCIA)
+        return (math.floor(norte_m / self.tamanho_celula_m), math.floor(leste_m / self.tamanho_celula_m))
+
+    def existe(self, lat, lng, nivel, distancia_alvo, raio_m=None):
+        """
+        Indica se já há circuito da distância e nível começando perto do ponto (permite retomar o job)
+
+        Args:
+            lat (float): Latitude do ponto de partida planejado
+            lng (float): Longitude do ponto de partida planejado
+            nivel (str): Nível do ciclista
+            distancia_alvo (int): Distância solicitada (passo do slider)
+            raio_m (float): Distância máxima até o início já gravado (padrão: meia célula)
+
+        Returns:
+            bool: True se o circuito já existe
+        """
+        raio_m = raio_m if raio_m is not None else self.tamanho_celula_m / 2
+        return any(c["distancia_alvo"] == int(distancia_alvo)
+                   for c in self.candidatos_proximos(lat, lng, nivel, raio_m))
+
+    def adicionar(self, lat, lng, nivel, distancia_alvo, distancia_km, waypoints, passos=None,
+                  polyline=None, elevation_data=None, title=None, starting_point=None):
+        """
+        Grava um circuito na biblioteca
+
+        Args:
+            lat (float): Latitude do início do circuito
+            lng (float): Longitude do início do circuito
+            nivel (str): Nível do ciclista usado na geração
+            distancia_alvo (int): Distância solicitada (passo do slider)
+            distancia_km (float): Distância real do circuito em km
+            waypoints (list): Waypoints "lat,lng" na ordem de percurso
+            passos (list): Instruções da rota
+            polyline (str): overview_polyline da rota
+            elevation_data (list): Dados de elevação no formato do gráfico
+            title (str): Título (mesmo campo do modelo Route)
+            starting_point (str): Ponto de partida (mesmo campo do modelo Route)
+        """
+        celula = self.celula(lat, lng)
+        payload = zlib.compress(json.dumps({
+            "steps": passos or [],
+            "polyline": polyline,
+            "elevation_data": elevation_data or [],
+        }).encode("utf-8"), 9)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO circuitos (celula_i, celula_j, lat, lng, nivel, distancia_alvo, distancia_km, "
+                "title, starting_point, waypoints, payload, criado_em) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (celula[0], celula[1], lat, lng, nivel, int(distancia_alvo), float(distancia_km),
+                 title or f"Circuito de {distancia_alvo} km ({nivel})",
+                 starting_point or f"{lat},{lng}", json.dumps(waypoints), payload, time.time())
+            )
+            self._conn.commit()
+
+    def candidatos_proximos(self, lat, lng, nivel, raio_max_m=RAIO_MAX_M):
+        """
+        Circuitos do nível cujo início está a até raio_max_m do ponto
+
+        Args:
+            lat (float): Latitude da origem
+            lng (float): Longitude da origem
+            nivel (str): Nível do ciclista
+            raio_max_m (float): Distância máxima em linha reta
+
+        Returns:
+            list: Dicts (id, lat, lng, distancia_alvo, distancia_km, waypoints, ligacao_m)
+        """
+        i, j = self.celula(lat, lng)
+        aneis = max(1, math.ceil(raio_max_m / self.tamanho_celula_m))
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, lat, lng, distancia_alvo, distancia_km, waypoints FROM circuitos "
+                "WHERE celula_i BETWEEN ? AND ? AND celula_j BETWEEN ? AND ? AND nivel = ?",
+                (i - aneis, i + aneis, j - aneis, j + aneis, nivel)
+            ).fetchall()
+
+        candidatos = []
+        for id_, lat_c, lng_c, alvo, km, waypoints in rows:
+            ligacao_m = float(distancias_m(lat, lng, lat_c, lng_c))
+            if ligacao_m <= raio_max_m:
+                candidatos.append({
+                    "id": id_, "lat": lat_c, "lng": lng_c, "distancia_alvo": alvo,
+                    "distancia_km": km, "waypoints": json.loads(waypoints), "ligacao_m": ligacao_m,
+                })
+        return candidatos
+
+    def mais_proximo(self, lat, lng, distancia, nivel, raio_max_m=RAIO_MAX_M):
+        """
+        Escolhe o circuito cujo total estimado (ida + circuito + volta) mais se aproxima da distância
+
+        Args:
+            lat (float): Latitude da origem
+            lng (float): Longitude da origem
+            distancia (float): Distância solicitada em km
+            nivel (str): Nível do ciclista
+            raio_max_m (float): Distância máxima até o início do circuito
+
+        Returns:
+            dict: Circuito escolhido (com a chave total_estimado_km) ou None
+        """
+        melhor = None
+        for circuito in self.candidatos_proximos(lat, lng, nivel, raio_max_m):
+            ligacao_km = 0.0
+            if circuito["ligacao_m"] > LIGACAO_DESPREZIVEL_M:
+                ligacao_km = circuito["ligacao_m"] * CIRCUIDADE_LIGACAO / 1000
+            circuito["total_estimado_km"] = circuito["distancia_km"] + 2 * ligacao_km
+            chave = (circuito["total_estimado_km"] > distancia,
+                     abs(circuito["total_estimado_km"] - distancia), circuito["ligacao_m"])
+            if melhor is None or chave < melhor[0]:
+                melhor = (chave, circuito)
+        return melhor[1] if melhor else None
+
+    def detalhes(self, id_):
+        """
+        Carrega todos os campos de um circuito
+
+        Returns:
+            dict: Campos da tabela com steps, polyline e elevation_data descomprimidos
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, lat, lng, nivel, distancia_alvo, distancia_km, title, starting_point, waypoints, payload "
+                "FROM circuitos WHERE id = ?", (id_,)
+            ).fetchone()
+        if row is None:
+            return None
+        circuito = dict(zip(
+            ("id", "lat", "lng", "nivel", "distancia_alvo", "distancia_km", "title", "starting_point", "waypoints"),
+            row[:-1]
+        ))
+        circuito["waypoints"] = json.loads(circuito["waypoints"])
+        circuito.update(json.loads(zlib.decompress(row[-1]).decode("utf-8")))
+        return circuito
+
+    def estatisticas(self):
+        """
+        Returns:
+            dict: Número de circuitos, de células ocupadas e contagem por nível
+        """
+        with self._lock:
+            total, celulas = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT celula_i || ',' || celula_j) FROM circuitos"
+            ).fetchone()
+            por_nivel = dict(self._conn.execute("SELECT nivel, COUNT(*) FROM circuitos GROUP BY nivel").fetchall())
+        return {"circuitos": total, "celulas": celulas, "por_nivel": por_nivel}
+
+
+def como_route(circuito, user_id=None):
+    """
+    Converte um circuito da biblioteca em uma instância do modelo Route
+
+    Args:
+        circuito (dict): Resultado de BibliotecaRotas.detalhes
+        user_id (int): Usuário dono da rota (opcional)
+
+    Returns:
+        Route: Instância não persistida do modelo
+    """
+    # Import tardio: db_utils cria a engine do banco ao ser importado
+    from db_utils import Route
+    return Route(
+        user_id=user_id,
+        title=circuito["title"],
+        starting_point=circuito["starting_point"],
+        distance=circuito["distancia_km"],
+        steps=circuito.get("steps", []),
+        elevation_data=circuito.get("elevation_data", []),
+    )
+
+
+_biblioteca_padrao = None
+_biblioteca_padrao_lock = threading.Lock()
+
+
+def get_biblioteca_padrao(caminho=BIBLIOTECA_PATH):
+    """Retorna a biblioteca compartilhada, ou None se o arquivo ainda não foi gerado"""
+    global _biblioteca_padrao
+    with _biblioteca_padrao_lock:
+        if _biblioteca_padrao is None:
+            if not os.path.exists(caminho):
+                return None
+            _biblioteca_padrao = BibliotecaRotas(caminho)
+        return _biblioteca_padrao
+
+
+def ligacao_da_biblioteca(lat, lng, distancia, nivel, tolerancia=TOLERANCIA_KM, biblioteca=None):
+    """
+    Escolhe o circuito pré-calculado para a origem e monta os waypoints da rota final
+
+    Args:
+        lat (float): Latitude da origem
+        lng (float): Longitude da origem
+        distancia (float): Distância solicitada em km
+        nivel (str): Nível do ciclista
+        tolerancia (float): Tolerância máxima em km
+        biblioteca (BibliotecaRotas): Biblioteca a consultar (padrão: a compartilhada)
+
+    Returns:
+        tuple: (circuito, waypoints) ou None se não houver circuito adequado
+    """
+    biblioteca = biblioteca if biblioteca is not None else get_biblioteca_padrao()
+    if biblioteca is None:
+        return None
+
+    circuito = biblioteca.mais_proximo(lat, lng, distancia, nivel)
+    if circuito is None or abs(circuito["total_estimado_km"] - distancia) > tolerancia:
+        return None
+
+    inicio = f"{circuito['lat']},{circuito['lng']}"
+    waypoints = list(circuito["waypoints"])
+    if circuito["ligacao_m"] > LIGACAO_DESPREZIVEL_M:
+        waypoints = [inicio] + waypoints + [inicio]
+    return circuito, waypoints
+
+
+def candidato_da_biblioteca(circuito, waypoints, route, distancia, tolerancia=TOLERANCIA_KM):
+    """
+    Valida a rota obtida para um circuito pré-calculado
+
+    Returns:
+        dict: Candidato (route, distance, diff, waypoints, otimizar) ou None se fora da tolerância
+    """
+    if not route:
+        return None
+    km = distancia_rota_km(route)
+    if not rota_satisfatoria(km, distancia, tolerancia):
+        print(f"Circuito pré-calculado {circuito['id']} resultou em {km:.1f}km, fora da tolerância")
+        return None
+    # Ordem fixa: início do circuito, waypoints na ordem de percurso, volta ao início
+    return {"route": route, "distance": km, "diff": abs(km - distancia), "waypoints": waypoints, "otimizar": False}
+
+
+def rota_da_biblioteca(gmaps, origem, lat, lng, distancia, nivel, tolerancia=TOLERANCIA_KM, biblioteca=None):
+    """
+    Resolve a requisição pelo circuito pré-calculado mais próximo com uma única chamada de rotas
+
+    A rota final é origem → início do circuito → waypoints do circuito → início → origem.
+
+    Args:
+        gmaps: Cliente do Google Maps
+        origem (str): Origem (e retorno) no formato aceito pela API
+        lat (float): Latitude da origem
+        lng (float): Longitude da origem
+        distancia (float): Distância solicitada em km
+        nivel (str): Nível do ciclista
+        tolerancia (float): Tolerância máxima em km
+        biblioteca (BibliotecaRotas): Biblioteca a consultar (padrão: a compartilhada)
+
+    Returns:
+        dict: Candidato (route, distance, diff, waypoints, otimizar) ou None se não houver circuito adequado
+    """
+    ligacao = ligacao_da_biblioteca(lat, lng, distancia, nivel, tolerancia, biblioteca)
+    if ligacao is None:
+        return None
+    circuito, waypoints = ligacao
+
+    try:
+        route = gmaps.directions(
+            origin=origem,
+            destination=origem,
+            waypoints=waypoints,
+            mode="bicycling",
+            optimize_waypoints=False
+        )
+    except Exception as e:
+        print(f"Erro ao ligar a origem ao circuito pré-calculado: {str(e)}")
+        return None
+    return candidato_da_biblioteca(circuito, waypoints, route, distancia, tolerancia)
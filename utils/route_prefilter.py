@@ -0,0 +1,203 @@
+"""
+Pré-filtro preditivo dos candidatos de waypoints.
+
+Antes de pedir uma rota, o comprimento do circuito é estimado localmente pelo
+perímetro em linha reta origem → waypoints → origem vezes a circuidade urbana.
+Candidatos cuja faixa prevista (circuidade mínima a máxima, mais uma folga para
+o ajuste dos waypoints às vias) não alcança a janela distancia ± tolerancia são
+descartados sem chamada à API.
+
+No modo "medir" nada é descartado: os candidatos que seriam podados são apenas
+marcados, e ao final da requisição verifica-se se a rota escolhida estava entre
+eles (poda indevida). Os contadores são acumulados no processo.
+"""
+import os
+import threading
+from itertools import permutations
+
+import numpy as np
+
+from utils.geodesia import distancias_m
+from utils.route_candidates import CIRCUIDADE_URBANA, TOLERANCIA_KM
+
+# Faixa da razão distância pela malha / perímetro em linha reta (percentis 1 e 99
+# dos candidatos da grade nas fixtures do benchmark; as fixtures são respostas
+# sintéticas de comparar_busca_raio.ClienteSintetico, não rotas reais de São José
+# dos Campos: remedir com respostas gravadas da API antes de apertar a faixa)
+CIRCUIDADE_MIN = 1.1
+CIRCUIDADE_MAX = 1.7
+
+# Folga (km) pelo deslocamento dos waypoints até a via mais próxima
+FOLGA_AJUSTE_KM = 0.5
+
+# "podar" descarta os candidatos, "medir" só os marca, "desligado" não estima
+MODOS_PREFILTRO = ("podar", "medir", "desligado")
+MODO_PREFILTRO = os.environ.get("PEDALA_PREFILTRO", "podar")
+
+_totais = {"estimados": 0, "podados": 0, "requisicoes": 0, "vencedores_podados": 0}
+_totais_lock = threading.Lock()
+
+
+def _parse(waypoint):
+    lat, lng = str(waypoint).split(",")
+    return float(lat), float(lng)
+
+
+def perimetro_km(lat, lng, waypoints):
+    """
+    Perímetro em linha reta do circuito origem → waypoints → origem
+
+    Como a API pode reordenar os waypoints, vale a ordem de menor perímetro.
+
+    Args:
+        lat (float): Latitude da origem
+        lng (float): Longitude da origem
+        waypoints (list): Waypoints "lat,lng"
+
+    Returns:
+        float: Perímetro em km, ou None se algum waypoint é um endereço
+    """
+    try:
+        pontos = np.array([_parse(w) for w in waypoints])
+    except ValueError:
+        return None
+    if not len(pontos):
+        return 0.0
+    melhor = None
+    for perm in permutations(range(len(pontos))):
+        circuito = np.vstack([[lat, lng], pontos[list(perm)], [lat, lng]])
+        metros = distancias_m(circuito[:-1, 0], circuito[:-1, 1], circuito[1:, 0], circuito[1:, 1]).sum()
+        melhor = metros if melhor is None else min(melhor, metros)
+    return float(melhor) / 1000
+
+
+def comprimento_previsto_km(lat, lng, waypoints, circuidade=CIRCUIDADE_URBANA):
+    """
+    Comprimento estimado da rota (perímetro × circuidade)
+
+    Returns:
+        float: Distância prevista em km, ou None se não há como estimar
+    """
+    perimetro = perimetro_km(lat, lng, waypoints)
+    return perimetro * circuidade if perimetro is not None else None
+
+
+class FiltroPreditivo:
+    """Descarta (ou marca) os candidatos cuja distância prevista fica fora da tolerância"""
+
+    def __init__(self, lat, lng, distancia, tolerancia=TOLERANCIA_KM, modo=None):
+        """
+        Args:
+            lat (float): Latitude da origem
+            lng (float): Longitude da origem
+            distancia (float): Distância solicitada em km
+            tolerancia (float): Tolerância máxima em km
+            modo (str): "podar" ou "medir" (padrão: modo do processo)
+        """
+        self.lat = lat
+        self.lng = lng
+        self.distancia = distancia
+        self.tolerancia = tolerancia
+        self.modo = modo or MODO_PREFILTRO
+        self.estimados = 0
+        self.podados = []
+        self._lock = threading.Lock()
+
+    def fora_da_tolerancia(self, waypoints):
+        """
+        Indica se nenhuma circuidade plausível leva o candidato à janela da tolerância
+
+        Returns:
+            bool: True se a rota seria curta ou longa demais
+        """
+        perimetro = perimetro_km(self.lat, self.lng, waypoints)
+        if perimetro is None:
+            return False
+        with self._lock:
+            self.estimados += 1
+        minimo = perimetro * CIRCUIDADE_MIN - FOLGA_AJUSTE_KM
+        maximo = perimetro * CIRCUIDADE_MAX + FOLGA_AJUSTE_KM
+        return maximo < self.distancia - self.tolerancia or minimo > self.distancia + self.tolerancia
+
+    def descartar(self, waypoints):
+        """
+        Decide se o candidato deve ser pulado antes da chamada à API
+
+        Args:
+            waypoints (list): Waypoints do candidato
+
+        Returns:
+            bool: True se a chamada deve ser evitada (sempre False no modo "medir")
+        """
+        if not self.fora_da_tolerancia(waypoints):
+            return False
+        with self._lock:
+            self.podados.append(list(waypoints))
+        return self.modo == "podar"
+
+    def conferir(self, escolhido):
+        """
+        Encerra a requisição: verifica se a rota escolhida estava entre os podados e
+        acumula os contadores do processo
+
+        Args:
+            escolhido (dict): Candidato escolhido pelo motor (ou None)
+
+        Returns:
+            bool: True se a rota escolhida teria sido podada
+        """
+        vencedor_podado = escolhido is not None and list(escolhido["waypoints"]) in self.podados
+        with _totais_lock:
+            _totais["estimados"] += self.estimados
+            _totais["podados"] += len(self.podados)
+            _totais["requisicoes"] += 1
+            _totais["vencedores_podados"] += int(vencedor_podado)
+        if self.podados:
+            acao = "chamadas evitadas" if self.modo == "podar" else "candidatos que seriam podados"
+            print(f"Pré-filtro: {len(self.podados)} {acao} de {self.estimados} estimados"
+                  + (" (a rota escolhida estava entre eles)" if vencedor_podado else ""))
+        return vencedor_podado
+
+
+def criar_filtro(lat, lng, distancia, tolerancia=TOLERANCIA_KM):
+    """
+    Filtro da requisição no modo do processo
+
+    Returns:
+        FiltroPreditivo: Filtro, ou None se o pré-filtro está desligado ou a origem não tem coordenadas
+    """
+    if MODO_PREFILTRO == "desligado" or lat is None or lng is None:
+        return None
+    return FiltroPreditivo(lat, lng, distancia, tolerancia)
+
+
+def definir_modo_prefiltro(modo):
+    """
+    Altera o modo do pré-filtro no processo (ex.: "medir" no benchmark)
+
+    Args:
+        modo (str): Um de MODOS_PREFILTRO
+    """
+    global MODO_PREFILTRO
+    if modo not in MODOS_PREFILTRO:
+        raise ValueError(f"Modo de pré-filtro desconhecido: {modo}")
+    MODO_PREFILTRO = modo
+
+
+def estatisticas_prefiltro():
+    """
+    Contadores acumulados no processo
+
+    Returns:
+        dict: Requisições, candidatos estimados, podados (chamadas evitadas no modo
+            "podar") e requisições cuja rota escolhida estava entre os podados
+    """
+    with _totais_lock:
+        return dict(_totais)
+
+
+def zerar_estatisticas_prefiltro():
+    """Zera os contadores acumulados"""
+    with _totais_lock:
+        for chave in _totais:
+            _totais[chave] = 0
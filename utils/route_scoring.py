@@ -0,0 +1,223 @@
+"""
+Pontuação multiobjetivo dos candidatos de rota.
+
+As métricas de cada rota aceita na janela de comparação (ver
+utils.route_candidates.SelecaoCandidatos) são calculadas uma rota por vez e
+reunidas em colunas (um array por métrica); só a combinação ponderada das
+colunas é vetorizada. As métricas são o erro de
+distância, a subida por km (quando há modelo de elevação local), a sobreposição
+do circuito (trechos percorridos na ida e na volta), a fração em vias
+principais e a fração fora de ciclovias e ciclofaixas (índice local de
+utils.cycleways). Os pesos vêm do nível do ciclista (CICLISTA_FATORES) e do estilo
+(ESTILO_AJUSTES); menor pontuação é melhor. Nenhuma métrica exige chamadas à API.
+"""
+import re
+import html
+
+import numpy as np
+
+from utils.cycleways import indice_ciclovias_padrao
+from utils.elevation_cache import celulas
+from utils.geodesia import reamostrar
+from utils.polyline import geometria_rota
+from utils.route_candidates import CICLISTA_FATORES, ESTILO_AJUSTES, TOLERANCIA_KM
+
+# Espaçamento da reamostragem usada na sobreposição (m); a grade tem ~10 m
+INTERVALO_SOBREPOSICAO_M = 10
+
+# Subida por km considerada "muito íngreme" na normalização (m/km)
+SUBIDA_REFERENCIA_M_KM = 20.0
+
+# Pesos fixos do erro de distância e da sobreposição
+PESO_ERRO = 1.0
+PESO_SOBREPOSICAO = 0.5
+
+# Preferência por ciclovias de cada nível (soma-se à do estilo, peso_ciclovia)
+PESO_CICLOVIA_NIVEL = {"Iniciante": 0.5}
+
+# Nomes de vias de tráfego intenso nas instruções da API
+_VIAS_PRINCIPAIS = re.compile(
+    r"\b(Av\.|Avenida|Rodovia|Rod\.|Via Dutra|Marginal|Anel Viário|SP-\d+|BR-\d+)", re.IGNORECASE
+)
+
+
+def sobreposicao(geometria):
+    """
+    Fração da rota percorrida mais de uma vez (ida e volta pela mesma via)
+
+    Args:
+        geometria (np.ndarray): Array (n, 2) com lat e lng
+
+    Returns:
+        float: De 0 (circuito sem repetição) a 1 (ida e volta pelo mesmo caminho)
+    """
+    _, pontos = reamostrar(geometria, INTERVALO_SOBREPOSICAO_M)
+    if len(pontos) < 2:
+        return 0.0
+    ids = celulas(pontos)
+    # Cada passagem por uma célula é uma sequência de amostras consecutivas nela
+    inicio_passagem = np.concatenate(([True], ids[1:] != ids[:-1]))
+    unicas, passagens = np.unique(ids[inicio_passagem], return_counts=True)
+    repetidas = unicas[passagens > 1]
+    return float(np.isin(ids, repetidas).mean())
+
+
+def fracao_vias_principais(route):
+    """
+    Fração da distância da rota em avenidas e rodovias, pelas instruções dos passos
+
+    Returns:
+        float: De 0 a 1
+    """
+    passos = [step for leg in route[0]["legs"] for step in leg.get("steps", [])]
+    metros = np.array([step.get("distance", {}).get("value", 0) for step in passos], dtype=np.float64)
+    principais = np.array([
+        bool(_VIAS_PRINCIPAIS.search(html.unescape(re.sub(r"<[^>]+>", "", step.get("html_instructions", "")))))
+        for step in passos
+    ])
+    total = metros.sum()
+    return float(metros[principais].sum() / total) if total > 0 else 0.0
+
+
+def metricas_candidatos(candidatos, distancia):
+    """
+    Métricas dos candidatos em formato colunar
+
+    Args:
+        candidatos (list): Candidatos com route e distance (e subida_m, se houver)
+        distancia (float): Distância solicitada em km
+
+    Returns:
+        dict: Arrays (n,) erro_km, subida_m_km, sobreposicao, vias_principais e fora_ciclovia
+    """
+    km = np.array([c["distance"] for c in candidatos], dtype=np.float64)
+    geometrias = [geometria_rota(c["route"]) for c in candidatos]
+    ciclovias = indice_ciclovias_padrao()
+    subida = np.array([c.get("subida_m", np.nan) for c in candidatos], dtype=np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        subida_m_km = np.where(km > 0, subida / km, np.nan)
+    return {
+        "erro_km": np.abs(km - distancia),
+        # Sem elevação local a subida não entra na comparação
+        "subida_m_km": np.nan_to_num(subida_m_km, nan=0.0),
+        "sobreposicao": np.array([sobreposicao(g) for g in geometrias]),
+        "vias_principais": np.array([fracao_vias_principais(c["route"]) for c in candidatos]),
+        # Sem o arquivo de ciclovias todos os candidatos empatam (fração fora = 1)
+        "fora_ciclovia": np.array([1.0 - ciclovias.cobertura(g)["fracao"] for g in geometrias]),
+    }
+
+
+def pesos_busca(nivel, estilo):
+    """
+    Pesos das métricas para o nível e o estilo
+
+    Iniciantes são penalizados pela subida e profissionais a preferem (1 - fator do
+    nível); o estilo acrescenta sua preferência de subida e seu peso de vias principais.
+    Iniciantes e o estilo familiar preferem rotas em ciclovias e ciclofaixas.
+
+    Returns:
+        dict: Peso de cada métrica de metricas_candidatos
+    """
+    ajustes = ESTILO_AJUSTES.get(estilo, {})
+    return {
+        "erro_km": PESO_ERRO,
+        "subida_m_km": (1.0 - CICLISTA_FATORES.get(nivel, 0.8)) + ajustes.get("peso_subida", 0.0),
+        "sobreposicao": PESO_SOBREPOSICAO,
+        "vias_principais": ajustes.get("peso_vias_principais", 0.0),
+        "fora_ciclovia": PESO_CICLOVIA_NIVEL.get(nivel, 0.0) + ajustes.get("peso_ciclovia", 0.0),
+    }
+
+
+def pontuar(metricas, pesos, tolerancia=TOLERANCIA_KM):
+    """
+    Pontuação de todos os candidatos numa passada (menor é melhor)
+
+    Args:
+        metricas (dict): Saída de metricas_candidatos
+        pesos (dict): Saída de pesos_busca
+        tolerancia (float): Tolerância que normaliza o erro de distância
+
+    Returns:
+        np.ndarray: Pontuação (n,) de cada candidato
+    """
+    escalas = {"erro_km": tolerancia, "subida_m_km": SUBIDA_REFERENCIA_M_KM}
+    nomes = list(pesos)
+    colunas = np.column_stack([metricas[n] / escalas.get(n, 1.0) for n in nomes])
+    return colunas @ np.array([pesos[n] for n in nomes], dtype=np.float64)
+
+
+def pontuador(distancia, nivel, estilo, tolerancia=TOLERANCIA_KM):
+    """
+    Função de pontuação de uma requisição, usada por SelecaoCandidatos
+
+    Returns:
+        callable: pontuar(candidatos) -> np.ndarray com a pontuação de cada candidato
+    """
+    pesos = pesos_busca(nivel, estilo)
+
+    def pontuar_candidatos(candidatos):
+        metricas = metricas_candidatos(candidatos, distancia)
+        pontuacao = pontuar(metricas, pesos, tolerancia)
+        for i, candidato in enumerate(candidatos):
+            candidato["metricas"] = {nome: float(valores[i]) for nome, valores in metricas.items()}
+            candidato["pontuacao"] = float(pontuacao[i])
+        return pontuacao
+
+    return pontuar_candidatos
+
+
+if __name__ == "__main__":
+    import sys
+    import threading
+
+    from utils.geodesia import METROS_POR_GRAU, comprimento_m, metros_para_graus
+    from utils.polyline import codificar
+    from utils.route_candidates import avaliar_candidatos
+
+    # Verificação da preferência por ciclovias: ida e volta pelo maior trecho do
+    # arquivo contra o mesmo percurso deslocado ~500 m, ambos dentro da tolerância
+    indice = indice_ciclovias_padrao()
+    if not indice.trechos:
+        print("Sem ciclovias carregadas")
+        sys.exit(1)
+    pontos = max((np.asarray(t["pontos"], dtype=np.float64) for t in indice.trechos),
+                 key=lambda p: comprimento_m(p))
+    norte, leste = (pontos[-1] - pontos[0]) * METROS_POR_GRAU * [1.0, np.cos(np.radians(pontos[0, 0]))]
+    normal = np.array(metros_para_graus(-leste * 500 / np.hypot(norte, leste),
+                                        norte * 500 / np.hypot(norte, leste), pontos[0, 0]))
+    # O terceiro candidato (também na ciclovia) nunca deve ser pedido
+    circuitos = [np.vstack([p, p[-2::-1]]) for p in (pontos + normal, pontos, pontos)]
+
+    class ClienteCircuitos:
+        """Responde o circuito do índice no primeiro waypoint e conta as chamadas"""
+
+        def __init__(self):
+            self.chamadas = 0
+            self._lock = threading.Lock()
+
+        def directions(self, waypoints, **kwargs):
+            with self._lock:
+                self.chamadas += 1
+            circuito = circuitos[int(waypoints[0])]
+            return [{"legs": [{"distance": {"value": int(comprimento_m(circuito))}, "steps": []}],
+                     "overview_polyline": {"points": codificar(circuito)}}]
+
+    distancia = comprimento_m(circuitos[0]) / 1000 + 0.5
+    coberturas = [indice.cobertura(c)["fracao"] for c in circuitos[:2]]
+    print(f"Cobertura: deslocado {coberturas[0]:.0%}, na ciclovia {coberturas[1]:.0%} ({distancia - 0.5:.1f} km)")
+    candidatos = [[str(i)] for i in range(len(circuitos))]
+    falhas = 0
+    # Com duas chamadas simultâneas os dois primeiros candidatos já estão em andamento
+    # quando a primeira rota é aceita: a pontuação escolhe entre eles sem pedir o
+    # terceiro. Sem peso de ciclovia, o empate fica com o primeiro (deslocado).
+    for nivel, estilo, workers, esperado in (("Iniciante", "urbano", 2, 1), ("Intermediário", "familiar", 2, 1),
+                                             ("Avançado", "urbano", 2, 0), ("Iniciante", "urbano", 1, 0)):
+        cliente = ClienteCircuitos()
+        melhor, _ = avaliar_candidatos(cliente, "origem", candidatos, distancia, max_workers=workers,
+                                       deduplicar=False, pontuar=pontuador(distancia, nivel, estilo))
+        ok = melhor is not None and melhor["indice"] == esperado and cliente.chamadas == workers
+        falhas += not ok
+        escolhido = "-" if melhor is None else ("na ciclovia" if melhor["indice"] else "deslocado")
+        print(f"{nivel}/{estilo}, {workers} simultânea(s): {escolhido}, {cliente.chamadas} chamada(s) de rotas"
+              f"{'' if ok else '  ✗'}")
+    sys.exit(1 if falhas else 0)
@@ -0,0 +1,45 @@
+"""
+Conexões SQLite dos arquivos em disco compartilhados entre processos.
+
+O cache do Maps, o cache de elevação e o modelo de circuidade são abertos ao
+mesmo tempo pelos processos de gerar_rotas_lote.py. Em modo WAL as leituras não
+bloqueiam a gravação, e o tempo de espera por bloqueio faz uma gravação
+concorrente aguardar a vez em vez de falhar com "database is locked". Quando o
+arquivo não pode ser aberto, o armazenamento fica em memória.
+"""
+import os
+import sqlite3
+
+# Espera máxima por um banco bloqueado por outro processo (s)
+TIMEOUT_BLOQUEIO_S = 10.0
+
+
+def conectar(caminho, esquema, descricao):
+    """
+    Abre (ou cria) um banco SQLite compartilhado, em modo WAL e com espera por bloqueio
+
+    Args:
+        caminho (str): Caminho do arquivo (":memory:" para banco volátil)
+        esquema (str): Comandos CREATE ... IF NOT EXISTS do banco
+        descricao (str): Nome do armazenamento nas mensagens (ex.: "Cache do Maps")
+
+    Returns:
+        tuple: (conexão, caminho efetivo, ":memory:" se o arquivo não pôde ser aberto)
+    """
+    if caminho != ":memory:":
+        conn = None
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+            conn = sqlite3.connect(caminho, timeout=TIMEOUT_BLOQUEIO_S, check_same_thread=False)
+            conn.execute(f"PRAGMA busy_timeout = {int(TIMEOUT_BLOQUEIO_S * 1000)}")
+            # O modo fica gravado no arquivo; sistemas de arquivos sem WAL mantêm o modo atual
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(esquema)
+            return conn, caminho
+        except (OSError, sqlite3.Error) as e:
+            if conn is not None:
+                conn.close()
+            print(f"{descricao} indisponível em {caminho}: {str(e)}. Usando armazenamento em memória.")
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    conn.executescript(esquema)
+    return conn, ":memory:"